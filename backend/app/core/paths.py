@@ -28,6 +28,16 @@ def get_pdf_path(pdf_id: str) -> Path:
     return PDF_DIR / f"{pdf_id}.pdf"
 
 
+def get_pdf_meta_path(pdf_id: str) -> Path:
+    """PDF 메타데이터 sidecar 경로 반환 (sha256 / 크기 / 페이지 수)"""
+    return PDF_DIR / f"{pdf_id}.meta.json"
+
+
+def get_pdf_sha256_index_path(sha256: str) -> Path:
+    """sha256 -> 최초 업로드 pdf_id 인덱스 파일 경로 (중복 업로드 탐지용)"""
+    return PDF_DIR / "_by_sha256" / sha256
+
+
 def get_job_path(job_id: str) -> Path:
     """Job JSON 파일 경로 반환"""
     return JOB_DIR / f"{job_id}.json"
@@ -1,6 +1,6 @@
 """PDF 서비스"""
 from fastapi import UploadFile
-from app.storage.pdf_store import PDFStore
+from app.storage.pdf_store import PDFStore, UPLOAD_CHUNK_SIZE
 from app.models.pdf import PDFStatus
 from app.core.errors import PDFNotFoundError
 from app.utils.id_generator import generate_pdf_id
@@ -15,19 +15,26 @@ class PDFService:
         # PDF ID 생성
         pdf_id = generate_pdf_id()
         
-        # 파일 읽기
-        file_bytes = await file.read()
-        if not file_bytes:
-            raise ValueError("빈 파일입니다.")
-        
-        # 저장과 페이지 수 계산을 한 번에 처리
-        page_count = PDFStore.save_and_count_pages(pdf_id=pdf_id, pdf_bytes=file_bytes)
+        # chunk 단위로 디스크에 쓰면서 SHA-256 계산 (전체를 메모리에 올리지 않음)
+        writer = PDFStore.open_upload(pdf_id, original_filename=file.filename)
+        try:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+
+        # 페이지 수 확인 + 원자적 이동 + 메타 sidecar 저장
+        meta = writer.commit()
         
         # PDFStatus 모델 반환
         return PDFStatus(
             pdf_id=pdf_id,
             status="UPLOADED",
-            page_count=page_count
+            page_count=meta["page_count"]
         )
     
     @staticmethod
@@ -1,13 +1,92 @@
 """PDF 저장소"""
+import hashlib
+import json
 import os
 import tempfile
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
-from app.core.paths import get_pdf_path, PDF_DIR
+from typing import Any, Dict, Optional
+from app.core.paths import get_pdf_path, get_pdf_meta_path, get_pdf_sha256_index_path, PDF_DIR
 from app.core.errors import PDFNotFoundError
 from app.models.pdf import PDFStatus
+import fitz  # PyMuPDF
 import pypdf
 
+# 업로드 스트리밍 chunk 크기 (메모리 사용량 상한)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class PDFUploadWriter:
+    """
+    업로드를 chunk 단위로 디스크에 흘려 쓰면서 SHA-256 을 같이 계산한다.
+    (파일 전체를 메모리에 올리지 않으므로 200MB 스캔본도 메모리가 일정)
+
+    - write(chunk): 임시 파일에 append + 해시 갱신
+    - commit(): fitz 로 페이지 수 확인 → 최종 경로로 원자적 이동 → 메타 sidecar 저장
+    - abort(): 임시 파일 삭제
+    """
+
+    def __init__(self, pdf_id: str, original_filename: Optional[str] = None):
+        self.pdf_id = pdf_id
+        self.original_filename = original_filename
+        self.size_bytes = 0
+        self._sha = hashlib.sha256()
+        tmp = tempfile.NamedTemporaryFile(delete=False, dir=str(PDF_DIR), suffix=".tmp")
+        self._f = tmp
+        self.tmp_path = Path(tmp.name)
+
+    def write(self, chunk: bytes) -> None:
+        self._f.write(chunk)
+        self._sha.update(chunk)
+        self.size_bytes += len(chunk)
+
+    def commit(self) -> Dict[str, Any]:
+        """저장 완료. 메타데이터 dict 반환 (pdf_id, sha256, size_bytes, page_count, ...)"""
+        try:
+            self._f.close()
+            if self.size_bytes == 0:
+                raise ValueError("빈 파일입니다.")
+
+            page_count = PDFStore.count_pages_fast(self.tmp_path)
+
+            sha256 = self._sha.hexdigest()
+            duplicate_of = PDFStore.find_by_sha256(sha256)
+
+            final_path = get_pdf_path(self.pdf_id)
+            if duplicate_of is not None and PDFStore._link_duplicate(duplicate_of, final_path):
+                # 같은 내용이 이미 있으면 hardlink 로 디스크 공간 공유
+                self.tmp_path.unlink()
+            else:
+                os.replace(str(self.tmp_path), str(final_path))
+
+            meta = {
+                "pdf_id": self.pdf_id,
+                "sha256": sha256,
+                "size_bytes": self.size_bytes,
+                "page_count": page_count,
+                "original_filename": self.original_filename,
+                "duplicate_of": duplicate_of,
+                "uploaded_at": datetime.now(timezone.utc).astimezone().isoformat(),
+            }
+            PDFStore._write_json(get_pdf_meta_path(self.pdf_id), meta)
+            if duplicate_of is None:
+                PDFStore._register_sha256(sha256, self.pdf_id)
+            return meta
+        except Exception:
+            self.abort()
+            raise
+
+    def abort(self) -> None:
+        try:
+            self._f.close()
+        except Exception:
+            pass
+        if self.tmp_path.exists():
+            try:
+                self.tmp_path.unlink()
+            except Exception:
+                pass
+
 
 class PDFStore:
     """PDF 저장 및 조회"""
@@ -19,6 +98,80 @@ class PDFStore:
         pdf_path.write_bytes(file_content)
         return pdf_path
     
+    @staticmethod
+    def open_upload(pdf_id: str, original_filename: Optional[str] = None) -> PDFUploadWriter:
+        """스트리밍 업로드 writer 생성 (PDFService.upload_pdf 에서 chunk 단위로 write)"""
+        return PDFUploadWriter(pdf_id, original_filename=original_filename)
+
+    @staticmethod
+    def count_pages_fast(pdf_path: Path) -> int:
+        """
+        fitz 로 페이지 수만 확인 (xref/page tree 만 읽어서 pypdf 전체 파싱보다 훨씬 가볍다)
+        """
+        try:
+            doc = fitz.open(str(pdf_path))
+            try:
+                if not doc.is_pdf:
+                    raise ValueError("PDF 파일이 아닙니다.")
+                page_count = doc.page_count
+            finally:
+                doc.close()
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError("PDF를 열 수 없습니다. 파일이 손상되었거나 비정상 형식입니다.") from e
+        if page_count <= 0:
+            raise ValueError("페이지 수를 확인할 수 없습니다.")
+        return page_count
+
+    @staticmethod
+    def get_pdf_meta(pdf_id: str) -> Optional[Dict[str, Any]]:
+        """메타데이터 sidecar 조회 (스트리밍 업로드 이전에 올라온 PDF 는 None)"""
+        meta_path = get_pdf_meta_path(pdf_id)
+        if not meta_path.exists():
+            return None
+        try:
+            return json.loads(meta_path.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, OSError):
+            return None
+
+    @staticmethod
+    def find_by_sha256(sha256: str) -> Optional[str]:
+        """같은 내용으로 먼저 업로드된 pdf_id (없으면 None)"""
+        index_path = get_pdf_sha256_index_path(sha256)
+        if not index_path.exists():
+            return None
+        pdf_id = index_path.read_text(encoding="utf-8").strip()
+        if not pdf_id or not get_pdf_path(pdf_id).exists():
+            return None
+        return pdf_id
+
+    @staticmethod
+    def _link_duplicate(src_pdf_id: str, final_path: Path) -> bool:
+        link_tmp = final_path.with_name(final_path.name + ".link.tmp")
+        try:
+            if link_tmp.exists():
+                link_tmp.unlink()
+            os.link(str(get_pdf_path(src_pdf_id)), str(link_tmp))
+            os.replace(str(link_tmp), str(final_path))
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def _register_sha256(sha256: str, pdf_id: str) -> None:
+        index_path = get_pdf_sha256_index_path(sha256)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = index_path.with_name(index_path.name + ".tmp")
+        tmp.write_text(pdf_id, encoding="utf-8")
+        tmp.replace(index_path)
+
+    @staticmethod
+    def _write_json(path: Path, obj: Dict[str, Any]) -> None:
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(path)
+
     @staticmethod
     def save_and_count_pages(pdf_id: str, pdf_bytes: bytes) -> int:
         """
@@ -82,7 +235,12 @@ class PDFStore:
         if not pdf_path.exists():
             return None
         
-        page_count = PDFStore.get_page_count(pdf_path)
+        # 메타 sidecar 가 있으면 PDF 를 다시 파싱하지 않는다
+        meta = PDFStore.get_pdf_meta(pdf_id)
+        if meta and meta.get("page_count"):
+            page_count = int(meta["page_count"])
+        else:
+            page_count = PDFStore.get_page_count(pdf_path)
         return PDFStatus(
             pdf_id=pdf_id,
             status="UPLOADED",
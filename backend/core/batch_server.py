@@ -0,0 +1,283 @@
+# core/batch_server.py
+"""
+로컬 batch 서버 (OpenAI /v1/files + /v1/batches 의 오프라인 대용)
+
+llm_batch 의 제출 → 폴링 → 결과 회수 흐름을 실제 provider 없이 돌려보기 위한 서버.
+OpenAI SDK 가 쓰는 엔드포인트만 구현한다:
+
+  POST /v1/files                  (multipart, purpose=batch)
+  GET  /v1/files/{id}/content
+  POST /v1/batches                {"input_file_id", "endpoint", "completion_window"}
+  GET  /v1/batches/{id}
+  POST /v1/batches/{id}/cancel
+
+batch 는 백그라운드 스레드에서 한 줄씩 처리한다.
+  --upstream URL   각 요청을 OpenAI 호환 서버(/responses)로 그대로 보내서 응답을 받는다
+  (없으면)         --stub_text 를 output_text 로 하는 고정 응답
+
+실행:
+  python -m core.batch_server --port 8766 [--upstream http://127.0.0.1:8765/v1] [--delay 2]
+  LLM_BATCH_BASE_URL=http://127.0.0.1:8766/v1 python -m core.run_table_extract_mm --batch ...
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+Responder = Callable[[Dict[str, Any]], Tuple[int, Dict[str, Any]]]
+
+
+def stub_responder(text: str) -> Responder:
+    """모든 요청에 output_text=text 인 completed 응답"""
+    def _respond(body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        return 200, {
+            "id": f"resp_{uuid.uuid4().hex[:24]}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": body.get("model"),
+            "status": "completed",
+            "output": [{
+                "type": "message",
+                "id": f"msg_{uuid.uuid4().hex[:24]}",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }],
+            "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+        }
+    return _respond
+
+
+def upstream_responder(base_url: str) -> Responder:
+    """각 요청을 OpenAI 호환 서버로 보낸다 (응답 캐시 / rate limit 은 거치지 않음)"""
+    from openai import APIStatusError, OpenAI
+
+    client = OpenAI(base_url=base_url, api_key=os.environ.get("OPENAI_API_KEY") or "local")
+
+    def _respond(body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        try:
+            return 200, client.responses.create(**body).model_dump(mode="json")
+        except APIStatusError as e:
+            return e.status_code, {"error": {"message": str(e)}}
+        except Exception as e:
+            return 500, {"error": {"message": repr(e)}}
+    return _respond
+
+
+class BatchStore:
+    """파일 / batch 상태 (파일 내용은 data_dir 에 저장)"""
+
+    def __init__(self, data_dir: Path, responder: Responder, delay: float = 0.0):
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.responder = responder
+        self.delay = delay
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def add_file(self, data: bytes, filename: str, purpose: str) -> Dict[str, Any]:
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        (self.data_dir / file_id).write_bytes(data)
+        obj = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self.lock:
+            self.files[file_id] = obj
+        return obj
+
+    def file_content(self, file_id: str) -> Optional[bytes]:
+        path = self.data_dir / file_id
+        return path.read_bytes() if file_id in self.files and path.exists() else None
+
+    def create_batch(self, input_file_id: str, endpoint: str, completion_window: str) -> Dict[str, Any]:
+        batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+        batch = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": endpoint,
+            "input_file_id": input_file_id,
+            "completion_window": completion_window,
+            "status": "validating",
+            "created_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        with self.lock:
+            self.batches[batch_id] = batch
+        threading.Thread(target=self._process, args=(batch_id,), daemon=True).start()
+        return batch
+
+    def _process(self, batch_id: str) -> None:
+        batch = self.batches[batch_id]
+        data = self.file_content(batch["input_file_id"])
+        if data is None:
+            batch.update(status="failed", failed_at=int(time.time()))
+            return
+        lines = [json.loads(x) for x in data.decode("utf-8").splitlines() if x.strip()]
+        batch["request_counts"]["total"] = len(lines)
+        batch.update(status="in_progress", in_progress_at=int(time.time()))
+        if self.delay:
+            time.sleep(self.delay)
+
+        ok_lines, err_lines = [], []
+        for n, line in enumerate(lines):
+            if batch["status"] == "cancelling":
+                break
+            status, body = self.responder(line.get("body") or {})
+            rec = {
+                "id": f"batch_req_{n}",
+                "custom_id": line.get("custom_id"),
+                "response": {"status_code": status, "request_id": f"req_{n}", "body": body},
+                "error": None,
+            }
+            if status == 200:
+                ok_lines.append(rec)
+                batch["request_counts"]["completed"] += 1
+            else:
+                err_lines.append(rec)
+                batch["request_counts"]["failed"] += 1
+
+        for key, recs in (("output_file_id", ok_lines), ("error_file_id", err_lines)):
+            if recs:
+                blob = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in recs).encode("utf-8")
+                batch[key] = self.add_file(blob, f"{batch_id}_{key}.jsonl", "batch_output")["id"]
+
+        if batch["status"] == "cancelling":
+            batch.update(status="cancelled", cancelled_at=int(time.time()))
+        else:
+            batch.update(status="completed", completed_at=int(time.time()))
+
+
+def make_handler(store: BatchStore):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt: str, *args: Any) -> None:
+            pass
+
+        def _path(self) -> str:
+            p = self.path.split("?", 1)[0].rstrip("/")
+            return p[3:] if p.startswith("/v1/") else p
+
+        def _send(self, status: int, obj: Any = None, raw: Optional[bytes] = None) -> None:
+            body = raw if raw is not None else json.dumps(obj, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("content-type", "application/octet-stream" if raw is not None else "application/json")
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _not_found(self) -> None:
+            self._send(404, {"error": {"message": f"not found: {self.path}"}})
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("content-length") or 0))
+
+        def do_GET(self) -> None:
+            parts = self._path().strip("/").split("/")
+            if len(parts) == 3 and parts[0] == "files" and parts[2] == "content":
+                data = store.file_content(parts[1])
+                return self._send(200, raw=data) if data is not None else self._not_found()
+            if len(parts) == 2 and parts[0] == "files" and parts[1] in store.files:
+                return self._send(200, store.files[parts[1]])
+            if len(parts) == 2 and parts[0] == "batches" and parts[1] in store.batches:
+                return self._send(200, store.batches[parts[1]])
+            self._not_found()
+
+        def do_POST(self) -> None:
+            parts = self._path().strip("/").split("/")
+            body = self._body()
+            if parts == ["files"]:
+                ctype = self.headers.get("content-type", "")
+                msg = BytesParser(policy=policy.default).parsebytes(
+                    b"Content-Type: " + ctype.encode("latin-1") + b"\r\n\r\n" + body
+                )
+                fields: Dict[str, Any] = {}
+                for part in msg.iter_parts():
+                    name = part.get_param("name", header="content-disposition")
+                    fields[name] = (part.get_filename(), part.get_payload(decode=True))
+                if "file" not in fields:
+                    return self._send(400, {"error": {"message": "missing file"}})
+                filename, data = fields["file"]
+                purpose = (fields.get("purpose") or (None, b"batch"))[1].decode("utf-8")
+                return self._send(200, store.add_file(data, filename or "upload.jsonl", purpose))
+            if parts == ["batches"]:
+                req = json.loads(body or b"{}")
+                if req.get("input_file_id") not in store.files:
+                    return self._send(400, {"error": {"message": "unknown input_file_id"}})
+                return self._send(200, store.create_batch(
+                    req["input_file_id"], req.get("endpoint", "/v1/responses"), req.get("completion_window", "24h")
+                ))
+            if len(parts) == 3 and parts[0] == "batches" and parts[2] == "cancel" and parts[1] in store.batches:
+                batch = store.batches[parts[1]]
+                if batch["status"] in ("validating", "in_progress"):
+                    batch["status"] = "cancelling"
+                return self._send(200, batch)
+            self._not_found()
+
+    return Handler
+
+
+def serve(
+    port: int,
+    *,
+    host: str = "127.0.0.1",
+    upstream: Optional[str] = None,
+    stub_text: str = "{}",
+    delay: float = 0.0,
+    data_dir: Optional[Path] = None,
+) -> ThreadingHTTPServer:
+    """서버 객체를 만들어 돌려준다 (serve_forever 는 호출하는 쪽에서)"""
+    responder = upstream_responder(upstream) if upstream else stub_responder(stub_text)
+    store = BatchStore(data_dir or Path(tempfile.mkdtemp(prefix="batch_server_")), responder, delay=delay)
+    return ThreadingHTTPServer((host, port), make_handler(store))
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="로컬 batch 서버 (OpenAI Batch API 오프라인 대용)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8766)
+    ap.add_argument("--upstream", default=None, help="요청을 실제로 처리할 OpenAI 호환 base URL (예: http://127.0.0.1:8765/v1)")
+    ap.add_argument("--stub_text", default="{}", help="--upstream 이 없을 때 모든 요청의 output_text")
+    ap.add_argument("--delay", type=float, default=0.0, help="batch 처리 시작 전 대기(초) — 폴링 테스트용")
+    ap.add_argument("--data_dir", default=None, help="업로드/결과 파일 저장 위치 (기본: 임시 폴더)")
+    args = ap.parse_args(argv)
+
+    server = serve(
+        args.port,
+        host=args.host,
+        upstream=args.upstream,
+        stub_text=args.stub_text,
+        delay=args.delay,
+        data_dir=Path(args.data_dir) if args.data_dir else None,
+    )
+    print(f"[batch_server] http://{args.host}:{args.port}/v1 (upstream={args.upstream or 'stub'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
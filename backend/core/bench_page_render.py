@@ -0,0 +1,59 @@
+# core/bench_page_render.py
+"""
+페이지 렌더 코덱/병렬 벤치마크.
+
+포맷(png/jpeg/webp) x workers 조합마다 전체 렌더 wall time 과
+페이지당 파일 크기 / base64(data URL) 크기를 출력한다.
+
+  python -m core.bench_page_render --pdf_path data/Ch6.pdf --workers 1 4
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from core.page_render import DEFAULT_IMAGE_QUALITY, render_page_images
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="페이지 렌더 코덱/병렬 벤치마크")
+    ap.add_argument("--pdf_path", default="data/Ch6.pdf", help="입력 PDF 경로")
+    ap.add_argument("--dpi", type=int, default=150, help="렌더 DPI")
+    ap.add_argument("--formats", nargs="+", default=["png", "jpeg", "webp"], help="비교할 포맷")
+    ap.add_argument("--quality", type=int, default=DEFAULT_IMAGE_QUALITY, help="jpeg/webp 품질")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="비교할 workers 값")
+    args = ap.parse_args(argv)
+
+    print(f"{'format':<6} {'workers':>7} {'wall_s':>8} {'pages':>6} {'KB/page':>9} {'b64 KB/page':>12}")
+    for fmt in args.formats:
+        for workers in args.workers:
+            tmp = Path(tempfile.mkdtemp(prefix="bench_render_"))
+            try:
+                t0 = time.perf_counter()
+                try:
+                    paths = render_page_images(
+                        Path(args.pdf_path), tmp, dpi=args.dpi,
+                        image_format=fmt, quality=args.quality, workers=workers,
+                    )
+                except RuntimeError as e:  # webp without Pillow
+                    print(f"{fmt:<6} {workers:>7} skipped: {e}")
+                    continue
+                wall = time.perf_counter() - t0
+
+                n = max(1, len(paths))
+                total = sum(p.stat().st_size for p in paths)
+                b64_total = sum(4 * ((p.stat().st_size + 2) // 3) for p in paths)
+                print(
+                    f"{fmt:<6} {workers:>7} {wall:>8.2f} {len(paths):>6} "
+                    f"{total / n / 1024:>9.1f} {b64_total / n / 1024:>12.1f}"
+                )
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# core/contact_sheet.py
+"""
+표 존재 탐지용 contact sheet (페이지 썸네일 격자 한 장)
+
+detect_table_presence_batch 는 원본 해상도 페이지 이미지를 5장씩 보낸다. 16:9 슬라이드 한 장이
+high detail 로 ~1105 토큰이라 5장이면 요청 하나가 ~5.5k 이미지 토큰이다. 표가 있는지만 보려면
+격자선 / 셀 배치가 보일 정도의 썸네일이면 충분하므로, 여러 페이지를 번호 붙은 격자 한 장으로 합쳐
+이미지 하나로 보낸다.
+
+몇 장씩 묶을지는 고정 개수가 아니라 이미지 토큰 예산으로 정한다 (plan_layout):
+  provider 는 high detail 이미지를 긴 변 2048 → 짧은 변 768 로 줄인 뒤 512px 타일 수로 과금한다
+  (image_tokens). 시트를 처음부터 provider 가 보게 될 크기로 그려서 썸네일이 더 줄지 않게 하고,
+  셀 긴 변 cell_px 를 지키면서 토큰이 예산 안에 드는 가장 큰 격자(cols x rows)를 고른다.
+  예: cell_px=320, 예산 1105 → 16:9 슬라이드 2x8=16장 / 1105 토큰 (페이지당 ~69 토큰, 기존 한 장 ~1105),
+      A4 세로 2x6=12장 / 765 토큰
+
+그리기는 PyMuPDF 로: 빈 페이지에 원본 PDF 페이지를 show_pdf_page 로 바로 얹고 (lazy render 여도
+페이지 PNG 를 만들 필요 없음), PDF 가 없으면 페이지 PNG 를 insert_image 로 얹는다.
+셀마다 왼쪽 위에 0부터 번호를 붙이고, 모델은 번호별로 {"page": 번호, "t": bool} 을 답한다
+(table_presence_batch schema 그대로).
+
+설정 (환경변수, run_table_presence --sheet_* 인자가 우선):
+  PRESENCE_SHEET_TOKEN_BUDGET   시트 한 장의 이미지 토큰 예산 (기본 1105)
+  PRESENCE_SHEET_CELL_PX        셀 긴 변 px (기본 320)
+  PRESENCE_SHEET_MAX_CELLS      한 장에 넣을 최대 페이지 수 (기본 24, 많으면 번호 대응이 흔들림)
+"""
+from __future__ import annotations
+
+import base64
+import math
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from core.page_render import encode_pixmap
+
+DEFAULT_TOKEN_BUDGET = 1105
+DEFAULT_CELL_PX = 320
+DEFAULT_MAX_CELLS = 24
+
+# OpenAI high detail 이미지 과금 (긴 변 / 짧은 변 축소 → 512 타일)
+_MAX_LONG_SIDE = 2048
+_MAX_SHORT_SIDE = 768
+_TILE = 512
+_BASE_TOKENS = 85
+_TILE_TOKENS = 170
+
+_GAP = 4           # 셀 사이 여백 px
+_LABEL_RATIO = 0.1   # 번호 글자 크기 / 셀 짧은 변
+
+
+def image_tokens(width: float, height: float) -> int:
+    """high detail 이미지 한 장의 입력 토큰"""
+    w, h = float(width), float(height)
+    scale = min(1.0, _MAX_LONG_SIDE / max(w, h))
+    w, h = w * scale, h * scale
+    scale = min(1.0, _MAX_SHORT_SIDE / min(w, h))
+    w, h = w * scale, h * scale
+    return _BASE_TOKENS + _TILE_TOKENS * math.ceil(w / _TILE) * math.ceil(h / _TILE)
+
+
+@dataclass(frozen=True)
+class SheetLayout:
+    cols: int
+    rows: int
+    cell_w: int
+    cell_h: int
+
+    @property
+    def cells(self) -> int:
+        return self.cols * self.rows
+
+    @property
+    def width(self) -> int:
+        return self.cols * self.cell_w + (self.cols + 1) * _GAP
+
+    @property
+    def height(self) -> int:
+        return self.rows * self.cell_h + (self.rows + 1) * _GAP
+
+    @property
+    def tokens(self) -> int:
+        return image_tokens(self.width, self.height)
+
+    def to_dict(self) -> dict:
+        return {"cols": self.cols, "rows": self.rows, "cell_w": self.cell_w, "cell_h": self.cell_h,
+                "tokens": self.tokens}
+
+
+def _env_int(name: str, default: int) -> int:
+    v = os.environ.get(name)
+    return int(v) if v else default
+
+
+def plan_layout(
+    page_w: float,
+    page_h: float,
+    *,
+    token_budget: Optional[int] = None,
+    cell_px: Optional[int] = None,
+    max_cells: Optional[int] = None,
+) -> SheetLayout:
+    """
+    페이지 비율(page_w:page_h)의 셀을 provider 가 줄이지 않는 크기 안에서,
+    토큰 예산을 넘지 않는 가장 많은 칸으로 배치한다 (같은 칸 수면 토큰이 적은 쪽).
+    """
+    token_budget = token_budget or _env_int("PRESENCE_SHEET_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)
+    cell_px = cell_px or _env_int("PRESENCE_SHEET_CELL_PX", DEFAULT_CELL_PX)
+    max_cells = max_cells or _env_int("PRESENCE_SHEET_MAX_CELLS", DEFAULT_MAX_CELLS)
+
+    aspect = page_h / page_w if page_w > 0 else 1.0
+    if aspect <= 1.0:
+        cell_w, cell_h = cell_px, max(1, round(cell_px * aspect))
+    else:
+        cell_w, cell_h = max(1, round(cell_px / aspect)), cell_px
+
+    best = SheetLayout(1, 1, cell_w, cell_h)
+    for cols in range(1, max_cells + 1):
+        for rows in range(1, max_cells // cols + 1):
+            layout = SheetLayout(cols, rows, cell_w, cell_h)
+            long_side, short_side = max(layout.width, layout.height), min(layout.width, layout.height)
+            if long_side > _MAX_LONG_SIDE or short_side > _MAX_SHORT_SIDE:
+                continue  # provider 가 줄이면 셀이 cell_px 보다 작아진다
+            if layout.tokens > token_budget:
+                continue
+            if (layout.cells, -layout.tokens) > (best.cells, -best.tokens):
+                best = layout
+    return best
+
+
+def page_size(pdf_path: Optional[Path] = None, image_path: Optional[Path] = None) -> Tuple[float, float]:
+    """첫 페이지 크기 (PDF 면 pt, 이미지면 px) — 셀 비율을 정하는 데만 쓴다"""
+    if pdf_path is not None:
+        with fitz.open(str(pdf_path)) as doc:
+            r = doc[0].rect
+            return r.width, r.height
+    if image_path is not None:
+        pix = fitz.Pixmap(str(image_path))
+        return pix.width, pix.height
+    raise ValueError("page_size needs pdf_path or image_path")
+
+
+def render_sheet(
+    page_indices: List[int],
+    layout: SheetLayout,
+    *,
+    pdf_path: Optional[Path] = None,
+    image_paths: Optional[List[Path]] = None,
+    image_format: str = "png",
+) -> bytes:
+    """
+    page_indices 를 순서대로 격자에 얹고 0.. 번호를 붙인 시트 이미지 바이트.
+    pdf_path 가 있으면 원본 페이지를 벡터로 얹고, 없으면 image_paths (같은 순서) 를 쓴다.
+    """
+    if len(page_indices) > layout.cells:
+        raise ValueError(f"{len(page_indices)} pages do not fit in {layout.cols}x{layout.rows} sheet")
+    if pdf_path is None and (image_paths is None or len(image_paths) != len(page_indices)):
+        raise ValueError("render_sheet needs pdf_path or one image path per page")
+
+    sheet_doc = fitz.open()
+    src = fitz.open(str(pdf_path)) if pdf_path is not None else None
+    try:
+        sheet = sheet_doc.new_page(width=layout.width, height=layout.height)
+        sheet.draw_rect(sheet.rect, color=None, fill=(1, 1, 1))
+        fontsize = max(10, round(min(layout.cell_w, layout.cell_h) * _LABEL_RATIO))
+
+        for i, pi in enumerate(page_indices):
+            col, row = i % layout.cols, i // layout.cols
+            x0 = _GAP + col * (layout.cell_w + _GAP)
+            y0 = _GAP + row * (layout.cell_h + _GAP)
+            cell = fitz.Rect(x0, y0, x0 + layout.cell_w, y0 + layout.cell_h)
+            if src is not None:
+                sheet.show_pdf_page(cell, src, pi, keep_proportion=True)
+            else:
+                sheet.insert_image(cell, filename=str(image_paths[i]), keep_proportion=True)
+            sheet.draw_rect(cell, color=(0.55, 0.55, 0.55), width=1)
+
+            label = str(i)
+            box = fitz.Rect(x0, y0, x0 + fontsize * (0.65 * len(label) + 0.5), y0 + fontsize * 1.25)
+            sheet.draw_rect(box, color=(0.8, 0, 0), fill=(1, 1, 0.85), width=1)
+            sheet.insert_text((box.x0 + fontsize * 0.25, box.y1 - fontsize * 0.3), label,
+                              fontsize=fontsize, fontname="hebo", color=(0.8, 0, 0))
+
+        pix = sheet.get_pixmap(alpha=False)
+        return encode_pixmap(pix, image_format)
+    finally:
+        if src is not None:
+            src.close()
+        sheet_doc.close()
+
+
+def sheet_data_url(
+    page_indices: List[int],
+    layout: SheetLayout,
+    *,
+    pdf_path: Optional[Path] = None,
+    image_paths: Optional[List[Path]] = None,
+) -> str:
+    data = render_sheet(page_indices, layout, pdf_path=pdf_path, image_paths=image_paths)
+    return f"data:image/png;base64,{base64.b64encode(data).decode('utf-8')}"
@@ -0,0 +1,180 @@
+# core/image_payload.py
+"""
+페이지 이미지 → base64 data URL 인코딩 캐시 (프로세스 공용, 메모리 상한 LRU)
+
+presence batch / 표 추출 / 재시도(core.retry_policy)가 같은 PNG 를 매번 다시 읽고 base64 로 바꿨다.
+여기서 한 번 인코딩한 data URL 을 들고 있다가 같은 이미지 + 같은 변환이면 그대로 돌려준다.
+
+key = (절대 경로, mtime_ns, 파일 크기, ImageVariant)
+  lazy render 로 파일이 다시 써지면 mtime 이 바뀌어 자동으로 새로 인코딩한다.
+
+ImageVariant 는 보내기 전 변환 (포맷 / 품질 / 긴 변 축소 / 흑백). 소비자(stage)마다 다른 변형을 쓸 수 있고
+변형마다 따로 캐시된다. 기본값은 모두 "파일 그대로" 라서 설정하지 않으면 예전과 같은 바이트가 나간다.
+
+설정 (환경변수):
+  MM_IMAGE_FORMAT / MM_IMAGE_QUALITY        전체 기본 재인코딩 포맷 / 품질 (기존)
+  MM_IMAGE_<STAGE>_MAX_SIDE                 stage 별 긴 변 최대 px (예: MM_IMAGE_PRESENCE_MAX_SIDE=1024)
+  MM_IMAGE_<STAGE>_GRAYSCALE=1              stage 별 흑백 변환
+  MM_IMAGE_CACHE_MB                         캐시 상한 (기본 256, 0 이면 캐시 안 함)
+"""
+from __future__ import annotations
+
+import base64
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_CACHE_MB = 256
+
+_MIME_BY_SUFFIX = {"png": "image/png", "jpg": "image/jpeg", "jpeg": "image/jpeg", "webp": "image/webp"}
+_MIME_BY_FORMAT = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+@dataclass(frozen=True)
+class ImageVariant:
+    image_format: Optional[str] = None   # None 이면 파일 포맷 그대로
+    quality: Optional[int] = None
+    max_side: Optional[int] = None       # 긴 변이 이보다 크면 비율 유지 축소
+    grayscale: bool = False
+
+    @property
+    def is_identity(self) -> bool:
+        return self.max_side is None and not self.grayscale
+
+
+def variant_for(
+    stage: Optional[str] = None,
+    image_format: Optional[str] = None,
+    quality: Optional[int] = None,
+) -> ImageVariant:
+    """인자 > MM_IMAGE_<STAGE>_* > MM_IMAGE_FORMAT / MM_IMAGE_QUALITY 순으로 변형을 정한다."""
+    image_format = image_format or os.environ.get("MM_IMAGE_FORMAT") or None
+    if quality is None and os.environ.get("MM_IMAGE_QUALITY"):
+        quality = int(os.environ["MM_IMAGE_QUALITY"])
+
+    max_side = None
+    grayscale = False
+    if stage:
+        prefix = f"MM_IMAGE_{stage.upper()}_"
+        v = os.environ.get(prefix + "MAX_SIDE")
+        max_side = int(v) if v else None
+        grayscale = os.environ.get(prefix + "GRAYSCALE", "0") not in ("0", "false", "no", "")
+    return ImageVariant(image_format=image_format, quality=quality, max_side=max_side, grayscale=grayscale)
+
+
+def encode_data_url(image_path: Path, variant: ImageVariant) -> str:
+    """캐시 없이 한 번 인코딩 (파일이 이미 원하는 포맷이고 변환이 없으면 바이트 그대로)"""
+    image_path = Path(image_path)
+    suffix = image_path.suffix.lower().lstrip(".")
+    if suffix not in _MIME_BY_SUFFIX:
+        raise ValueError(f"Unsupported image type: .{suffix}")
+
+    image_format = variant.image_format
+    if image_format and image_format not in _MIME_BY_FORMAT:
+        raise ValueError(f"Unsupported image_format: {image_format}")
+    same_format = not image_format or _MIME_BY_FORMAT[image_format] == _MIME_BY_SUFFIX[suffix]
+
+    if same_format and variant.is_identity:
+        data = image_path.read_bytes()
+        mime = _MIME_BY_SUFFIX[suffix]
+    else:
+        import fitz  # PyMuPDF (재인코딩할 때만 필요)
+        from core.page_render import DEFAULT_IMAGE_QUALITY, encode_pixmap
+
+        if not image_format:
+            image_format = "jpeg" if suffix in ("jpg", "jpeg") else suffix
+        pix = fitz.Pixmap(str(image_path))
+        if variant.grayscale and pix.colorspace is not None and pix.colorspace.n != 1:
+            pix = fitz.Pixmap(fitz.csGRAY, pix)
+        if variant.max_side and max(pix.width, pix.height) > variant.max_side:
+            scale = variant.max_side / max(pix.width, pix.height)
+            pix = fitz.Pixmap(pix, max(1, round(pix.width * scale)), max(1, round(pix.height * scale)), None)
+        quality = variant.quality if variant.quality is not None else DEFAULT_IMAGE_QUALITY
+        data = encode_pixmap(pix, image_format, quality)
+        mime = _MIME_BY_FORMAT[image_format]
+
+    b64 = base64.b64encode(data).decode("utf-8")
+    return f"data:{mime};base64,{b64}"
+
+
+_Key = Tuple[str, int, int, ImageVariant]
+
+
+class ImagePayloadCache:
+    """data URL LRU. 크기는 문자열 길이(≈ 바이트) 합으로 제한한다."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = int(max_bytes)
+        self._items: "OrderedDict[_Key, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, image_path: Path, variant: ImageVariant) -> str:
+        p = Path(image_path).resolve()
+        st = p.stat()
+        key: _Key = (str(p), st.st_mtime_ns, st.st_size, variant)
+        with self._lock:
+            url = self._items.get(key)
+            if url is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return url
+            self.misses += 1
+
+        # 인코딩은 lock 밖에서 (다른 페이지 인코딩을 막지 않게). 같은 key 가 동시에 오면 한 번 더 인코딩될 뿐.
+        url = encode_data_url(p, variant)
+        if len(url) > self.max_bytes:
+            return url
+        with self._lock:
+            if key not in self._items:
+                self._items[key] = url
+                self._bytes += len(url)
+                while self._bytes > self.max_bytes:
+                    _, old = self._items.popitem(last=False)
+                    self._bytes -= len(old)
+        return url
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self._items),
+                "bytes": self._bytes,
+            }
+
+
+_cache_lock = threading.Lock()
+_cache: Optional[ImagePayloadCache] = None
+
+
+def get_cache() -> ImagePayloadCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                mb = float(os.environ.get("MM_IMAGE_CACHE_MB") or DEFAULT_CACHE_MB)
+                _cache = ImagePayloadCache(int(mb * 1024 * 1024))
+    return _cache
+
+
+def data_url(
+    image_path: Path,
+    *,
+    stage: Optional[str] = None,
+    image_format: Optional[str] = None,
+    quality: Optional[int] = None,
+) -> str:
+    """stage 에 맞는 변형으로 인코딩한 data URL (이 프로세스에서 이미 만든 적 있으면 캐시에서)"""
+    return get_cache().get(image_path, variant_for(stage, image_format, quality))
+
+
+def cache_stats() -> Dict[str, Any]:
+    return get_cache().stats()
@@ -7,7 +7,10 @@ import math
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from core.pages_reader import open_pages, pages_text_exists
+from core.span_store import SpanStore, page_spans_of
 
 
 @dataclass(frozen=True)
@@ -70,14 +73,6 @@ def _write_json(path: Path, obj: Any) -> None:
         json.dump(obj, f, ensure_ascii=False, indent=2)
 
 
-def _ensure_pages_list(pages_text: Any) -> List[Dict[str, Any]]:
-    if isinstance(pages_text, dict) and isinstance(pages_text.get("pages"), list):
-        return pages_text["pages"]
-    if isinstance(pages_text, list):
-        return pages_text
-    raise ValueError("pages_text.json must be a list or an object with a 'pages' list")
-
-
 def _ensure_sections_list(sections_obj: Any) -> List[Dict[str, Any]]:
     if isinstance(sections_obj, list):
         return [s for s in sections_obj if isinstance(s, dict)]
@@ -99,14 +94,15 @@ def _ensure_sections_list(sections_obj: Any) -> List[Dict[str, Any]]:
     raise ValueError("sections.json must be a list of section objects")
 
 
-def _page_text(page_obj: Dict[str, Any]) -> str:
+def _page_text(page_obj: Dict[str, Any], page_index: int, span_store: Optional[SpanStore] = None) -> str:
     for k in ("text", "page_text", "content", "raw_text"):
         v = page_obj.get(k)
         if isinstance(v, str) and v.strip():
             return v.strip()
 
-    spans = page_obj.get("spans") or page_obj.get("layout", {}).get("spans") or []
-    if isinstance(spans, list) and spans:
+    # layout_format=npy 면 spans 는 pages_layout/ (span_store) 에 있다
+    spans = page_spans_of(page_obj, page_index, span_store)
+    if spans:
         parts = []
         for s in spans:
             if not isinstance(s, dict):
@@ -187,13 +183,14 @@ def _section_pages(sec: Dict[str, Any], num_pages: int) -> List[int]:
 
 def _build_text_for_pages(
     pages: List[int],
-    pages_list: List[Dict[str, Any]],
+    pages_list: Sequence[Dict[str, Any]],
     sep: str,
+    span_store: Optional[SpanStore] = None,
 ) -> Tuple[str, Dict[int, str]]:
     parts: List[str] = []
     page_texts: Dict[int, str] = {}
     for p in pages:
-        txt = _page_text(pages_list[p])
+        txt = _page_text(pages_list[p], p, span_store)
         page_texts[p] = txt
         parts.append(sep.format(page_index=p) + txt)
     merged = "".join(parts).strip()
@@ -338,15 +335,16 @@ def _build_jobs(cfg: JobBuilderConfig, skip_allocation: bool = False, external_a
 
     if not sections_path.exists():
         raise FileNotFoundError(f"Missing: {sections_path}")
-    if not pages_text_path.exists():
+    if not pages_text_exists(pages_text_path):
         raise FileNotFoundError(f"Missing: {pages_text_path}")
 
     sections_obj = _read_json(sections_path)
     sections = _ensure_sections_list(sections_obj)
 
-    pages_text_obj = _read_json(pages_text_path)
-    pages_list = _ensure_pages_list(pages_text_obj)
+    # pages_text.jsonl(index)가 있으면 필요한 페이지만 lazy 로드
+    pages_list = open_pages(pages_text_path)
     num_pages_total = len(pages_list)
+    span_store = SpanStore.open_if_exists(pages_text_path.parent)
 
     tables_obj = _read_json(tables_path) if tables_path.exists() else None
     tables_by_page = _normalize_tables_by_page(tables_obj)
@@ -361,7 +359,7 @@ def _build_jobs(cfg: JobBuilderConfig, skip_allocation: bool = False, external_a
         section_id = sec.get("section_id") or f"S{i:03d}"
         title = sec.get("title") or ""
         pages = _section_pages(sec, num_pages_total)
-        text, _page_texts = _build_text_for_pages(pages, pages_list, cfg.page_separator)
+        text, _page_texts = _build_text_for_pages(pages, pages_list, cfg.page_separator, span_store)
         tables = _tables_for_pages(pages, tables_by_page)
         cc = len(text)
         total_chars_all_sections += cc
@@ -423,7 +421,7 @@ def _build_jobs(cfg: JobBuilderConfig, skip_allocation: bool = False, external_a
         merged_with_next = False
         merged_section_ids = [section_id]
 
-        text, page_texts = _build_text_for_pages(job_pages, pages_list, cfg.page_separator)
+        text, page_texts = _build_text_for_pages(job_pages, pages_list, cfg.page_separator, span_store)
         tables = _tables_for_pages(job_pages, tables_by_page)
         char_count = len(text)
         has_tables = len(tables) > 0
@@ -436,7 +434,7 @@ def _build_jobs(cfg: JobBuilderConfig, skip_allocation: bool = False, external_a
                 next_n=cfg.SMALL_BUFFER_NEXT_PAGES,
             )
             buffered = True
-            text, page_texts = _build_text_for_pages(job_pages, pages_list, cfg.page_separator)
+            text, page_texts = _build_text_for_pages(job_pages, pages_list, cfg.page_separator, span_store)
             tables = _tables_for_pages(job_pages, tables_by_page)
             char_count = len(text)
             has_tables = len(tables) > 0
@@ -447,7 +445,7 @@ def _build_jobs(cfg: JobBuilderConfig, skip_allocation: bool = False, external_a
                 next_id = sec_next.get("section_id") or f"S{i+1:03d}"
                 next_pages = _section_pages(sec_next, num_pages_total)
                 merged_pages = sorted(set(job_pages + next_pages))
-                text, page_texts = _build_text_for_pages(merged_pages, pages_list, cfg.page_separator)
+                text, page_texts = _build_text_for_pages(merged_pages, pages_list, cfg.page_separator, span_store)
                 tables = _tables_for_pages(merged_pages, tables_by_page)
                 char_count = len(text)
                 has_tables = len(tables) > 0
@@ -515,7 +513,7 @@ def _build_jobs(cfg: JobBuilderConfig, skip_allocation: bool = False, external_a
                 table_job_index = 0
 
         for j, page_group in enumerate(page_jobs):
-            grp_text, _grp_page_texts = _build_text_for_pages(page_group, pages_list, cfg.page_separator)
+            grp_text, _grp_page_texts = _build_text_for_pages(page_group, pages_list, cfg.page_separator, span_store)
             grp_tables = _tables_for_pages(page_group, tables_by_page)
             job_id = f"{section_id}_J{j+1:02d}"
 
@@ -0,0 +1,84 @@
+# core/json_stream.py
+"""
+스트리밍 출력에서 JSON 배열 원소를 닫히는 대로 꺼내는 증분 파서
+
+문제 생성 출력은 {"questions": [{...}, {...}, ...]} 한 덩어리라서
+전체가 다 와야 json.loads 를 할 수 있다. 스트리밍 중에 최상위 object 의 key 배열 안
+object 가 '}' 로 닫히는 순간 그 원소만 잘라서 파싱해 돌려준다.
+
+    items = JsonArrayItems("questions")
+    for delta in stream:
+        for q in items.feed(delta):
+            ...
+
+문자열 안의 괄호 / 이스케이프는 건너뛰고, 최상위가 object 가 아니거나 key 가 없으면 아무것도 내지 않는다
+(그 경우는 스트림이 끝난 뒤 전체 텍스트를 평소처럼 파싱하면 된다).
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional
+
+
+class JsonArrayItems:
+    """최상위 object 의 key 배열 원소(object)를 닫히는 순서대로 돌려준다."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._str_start = 0
+        self._last_key: Optional[str] = None   # depth 1 에서 마지막으로 닫힌 문자열
+        self._array_depth: Optional[int] = None  # key 배열 안일 때 배열의 depth
+        self._item_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self.text += chunk
+        out: List[Dict[str, Any]] = []
+        text = self.text
+
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif c == "\\":
+                    self._esc = True
+                elif c == '"':
+                    self._in_str = False
+                    if self._depth == 1:
+                        try:
+                            self._last_key = json.loads(text[self._str_start:i + 1])
+                        except ValueError:
+                            self._last_key = None
+                continue
+
+            if c == '"':
+                self._in_str = True
+                self._str_start = i
+            elif c in "{[":
+                self._depth += 1
+                if c == "[" and self._depth == 2 and self._last_key == self.key:
+                    self._array_depth = 2
+                elif c == "{" and self._array_depth is not None and self._depth == self._array_depth + 1:
+                    self._item_start = i
+            elif c in "}]":
+                if c == "}" and self._item_start is not None and self._depth == self._array_depth + 1:
+                    try:
+                        obj = json.loads(text[self._item_start:i + 1])
+                    except ValueError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        out.append(obj)
+                    self._item_start = None
+                elif c == "]" and self._array_depth is not None and self._depth == self._array_depth:
+                    self._array_depth = None
+                self._depth -= 1
+                if self._depth == 1:
+                    self._last_key = None
+
+        self._pos = len(text)
+        return out
@@ -0,0 +1,83 @@
+# core/llm_async.py
+"""
+asyncio 기반 LLM 작업 실행기 (stage runner 의 ThreadPoolExecutor 대체)
+
+스레드 풀은 동시 요청 하나에 스레드 하나를 잡아서 workers 를 2~3 이상 올리기 부담스럽다.
+여기서는 한 event loop 에서 작업을 코루틴으로 돌리고 asyncio.Semaphore 로 동시 실행 수만 제한한다.
+실제 동시 요청 수는 concurrency 와 core.llm_client 의 stage 제한(LLM_CONCURRENCY_<STAGE>) 중 작은 값.
+
+결과 처리(on_done)는 완료 순서대로 loop 스레드에서 하나씩 호출되므로
+runner 의 상태 dict / 진행 파일 기록에 lock 이 필요 없다 (기존 as_completed 루프와 같은 모양).
+
+    def on_done(i, item, result, error): ...
+    run_tasks(todo, worker, concurrency=64, on_done=on_done)
+
+worker 가 코루틴 함수가 아니면(여러 단계가 얽힌 동기 파이프라인 등) 전용 스레드 풀에서 실행한다.
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Tuple, TypeVar
+
+from core.llm_client import close_async_client
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# on_done(완료 순번 1.., item, result, error) — error 가 None 이 아니면 result 는 None
+OnDone = Callable[[int, T, Optional[R], Optional[BaseException]], None]
+
+
+def run_tasks(
+    items: Iterable[T],
+    worker: Callable[[T], Any],
+    *,
+    concurrency: int,
+    on_done: OnDone,
+) -> None:
+    """items 를 worker 로 처리하고 완료될 때마다 on_done 호출. 새 event loop 에서 끝까지 실행."""
+    asyncio.run(run_tasks_async(items, worker, concurrency=concurrency, on_done=on_done))
+
+
+async def run_tasks_async(
+    items: Iterable[T],
+    worker: Callable[[T], Any],
+    *,
+    concurrency: int,
+    on_done: OnDone,
+) -> None:
+    items = list(items)
+    concurrency = max(1, int(concurrency))
+    sem = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    is_async = inspect.iscoroutinefunction(worker)
+    pool = None if is_async else ThreadPoolExecutor(max_workers=min(concurrency, max(1, len(items))))
+
+    async def _one(item: T) -> Tuple[T, Any, Optional[BaseException]]:
+        async with sem:
+            try:
+                if is_async:
+                    result = await worker(item)
+                else:
+                    result = await loop.run_in_executor(pool, worker, item)
+                return item, result, None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                return item, None, e
+
+    tasks: List[asyncio.Task] = [asyncio.create_task(_one(it)) for it in items]
+    try:
+        for i, fut in enumerate(asyncio.as_completed(tasks), 1):
+            item, result, error = await fut
+            on_done(i, item, result, error)
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        await close_async_client()
@@ -0,0 +1,255 @@
+# core/llm_batch.py
+"""
+Batch API 제출 / 폴링 / 결과 회수 (야간 대량 처리용 비대화형 모드)
+
+강의 자료 전체를 밤새 돌릴 때는 응답 지연이 상관없으므로, 요청을 JSONL 로 모아
+provider batch 인터페이스(/v1/files + /v1/batches)로 한 번에 제출하고 끝나면 결과를 받아온다.
+(OpenAI Batch API 는 같은 요청이 대화형 호출의 절반 가격이고 분당 한도와 별도)
+
+    results = run_batch(items, work_dir)   # {custom_id: Response | BatchItemError}
+
+work_dir:
+  requests.jsonl     제출한 요청 ({"custom_id", "method", "url", "body"})
+  batch_state.json   batch id / 상태 — 중간에 죽어도 같은 입력이면 새로 제출하지 않고 이어서 폴링
+  output.jsonl       성공 결과
+  errors.jsonl       실패한 요청
+
+응답 캐시(core.llm_cache)에 있는 요청은 제출하지 않고, 받은 결과는 캐시에 넣는다.
+scope(custom_id) 를 주면 요청마다 그 컨텍스트 안에서 캐시 조회 / 사용량 기록을 한다
+(여러 job 을 한 batch 로 보내도 job 별 llm_cache.track / llm_usage.track 에 나눠 센다).
+
+설정 (환경변수):
+  LLM_BATCH_BASE_URL        batch 를 보낼 서버 (기본: 대화형 client 와 같음)
+                            오프라인 테스트는 core.batch_server 를 띄우고 그 주소를 준다
+  LLM_BATCH_POLL_SECONDS    상태 확인 간격 (기본 30)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Union
+
+from openai import OpenAI
+
+from core import llm_cache, llm_usage
+from core.llm_client import _client_kwargs, _dump_response, _load_response, get_client
+
+BATCH_ENDPOINT = "/v1/responses"
+COMPLETION_WINDOW = "24h"
+DEFAULT_POLL_SECONDS = 30.0
+
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    custom_id: str                  # batch 안에서 유일해야 함 (예: "page_003", "gen:J001")
+    stage: str                      # 캐시 / 통계용 stage 이름
+    request: Dict[str, Any]         # Responses API 요청 body (create_response 에 넘기는 것과 같음)
+
+
+class BatchItemError(RuntimeError):
+    """batch 안의 요청 하나가 실패 (나머지 결과는 정상)"""
+
+
+BatchResult = Union[Any, BatchItemError]
+
+
+def batch_client() -> OpenAI:
+    base_url = os.environ.get("LLM_BATCH_BASE_URL")
+    if not base_url:
+        return get_client()
+    return OpenAI(base_url=base_url, **_client_kwargs())
+
+
+def run_batch(
+    items: List[BatchItem],
+    work_dir: Path,
+    *,
+    poll_seconds: Optional[float] = None,
+    timeout: Optional[float] = None,
+    log: Callable[[str], None] = print,
+    scope: Optional[Callable[[str], ContextManager[Any]]] = None,
+) -> Dict[str, BatchResult]:
+    """
+    items 를 batch 로 처리하고 {custom_id: Response | BatchItemError} 반환.
+    timeout(초) 안에 끝나지 않으면 TimeoutError — 다시 호출하면 같은 batch 를 이어서 기다린다.
+    """
+    def _scope(custom_id: str) -> ContextManager[Any]:
+        return scope(custom_id) if scope is not None else nullcontext()
+
+    ids = [it.custom_id for it in items]
+    if len(set(ids)) != len(ids):
+        raise ValueError("custom_id must be unique within a batch")
+
+    results: Dict[str, BatchResult] = {}
+    pending: List[BatchItem] = []
+    for it in items:
+        with _scope(it.custom_id):
+            found, resp = llm_cache.lookup(it.stage, it.request, load=_load_response)
+            if found:
+                llm_usage.record(it.stage, it.request, cache_hit=True)
+        if found:
+            results[it.custom_id] = resp
+        else:
+            pending.append(it)
+
+    if len(pending) < len(items):
+        log(f"[batch] cache hit {len(items) - len(pending)}/{len(items)}")
+    if not pending:
+        return results
+
+    outputs = _submit_and_wait(pending, Path(work_dir), poll_seconds=poll_seconds, timeout=timeout, log=log)
+    for it in pending:
+        r = outputs.get(it.custom_id)
+        if r is None:
+            r = BatchItemError(f"no result for {it.custom_id}")
+        with _scope(it.custom_id):
+            if isinstance(r, BatchItemError):
+                llm_usage.record(it.stage, it.request, error=True, batch=True)
+            else:
+                llm_usage.record(it.stage, it.request, r, batch=True)
+                llm_cache.store(it.stage, it.request, r, dump=_dump_response)
+        results[it.custom_id] = r
+    return results
+
+
+def _submit_and_wait(
+    items: List[BatchItem],
+    work_dir: Path,
+    *,
+    poll_seconds: Optional[float],
+    timeout: Optional[float],
+    log: Callable[[str], None],
+) -> Dict[str, BatchResult]:
+    work_dir.mkdir(parents=True, exist_ok=True)
+    state_path = work_dir / "batch_state.json"
+    if poll_seconds is None:
+        poll_seconds = float(os.environ.get("LLM_BATCH_POLL_SECONDS") or DEFAULT_POLL_SECONDS)
+
+    lines = [
+        json.dumps(
+            {"custom_id": it.custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": it.request},
+            ensure_ascii=False,
+        )
+        for it in items
+    ]
+    blob = ("\n".join(lines) + "\n").encode("utf-8")
+    input_sha = hashlib.sha256(blob).hexdigest()
+
+    client = batch_client()
+    state = _load_json(state_path)
+    resubmit = (
+        state is None
+        or state.get("input_sha") != input_sha
+        or state.get("status") in ("failed", "expired", "cancelled")
+    )
+
+    if resubmit:
+        req_path = work_dir / "requests.jsonl"
+        tmp = req_path.with_suffix(".jsonl.tmp")
+        tmp.write_bytes(blob)
+        tmp.replace(req_path)
+        for name in ("output.jsonl", "errors.jsonl"):
+            (work_dir / name).unlink(missing_ok=True)
+
+        with req_path.open("rb") as f:
+            file_obj = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=file_obj.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=COMPLETION_WINDOW,
+        )
+        state = {
+            "batch_id": batch.id,
+            "input_file_id": file_obj.id,
+            "input_sha": input_sha,
+            "num_requests": len(items),
+            "status": batch.status,
+            "submitted_at": _now_iso(),
+        }
+        _write_json(state_path, state)
+        log(f"[batch] submitted {batch.id}: {len(items)} requests")
+    else:
+        log(f"[batch] resuming {state['batch_id']} (status={state.get('status')})")
+
+    t0 = time.time()
+    while True:
+        batch = client.batches.retrieve(state["batch_id"])
+        counts = getattr(batch, "request_counts", None)
+        state.update({
+            "status": batch.status,
+            "output_file_id": getattr(batch, "output_file_id", None),
+            "error_file_id": getattr(batch, "error_file_id", None),
+            "request_counts": counts.model_dump() if counts is not None else None,
+            "updated_at": _now_iso(),
+        })
+        _write_json(state_path, state)
+        if batch.status in TERMINAL_STATUSES:
+            break
+        if timeout is not None and time.time() - t0 > timeout:
+            raise TimeoutError(f"batch {state['batch_id']} still {batch.status} after {timeout:.0f}s")
+        log(f"[batch] {state['batch_id']} {batch.status} {state['request_counts'] or ''}")
+        time.sleep(poll_seconds)
+
+    log(f"[batch] {state['batch_id']} {batch.status} {state['request_counts'] or ''}")
+
+    # expired / cancelled 여도 끝난 요청의 결과는 받아온다
+    outputs: Dict[str, BatchResult] = {}
+    for key, name in (("output_file_id", "output.jsonl"), ("error_file_id", "errors.jsonl")):
+        file_id = state.get(key)
+        if not file_id:
+            continue
+        path = work_dir / name
+        if not path.exists():
+            data = client.files.content(file_id).read()
+            tmp = path.with_suffix(".jsonl.tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+        outputs.update(_parse_output(path.read_text(encoding="utf-8")))
+
+    if batch.status != "completed":
+        for it in items:
+            outputs.setdefault(it.custom_id, BatchItemError(f"batch {batch.status}"))
+    return outputs
+
+
+def _parse_output(text: str) -> Dict[str, BatchResult]:
+    out: Dict[str, BatchResult] = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        rec = json.loads(line)
+        cid = rec.get("custom_id")
+        resp = rec.get("response") or {}
+        if rec.get("error") or resp.get("status_code") != 200:
+            detail = rec.get("error") or resp.get("body")
+            out[cid] = BatchItemError(json.dumps(detail, ensure_ascii=False)[:500])
+        else:
+            out[cid] = _load_response(resp["body"])
+    return out
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).astimezone().isoformat()
+
+
+def _load_json(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return None
+
+
+def _write_json(path: Path, obj: Dict[str, Any]) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(path)
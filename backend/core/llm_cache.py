@@ -0,0 +1,359 @@
+# core/llm_cache.py
+"""
+LLM 응답 content-addressed 캐시 (SQLite, 크기 제한 LRU)
+
+job 을 다시 돌리면(크래시 후 재시작, 문제 수만 바꿔서 재실행 등) presence / extract /
+allocate / verify 호출을 전부 다시 내게 된다. core.llm_client.create_response 가
+요청을 보내기 전에 여기서 먼저 찾는다.
+
+key = sha256(canonical JSON of request)
+  request 에는 model / input(프롬프트 + 이미지 data URL) / temperature / max_output_tokens /
+  text format 등이 모두 들어있으므로 "모델 + 프롬프트 해시 + 이미지 내용 해시 + 샘플링 파라미터"가 된다.
+  (timeout 처럼 결과에 영향 없는 값은 제외)
+
+설정 (환경변수):
+  LLM_CACHE=0                     캐시 끄기
+  LLM_CACHE_DIR                   기본 artifacts/_llm_cache
+  LLM_CACHE_MAX_MB                기본 512 (초과하면 오래 안 쓴 것부터 삭제)
+  LLM_CACHE_STAGES                캐시 쓰는 stage 목록 (기본: presence,extract,detect,allocate,verify,chunk)
+                                  generate 는 temperature>0 이라 기본 제외 — 필요하면 목록에 추가
+
+hit/miss 는 stage 별로 센다. track() 안에서 나간 호출은 그 job 의 카운터에도 잡힌다
+(run_question_pipeline 이 job state 에 기록).
+
+저장하는 것은 status == "completed" 인 응답뿐이다 (max_output_tokens 에서 잘린 incomplete 등은 저장 안 함).
+응답은 왔지만 출력을 쓸 수 없을 때(JSON / schema 검증 실패):
+  refresh()        with 블록 안의 조회를 건너뛰고 새 응답으로 덮어쓴다 (core.retry_policy 가 재시도에 씀)
+  evict(stage, request)   그 요청의 항목을 지운다 (batch 결과처럼 재시도 밖에서 파싱하는 곳)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+DEFAULT_CACHE_DIR = Path("artifacts") / "_llm_cache"
+DEFAULT_MAX_MB = 512
+DEFAULT_STAGES = ("presence", "extract", "detect", "allocate", "verify", "chunk")
+
+# 결과에 영향을 주지 않는 요청 필드 (key 에서 제외)
+_NON_KEY_FIELDS = ("timeout", "stream", "extra_headers", "metadata", "user")
+
+# put 이 이만큼 쌓일 때마다 크기 검사
+_EVICT_EVERY = 50
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+_tracker: ContextVar[Optional[Dict[str, Dict[str, int]]]] = ContextVar("llm_cache_tracker", default=None)
+_refresh: ContextVar[bool] = ContextVar("llm_cache_refresh", default=False)
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    body = {k: v for k, v in request.items() if k not in _NON_KEY_FIELDS}
+    blob = json.dumps(body, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+class LLMCache:
+    """SQLite 한 파일. 스레드마다 커넥션을 따로 쓰고, WAL 이라 여러 프로세스가 같이 써도 된다."""
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self._local = threading.local()
+        self._puts = 0
+        self._puts_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, stage TEXT, model TEXT, value BLOB,"
+            " size INTEGER, created_at REAL, accessed_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        row = conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+        except sqlite3.OperationalError:
+            pass  # 다른 프로세스가 쓰는 중이면 LRU 갱신은 건너뜀
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def put(self, key: str, value: Dict[str, Any], stage: str, model: Optional[str]) -> None:
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, stage, model, value, size, created_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, stage, model, blob, len(blob), now, now),
+        )
+        conn.commit()
+
+        with self._puts_lock:
+            self._puts += 1
+            check = self._puts % _EVICT_EVERY == 1
+        if check:
+            self.evict()
+
+    def delete(self, key: str) -> bool:
+        conn = self._conn()
+        cur = conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        conn.commit()
+        return cur.rowcount > 0
+
+    def evict(self) -> int:
+        """전체 크기가 max_bytes 를 넘으면 오래 안 쓴 것부터 90% 까지 삭제. 삭제 건수 반환."""
+        conn = self._conn()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        target = int(self.max_bytes * 0.9)
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        conn.commit()
+        return len(doomed)
+
+    def size_bytes(self) -> int:
+        return int(self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0])
+
+
+_cache_lock = threading.Lock()
+_cache: Optional[LLMCache] = None
+_cache_pid: Optional[int] = None
+
+
+def get_cache() -> Optional[LLMCache]:
+    """LLM_CACHE=0 이면 None"""
+    global _cache, _cache_pid
+    if os.environ.get("LLM_CACHE", "1") in ("0", "false", "no"):
+        return None
+    pid = os.getpid()
+    if _cache is not None and _cache_pid == pid:
+        return _cache
+    with _cache_lock:
+        if _cache is None or _cache_pid != pid:
+            cache_dir = Path(os.environ.get("LLM_CACHE_DIR") or DEFAULT_CACHE_DIR)
+            max_mb = float(os.environ.get("LLM_CACHE_MAX_MB") or DEFAULT_MAX_MB)
+            _cache = LLMCache(cache_dir / "llm_cache.sqlite", max_bytes=int(max_mb * 1024 * 1024))
+            _cache_pid = pid
+    return _cache
+
+
+def reset_cache() -> None:
+    global _cache, _cache_pid
+    with _cache_lock:
+        _cache = None
+        _cache_pid = None
+
+
+def stage_enabled(stage: str) -> bool:
+    v = os.environ.get("LLM_CACHE_STAGES")
+    stages = [s.strip() for s in v.split(",")] if v is not None else list(DEFAULT_STAGES)
+    return stage in stages or "*" in stages
+
+
+def _count(stage: str, hit: bool) -> None:
+    field = "hits" if hit else "misses"
+    with _stats_lock:
+        _stats.setdefault(stage, {"hits": 0, "misses": 0})[field] += 1
+        tracker = _tracker.get()
+        if tracker is not None:
+            tracker.setdefault(stage, {"hits": 0, "misses": 0})[field] += 1
+
+
+def cached_call(
+    *,
+    stage: str,
+    request: Dict[str, Any],
+    call: Callable[[], Any],
+    dump: Callable[[Any], Dict[str, Any]],
+    load: Callable[[Dict[str, Any]], Any],
+) -> Any:
+    """
+    캐시를 거쳐 call() 실행.
+    dump/load 는 응답 객체 <-> JSON dict 변환 (Responses API 객체는 pydantic model_dump / construct).
+    """
+    cache = get_cache() if stage_enabled(stage) else None
+    if cache is None:
+        return call()
+
+    key = request_key(request)
+    found, resp = _lookup(cache, key, stage, load)
+    if found:
+        return resp
+
+    resp = call()
+    _store(cache, key, resp, stage, request, dump)
+    return resp
+
+
+async def cached_call_async(
+    *,
+    stage: str,
+    request: Dict[str, Any],
+    call: Callable[[], Awaitable[Any]],
+    dump: Callable[[Any], Dict[str, Any]],
+    load: Callable[[Dict[str, Any]], Any],
+) -> Any:
+    """cached_call 의 asyncio 버전 (SQLite 조회/저장은 로컬 파일이라 loop 에서 바로 한다)"""
+    cache = get_cache() if stage_enabled(stage) else None
+    if cache is None:
+        return await call()
+
+    key = request_key(request)
+    found, resp = _lookup(cache, key, stage, load)
+    if found:
+        return resp
+
+    resp = await call()
+    _store(cache, key, resp, stage, request, dump)
+    return resp
+
+
+def lookup(stage: str, request: Dict[str, Any], load: Callable[[Dict[str, Any]], Any]) -> Tuple[bool, Any]:
+    """cached_call 밖에서 요청을 직접 모아 보내는 경우(batch 제출 등)의 조회. (찾았는지, 응답)"""
+    cache = get_cache() if stage_enabled(stage) else None
+    if cache is None:
+        return False, None
+    return _lookup(cache, request_key(request), stage, load)
+
+
+def store(stage: str, request: Dict[str, Any], resp: Any, dump: Callable[[Any], Dict[str, Any]]) -> None:
+    cache = get_cache() if stage_enabled(stage) else None
+    if cache is not None:
+        _store(cache, request_key(request), resp, stage, request, dump)
+
+
+def evict(stage: str, request: Dict[str, Any]) -> bool:
+    """요청의 캐시 항목 삭제 (응답을 파싱하지 못했을 때). 지웠으면 True."""
+    cache = get_cache() if stage_enabled(stage) else None
+    if cache is None:
+        return False
+    try:
+        return cache.delete(request_key(request))
+    except sqlite3.Error:
+        return False
+
+
+@contextmanager
+def refresh() -> Iterator[None]:
+    """with 블록(같은 컨텍스트) 안의 조회는 miss 로 보고 실제로 보낸 뒤 새 응답으로 덮어쓴다."""
+    token = _refresh.set(True)
+    try:
+        yield
+    finally:
+        _refresh.reset(token)
+
+
+def _lookup(cache: LLMCache, key: str, stage: str, load: Callable[[Dict[str, Any]], Any]) -> Tuple[bool, Any]:
+    if _refresh.get():
+        _count(stage, hit=False)
+        return False, None
+    try:
+        value = cache.get(key)
+    except (sqlite3.Error, ValueError, zlib.error):
+        value = None
+    if value is not None:
+        try:
+            resp = load(value)
+            _count(stage, hit=True)
+            return True, resp
+        except Exception:
+            pass  # 스키마가 바뀐 오래된 항목 → miss 취급
+
+    _count(stage, hit=False)
+    return False, None
+
+
+def _store(
+    cache: LLMCache,
+    key: str,
+    resp: Any,
+    stage: str,
+    request: Dict[str, Any],
+    dump: Callable[[Any], Dict[str, Any]],
+) -> None:
+    if resp is None:
+        return
+    value = dump(resp)
+    if value.get("status") != "completed":
+        return  # incomplete(잘린 출력) / failed 는 다음 실행에서 다시 받아야 한다
+    try:
+        cache.put(key, value, stage=stage, model=request.get("model"))
+    except sqlite3.Error:
+        pass  # 캐시 저장 실패가 호출 실패가 되면 안 된다
+
+
+def _summarize(counters: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    hits = sum(v["hits"] for v in counters.values())
+    misses = sum(v["misses"] for v in counters.values())
+    total = hits + misses
+    by_stage = {}
+    for stage, v in sorted(counters.items()):
+        n = v["hits"] + v["misses"]
+        by_stage[stage] = {**v, "hit_rate": round(v["hits"] / n, 4) if n else 0.0}
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+        "by_stage": by_stage,
+    }
+
+
+def cache_stats() -> Dict[str, Any]:
+    """이 프로세스의 stage 별 hit/miss"""
+    with _stats_lock:
+        return _summarize({k: dict(v) for k, v in _stats.items()})
+
+
+@contextmanager
+def track(counters: Optional[Dict[str, Dict[str, int]]] = None) -> Iterator[Dict[str, Dict[str, int]]]:
+    """
+    with 블록(같은 스레드/컨텍스트) 안에서 나간 호출의 hit/miss 를 따로 센다.
+    counters 를 주면 이전 블록이 yield 한 것에 이어서 센다 (한 job 을 여러 블록에 나눠 셀 때).
+    """
+    if counters is None:
+        counters = {}
+    token = _tracker.set(counters)
+    try:
+        yield counters
+    finally:
+        _tracker.reset(token)
+
+
+def tracked_stats() -> Optional[Dict[str, Any]]:
+    """현재 track() 블록의 hit/miss 요약 (블록 밖이면 None)"""
+    counters = _tracker.get()
+    if counters is None:
+        return None
+    with _stats_lock:
+        return _summarize({k: dict(v) for k, v in counters.items()})
@@ -0,0 +1,244 @@
+# core/llm_cassette.py
+"""
+LLM 응답 녹화 / 재생 (cassette) — 오프라인 성능 회귀 측정용
+
+실제 provider 로 한 번 돌리면서 응답과 걸린 시간을 cassette 에 녹화해 두고,
+그 뒤로는 네트워크 없이 같은 응답을 (녹화된 지연 시간 또는 지정한 분포대로 기다렸다가) 돌려준다.
+core.llm_client 의 모든 진입점(create_response / create_response_async / stream_response)이 쓴다.
+
+  record   실제 호출이 성공할 때마다 {dir}/{stage}.jsonl 에 한 줄씩 추가
+           {"key", "stage", "model", "latency", "ttft", "response", "recorded_at"}
+  replay   요청 key 로 cassette 를 찾아 응답을 돌려준다 (요청은 나가지 않음).
+           stage 동시 실행 제한(stage_slot)은 그대로 걸고, rate limit / circuit breaker 는 건너뛴다.
+           같은 key 가 여러 번 녹화돼 있으면 (generate 처럼 temperature>0) 순서대로 돌아가며 쓴다.
+
+key 는 core.llm_cache.request_key 와 같다 (model + 프롬프트 + 이미지 + 샘플링 파라미터).
+응답 캐시가 먼저 hit 하면 cassette 까지 오지 않으므로 측정할 때는 LLM_CACHE=0 을 같이 쓴다.
+
+지연 시간 분포 (LLM_REPLAY_LATENCY, stage 별로 LLM_REPLAY_LATENCY_<STAGE> 가 우선):
+  recorded (기본)          녹화된 시간 그대로
+  none                     기다리지 않음
+  fixed:S                  S 초
+  uniform:A,B              A~B 초 균등
+  lognormal:MEDIAN,SIGMA   중앙값 MEDIAN 초, log 표준편차 SIGMA (provider 꼬리 지연 흉내)
+LLM_REPLAY_SPEED 로 뽑은 값에 배율을 곱한다 (0.1 이면 10배 빠르게).
+
+설정 (환경변수):
+  LLM_CASSETTE=record|replay    (없으면 꺼짐)
+  LLM_CASSETTE_DIR              기본 artifacts/_cassettes
+  LLM_CASSETTE_MISS             replay 에서 못 찾았을 때: error (기본, CassetteMiss) / live (실제로 보냄)
+  LLM_REPLAY_LATENCY / LLM_REPLAY_LATENCY_<STAGE> / LLM_REPLAY_SPEED
+
+core.mock_llm_server 도 같은 cassette 디렉토리와 분포 문법을 쓴다 (HTTP 로 재생).
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.llm_cache import request_key
+
+DEFAULT_CASSETTE_DIR = Path("artifacts") / "_cassettes"
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMiss(LookupError):
+    """replay 중 cassette 에 없는 요청 (core.retry_policy 에서 permanent 로 분류)"""
+
+
+def mode() -> Optional[str]:
+    v = (os.environ.get("LLM_CASSETTE") or "").strip().lower()
+    return v if v in (RECORD, REPLAY) else None
+
+
+def recording() -> bool:
+    return mode() == RECORD
+
+
+def replaying() -> bool:
+    return mode() == REPLAY
+
+
+def cassette_dir() -> Path:
+    return Path(os.environ.get("LLM_CASSETTE_DIR") or DEFAULT_CASSETTE_DIR)
+
+
+# =============================================================================
+# 지연 시간 분포
+# =============================================================================
+
+@dataclass(frozen=True)
+class LatencyModel:
+    kind: str = "recorded"
+    a: float = 0.0
+    b: float = 0.0
+    speed: float = 1.0
+
+    @classmethod
+    def parse(cls, spec: Optional[str], speed: float = 1.0) -> "LatencyModel":
+        """'recorded' / 'none' / 'fixed:S' / 'uniform:A,B' / 'lognormal:MEDIAN,SIGMA'"""
+        spec = (spec or "recorded").strip().lower()
+        kind, _, args = spec.partition(":")
+        nums = [float(x) for x in args.split(",") if x.strip()]
+        need = {"recorded": 0, "none": 0, "fixed": 1, "uniform": 2, "lognormal": 2}
+        if kind not in need or len(nums) != need[kind]:
+            raise ValueError(f"invalid latency spec: {spec!r}")
+        nums += [0.0, 0.0]
+        return cls(kind=kind, a=nums[0], b=nums[1], speed=speed)
+
+    def sample(self, recorded: float, rng: Optional[random.Random] = None) -> float:
+        rng = rng or random
+        if self.kind == "none":
+            sec = 0.0
+        elif self.kind == "fixed":
+            sec = self.a
+        elif self.kind == "uniform":
+            sec = rng.uniform(self.a, self.b)
+        elif self.kind == "lognormal":
+            sec = rng.lognormvariate(math.log(max(self.a, 1e-6)), self.b)
+        else:
+            sec = recorded
+        return max(0.0, sec * self.speed)
+
+
+def latency_model(stage: Optional[str] = None) -> LatencyModel:
+    spec = os.environ.get(f"LLM_REPLAY_LATENCY_{stage.upper()}") if stage else None
+    speed = float(os.environ.get("LLM_REPLAY_SPEED") or 1.0)
+    return LatencyModel.parse(spec or os.environ.get("LLM_REPLAY_LATENCY"), speed=speed)
+
+
+# =============================================================================
+# 저장소
+# =============================================================================
+
+class Cassette:
+    """디렉토리 하나. 읽기는 처음 찾을 때 전체를 올리고, 쓰기는 stage 파일에 한 줄씩 append."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._entries: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, List[Dict[str, Any]]]:
+        entries: Dict[str, List[Dict[str, Any]]] = {}
+        for f in sorted(self.path.glob("*.jsonl")):
+            for line in f.read_text(encoding="utf-8").splitlines():
+                try:
+                    e = json.loads(line)
+                except ValueError:
+                    continue  # 녹화 중 끊긴 마지막 줄
+                if isinstance(e, dict) and e.get("key") and isinstance(e.get("response"), dict):
+                    entries.setdefault(e["key"], []).append(e)
+        return entries
+
+    def find(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            found = self._entries.get(key)
+            if not found:
+                return None
+            i = self._cursor.get(key, 0)
+            self._cursor[key] = i + 1
+            return found[i % len(found)]
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        stage = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(entry.get("stage") or "default"))
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            # 한 번의 write (O_APPEND) → 여러 stage 프로세스가 같은 파일에 써도 줄이 섞이지 않는다
+            with open(self.path / f"{stage}.jsonl", "a", encoding="utf-8") as f:
+                f.write(line)
+            if self._entries is not None:
+                self._entries.setdefault(entry["key"], []).append(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._entries if self._entries is not None else self._load()
+        return {"keys": len(entries), "entries": sum(len(v) for v in entries.values())}
+
+
+_cassettes_lock = threading.Lock()
+_cassettes: Dict[str, Cassette] = {}
+
+
+def get_cassette(path: Optional[Path] = None) -> Cassette:
+    p = str(Path(path or cassette_dir()).resolve())
+    with _cassettes_lock:
+        c = _cassettes.get(p)
+        if c is None:
+            c = _cassettes[p] = Cassette(Path(p))
+    return c
+
+
+# =============================================================================
+# core.llm_client 에서 쓰는 함수
+# =============================================================================
+
+def find(stage: str, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    replay 모드에서 요청에 맞는 녹화 항목. replay 가 아니면 None.
+    못 찾으면 LLM_CASSETTE_MISS=live 일 때만 None (실제로 보냄), 아니면 CassetteMiss.
+    """
+    if not replaying():
+        return None
+    entry = get_cassette().find(request_key(request))
+    if entry is None and os.environ.get("LLM_CASSETTE_MISS", "error") != "live":
+        raise CassetteMiss(f"[{stage}] cassette 에 없는 요청 (model={request.get('model')}, dir={cassette_dir()})")
+    return entry
+
+
+def delay(stage: str, entry: Dict[str, Any]) -> float:
+    """이 항목을 재생하기 전에 기다릴 초"""
+    return latency_model(stage).sample(float(entry.get("latency") or 0.0))
+
+
+def record(
+    stage: str,
+    request: Dict[str, Any],
+    resp: Any,
+    *,
+    latency: float,
+    dump: Callable[[Any], Dict[str, Any]],
+    ttft: Optional[float] = None,
+) -> None:
+    """record 모드에서 성공한 호출 한 건을 남긴다 (아니면 아무것도 안 함)"""
+    if not recording() or resp is None:
+        return
+    get_cassette().append({
+        "key": request_key(request),
+        "stage": stage,
+        "model": request.get("model"),
+        "latency": round(latency, 4),
+        "ttft": round(ttft, 4) if ttft is not None else None,
+        "response": dump(resp),
+        "recorded_at": time.time(),
+    })
+
+
+def split_stream(text: str, entry: Dict[str, Any], total: float, chunks: int = 20) -> List[Tuple[float, str]]:
+    """
+    stream 재생용 (대기 초, 조각) 목록. 첫 조각까지는 녹화된 ttft 비율만큼, 나머지는 고르게.
+    (비스트리밍으로 녹화된 항목은 ttft 를 전체의 30% 로 본다)
+    """
+    latency = float(entry.get("latency") or 0.0)
+    ttft = entry.get("ttft")
+    ratio = (float(ttft) / latency) if ttft is not None and latency > 0 else 0.3
+    first = total * min(max(ratio, 0.0), 1.0)
+    step = max(1, math.ceil(len(text) / chunks))
+    pieces = [text[i:i + step] for i in range(0, len(text), step)]
+    if len(pieces) <= 1:
+        return [(total, text)]
+    rest = (total - first) / (len(pieces) - 1)
+    return [(first if i == 0 else rest, p) for i, p in enumerate(pieces)]
@@ -0,0 +1,391 @@
+# core/llm_client.py
+"""
+프로세스 공용 OpenAI client + stage 별 동시 실행 제한
+
+호출마다 OpenAI(...) 를 새로 만들면 TLS/커넥션 셋업을 매번 다시 하고 keep-alive 를 못 쓴다.
+여기서 client 하나를 만들어 모든 LLM 진입점(llm_text / llm_mm / mm_table_presence)이 공유한다.
+OpenAI client 는 내부 httpx connection pool 을 가지며 스레드 안전하다.
+
+설정 (환경변수):
+  OPENAI_API_KEY                  필수
+  OPENAI_BASE_URL                 (선택) OpenAI 호환 서버
+  LLM_CONNECT_TIMEOUT             커넥트 타임아웃 초 (기본 10)
+  LLM_READ_TIMEOUT                응답 대기 타임아웃 초 (기본 120)
+  LLM_SDK_MAX_RETRIES             SDK 내부 재시도 횟수 (기본 0: 재시도는 모두 core.retry_policy 가 한다.
+                                  SDK 가 429 / 5xx 를 먼저 삼키면 retry-after / breaker / rate_limit.drain 이
+                                  늦게 돌거나 아예 안 돈다. 일부러 켤 때만 준다)
+  LLM_CONCURRENCY_<STAGE>         stage 별 동시 요청 수 (예: LLM_CONCURRENCY_PRESENCE=4)
+  LLM_RPM_<MODEL> / LLM_TPM_<MODEL>   프로세스 간 공유 분당 한도 (core.rate_limit)
+
+호출마다 토큰 / 지연 시간 / 캐시 hit 를 core.llm_usage 에 기록한다.
+요청 직전에 core.retry_policy 의 model 별 circuit breaker 가 열려 있으면 닫힐 때까지 기다리고,
+성공 / 실패(분류 포함)를 breaker 에 알린다.
+
+stage 이름: presence / extract / detect / allocate / generate / verify / chunk (그 외는 DEFAULT_STAGE_CONCURRENCY)
+
+asyncio 경로 (core.llm_async 엔진):
+  create_response_async 는 AsyncOpenAI client 를 event loop 마다 하나 만들어 쓰고,
+  stage 제한도 loop 별 asyncio.Semaphore 로 건다 (스레드 없이 요청 수백 개를 동시에 걸어둘 수 있음).
+
+스트리밍 (stream_response):
+  출력 텍스트를 조각으로 받아 문제 생성처럼 앞부분부터 처리할 수 있는 호출에 쓴다.
+
+녹화 / 재생 (core.llm_cassette, LLM_CASSETTE=record|replay):
+  record 면 성공한 응답과 지연 시간을 cassette 에 남기고, replay 면 요청을 보내지 않고
+  cassette 의 응답을 지정한 지연 분포만큼 기다렸다가 돌려준다 (stage 제한은 그대로).
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+from core import llm_cache, llm_cassette, llm_usage, rate_limit, retry_policy
+
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 120.0
+
+# stage 별 기본 동시 요청 수 (한 프로세스 안에서)
+STAGE_CONCURRENCY: Dict[str, int] = {
+    "presence": 8,
+    "extract": 4,
+    "detect": 4,
+    "allocate": 2,
+    "generate": 8,
+    "verify": 8,
+    "chunk": 4,
+}
+DEFAULT_STAGE_CONCURRENCY = 8
+
+_lock = threading.Lock()
+_client: Optional[OpenAI] = None
+_client_pid: Optional[int] = None
+_stage_sems: Dict[str, threading.BoundedSemaphore] = {}
+
+# event loop 별 async client / stage semaphore (loop 가 닫히면 같이 사라진다)
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+_async_sems: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _env_float(name: str, default: float) -> float:
+    v = os.environ.get(name)
+    return float(v) if v else default
+
+
+def get_client() -> OpenAI:
+    """
+    프로세스 공용 OpenAI client.
+    fork 된 자식 프로세스에서는 부모의 커넥션을 쓰지 않도록 새로 만든다.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _lock:
+        if _client is None or _client_pid != pid:
+            _client = OpenAI(**_client_kwargs())
+            _client_pid = pid
+    return _client
+
+
+def _client_kwargs() -> Dict[str, Any]:
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("Missing OPENAI_API_KEY environment variable")
+    return {
+        "api_key": api_key,
+        "timeout": openai.Timeout(
+            timeout=_env_float("LLM_READ_TIMEOUT", DEFAULT_READ_TIMEOUT),
+            connect=_env_float("LLM_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT),
+        ),
+        "max_retries": int(os.environ.get("LLM_SDK_MAX_RETRIES", "0")),
+    }
+
+
+def get_async_client() -> AsyncOpenAI:
+    """
+    현재 event loop 전용 AsyncOpenAI client.
+    내부 httpx AsyncClient 가 loop 에 묶이므로 loop 마다 하나씩 만든다 (loop 안에서만 접근 → lock 불필요).
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(**_client_kwargs())
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_client() -> None:
+    """현재 loop 의 async client 정리 (asyncio.run 이 끝나기 전에 호출)"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.pop(loop, None)
+    _async_sems.pop(loop, None)
+    if client is not None:
+        await client.close()
+
+
+def reset_client() -> None:
+    """테스트 / 환경변수 변경 후 client 를 다시 만들게 한다."""
+    global _client, _client_pid
+    with _lock:
+        if _client is not None:
+            try:
+                _client.close()
+            except Exception:
+                pass
+        _client = None
+        _client_pid = None
+        _stage_sems.clear()
+
+
+def stage_limit(stage: str) -> int:
+    v = os.environ.get(f"LLM_CONCURRENCY_{stage.upper()}")
+    if v:
+        return max(1, int(v))
+    return STAGE_CONCURRENCY.get(stage, DEFAULT_STAGE_CONCURRENCY)
+
+
+def set_stage_limit(stage: str, limit: int) -> None:
+    """runner 에서 --workers 등으로 stage 동시 요청 수를 바꿀 때"""
+    with _lock:
+        STAGE_CONCURRENCY[stage] = max(1, int(limit))
+        _stage_sems.pop(stage, None)
+
+
+@contextmanager
+def stage_slot(stage: str) -> Iterator[None]:
+    """stage 동시 요청 수 제한 (스레드 풀이 더 커도 이 이상 동시에 나가지 않음)"""
+    sem = _stage_sems.get(stage)
+    if sem is None:
+        with _lock:
+            sem = _stage_sems.get(stage)
+            if sem is None:
+                sem = threading.BoundedSemaphore(stage_limit(stage))
+                _stage_sems[stage] = sem
+    with sem:
+        yield
+
+
+@asynccontextmanager
+async def stage_slot_async(stage: str) -> AsyncIterator[None]:
+    """stage_slot 의 asyncio 버전 (loop 별 semaphore)"""
+    sems = _async_sems.setdefault(asyncio.get_running_loop(), {})
+    sem = sems.get(stage)
+    if sem is None:
+        sem = sems[stage] = asyncio.Semaphore(stage_limit(stage))
+    async with sem:
+        yield
+
+
+def create_response(*, stage: str, timeout: Optional[float] = None, **request: Any) -> Any:
+    """
+    모든 LLM 호출이 지나가는 단일 진입점 (Responses API).
+    timeout 을 주면 이 요청만 read 타임아웃을 덮어쓴다.
+    응답 캐시(core.llm_cache)를 먼저 확인하고, hit 이면 요청을 보내지 않는다.
+    실제로 보낼 때는 core.rate_limit 에서 model 별 요청/토큰 예산을 먼저 받는다.
+    응답을 받으면 retry_policy.note_response() 로 알린다 (그 뒤의 파싱 실패는 캐시를 건너뛰고 재시도).
+    """
+    def _call() -> Any:
+        called.append(True)
+        entry = llm_cassette.find(stage, request)
+        if entry is not None:
+            with stage_slot(stage):
+                t0 = time.monotonic()
+                time.sleep(llm_cassette.delay(stage, entry))
+            return _replayed(stage, request, entry, time.monotonic() - t0)
+
+        client = get_client()
+        kwargs = dict(request)
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        model = str(request.get("model") or "")
+        tokens = rate_limit.estimate_tokens(request)
+        retry_policy.wait(model)
+        rate_limit.acquire(model, tokens)
+        with stage_slot(stage):
+            t0 = time.monotonic()
+            try:
+                raw = client.responses.with_raw_response.create(**kwargs)
+                resp = raw.parse()
+            except Exception as e:
+                _on_error(stage, model, request, e, time.monotonic() - t0)
+                raise
+        latency = time.monotonic() - t0
+        retry_policy.record_success(model)
+        llm_usage.record(stage, request, resp, latency=latency, retries=_retries(raw))
+        llm_cassette.record(stage, request, resp, latency=latency, dump=_dump_response)
+        rate_limit.settle(model, tokens, resp)
+        return resp
+
+    called: list = []
+    resp = llm_cache.cached_call(
+        stage=stage,
+        request=request,
+        call=_call,
+        dump=_dump_response,
+        load=_load_response,
+    )
+    if not called:
+        llm_usage.record(stage, request, cache_hit=True)
+    retry_policy.note_response()
+    return resp
+
+
+async def create_response_async(*, stage: str, timeout: Optional[float] = None, **request: Any) -> Any:
+    """create_response 의 asyncio 버전 (같은 캐시 / 같은 stage 제한값)"""
+    async def _call() -> Any:
+        called.append(True)
+        entry = llm_cassette.find(stage, request)
+        if entry is not None:
+            async with stage_slot_async(stage):
+                t0 = time.monotonic()
+                await asyncio.sleep(llm_cassette.delay(stage, entry))
+            return _replayed(stage, request, entry, time.monotonic() - t0)
+
+        client = get_async_client()
+        kwargs = dict(request)
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        model = str(request.get("model") or "")
+        tokens = rate_limit.estimate_tokens(request)
+        await retry_policy.wait_async(model)
+        await rate_limit.acquire_async(model, tokens)
+        async with stage_slot_async(stage):
+            t0 = time.monotonic()
+            try:
+                raw = await client.responses.with_raw_response.create(**kwargs)
+                resp = raw.parse()
+            except Exception as e:
+                _on_error(stage, model, request, e, time.monotonic() - t0)
+                raise
+        latency = time.monotonic() - t0
+        retry_policy.record_success(model)
+        llm_usage.record(stage, request, resp, latency=latency, retries=_retries(raw))
+        llm_cassette.record(stage, request, resp, latency=latency, dump=_dump_response)
+        await asyncio.to_thread(rate_limit.settle, model, tokens, resp)
+        return resp
+
+    called: list = []
+    resp = await llm_cache.cached_call_async(
+        stage=stage,
+        request=request,
+        call=_call,
+        dump=_dump_response,
+        load=_load_response,
+    )
+    if not called:
+        llm_usage.record(stage, request, cache_hit=True)
+    retry_policy.note_response()
+    return resp
+
+
+def stream_response(*, stage: str, timeout: Optional[float] = None, **request: Any) -> Iterator[str]:
+    """
+    create_response 의 스트리밍 버전: 출력 텍스트 조각(delta)을 도착하는 대로 yield.
+    캐시 / rate limit / stage 제한은 create_response 와 같다 (stream 은 캐시 key 에 들어가지 않음).
+    캐시 hit 이면 전체 텍스트를 한 번에 yield 한다.
+    응답을 받으면 retry_policy.note_response() 로 알린다 (그 뒤의 파싱 실패는 캐시를 건너뛰고 재시도).
+    """
+    found, resp = llm_cache.lookup(stage, request, load=_load_response)
+    if found:
+        llm_usage.record(stage, request, cache_hit=True)
+        retry_policy.note_response()
+        yield resp.output_text or ""
+        return
+
+    entry = llm_cassette.find(stage, request)
+    if entry is not None:
+        resp = _load_response(entry["response"])
+        retry_policy.note_response()
+        with stage_slot(stage):
+            t0 = time.monotonic()
+            total = llm_cassette.delay(stage, entry)
+            for wait, piece in llm_cassette.split_stream(resp.output_text or "", entry, total):
+                time.sleep(wait)
+                yield piece
+        _replayed(stage, request, entry, time.monotonic() - t0)
+        llm_cache.store(stage, request, resp, dump=_dump_response)
+        return
+
+    client = get_client()
+    kwargs = dict(request)
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    model = str(request.get("model") or "")
+    tokens = rate_limit.estimate_tokens(request)
+    retry_policy.wait(model)
+    rate_limit.acquire(model, tokens)
+
+    final = None
+    ttft: Optional[float] = None
+    raw = None
+    with stage_slot(stage):
+        t0 = time.monotonic()
+        try:
+            raw = client.responses.with_raw_response.create(stream=True, **kwargs)
+            stream = raw.parse()
+            with stream:
+                for event in stream:
+                    etype = getattr(event, "type", "")
+                    if etype == "response.output_text.delta":
+                        if ttft is None:
+                            ttft = time.monotonic() - t0
+                        yield event.delta
+                    elif etype in ("response.completed", "response.incomplete"):
+                        final = event.response
+                    elif etype in ("response.failed", "error"):
+                        raise RuntimeError(f"stream {etype}: {getattr(event, 'response', None) or event}")
+        except Exception as e:
+            _on_error(stage, model, request, e, time.monotonic() - t0)
+            raise
+        latency = time.monotonic() - t0
+        retry_policy.record_success(model)
+        llm_usage.record(stage, request, final, latency=latency, retries=_retries(raw))
+
+    if final is not None:
+        retry_policy.note_response()
+        llm_cassette.record(stage, request, final, latency=latency, ttft=ttft, dump=_dump_response)
+        rate_limit.settle(model, tokens, final)
+        llm_cache.store(stage, request, final, dump=_dump_response)
+
+
+def _replayed(stage: str, request: Dict[str, Any], entry: Dict[str, Any], latency: float) -> Any:
+    """cassette 항목을 응답 객체로 (토큰 / 비용은 녹화된 usage 그대로 집계)"""
+    resp = _load_response(entry["response"])
+    llm_usage.record(stage, request, resp, latency=latency, retries=retry_policy.take_retry())
+    return resp
+
+
+def _retries(raw: Any) -> int:
+    """
+    이 요청의 재시도 수: core.retry_policy 가 다시 보낸 요청이면 1
+    + SDK 내부 재시도 (LLM_SDK_MAX_RETRIES 를 켰을 때만, raw response 의 retries_taken)
+    """
+    return retry_policy.take_retry() + int(getattr(raw, "retries_taken", 0) or 0)
+
+
+def _on_error(stage: str, model: str, request: Dict[str, Any], e: BaseException, latency: float) -> None:
+    llm_usage.record(stage, request, latency=latency, error=True, retries=retry_policy.take_retry())
+    if retry_policy.record_failure(model, e) == retry_policy.RATE_LIMITED:
+        rate_limit.on_rate_limited(model)
+
+
+def _dump_response(resp: Any) -> Dict[str, Any]:
+    return resp.model_dump(mode="json")
+
+
+def _load_response(data: Dict[str, Any]) -> Any:
+    from openai.types.responses import Response
+
+    # SDK 가 응답을 만들 때처럼 검증 없이 구성 (서버가 null 로 준 필드도 그대로 복원)
+    return Response.construct(**data)
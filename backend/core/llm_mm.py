@@ -1,54 +1,32 @@
 # core/llm_mm.py
 from __future__ import annotations
 
-import base64
-import json
-import os
+import asyncio
 from pathlib import Path
 from typing import Any, Dict, Optional
 
-from openai import OpenAI
+from core import image_payload
+from core.llm_client import create_response, create_response_async
+from core.llm_schemas import parse_json, with_schema
 
 
-def _image_to_data_url(image_path: Path) -> str:
+def _image_to_data_url(
+    image_path: Path,
+    image_format: Optional[str] = None,
+    quality: Optional[int] = None,
+    stage: Optional[str] = None,
+) -> str:
     """
     Convert local image file to a base64 data URL.
     OpenAI Responses API supports base64-encoded data URLs as image inputs. :contentReference[oaicite:0]{index=0}
-    """
-    image_path = Path(image_path)
-    suffix = image_path.suffix.lower().lstrip(".")
-    if suffix not in {"png", "jpg", "jpeg", "webp"}:
-        raise ValueError(f"Unsupported image type: .{suffix}")
-
-    mime = "image/png" if suffix == "png" else ("image/webp" if suffix == "webp" else "image/jpeg")
-    b64 = base64.b64encode(image_path.read_bytes()).decode("utf-8")
-    return f"data:{mime};base64,{b64}"
 
-
-def _extract_json(text: str) -> Dict[str, Any]:
-    """
-    Try hard to parse JSON from model output.
-    - Prefer pure JSON
-    - Fallback: extract first {...} block
+    image_format("png"|"jpeg"|"webp")이 파일 포맷과 다르면 보내기 전에 재인코딩한다.
+    지정하지 않으면 MM_IMAGE_FORMAT / MM_IMAGE_QUALITY 환경변수를 보고, 그것도 없으면 파일 그대로.
+    (prepare 에서 이미 jpeg/webp 로 렌더했다면 재인코딩 없이 그대로 나간다)
+    stage 를 주면 MM_IMAGE_<STAGE>_MAX_SIDE / _GRAYSCALE 변형을 적용한다.
+    인코딩 결과는 core.image_payload 캐시에 남아서 같은 페이지의 다음 호출 / 재시도는 다시 읽지 않는다.
     """
-    text = (text or "").strip()
-    if not text:
-        raise ValueError("Empty model output")
-
-    # 1) direct parse
-    try:
-        return json.loads(text)
-    except Exception:
-        pass
-
-    # 2) try to extract a JSON object block
-    start = text.find("{")
-    end = text.rfind("}")
-    if start != -1 and end != -1 and end > start:
-        chunk = text[start : end + 1]
-        return json.loads(chunk)
-
-    raise ValueError(f"Could not parse JSON from output: {text[:200]}")
+    return image_payload.data_url(image_path, stage=stage, image_format=image_format, quality=quality)
 
 
 def call_mm_json(
@@ -58,41 +36,76 @@ def call_mm_json(
     model: str = "gpt-4o-mini",
     temperature: float = 0.0,
     timeout: Optional[float] = None,
+    stage: str = "mm",
+    schema: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Multimodal call (image + prompt) -> JSON dict.
 
     Uses OpenAI Responses API (recommended for new projects). :contentReference[oaicite:1]{index=1}
     API key is read from OPENAI_API_KEY environment variable. :contentReference[oaicite:2]{index=2}
+    (client 는 core.llm_client 에서 프로세스 공용으로 재사용)
+    schema: core.llm_schemas 에 등록된 이름 (Structured Outputs 로 JSON 형식 강제)
     """
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("Missing OPENAI_API_KEY environment variable")
+    data_url = _image_to_data_url(image_path, stage=stage)
+    resp = create_response(
+        stage=stage,
+        timeout=timeout,
+        **mm_request(prompt, data_url, model=model, temperature=temperature, schema=schema),
+    )
+    return response_json(resp, stage=stage)
 
-    client = OpenAI(api_key=api_key)
 
-    data_url = _image_to_data_url(image_path)
+async def call_mm_json_async(
+    *,
+    prompt: str,
+    image_path: Path,
+    model: str = "gpt-4o-mini",
+    temperature: float = 0.0,
+    timeout: Optional[float] = None,
+    stage: str = "mm",
+    schema: Optional[str] = None,
+) -> Dict[str, Any]:
+    """call_mm_json 의 asyncio 버전 (이미지 인코딩은 스레드에서)"""
+    data_url = await asyncio.to_thread(_image_to_data_url, image_path, stage=stage)
+    resp = await create_response_async(
+        stage=stage,
+        timeout=timeout,
+        **mm_request(prompt, data_url, model=model, temperature=temperature, schema=schema),
+    )
+    return response_json(resp, stage=stage)
+
 
-    # Ask for strict JSON in the response text.
-    # (Structured Outputs exists, but keeping this minimal & robust for MVP.)
+def mm_request(
+    prompt: str,
+    data_url: str,
+    *,
+    model: str,
+    temperature: float,
+    schema: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Responses API 요청 body (batch 제출처럼 요청만 만들 때도 사용)"""
+    # JSON 형식은 schema(Structured Outputs)로 강제하고, 프롬프트 지시는
+    # LLM_STRUCTURED_OUTPUT=0 (schema 미지원 서버) 일 때를 위해 남겨둔다.
     full_prompt = (
         "Return ONLY valid JSON. Do not include code fences.\n"
         f"{prompt.strip()}"
     )
-
-    resp = client.responses.create(
-        model=model,
-        input=[{
+    return with_schema({
+        "model": model,
+        "input": [{
             "role": "user",
             "content": [
                 {"type": "input_text", "text": full_prompt},
                 {"type": "input_image", "image_url": data_url},
             ],
         }],
-        temperature=temperature,
-        # timeout parameter support can differ by transport; keep optional.
-    )
+        "temperature": temperature,
+    }, schema)
+
 
+def response_json(resp: Any, stage: str = "mm") -> Dict[str, Any]:
+    """응답 → JSON dict (파싱 결과는 core.llm_schemas 카운터에 stage 별로 기록, 실패면 ValueError)"""
     # openai-python exposes output_text convenience in docs/examples. :contentReference[oaicite:3]{index=3}
     text_out = getattr(resp, "output_text", None)
     if not text_out:
@@ -100,4 +113,7 @@ def call_mm_json(
         # (Usually output_text is present.)
         text_out = str(resp)
 
-    return _extract_json(text_out)
+    data = parse_json(stage, text_out)
+    if data is None:
+        raise ValueError(f"Could not parse JSON from output: {text_out[:200]}")
+    return data
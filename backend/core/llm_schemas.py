@@ -0,0 +1,177 @@
+# core/llm_schemas.py
+"""
+LLM 출력 JSON schema 모음 (Structured Outputs) + stage 별 파싱 실패 카운터
+
+예전에는 프롬프트의 "Return ONLY valid JSON" 과 호출부마다 따로 만든 _extract_json 으로 긁어냈다.
+파싱이 실패하면 LLM_OUTPUT_NOT_JSON → model fallback / _retry 로 요청을 통째로 다시 보냈다.
+이제 모든 호출은 여기 등록된 schema 를 Responses API 의 text.format(json_schema, strict) 으로 보낸다.
+provider 가 schema 에 맞는 JSON 만 생성하므로 파싱 실패 재요청이 거의 없어진다.
+
+    request["text"] = text_format("table_extract")
+    data = parse_json("extract", resp.output_text)    # dict | None, 카운터 갱신
+
+strict 모드는 모든 필드가 required 여야 해서 선택 필드는 null 을 허용하는 식으로 적었다.
+(generated_table 등) null 값 정리는 호출부에서 한다.
+
+설정 (환경변수):
+  LLM_STRUCTURED_OUTPUT=0   schema 를 보내지 않음 (json_schema 를 지원하지 않는 호환 서버용)
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+
+def _obj(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """strict 모드용 object: 모든 필드 required, 추가 필드 금지"""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+def _nullable(schema: Dict[str, Any]) -> Dict[str, Any]:
+    return {"anyOf": [schema, {"type": "null"}]}
+
+
+_STR = {"type": "string"}
+_INT = {"type": "integer"}
+_STR_LIST = {"type": "array", "items": _STR}
+
+_QUESTION = _obj({
+    "question_id": _STR,
+    "type": {"type": "string", "enum": ["MCQ", "SAQ"]},
+    "difficulty": {"type": "string", "enum": ["easy", "medium", "hard"]},
+    "question_text": _STR,
+    "options": _nullable(_STR_LIST),
+    "correct_answer": _STR,
+    "explanation": _STR,
+    "source_pages": {"type": "array", "items": _INT},
+    "evidence": {"type": "array", "items": _obj({"kind": _STR, "page": _INT, "chunk_id": _STR})},
+    "learning_objective": _STR,
+    "common_misconception": _STR,
+    "generated_table": _nullable(_obj({
+        "headers": _STR_LIST,
+        "rows": {"type": "array", "items": _STR_LIST},
+    })),
+    "table_refs": _nullable(_STR_LIST),
+})
+
+_TABLE = _obj({
+    "table_id": _STR,
+    "title": _nullable(_STR),
+    "format": _STR,
+    "content": _STR,
+})
+
+SCHEMAS: Dict[str, Dict[str, Any]] = {
+    # mm_table_presence.PROMPT_TABLE_EXISTS
+    "table_presence": _obj({"t": {"type": "boolean"}}),
+    # mm_table_presence.PROMPT_TABLE_EXISTS_BATCH
+    "table_presence_batch": _obj({
+        "results": {"type": "array", "items": _obj({"page": _INT, "t": {"type": "boolean"}})},
+    }),
+    # table_mm.PROMPT_EXTRACT_TABLES
+    "table_extract": _obj({"tables": {"type": "array", "items": _TABLE}}),
+    # table_detect_extract.PROMPT_DETECT_EXTRACT (탐지 + 추출 한 번에, 빈 tables = 표 없음)
+    "table_detect_extract": _obj({
+        "pages": {"type": "array", "items": _obj({"page": _INT, "tables": {"type": "array", "items": _TABLE}})},
+    }),
+    # question_generator / text_chunker
+    "questions": _obj({"questions": {"type": "array", "items": _QUESTION}}),
+    # llm_verifier
+    "question_verify": _obj({
+        "results": {"type": "array", "items": _obj({
+            "question_id": _STR,
+            "verdict": {"type": "string", "enum": ["OK", "FIXABLE", "REJECT"]},
+            "issues": _STR_LIST,
+            "confidence": {"type": "number"},
+        })},
+        "summary": _obj({"total": _INT, "ok": _INT, "fixable": _INT, "reject": _INT}),
+    }),
+    # question_orchestrator (section_id 가 key 인 dict 는 strict schema 로 못 적어서 배열)
+    "question_allocation": _obj({
+        "allocation": {"type": "array", "items": _obj({"section_id": _STR, "count": _INT})},
+        "reasoning": _STR,
+    }),
+}
+
+
+def structured_enabled() -> bool:
+    return os.environ.get("LLM_STRUCTURED_OUTPUT", "1") not in ("0", "false", "no")
+
+
+def text_format(name: str) -> Optional[Dict[str, Any]]:
+    """Responses API 의 text 파라미터. 끄면 None (요청에 넣지 않는다)."""
+    if name not in SCHEMAS:
+        raise KeyError(f"unknown schema: {name}")
+    if not structured_enabled():
+        return None
+    return {"format": {"type": "json_schema", "name": name, "schema": SCHEMAS[name], "strict": True}}
+
+
+def with_schema(request: Dict[str, Any], name: Optional[str]) -> Dict[str, Any]:
+    """요청 body 에 schema 를 붙여서 반환 (name 이 None 이거나 꺼져 있으면 그대로)"""
+    fmt = text_format(name) if name else None
+    if fmt is not None:
+        request["text"] = fmt
+    return request
+
+
+# =============================================================================
+# 파싱 + stage 별 카운터
+# =============================================================================
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _count(stage: str, field: str) -> None:
+    with _stats_lock:
+        _stats.setdefault(stage, {"ok": 0, "scraped": 0, "failed": 0})[field] += 1
+
+
+def parse_json(stage: str, text: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    모델 출력 → dict (실패하면 None).
+      ok       그대로 json.loads 성공 (schema 모드의 정상 경로)
+      scraped  코드 블록 / 앞뒤 잡문을 걷어내야 했음 (schema 를 안 쓰는 서버)
+      failed   JSON 을 못 찾음 (잘린 출력 등)
+    """
+    raw = (text or "").strip()
+    try:
+        obj = json.loads(raw)
+        if isinstance(obj, dict):
+            _count(stage, "ok")
+            return obj
+    except Exception:
+        pass
+
+    start = raw.find("{")
+    end = raw.rfind("}")
+    if start != -1 and end > start:
+        try:
+            obj = json.loads(raw[start:end + 1])
+            if isinstance(obj, dict):
+                _count(stage, "scraped")
+                return obj
+        except Exception:
+            pass
+
+    _count(stage, "failed")
+    return None
+
+
+def parse_stats() -> Dict[str, Any]:
+    """이 프로세스의 stage 별 파싱 결과"""
+    with _stats_lock:
+        by_stage = {k: dict(v) for k, v in _stats.items()}
+    return {
+        "failed": sum(v["failed"] for v in by_stage.values()),
+        "scraped": sum(v["scraped"] for v in by_stage.values()),
+        "by_stage": by_stage,
+    }
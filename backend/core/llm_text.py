@@ -1,10 +1,10 @@
 # core/llm_text.py
 from __future__ import annotations
 
-import os
-from typing import Optional
+from typing import Any, Dict, Iterator, Optional
 
-from openai import OpenAI
+from core.llm_client import create_response, create_response_async, stream_response
+from core.llm_schemas import with_schema
 
 
 def call_llm_text(
@@ -14,24 +14,78 @@ def call_llm_text(
     temperature: float = 0.3,
     max_output_tokens: int = 2000,
     timeout: Optional[float] = None,
+    stage: str = "text",
+    schema: Optional[str] = None,
 ) -> str:
     """
     Text-only LLM call wrapper.
-    Uses OpenAI Responses API.
+    Uses OpenAI Responses API (core.llm_client 공용 client, stage 별 동시 요청 제한).
+    schema: core.llm_schemas 에 등록된 이름을 주면 그 JSON schema 로 출력을 강제.
     """
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    resp = create_response(
+        stage=stage,
+        timeout=timeout,
+        **text_request(prompt, model=model, temperature=temperature, max_output_tokens=max_output_tokens, schema=schema),
+    )
+
+    # Responses API returns output_text aggregated
+    return resp.output_text or ""
+
 
-    resp = client.responses.create(
-        model=model,
-        input=[
+async def call_llm_text_async(
+    *,
+    prompt: str,
+    model: str,
+    temperature: float = 0.3,
+    max_output_tokens: int = 2000,
+    timeout: Optional[float] = None,
+    stage: str = "text",
+    schema: Optional[str] = None,
+) -> str:
+    """call_llm_text 의 asyncio 버전"""
+    resp = await create_response_async(
+        stage=stage,
+        timeout=timeout,
+        **text_request(prompt, model=model, temperature=temperature, max_output_tokens=max_output_tokens, schema=schema),
+    )
+    return resp.output_text or ""
+
+
+def stream_llm_text(
+    *,
+    prompt: str,
+    model: str,
+    temperature: float = 0.3,
+    max_output_tokens: int = 2000,
+    timeout: Optional[float] = None,
+    stage: str = "text",
+    schema: Optional[str] = None,
+) -> Iterator[str]:
+    """call_llm_text 의 스트리밍 버전 (출력 텍스트 조각을 도착하는 대로 yield)"""
+    yield from stream_response(
+        stage=stage,
+        timeout=timeout,
+        **text_request(prompt, model=model, temperature=temperature, max_output_tokens=max_output_tokens, schema=schema),
+    )
+
+
+def text_request(
+    prompt: str,
+    *,
+    model: str,
+    temperature: float,
+    max_output_tokens: int = 2000,
+    schema: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Responses API 요청 body (batch 제출처럼 요청만 만들 때도 사용)"""
+    return with_schema({
+        "model": model,
+        "input": [
             {
                 "role": "user",
                 "content": [{"type": "input_text", "text": prompt}],
             }
         ],
-        temperature=temperature,
-        max_output_tokens=max_output_tokens,
-    )
-
-    # Responses API returns output_text aggregated
-    return resp.output_text or ""
+        "temperature": temperature,
+        "max_output_tokens": max_output_tokens,
+    }, schema)
@@ -0,0 +1,264 @@
+# core/llm_usage.py
+"""
+LLM 호출별 토큰 / 지연 시간 집계 (stage 별, job 별) + PDF 단위 비용 리포트
+
+어느 stage 가 토큰과 시간을 얼마나 쓰는지 보이지 않아서, core.llm_client 의 모든 진입점
+(create_response / create_response_async / stream_response)과 core.llm_batch 가
+호출이 끝날 때마다 여기에 한 건씩 기록한다.
+
+한 건에 남는 값:
+  calls          실제로 나간 요청 수 (캐시 hit 제외)
+  cache_hits     core.llm_cache 에서 바로 돌려준 수 (토큰 / 비용 0)
+  errors         예외로 끝난 요청 수
+  retries        다시 보낸 요청 수: core.retry_policy.retry / retry_async 가 두 번째 시도부터 내보낸 요청
+                 (bad_output 으로 캐시를 건너뛰고 다시 받은 것 포함, 시도마다 첫 요청 하나)
+                 + SDK 내부 재시도 (LLM_SDK_MAX_RETRIES 를 켰을 때, 응답의 retries_taken).
+                 SDK 재시도의 대기 시간은 그 요청의 latency 에 들어가고, SDK 가 끝내 포기한 요청의 재시도 수는
+                 예외에 남지 않아 빠진다 (기본값처럼 SDK 재시도를 끄면 모든 재시도가 여기 잡힌다)
+  input_tokens / output_tokens   응답 usage 기준 (usage 가 없으면 0)
+  cached_tokens  input_tokens 중 provider prompt prefix 캐시에서 읽은 토큰 (usage.input_tokens_details)
+                 요약에는 cached_ratio = cached_tokens / input_tokens 가 stage 별로 붙는다.
+                 프롬프트 앞부분의 고정 지시문이 job 마다 바이트 단위로 같아야 올라간다
+  images         요청에 들어간 input_image 수
+  latency_ms / latency_max_ms    요청 시작 ~ 응답 완료 (stream 은 마지막 조각까지)
+  cost_usd       PRICES 표 기준 추정 비용 (batch 는 절반, 캐시된 입력 토큰은 CACHED_INPUT_DISCOUNT)
+
+job 단위는 llm_cache.track() 과 같은 방식: track() 블록 안에서 나간 호출은 그 job 의 카운터에도 잡힌다
+(run_question_pipeline 이 data/jobs/{job_id}.json 에 기록).
+
+PDF 단위: stage runner 가 끝날 때 write_report(out_dir, step) 로 {out_dir}/llm_usage.json 의
+step 항목에 자기 프로세스 집계를 더하고 전체 합계를 다시 계산한다.
+
+설정 (환경변수):
+  LLM_PRICE_<MODEL>   "입력,출력" USD / 1M tokens (예: LLM_PRICE_GPT_4O_MINI=0.15,0.6)
+  LLM_PRICE_DEFAULT   표에 없는 model
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+REPORT_NAME = "llm_usage.json"
+
+# USD / 1M tokens (입력, 출력). 요금이 바뀌면 환경변수로 덮어쓴다.
+PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+BATCH_DISCOUNT = 0.5
+CACHED_INPUT_DISCOUNT = 0.5
+
+_FIELDS = (
+    "calls", "cache_hits", "errors", "retries", "input_tokens", "cached_tokens", "output_tokens", "images",
+    "latency_ms", "latency_max_ms",
+)
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, Any]] = {}
+_tracker: ContextVar[Optional[Dict[str, Dict[str, Any]]]] = ContextVar("llm_usage_tracker", default=None)
+
+
+def price_for(model: str) -> Tuple[float, float]:
+    key = re.sub(r"[^A-Z0-9]+", "_", model.upper())
+    for name in (f"LLM_PRICE_{key}", "LLM_PRICE_DEFAULT"):
+        v = os.environ.get(name)
+        if v:
+            inp, out = (float(x) for x in v.split(","))
+            return inp, out
+    return PRICES.get(model, (0.0, 0.0))
+
+
+def count_images(request: Dict[str, Any]) -> int:
+    n = 0
+    for msg in request.get("input") or []:
+        content = msg.get("content") if isinstance(msg, dict) else None
+        if isinstance(content, list):
+            n += sum(1 for part in content if isinstance(part, dict) and part.get("type") == "input_image")
+    return n
+
+
+def _usage_tokens(resp: Any) -> Tuple[int, int, int]:
+    """(input, cached input, output)"""
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return 0, 0, 0
+    details = getattr(usage, "input_tokens_details", None)
+    return (
+        int(getattr(usage, "input_tokens", 0) or 0),
+        int(getattr(details, "cached_tokens", 0) or 0),
+        int(getattr(usage, "output_tokens", 0) or 0),
+    )
+
+
+def _empty() -> Dict[str, Any]:
+    c: Dict[str, Any] = {f: 0 for f in _FIELDS}
+    c["cost_usd"] = 0.0
+    c["models"] = {}
+    return c
+
+
+def _add(counters: Dict[str, Dict[str, Any]], stage: str, delta: Dict[str, Any], model: str) -> None:
+    c = counters.setdefault(stage, _empty())
+    for f in _FIELDS:
+        if f == "latency_max_ms":
+            c[f] = max(c[f], delta[f])
+        else:
+            c[f] += delta[f]
+    c["cost_usd"] += delta["cost_usd"]
+    if delta["calls"]:
+        m = c["models"].setdefault(model, {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+        m["calls"] += delta["calls"]
+        m["input_tokens"] += delta["input_tokens"]
+        m["output_tokens"] += delta["output_tokens"]
+
+
+def record(
+    stage: str,
+    request: Dict[str, Any],
+    resp: Any = None,
+    *,
+    latency: float = 0.0,
+    error: bool = False,
+    cache_hit: bool = False,
+    batch: bool = False,
+    retries: int = 0,
+) -> None:
+    """호출 한 건 기록. latency 는 초, retries 는 이 요청을 내보내기까지 다시 보낸 횟수."""
+    model = str(request.get("model") or "")
+    inp, cached, out = (0, 0, 0) if cache_hit else _usage_tokens(resp)
+    cost = 0.0
+    if not cache_hit:
+        p_in, p_out = price_for(model)
+        billed_in = (inp - cached) + cached * CACHED_INPUT_DISCOUNT
+        cost = (billed_in * p_in + out * p_out) / 1_000_000 * (BATCH_DISCOUNT if batch else 1.0)
+    latency_ms = int(latency * 1000)
+    delta = {
+        "calls": 0 if cache_hit else 1,
+        "cache_hits": 1 if cache_hit else 0,
+        "errors": 1 if error else 0,
+        "retries": int(retries),
+        "input_tokens": inp,
+        "cached_tokens": cached,
+        "output_tokens": out,
+        "images": count_images(request),
+        "latency_ms": latency_ms,
+        "latency_max_ms": latency_ms,
+        "cost_usd": cost,
+    }
+    with _stats_lock:
+        _add(_stats, stage, delta, model)
+        tracker = _tracker.get()
+        if tracker is not None:
+            _add(tracker, stage, delta, model)
+
+
+def _summarize(counters: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    by_stage: Dict[str, Any] = {}
+    totals = _empty()
+    del totals["models"]
+    for stage, c in sorted(counters.items()):
+        s = {**c, "cost_usd": round(c["cost_usd"], 6), "models": {k: dict(v) for k, v in c["models"].items()}}
+        s["latency_avg_ms"] = int(c["latency_ms"] / c["calls"]) if c["calls"] else 0
+        s["cached_ratio"] = _ratio(c["cached_tokens"], c["input_tokens"])
+        by_stage[stage] = s
+        for f in _FIELDS:
+            totals[f] = max(totals[f], c[f]) if f == "latency_max_ms" else totals[f] + c[f]
+        totals["cost_usd"] += c["cost_usd"]
+    totals["cost_usd"] = round(totals["cost_usd"], 6)
+    totals["cached_ratio"] = _ratio(totals["cached_tokens"], totals["input_tokens"])
+    return {**totals, "by_stage": by_stage}
+
+
+def _ratio(part: int, whole: int) -> float:
+    return round(part / whole, 4) if whole else 0.0
+
+
+def usage_stats() -> Dict[str, Any]:
+    """이 프로세스의 stage 별 사용량"""
+    with _stats_lock:
+        return _summarize(_stats)
+
+
+@contextmanager
+def track(counters: Optional[Dict[str, Dict[str, Any]]] = None) -> Iterator[Dict[str, Dict[str, Any]]]:
+    """
+    with 블록(같은 스레드/컨텍스트) 안에서 나간 호출의 사용량을 따로 센다.
+    counters 를 주면 이전 블록이 yield 한 것에 이어서 센다 (한 job 을 여러 블록에 나눠 셀 때).
+    """
+    if counters is None:
+        counters = {}
+    token = _tracker.set(counters)
+    try:
+        yield counters
+    finally:
+        _tracker.reset(token)
+
+
+def tracked_stats() -> Optional[Dict[str, Any]]:
+    """현재 track() 블록의 사용량 요약 (블록 밖이면 None)"""
+    counters = _tracker.get()
+    if counters is None:
+        return None
+    with _stats_lock:
+        return _summarize(counters)
+
+
+# =============================================================================
+# PDF 단위 리포트 ({out_dir}/llm_usage.json)
+# =============================================================================
+
+def _merge(into: Dict[str, Dict[str, Any]], by_stage: Dict[str, Any]) -> None:
+    """_summarize 결과(by_stage)를 원시 카운터에 더한다."""
+    for stage, c in by_stage.items():
+        m = into.setdefault(stage, _empty())
+        for f in _FIELDS:
+            m[f] = max(m[f], c.get(f, 0)) if f == "latency_max_ms" else m[f] + c.get(f, 0)
+        m["cost_usd"] += c.get("cost_usd", 0.0)
+        for model, mc in (c.get("models") or {}).items():
+            mm = m["models"].setdefault(model, {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+            for k in mm:
+                mm[k] += mc.get(k, 0)
+
+
+def write_report(out_dir: Path, step: str, *, pdf_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    이 프로세스의 사용량을 리포트의 step 항목에 더하고 (재실행 / 이어하기도 실제로 쓴 비용이라 누적, runs 로 횟수)
+    step 전체를 합친 stage 별 / 총합을 다시 계산해 저장한다.
+    """
+    out_dir = Path(out_dir)
+    path = out_dir / REPORT_NAME
+    try:
+        report = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        report = {}
+    steps = report.get("steps") if isinstance(report.get("steps"), dict) else {}
+
+    now = datetime.now(timezone.utc).isoformat()
+    prev = steps.get(step) or {}
+    counters: Dict[str, Dict[str, Any]] = {}
+    _merge(counters, prev.get("by_stage") or {})
+    _merge(counters, usage_stats()["by_stage"])
+    steps[step] = {"updated_at": now, "runs": int(prev.get("runs", 0)) + 1, **_summarize(counters)}
+
+    merged: Dict[str, Dict[str, Any]] = {}
+    for s in steps.values():
+        _merge(merged, s.get("by_stage") or {})
+
+    report = {
+        "pdf_id": pdf_id or report.get("pdf_id"),
+        "updated_at": now,
+        "total": _summarize(merged),
+        "steps": steps,
+    }
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(path)
+    return report
@@ -8,12 +8,15 @@ Phase 2: LLM Batch 품질 검증
 """
 from __future__ import annotations
 
-import json
+import contextvars
+import threading
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
 
+from core.llm_schemas import parse_json
 from core.llm_text import call_llm_text
+from core.retry_policy import classify, retry
 
 
 # =============================================================================
@@ -36,40 +39,45 @@ def _now_iso() -> str:
     return datetime.now(timezone.utc).astimezone().isoformat()
 
 
-def _extract_json(raw: str) -> Optional[Dict[str, Any]]:
-    """JSON 추출 (markdown 블록 제거)"""
-    if not isinstance(raw, str) or not raw.strip():
-        return None
-    raw = raw.strip()
+# =============================================================================
+# LLM Batch Verification
+# =============================================================================
 
-    if raw.startswith("```"):
-        lines = raw.split("\n")
-        if lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].strip() == "```":
-            lines = lines[:-1]
-        raw = "\n".join(lines).strip()
+# 검증 기준 / 출력 형식은 모든 batch 에서 같으므로 앞에 두고 문제 목록은 맨 뒤에 붙인다
+# (provider prompt prefix 캐시가 이 부분을 재사용한다. 이 상수에 batch 별 값을 넣지 말 것)
+_VERIFY_INSTRUCTIONS = f"""당신은 교육 전문가입니다. 맨 아래 "검증 대상 문제들"의 품질을 검증하세요.
 
-    try:
-        obj = json.loads(raw)
-        return obj if isinstance(obj, dict) else None
-    except Exception:
-        pass
-
-    start = raw.find("{")
-    end = raw.rfind("}")
-    if start != -1 and end != -1 and end > start:
-        try:
-            obj = json.loads(raw[start:end + 1])
-            return obj if isinstance(obj, dict) else None
-        except Exception:
-            return None
-    return None
+{"="*60}
+검증 기준
+{"="*60}
+1. **정답 정확성**: 제시된 정답이 실제로 맞는가?
+2. **해설 일관성**: 해설이 정답을 올바르게 설명하는가?
+3. **문제 명확성**: 문제가 모호하지 않고 명확한가?
+4. **MCQ 선지 품질**: 오답 선지가 합리적인가? (너무 쉽게 배제 가능하지 않은가?)
+5. **복수 정답 가능성**: 복수 정답이 가능한 문제인가?
 
+{"="*60}
+출력 형식 (JSON ONLY)
+{"="*60}
+{{
+  "results": [
+    {{
+      "question_id": "문제ID",
+      "verdict": "OK" | "FIXABLE" | "REJECT",
+      "issues": ["이슈1", "이슈2"],
+      "confidence": 0.95
+    }}
+  ],
+  "summary": {{
+    "total": 10,
+    "ok": 8,
+    "fixable": 1,
+    "reject": 1
+  }}
+}}
+
+검증 결과를 JSON으로만 출력하세요."""
 
-# =============================================================================
-# LLM Batch Verification
-# =============================================================================
 
 def _build_verify_prompt(questions: List[Dict[str, Any]]) -> str:
     """검증용 프롬프트 생성"""
@@ -100,43 +108,12 @@ def _build_verify_prompt(questions: List[Dict[str, Any]]) -> str:
 
     questions_text = "\n".join(q_items)
 
-    return f"""당신은 교육 전문가입니다. 다음 시험 문제들의 품질을 검증하세요.
+    return f"""{_VERIFY_INSTRUCTIONS}
 
 {"="*60}
 검증 대상 문제들
 {"="*60}
 {questions_text}
-
-{"="*60}
-검증 기준
-{"="*60}
-1. **정답 정확성**: 제시된 정답이 실제로 맞는가?
-2. **해설 일관성**: 해설이 정답을 올바르게 설명하는가?
-3. **문제 명확성**: 문제가 모호하지 않고 명확한가?
-4. **MCQ 선지 품질**: 오답 선지가 합리적인가? (너무 쉽게 배제 가능하지 않은가?)
-5. **복수 정답 가능성**: 복수 정답이 가능한 문제인가?
-
-{"="*60}
-출력 형식 (JSON ONLY)
-{"="*60}
-{{
-  "results": [
-    {{
-      "question_id": "문제ID",
-      "verdict": "OK" | "FIXABLE" | "REJECT",
-      "issues": ["이슈1", "이슈2"],
-      "confidence": 0.95
-    }}
-  ],
-  "summary": {{
-    "total": 10,
-    "ok": 8,
-    "fixable": 1,
-    "reject": 1
-  }}
-}}
-
-검증 결과를 JSON으로만 출력하세요.
 """
 
 
@@ -174,13 +151,60 @@ def verify_questions_llm(
 
     # 배치 단위로 처리
     all_results: List[Dict[str, Any]] = []
-    questions_with_verdict: List[Dict[str, Any]] = []
 
-    for batch_start in range(0, len(questions), config.batch_size):
-        batch = questions[batch_start:batch_start + config.batch_size]
+    for batch in verify_batches(questions, config):
         batch_results = _verify_batch(batch, config)
         all_results.extend(batch_results)
 
+    return assemble_verification(questions, all_results, config)
+
+
+def verify_batches(
+    questions: List[Dict[str, Any]],
+    config: LLMVerifyConfig,
+) -> List[List[Dict[str, Any]]]:
+    """config.batch_size 개씩 나눈 검증 단위 (batch 모드는 단위마다 요청 하나)"""
+    return [
+        questions[i:i + config.batch_size]
+        for i in range(0, len(questions), config.batch_size)
+    ]
+
+
+def verify_prompt(batch: List[Dict[str, Any]]) -> str:
+    return _build_verify_prompt(batch)
+
+
+def parse_verify_output(raw: str, batch: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """LLM 출력 → 정규화된 결과 (파싱 실패면 None)"""
+    data = parse_json("verify", raw)
+    if data and "results" in data:
+        results = data["results"]
+        if isinstance(results, list):
+            return _normalize_results(results, batch)
+    return None
+
+
+def fallback_results(batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """LLM 검증 실패 시 기본값 (구조 검증 결과 신뢰)"""
+    return [
+        {
+            "question_id": q.get("question_id", "unknown"),
+            "verdict": "OK",  # LLM 실패 시 구조 검증 결과 신뢰
+            "issues": ["LLM verification failed"],
+            "confidence": 0.0,
+        }
+        for q in batch
+    ]
+
+
+def assemble_verification(
+    questions: List[Dict[str, Any]],
+    all_results: List[Dict[str, Any]],
+    config: LLMVerifyConfig,
+) -> Dict[str, Any]:
+    """배치별 결과를 모아 verify_questions_llm 반환 형태로"""
+    questions_with_verdict: List[Dict[str, Any]] = []
+
     # 결과를 question_id로 매핑
     result_map = {r["question_id"]: r for r in all_results}
 
@@ -214,6 +238,57 @@ def verify_questions_llm(
     }
 
 
+class StreamingLLMVerifier:
+    """
+    문제가 들어오는 대로 LLM 검증 (스트리밍 생성용).
+    백그라운드 스레드 하나가 대기 중인 문제를 최대 batch_size 개씩 묶어 검증한다:
+    첫 문제는 바로 혼자 나가고, 그 호출이 도는 동안 쌓인 문제는 다음 호출에 같이 묶인다.
+
+        v = StreamingLLMVerifier(config)
+        v.submit(q)  ...
+        llm_result = v.close()      # verify_questions_llm 과 같은 형태
+    """
+
+    def __init__(self, config: Optional[LLMVerifyConfig] = None):
+        self.config = config or LLMVerifyConfig()
+        self._cv = threading.Condition()
+        self._pending: List[Dict[str, Any]] = []
+        self._questions: List[Dict[str, Any]] = []
+        self._results: List[Dict[str, Any]] = []
+        self._closed = False
+        # 호출한 스레드의 contextvars(job 단위 llm_cache / llm_usage track)를 그대로 이어받는다
+        ctx = contextvars.copy_context()
+        self._thread = threading.Thread(target=ctx.run, args=(self._run,), name="llm-verify-stream", daemon=True)
+        self._thread.start()
+
+    def submit(self, question: Dict[str, Any]) -> None:
+        with self._cv:
+            if self._closed:
+                raise RuntimeError("StreamingLLMVerifier is closed")
+            self._pending.append(question)
+            self._questions.append(question)
+            self._cv.notify()
+
+    def close(self) -> Dict[str, Any]:
+        """남은 문제까지 검증하고 결과 반환"""
+        with self._cv:
+            self._closed = True
+            self._cv.notify()
+        self._thread.join()
+        return assemble_verification(self._questions, self._results, self.config)
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                while not self._pending and not self._closed:
+                    self._cv.wait()
+                if not self._pending:
+                    return
+                batch = self._pending[:self.config.batch_size]
+                del self._pending[:len(batch)]
+            self._results.extend(_verify_batch(batch, self.config))
+
+
 def _verify_batch(
     batch: List[Dict[str, Any]],
     config: LLMVerifyConfig,
@@ -221,34 +296,27 @@ def _verify_batch(
     """단일 배치 검증"""
     prompt = _build_verify_prompt(batch)
 
-    for attempt in range(config.max_retries):
-        try:
-            raw = call_llm_text(
-                prompt=prompt,
-                model=config.model,
-                temperature=config.temperature,
-            )
-
-            data = _extract_json(raw)
-            if data and "results" in data:
-                results = data["results"]
-                if isinstance(results, list):
-                    return _normalize_results(results, batch)
+    def _attempt(attempt: int) -> List[Dict[str, Any]]:
+        raw = call_llm_text(
+            prompt=prompt,
+            model=config.model,
+            temperature=config.temperature,
+            stage="verify",
+            schema="question_verify",
+        )
+        results = parse_verify_output(raw, batch)
+        if results is None:
+            # 응답을 받은 뒤의 ValueError 는 retry 가 bad_output 으로 보고 캐시를 건너뛰어 다시 받는다
+            raise ValueError("LLM verify output could not be parsed")
+        return results
 
-        except Exception as e:
-            print(f"⚠️ LLM 검증 실패 (attempt {attempt + 1}): {e}")
-            continue
+    try:
+        return retry(_attempt, max_retries=config.max_retries)
+    except Exception as e:
+        print(f"⚠️ LLM 검증 실패 ({classify(e)}): {e}")
 
     # 실패 시 기본값 반환
-    return [
-        {
-            "question_id": q.get("question_id", "unknown"),
-            "verdict": "OK",  # LLM 실패 시 구조 검증 결과 신뢰
-            "issues": ["LLM verification failed"],
-            "confidence": 0.0,
-        }
-        for q in batch
-    ]
+    return fallback_results(batch)
 
 
 def _normalize_results(
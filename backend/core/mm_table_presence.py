@@ -1,16 +1,15 @@
 # core/mm_table_presence.py
 from __future__ import annotations
 
-import base64
-import json
-import os
+import asyncio
 from pathlib import Path
 from dataclasses import dataclass
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 
-from openai import OpenAI
-
-from core.llm_mm import call_mm_json
+from core.contact_sheet import SheetLayout, sheet_data_url
+from core.llm_client import create_response, create_response_async
+from core.llm_mm import _image_to_data_url, call_mm_json, call_mm_json_async
+from core.llm_schemas import parse_json, with_schema
 
 
 @dataclass(frozen=True)
@@ -29,49 +28,39 @@ Do NOT count charts, diagrams, code blocks, formulas, or plain text.
 """
 
 
-PROMPT_TABLE_EXISTS_BATCH = """You are given {n} page images. For EACH page, determine if it contains a table.
+# 페이지 수는 이미지 뒤에 따로 붙인다 (지시문을 batch 크기와 무관하게 고정 → provider prompt prefix 캐시)
+PROMPT_TABLE_EXISTS_BATCH = """You are given several page images. For EACH page, determine if it contains a table.
 
 Schema:
-{{"results": [{{"page": 0, "t": true|false}}, {{"page": 1, "t": true|false}}, ...]}}
+{"results": [{"page": 0, "t": true|false}, {"page": 1, "t": true|false}, ...]}
 
 Rules:
 - "page" is the 0-based index of the image in order shown
 - "t" = true ONLY if page has a table with clear rows AND columns
 - Do NOT count charts, diagrams, code blocks, formulas, or plain text
-- Return results for ALL {n} pages
+- Return results for ALL pages
 """
 
+PROMPT_TABLE_EXISTS_BATCH_COUNT = "There are {n} page images above (page 0 to {last}). Return results for ALL {n} pages."
 
-def _image_to_data_url(image_path: Path) -> str:
-    """Convert local image file to a base64 data URL."""
-    image_path = Path(image_path)
-    suffix = image_path.suffix.lower().lstrip(".")
-    if suffix not in {"png", "jpg", "jpeg", "webp"}:
-        raise ValueError(f"Unsupported image type: .{suffix}")
-
-    mime = "image/png" if suffix == "png" else ("image/webp" if suffix == "webp" else "image/jpeg")
-    b64 = base64.b64encode(image_path.read_bytes()).decode("utf-8")
-    return f"data:{mime};base64,{b64}"
 
+# contact sheet: 페이지 썸네일 격자 한 장 (core.contact_sheet). 셀 수는 이미지 뒤에 따로 붙인다.
+PROMPT_TABLE_EXISTS_SHEET = """You are given ONE image: a contact sheet of page thumbnails arranged in a grid.
+Each cell is one page, labelled with a red number in its top-left corner (0, 1, 2, ... left to right, top to bottom).
+For EACH cell, determine if that page contains a table.
 
-def _extract_json(text: str) -> Dict[str, Any]:
-    """Try to parse JSON from model output."""
-    text = (text or "").strip()
-    if not text:
-        raise ValueError("Empty model output")
-
-    try:
-        return json.loads(text)
-    except Exception:
-        pass
+Schema:
+{"results": [{"page": 0, "t": true|false}, {"page": 1, "t": true|false}, ...]}
 
-    start = text.find("{")
-    end = text.rfind("}")
-    if start != -1 and end != -1 and end > start:
-        chunk = text[start:end + 1]
-        return json.loads(chunk)
+Rules:
+- "page" is the red cell label
+- "t" = true ONLY if the page has a table with clear rows AND columns (ruled grid or aligned cells)
+- Do NOT count charts, diagrams, code blocks, formulas, or plain text
+- Judge each cell on its own; do not let neighbouring cells influence the answer
+- Return results for ALL cells
+"""
 
-    raise ValueError(f"Could not parse JSON from output: {text[:200]}")
+PROMPT_TABLE_EXISTS_SHEET_COUNT = "The sheet above shows {n} pages in cells labelled 0 to {last}. Return results for ALL {n} cells."
 
 
 def detect_table_presence_mm(image_path: Path, page_index: int) -> TablePresenceResult:
@@ -85,8 +74,30 @@ def detect_table_presence_mm(image_path: Path, page_index: int) -> TablePresence
         image_path=image_path,
         model="gpt-4o-mini",
         temperature=0.0,
+        stage="presence",
+        schema="table_presence",
+    )
+    return _single_result(out, page_index)
+
+
+async def detect_table_presence_mm_async(image_path: Path, page_index: int) -> TablePresenceResult:
+    """detect_table_presence_mm 의 asyncio 버전"""
+    image_path = Path(image_path)
+    if not image_path.exists():
+        raise FileNotFoundError(f"Image not found: {image_path}")
+
+    out = await call_mm_json_async(
+        prompt=PROMPT_TABLE_EXISTS,
+        image_path=image_path,
+        model="gpt-4o-mini",
+        temperature=0.0,
+        stage="presence",
+        schema="table_presence",
     )
+    return _single_result(out, page_index)
+
 
+def _single_result(out: Any, page_index: int) -> TablePresenceResult:
     if not isinstance(out, dict) or "t" not in out:
         raise ValueError(f"Invalid MM output on page {page_index}: {out}")
 
@@ -117,54 +128,132 @@ def detect_table_presence_batch(
         pi, path = pages[0]
         return [detect_table_presence_mm(path, pi)]
 
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("Missing OPENAI_API_KEY environment variable")
+    data_urls = [_image_to_data_url(p, stage="presence") for p in _check_paths(pages)]
+
+    # API 호출
+    resp = create_response(stage="presence", **_batch_request(data_urls, model=model, temperature=temperature))
+    return _batch_results(resp, pages)
+
+
+async def detect_table_presence_batch_async(
+    pages: List[Tuple[int, Path]],
+    model: str = "gpt-4o-mini",
+    temperature: float = 0.0,
+) -> List[TablePresenceResult]:
+    """detect_table_presence_batch 의 asyncio 버전 (이미지 인코딩은 스레드에서)"""
+    if not pages:
+        return []
+
+    if len(pages) == 1:
+        pi, path = pages[0]
+        return [await detect_table_presence_mm_async(path, pi)]
+
+    paths = _check_paths(pages)
+    data_urls = await asyncio.to_thread(lambda: [_image_to_data_url(p, stage="presence") for p in paths])
+
+    resp = await create_response_async(
+        stage="presence", **_batch_request(data_urls, model=model, temperature=temperature)
+    )
+    return _batch_results(resp, pages)
 
-    client = OpenAI(api_key=api_key)
 
+async def detect_table_presence_sheet_async(
+    pages: List[Tuple[int, Path]],
+    layout: SheetLayout,
+    pdf_path: Optional[Path] = None,
+    model: str = "gpt-4o-mini",
+    temperature: float = 0.0,
+) -> List[TablePresenceResult]:
+    """
+    contact sheet 표 탐지: 페이지들을 썸네일 격자 이미지 한 장으로 합쳐 한 번에 판단
+
+    pdf_path 가 있으면 원본 PDF 에서 바로 그리고 (페이지 PNG 불필요), 없으면 pages 의 이미지로 그린다.
+    len(pages) 는 layout.cells 이하여야 한다.
+    답에서 빠진 칸이 있으면 표 없음으로 두지 않고 ValueError (retry 가 캐시를 건너뛰어 다시 물어본다).
+    """
+    if not pages:
+        return []
+
+    indices = [pi for pi, _ in pages]
+    if pdf_path is not None:
+        data_url = await asyncio.to_thread(sheet_data_url, indices, layout, pdf_path=Path(pdf_path))
+    else:
+        paths = _check_paths(pages)
+        data_url = await asyncio.to_thread(sheet_data_url, indices, layout, image_paths=paths)
+
+    resp = await create_response_async(
+        stage="presence", **_sheet_request(data_url, len(pages), model=model, temperature=temperature)
+    )
+    return _batch_results(resp, pages, strict=True)
+
+
+def _check_paths(pages: List[Tuple[int, Path]]) -> List[Path]:
+    paths = []
+    for _, image_path in pages:
+        image_path = Path(image_path)
+        if not image_path.exists():
+            raise FileNotFoundError(f"Image not found: {image_path}")
+        paths.append(image_path)
+    return paths
+
+
+def _batch_request(data_urls: List[str], *, model: str, temperature: float) -> Dict[str, Any]:
     # 이미지들을 content 배열로 구성
     content: List[Dict[str, Any]] = []
 
-    # 프롬프트 추가
-    prompt = PROMPT_TABLE_EXISTS_BATCH.format(n=len(pages))
+    # 프롬프트 추가 (고정 지시문 → 이미지 → 페이지 수 순서)
     content.append({
         "type": "input_text",
-        "text": f"Return ONLY valid JSON. Do not include code fences.\n{prompt}"
+        "text": f"Return ONLY valid JSON. Do not include code fences.\n{PROMPT_TABLE_EXISTS_BATCH}"
     })
 
-    # 각 페이지 이미지 추가
-    page_index_map: Dict[int, int] = {}  # batch_idx -> real_page_index
-    for batch_idx, (page_index, image_path) in enumerate(pages):
-        image_path = Path(image_path)
-        if not image_path.exists():
-            raise FileNotFoundError(f"Image not found: {image_path}")
-
-        data_url = _image_to_data_url(image_path)
+    # 각 페이지 이미지 추가 (batch_idx = content 안의 순서)
+    for data_url in data_urls:
         content.append({
             "type": "input_image",
             "image_url": data_url,
         })
-        page_index_map[batch_idx] = page_index
 
-    # API 호출
-    resp = client.responses.create(
-        model=model,
-        input=[{
+    n = len(data_urls)
+    content.append({
+        "type": "input_text",
+        "text": PROMPT_TABLE_EXISTS_BATCH_COUNT.format(n=n, last=n - 1),
+    })
+
+    return with_schema({
+        "model": model,
+        "input": [{
             "role": "user",
             "content": content,
         }],
-        temperature=temperature,
-    )
-
+        "temperature": temperature,
+    }, "table_presence_batch")
+
+
+def _sheet_request(data_url: str, n: int, *, model: str, temperature: float) -> Dict[str, Any]:
+    content: List[Dict[str, Any]] = [
+        {"type": "input_text", "text": f"Return ONLY valid JSON. Do not include code fences.\n{PROMPT_TABLE_EXISTS_SHEET}"},
+        # 시트는 provider 가 줄이지 않는 크기로 그려 두었다 (auto 면 low 로 떨어질 수 있어 high 고정)
+        {"type": "input_image", "image_url": data_url, "detail": "high"},
+        {"type": "input_text", "text": PROMPT_TABLE_EXISTS_SHEET_COUNT.format(n=n, last=n - 1)},
+    ]
+    return with_schema({
+        "model": model,
+        "input": [{"role": "user", "content": content}],
+        "temperature": temperature,
+    }, "table_presence_batch")
+
+
+def _batch_results(resp: Any, pages: List[Tuple[int, Path]], strict: bool = False) -> List[TablePresenceResult]:
+    """strict 면 답에 없는 번호를 표 없음(False)으로 채우지 않고 ValueError"""
     text_out = getattr(resp, "output_text", None)
     if not text_out:
         text_out = str(resp)
 
     # JSON 파싱
-    data = _extract_json(text_out)
+    data = parse_json("presence", text_out)
 
-    if not isinstance(data, dict) or "results" not in data:
+    if data is None or "results" not in data:
         raise ValueError(f"Invalid batch output format: {data}")
 
     results_raw = data["results"]
@@ -180,6 +269,11 @@ def detect_table_presence_batch(
             batch_idx = int(r["page"])
             result_map[batch_idx] = bool(r["t"])
 
+    if strict:
+        missing = [i for i in range(len(pages)) if i not in result_map]
+        if missing:
+            raise ValueError(f"batch output is missing cells {missing} of {len(pages)}")
+
     # 원래 순서대로 결과 반환
     for batch_idx, (page_index, _) in enumerate(pages):
         has_table = result_map.get(batch_idx, False)
@@ -189,7 +283,3 @@ def detect_table_presence_batch(
         ))
 
     return results
-
-
-
-
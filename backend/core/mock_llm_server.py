@@ -0,0 +1,366 @@
+# core/mock_llm_server.py
+"""
+로컬 mock LLM 서버 (OpenAI 호환 /v1/responses + batch API) — 오프라인 end-to-end / 성능 회귀 측정용
+
+engine/cli/run_job.py 를 노트북에서 provider 없이 끝까지 돌리기 위한 대용 서버.
+stage subprocess 들은 OPENAI_BASE_URL 만 이 서버로 바꾸면 코드 수정 없이 그대로 돈다.
+
+  POST /v1/responses      stream=false → JSON, stream=true → SSE (response.output_text.delta ...)
+  /v1/files, /v1/batches  core.batch_server 와 같은 구현 (같은 responder 로 처리, 지연 없음)
+
+응답을 고르는 순서:
+  1) --cassette DIR 이 있으면 core.llm_cassette 녹화본에서 요청 key 로 찾는다 (녹화된 지연 시간 포함)
+  2) 없으면 text.format 의 schema 이름으로 schema 에 맞는 그럴듯한 응답을 만든다 (synth)
+     - table_presence(_batch)  이미지(contact sheet 면 셀)마다 --table_rate 확률로 표 있음 (요청 key 로 seed → 매번 같은 결과)
+     - table_extract           작은 markdown 표 하나
+     - table_detect_extract    이미지마다 --table_rate 확률로 작은 표 하나, 아니면 빈 리스트
+     - questions               프롬프트의 "정확히 N개" / 근거 청크 목록 / 유형 구성대로 구조 검증을 통과하는 문제
+     - question_verify         프롬프트의 문제 ID 전부 OK
+     - question_allocation     프롬프트의 섹션에 총 문제 수를 고르게 배분
+     synth 응답의 "녹화된" 지연 시간은 SYNTH_BASE + 출력 토큰 / SYNTH_TOKENS_PER_SEC 로 본다.
+
+지연 시간 (--latency, 문법은 core.llm_cassette 와 같음): recorded(기본) / none / fixed:S /
+uniform:A,B / lognormal:MEDIAN,SIGMA, --speed 배율. --error_rate 만큼 429 (retry-after-ms 포함)를 섞는다.
+
+실행:
+  python -m core.mock_llm_server --port 8770 [--cassette artifacts/_cassettes] [--latency lognormal:1.5,0.5]
+  OPENAI_BASE_URL=http://127.0.0.1:8770/v1 OPENAI_API_KEY=local python engine/cli/run_job.py ...
+  (run_job.py --mock_llm 은 이 서버를 같은 프로세스에서 띄우고 환경변수를 맞춰 준다)
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.batch_server import BatchStore, make_handler
+from core.llm_cache import request_key
+from core.llm_cassette import Cassette, LatencyModel, split_stream
+from core.llm_usage import count_images
+from core.rate_limit import CHARS_PER_TOKEN, IMAGE_TOKENS
+
+SYNTH_BASE = 0.4
+SYNTH_TOKENS_PER_SEC = 80.0
+DEFAULT_TABLE_RATE = 0.3
+RETRY_AFTER_MS = 1000
+
+
+# =============================================================================
+# synth: schema 별 그럴듯한 출력
+# =============================================================================
+
+def _prompt_text(body: Dict[str, Any]) -> str:
+    parts: List[str] = []
+    if isinstance(body.get("instructions"), str):
+        parts.append(body["instructions"])
+    inp = body.get("input")
+    if isinstance(inp, str):
+        parts.append(inp)
+    for msg in inp if isinstance(inp, list) else []:
+        content = msg.get("content") if isinstance(msg, dict) else None
+        if isinstance(content, str):
+            parts.append(content)
+        for part in content if isinstance(content, list) else []:
+            if isinstance(part, dict) and isinstance(part.get("text"), str):
+                parts.append(part["text"])
+    return "\n".join(parts)
+
+
+def _schema_name(body: Dict[str, Any]) -> Optional[str]:
+    fmt = (body.get("text") or {}).get("format") or {}
+    return fmt.get("name") if isinstance(fmt, dict) else None
+
+
+def _synth_questions(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    m = re.search(r"정확히 (\d+)개", prompt)
+    n = int(m.group(1)) if m else 2
+    m = re.search(r"SAQ\(단답형\) (\d+)개", prompt)
+    n_saq = min(n, int(m.group(1))) if m else 0
+    chunks = re.findall(r"^- (\S+) \(page (-?\d+)\):", prompt, flags=re.M) or [("p0_c00", "0")]
+    m = re.search(r'- 섹션: "([^"]+)"', prompt)
+    section = m.group(1) if m else "S"
+    difficulties = ["easy", "medium", "hard"]
+
+    questions = []
+    for i in range(1, n + 1):
+        chunk_id, page = chunks[(i - 1) % len(chunks)]
+        saq = i > n - n_saq
+        questions.append({
+            "question_id": f"Q{i:03d}",
+            "type": "SAQ" if saq else "MCQ",
+            "difficulty": difficulties[(i - 1) % 3],
+            "question_text": f"[{section}] {chunk_id} 에서 설명한 개념 {i} 에 대한 설명으로 옳은 것은?",
+            "options": None if saq else [f"A) 개념 {i} 정의", f"B) 오답 {i}-1", f"C) 오답 {i}-2", f"D) 오답 {i}-3"],
+            "correct_answer": f"개념 {i} 정의" if saq else "ABCD"[rng.randrange(4)],
+            "explanation": f"{chunk_id} 의 본문에서 개념 {i} 를 이렇게 정의한다.",
+            "source_pages": [int(page)],
+            "evidence": [{"kind": "text", "page": int(page), "chunk_id": chunk_id}],
+            "learning_objective": f"개념 {i} 이해",
+            "common_misconception": f"개념 {i} 와 비슷한 용어를 혼동",
+            "generated_table": None,
+            "table_refs": None,
+        })
+    return {"questions": questions}
+
+
+def _synth_verify(prompt: str) -> Dict[str, Any]:
+    ids = list(dict.fromkeys(re.findall(r"^- ID: (\S+)", prompt, flags=re.M)))
+    return {
+        "results": [{"question_id": q, "verdict": "OK", "issues": [], "confidence": 0.9} for q in ids],
+        "summary": {"total": len(ids), "ok": len(ids), "fixable": 0, "reject": 0},
+    }
+
+
+def _synth_allocation(prompt: str) -> Dict[str, Any]:
+    sections = re.findall(r"^\d+\. \[([^\]]+)\]", prompt, flags=re.M)
+    m = re.search(r"총 (\d+)개", prompt)
+    total = int(m.group(1)) if m else len(sections)
+    alloc = [{"section_id": s, "count": total // len(sections) + (1 if i < total % len(sections) else 0)}
+             for i, s in enumerate(sections)] if sections else []
+    return {"allocation": alloc, "reasoning": "mock: 섹션에 고르게 배분"}
+
+
+_SYNTH_TABLE = {
+    "table_id": "t01",
+    "title": None,
+    "format": "markdown",
+    "content": "| 항목 | 값 |\n|---|---|\n| A | 1 |\n| B | 2 |",
+}
+
+
+def synth_output(body: Dict[str, Any], table_rate: float = DEFAULT_TABLE_RATE) -> str:
+    """요청의 schema 에 맞는 출력 텍스트 (같은 요청이면 항상 같은 결과)"""
+    name = _schema_name(body)
+    rng = random.Random(request_key(body))
+    prompt = _prompt_text(body)
+
+    if name == "table_presence":
+        data: Dict[str, Any] = {"t": rng.random() < table_rate}
+    elif name == "table_presence_batch":
+        # contact sheet 는 이미지 한 장에 여러 페이지 (셀 수는 프롬프트 끝 문장에 있다)
+        m = re.search(r"shows (\d+) pages in cells", prompt)
+        n = int(m.group(1)) if m else count_images(body)
+        data = {"results": [{"page": i, "t": rng.random() < table_rate} for i in range(n)]}
+    elif name == "table_extract":
+        data = {"tables": [_SYNTH_TABLE]}
+    elif name == "table_detect_extract":
+        data = {"pages": [{"page": i, "tables": [_SYNTH_TABLE] if rng.random() < table_rate else []}
+                          for i in range(count_images(body))]}
+    elif name == "questions":
+        data = _synth_questions(prompt, rng)
+    elif name == "question_verify":
+        data = _synth_verify(prompt)
+    elif name == "question_allocation":
+        data = _synth_allocation(prompt)
+    else:
+        data = {}
+    return json.dumps(data, ensure_ascii=False)
+
+
+def response_object(body: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """Responses API 응답 JSON (usage 는 문자 수 / 이미지 수로 추정)"""
+    prompt = _prompt_text(body)
+    inp = len(prompt) // CHARS_PER_TOKEN + count_images(body) * IMAGE_TOKENS
+    out = max(1, len(text) // CHARS_PER_TOKEN)
+    return {
+        "id": f"resp_{uuid.uuid4().hex[:24]}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": body.get("model"),
+        "status": "completed",
+        "output": [{
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "usage": {
+            "input_tokens": inp,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": out,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": inp + out,
+        },
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+    }
+
+
+# =============================================================================
+# 서버
+# =============================================================================
+
+class MockLLM:
+    """요청 body → (응답 JSON, 녹화 기준 지연 초, ttft 초 | None)"""
+
+    def __init__(
+        self,
+        cassette: Optional[Path] = None,
+        latency: Optional[str] = None,
+        speed: float = 1.0,
+        table_rate: float = DEFAULT_TABLE_RATE,
+        error_rate: float = 0.0,
+    ):
+        self.cassette = Cassette(Path(cassette)) if cassette else None
+        self.latency = LatencyModel.parse(latency, speed=speed)
+        self.table_rate = table_rate
+        self.error_rate = error_rate
+        self.counts = {"requests": 0, "cassette": 0, "synth": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self.counts[field] += 1
+
+    def respond(self, body: Dict[str, Any]) -> Tuple[Dict[str, Any], float, Optional[float]]:
+        self._count("requests")
+        entry = self.cassette.find(request_key(body)) if self.cassette else None
+        if entry is not None:
+            self._count("cassette")
+            return entry["response"], float(entry.get("latency") or 0.0), entry.get("ttft")
+        self._count("synth")
+        resp = response_object(body, synth_output(body, self.table_rate))
+        return resp, SYNTH_BASE + resp["usage"]["output_tokens"] / SYNTH_TOKENS_PER_SEC, None
+
+    def batch_responder(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        return 200, self.respond(body)[0]
+
+    def should_fail(self) -> bool:
+        if self.error_rate > 0 and random.random() < self.error_rate:
+            self._count("errors")
+            return True
+        return False
+
+
+def _output_text(resp: Dict[str, Any]) -> str:
+    return "".join(
+        c.get("text", "")
+        for item in resp.get("output") or [] if item.get("type") == "message"
+        for c in item.get("content") or [] if c.get("type") == "output_text"
+    )
+
+
+def make_mock_handler(mock: MockLLM, store: BatchStore):
+    base = make_handler(store)
+
+    class Handler(base):  # type: ignore[misc, valid-type]
+        def do_POST(self) -> None:
+            if self._path() != "/responses":
+                return super().do_POST()
+            body = json.loads(self._body() or b"{}")
+            if mock.should_fail():
+                return self._send_429()
+
+            resp, recorded, ttft = mock.respond(body)
+            total = mock.latency.sample(recorded)
+            if not body.get("stream"):
+                time.sleep(total)
+                return self._send(200, resp)
+
+            entry = {"latency": recorded, "ttft": ttft}
+            self.send_response(200)
+            self.send_header("content-type", "text/event-stream")
+            self.send_header("transfer-encoding", "chunked")
+            self.end_headers()
+            seq = 0
+            self._event({"type": "response.created", "response": dict(resp, status="in_progress", output=[]),
+                         "sequence_number": seq})
+            for wait, piece in split_stream(_output_text(resp), entry, total):
+                time.sleep(wait)
+                seq += 1
+                self._event({"type": "response.output_text.delta", "item_id": "msg", "output_index": 0,
+                             "content_index": 0, "delta": piece, "logprobs": [], "sequence_number": seq})
+            self._event({"type": "response.completed", "response": resp, "sequence_number": seq + 1})
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def _event(self, ev: Dict[str, Any]) -> None:
+            data = f"event: {ev['type']}\ndata: {json.dumps(ev, ensure_ascii=False)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def _send_429(self) -> None:
+            body = json.dumps({"error": {"message": "mock rate limit", "type": "rate_limit_error"}}).encode("utf-8")
+            self.send_response(429)
+            self.send_header("content-type", "application/json")
+            self.send_header("retry-after-ms", str(RETRY_AFTER_MS))
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def serve(
+    port: int,
+    *,
+    host: str = "127.0.0.1",
+    cassette: Optional[Path] = None,
+    latency: Optional[str] = None,
+    speed: float = 1.0,
+    table_rate: float = DEFAULT_TABLE_RATE,
+    error_rate: float = 0.0,
+    data_dir: Optional[Path] = None,
+) -> ThreadingHTTPServer:
+    """서버 객체를 만들어 돌려준다 (serve_forever 는 호출하는 쪽에서)"""
+    mock = MockLLM(cassette, latency=latency, speed=speed, table_rate=table_rate, error_rate=error_rate)
+    store = BatchStore(data_dir or Path(tempfile.mkdtemp(prefix="mock_llm_")), mock.batch_responder)
+    server = ThreadingHTTPServer((host, port), make_mock_handler(mock, store))
+    server.daemon_threads = True
+    server.mock = mock  # type: ignore[attr-defined]
+    return server
+
+
+def start_background(port: int = 0, **kwargs: Any) -> Tuple[ThreadingHTTPServer, str]:
+    """데몬 스레드로 띄우고 (server, base_url) 반환. port=0 이면 빈 포트."""
+    server = serve(port, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, real_port = server.server_address[:2]
+    return server, f"http://{host}:{real_port}/v1"
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="로컬 mock LLM 서버 (OpenAI Responses + Batch API 오프라인 대용)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8770)
+    ap.add_argument("--cassette", default=None, help="core.llm_cassette 녹화 디렉토리 (있으면 먼저 재생)")
+    ap.add_argument("--latency", default="recorded",
+                    help="지연 분포: recorded / none / fixed:S / uniform:A,B / lognormal:MEDIAN,SIGMA")
+    ap.add_argument("--speed", type=float, default=1.0, help="지연 시간 배율 (0.1 이면 10배 빠르게)")
+    ap.add_argument("--table_rate", type=float, default=DEFAULT_TABLE_RATE, help="synth presence 의 표 있음 비율")
+    ap.add_argument("--error_rate", type=float, default=0.0, help="429 로 응답할 비율 (재시도 경로 측정용)")
+    ap.add_argument("--data_dir", default=None, help="batch 업로드/결과 파일 저장 위치 (기본: 임시 폴더)")
+    args = ap.parse_args(argv)
+
+    server = serve(
+        args.port,
+        host=args.host,
+        cassette=Path(args.cassette) if args.cassette else None,
+        latency=args.latency,
+        speed=args.speed,
+        table_rate=args.table_rate,
+        error_rate=args.error_rate,
+        data_dir=Path(args.data_dir) if args.data_dir else None,
+    )
+    print(f"[mock_llm_server] http://{args.host}:{args.port}/v1 "
+          f"(cassette={args.cassette or '-'}, latency={args.latency} x{args.speed})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"[mock_llm_server] {server.mock.counts}")  # type: ignore[attr-defined]
+
+
+if __name__ == "__main__":
+    main()
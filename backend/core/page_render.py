@@ -1,30 +1,293 @@
 # core/page_render.py
+from __future__ import annotations
+
+import io
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import List, Optional, Tuple
+
 import fitz  # PyMuPDF
 
+# image_format -> 파일 확장자
+# (폴더 이름은 하위 호환을 위해 포맷과 무관하게 pages_png/ 를 그대로 쓴다)
+IMAGE_FORMATS = {"png": "png", "jpeg": "jpg", "webp": "webp"}
+DEFAULT_IMAGE_QUALITY = 85
+
+# 렌더 샤드 하나가 최소 이 정도 페이지는 맡아야 프로세스 기동 비용이 상쇄된다
+MIN_PAGES_PER_SHARD = 4
+
+
 def render_page_pngs(
     pdf_path: Path,
     out_dir: Path,
-    dpi: int = 150
+    dpi: int = 150,
+    workers: int = 1,
 ) -> list[Path]:
     """
     Render every page of PDF to PNG images.
     Returns list of PNG paths in page order (0-based).
     """
+    return render_page_images(pdf_path, out_dir, dpi=dpi, image_format="png", workers=workers)
+
+
+def render_page_images(
+    pdf_path: Path,
+    out_dir: Path,
+    dpi: int = 150,
+    image_format: str = "png",
+    quality: int = DEFAULT_IMAGE_QUALITY,
+    workers: int = 1,
+) -> list[Path]:
+    """
+    Render every page of PDF to page_{i:03d}.{png|jpg|webp}.
+
+    - image_format: "png" (무손실, 기본) | "jpeg" | "webp" (Pillow 필요)
+    - quality: jpeg/webp 품질 (1~100). png 에는 영향 없음
+    - workers > 1 이면 페이지 구간을 프로세스 풀에 나눠서 렌더 (PNG/JPEG 인코딩이 CPU-bound)
+
+    다른 포맷으로 렌더된 이전 페이지 이미지는 지운다
+    (list_page_images 가 같은 페이지를 두 번 세지 않도록).
+
+    Returns list of image paths in page order (0-based).
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image_format: {image_format}")
+
     pdf_path = Path(pdf_path)
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
+    ext = IMAGE_FORMATS[image_format]
+    for other in set(IMAGE_FORMATS.values()) - {ext}:
+        for p in out_dir.glob(f"page_*.{other}"):
+            p.unlink()
+
     doc = fitz.open(str(pdf_path))
+    page_count = doc.page_count
+
+    shards = _shard_ranges(page_count, workers) if workers > 1 else []
+    if len(shards) > 1:
+        doc.close()
+        tasks = [(str(pdf_path), str(out_dir), a, b, dpi, image_format, quality) for a, b in shards]
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as ex:
+            paths: List[Path] = []
+            for shard_paths in ex.map(_render_page_range, tasks):
+                paths.extend(Path(p) for p in shard_paths)
+        return paths
+
+    try:
+        return [
+            _render_page(doc.load_page(i), i, out_dir, dpi, image_format, quality)
+            for i in range(page_count)
+        ]
+    finally:
+        doc.close()
+
+
+def encode_pixmap(pix: "fitz.Pixmap", image_format: str, quality: int = DEFAULT_IMAGE_QUALITY) -> bytes:
+    """Pixmap -> 이미지 바이트. webp 는 PyMuPDF 가 못 써서 Pillow 로 인코딩한다."""
+    if image_format == "png":
+        return pix.tobytes("png")
+    if image_format == "jpeg":
+        return pix.tobytes("jpg", jpg_quality=int(quality))
+    if image_format == "webp":
+        try:
+            from PIL import Image
+        except ImportError as e:
+            raise RuntimeError("image_format='webp' requires Pillow (pip install pillow)") from e
+        if pix.alpha or pix.n != 3:
+            pix = fitz.Pixmap(fitz.csRGB, pix, 0)
+        img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        buf = io.BytesIO()
+        img.save(buf, format="WEBP", quality=int(quality))
+        return buf.getvalue()
+    raise ValueError(f"Unsupported image_format: {image_format}")
+
+
+def page_image_path(pages_dir: Path, page_index: int) -> Path:
+    """
+    pages_dir 에서 page_index 의 이미지 경로.
+    어떤 포맷으로 렌더됐는지 몰라도 되도록 있는 파일을 찾고, 없으면 .png 경로를 돌려준다.
+    """
+    pages_dir = Path(pages_dir)
+    for ext in IMAGE_FORMATS.values():
+        p = pages_dir / f"page_{page_index:03d}.{ext}"
+        if p.exists():
+            return p
+    return pages_dir / f"page_{page_index:03d}.png"
+
+
+def list_page_images(pages_dir: Path) -> list[Path]:
+    """pages_dir 의 page_*.{png,jpg,webp} (파일명 순 = 페이지 순)"""
+    pages_dir = Path(pages_dir)
+    paths: List[Path] = []
+    for ext in IMAGE_FORMATS.values():
+        paths.extend(pages_dir.glob(f"page_*.{ext}"))
+    return sorted(paths, key=lambda p: p.stem)
+
+
+class PageRenderer:
+    """
+    페이지 이미지를 필요할 때만 렌더하는 lazy renderer (on-disk 캐시).
+
+    prepare 를 render="lazy" 로 돌리면 PNG 를 미리 만들지 않는다.
+    presence / extraction 단계가 get(page_index) 로 요청한 페이지만
+    pages_png/page_NNN.{ext} 로 렌더하고, 이미 있으면 그대로 돌려준다.
+    prepare 기본 dpi 가 아닌 dpi 로 요청하면 pages_png/dpi_{dpi}/ 아래에 따로 캐시한다.
+
+    스레드 풀에서 같이 써도 된다 (fitz.Document 는 스레드 안전하지 않아서 렌더는 lock 으로 직렬화).
+    파일은 tmp → replace 로 쓰므로 다른 프로세스가 반쯤 쓴 이미지를 읽는 일은 없다.
+    """
+
+    def __init__(
+        self,
+        pdf_path: Path,
+        pages_dir: Path,
+        dpi: int = 150,
+        image_format: str = "png",
+        quality: int = DEFAULT_IMAGE_QUALITY,
+    ):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image_format: {image_format}")
+        self.pdf_path = Path(pdf_path)
+        self.pages_dir = Path(pages_dir)
+        self.dpi = int(dpi)
+        self.image_format = image_format
+        self.quality = int(quality)
+
+        self.rendered = 0  # 이번 프로세스에서 새로 렌더한 페이지 수
+        self.hits = 0      # 디스크에 이미 있던 페이지 수
+
+        self._lock = threading.Lock()
+        self._doc: Optional["fitz.Document"] = None
+        self._page_count: Optional[int] = None
+
+    @classmethod
+    def for_out_dir(cls, out_dir: Path) -> Optional["PageRenderer"]:
+        """
+        prepare_status.json 의 pdf_path / dpi / image_format 으로 renderer 생성.
+        원본 PDF 위치를 모르면(이전 버전 prepare) None.
+        """
+        out_dir = Path(out_dir)
+        status_path = out_dir / "prepare_status.json"
+        if not status_path.exists():
+            return None
+        try:
+            status = json.loads(status_path.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, OSError):
+            return None
+        pdf_path = status.get("pdf_path")
+        if not pdf_path or not Path(pdf_path).exists():
+            return None
+        return cls(
+            pdf_path=Path(pdf_path),
+            pages_dir=out_dir / status.get("pages_png_dir", "pages_png"),
+            dpi=int(status.get("dpi", 150)),
+            image_format=status.get("image_format", "png"),
+            quality=int(status.get("image_quality") or DEFAULT_IMAGE_QUALITY),
+        )
+
+    @property
+    def page_count(self) -> int:
+        if self._page_count is None:
+            with self._lock:
+                self._page_count = self._open().page_count
+        return self._page_count
+
+    def path(self, page_index: int, dpi: Optional[int] = None) -> Path:
+        """렌더 여부와 상관없이 page_index 이미지가 놓일 경로"""
+        dpi = self.dpi if dpi is None else int(dpi)
+        base = self.pages_dir if dpi == self.dpi else self.pages_dir / f"dpi_{dpi}"
+        return base / f"page_{page_index:03d}.{IMAGE_FORMATS[self.image_format]}"
+
+    def get(self, page_index: int, dpi: Optional[int] = None) -> Path:
+        """page_index 이미지 경로 (없으면 지금 렌더)"""
+        p = self.path(page_index, dpi)
+        if p.exists():
+            self.hits += 1
+            return p
+        with self._lock:
+            if p.exists():  # 기다리는 동안 다른 스레드가 렌더함
+                self.hits += 1
+                return p
+            doc = self._open()
+            if not 0 <= page_index < doc.page_count:
+                raise IndexError(f"page_index out of range: {page_index}")
+            zoom = (self.dpi if dpi is None else int(dpi)) / 72.0
+            pix = doc.load_page(page_index).get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            data = encode_pixmap(pix, self.image_format, self.quality)
+
+            p.parent.mkdir(parents=True, exist_ok=True)
+            tmp = p.with_name(f"{p.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            tmp.replace(p)
+            self.rendered += 1
+        return p
+
+    def close(self) -> None:
+        with self._lock:
+            if self._doc is not None:
+                self._doc.close()
+                self._doc = None
+
+    def _open(self) -> "fitz.Document":
+        if self._doc is None:
+            self._doc = fitz.open(str(self.pdf_path))
+        return self._doc
+
+
+def pdf_page_count(pdf_path: Path) -> int:
+    doc = fitz.open(str(pdf_path))
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def _render_page(
+    page: "fitz.Page",
+    page_index: int,
+    out_dir: Path,
+    dpi: int,
+    image_format: str,
+    quality: int,
+) -> Path:
     zoom = dpi / 72.0
-    mat = fitz.Matrix(zoom, zoom)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    p = out_dir / f"page_{page_index:03d}.{IMAGE_FORMATS[image_format]}"
+    # 제자리에 쓰면 prepare_cache 가 hardlink 로 연결해 둔 캐시 원본(같은 inode)까지 바뀐다 → tmp → replace
+    tmp = p.with_name(f"{p.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(encode_pixmap(pix, image_format, quality))
+    tmp.replace(p)
+    return p
+
+
+def _render_page_range(args: Tuple[str, str, int, int, int, str, int]) -> List[str]:
+    """ProcessPool 워커: [start, end) 구간 페이지를 렌더 (top-level 이어야 pickle 가능)"""
+    pdf_path, out_dir, start, end, dpi, image_format, quality = args
+    doc = fitz.open(pdf_path)
+    try:
+        return [
+            str(_render_page(doc.load_page(i), i, Path(out_dir), dpi, image_format, quality))
+            for i in range(start, end)
+        ]
+    finally:
+        doc.close()
 
-    png_paths: list[Path] = []
-    for page_index in range(doc.page_count):
-        page = doc.load_page(page_index)
-        pix = page.get_pixmap(matrix=mat, alpha=False)
-        p = out_dir / f"page_{page_index:03d}.png"
-        pix.save(str(p))
-        png_paths.append(p)
 
-    return png_paths
+def _shard_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """페이지를 연속 구간으로 나눈다 (워커당 2개 정도)."""
+    if page_count <= 0:
+        return []
+    n_shards = min(max(1, workers) * 2, max(1, page_count // MIN_PAGES_PER_SHARD))
+    size, rem = divmod(page_count, n_shards)
+    ranges: List[Tuple[int, int]] = []
+    start = 0
+    for i in range(n_shards):
+        end = start + size + (1 if i < rem else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
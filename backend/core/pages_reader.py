@@ -0,0 +1,167 @@
+# core/pages_reader.py
+"""
+페이지 단위 pages_text 저장/로드 (pages_text.jsonl + offset index)
+
+pages_text.json 은 한 덩어리라서, 섹션 하나의 페이지만 필요해도 전체를 json.load 해야 한다.
+pages_format="jsonl" 로 prepare 하면:
+
+  pages_text.jsonl        한 줄 = 한 페이지 (extract_pdf_text 의 page dict 와 같은 스키마)
+  pages_text.index.json   {"pdf_id", "page_count", "format": "jsonl",
+                           "offsets": [byte offset...], "lengths": [byte length...]}
+
+PagesReader 는 index 로 해당 줄만 seek 해서 읽으므로 1000+ 페이지 교재도 메모리가 거의 일정하다.
+"""
+from __future__ import annotations
+
+import json
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+PAGES_JSONL_FILENAME = "pages_text.jsonl"
+PAGES_INDEX_FILENAME = "pages_text.index.json"
+
+
+class PagesJsonlWriter:
+    """
+    페이지를 하나씩 pages_text.jsonl 에 흘려 쓰고, close() 에서 offset index 를 기록.
+    두 파일 모두 tmp 에 먼저 쓰고 replace 한다 (원자적 저장).
+    """
+
+    def __init__(self, out_dir: Path, pdf_id: str):
+        self.out_dir = Path(out_dir)
+        self.pdf_id = pdf_id
+        self.path = self.out_dir / PAGES_JSONL_FILENAME
+        self.index_path = self.out_dir / PAGES_INDEX_FILENAME
+        self._tmp_path = self.out_dir / (PAGES_JSONL_FILENAME + ".tmp")
+        self._f = open(self._tmp_path, "wb")
+        self._offsets: List[int] = []
+        self._lengths: List[int] = []
+
+    def write(self, page: Dict[str, Any]) -> None:
+        line = json.dumps(page, ensure_ascii=False).encode("utf-8") + b"\n"
+        self._offsets.append(self._f.tell())
+        self._lengths.append(len(line))
+        self._f.write(line)
+
+    def close(self) -> Path:
+        self._f.flush()
+        self._f.close()
+        self._tmp_path.replace(self.path)
+
+        index = {
+            "pdf_id": self.pdf_id,
+            "page_count": len(self._offsets),
+            "format": "jsonl",
+            "pages_file": self.path.name,
+            "offsets": self._offsets,
+            "lengths": self._lengths,
+        }
+        tmp_index = self.index_path.with_suffix(self.index_path.suffix + ".tmp")
+        tmp_index.write_text(json.dumps(index, ensure_ascii=False), encoding="utf-8")
+        tmp_index.replace(self.index_path)
+        return self.path
+
+    def __enter__(self) -> "PagesJsonlWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+            self._tmp_path.unlink(missing_ok=True)
+
+
+class PagesReader:
+    """
+    pages_text.jsonl 을 page 단위로 lazy 로드하는 read-only 시퀀스.
+
+    - reader[i] / reader.get(i): 해당 페이지 한 줄만 seek 해서 읽음
+    - len(reader), iter(reader): 순차 스트리밍 (전체를 메모리에 올리지 않음)
+    - 최근 cache_size 페이지는 LRU 로 들고 있음 (job_builder 처럼 같은 페이지를 여러 번 읽는 경우)
+    """
+
+    def __init__(self, index_path: Path, cache_size: int = 64):
+        self.index_path = Path(index_path)
+        index = json.loads(self.index_path.read_text(encoding="utf-8"))
+        self.pdf_id: Optional[str] = index.get("pdf_id")
+        self.offsets: List[int] = index["offsets"]
+        self.lengths: List[int] = index["lengths"]
+        self.page_count: int = int(index.get("page_count", len(self.offsets)))
+        self.path = self.index_path.parent / index.get("pages_file", PAGES_JSONL_FILENAME)
+
+        self._f = open(self.path, "rb")
+        self._cache: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._cache_size = cache_size
+
+    def get(self, page_index: int) -> Dict[str, Any]:
+        if page_index < 0:
+            page_index += self.page_count
+        if not 0 <= page_index < self.page_count:
+            raise IndexError(f"page_index out of range: {page_index}")
+
+        cached = self._cache.get(page_index)
+        if cached is not None:
+            self._cache.move_to_end(page_index)
+            return cached
+
+        self._f.seek(self.offsets[page_index])
+        page = json.loads(self._f.read(self.lengths[page_index]).decode("utf-8"))
+
+        if self._cache_size > 0:
+            self._cache[page_index] = page
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return page
+
+    def __getitem__(self, page_index: int) -> Dict[str, Any]:
+        return self.get(page_index)
+
+    def __len__(self) -> int:
+        return self.page_count
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        # 순차 스캔은 캐시를 오염시키지 않도록 별도 핸들로 읽는다
+        with open(self.path, "rb") as f:
+            for ln in f:
+                if ln.strip():
+                    yield json.loads(ln.decode("utf-8"))
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "PagesReader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def open_pages(pages_text_path: Path) -> Union[PagesReader, List[Dict[str, Any]]]:
+    """
+    pages_text 를 여는 공통 진입점.
+    - 같은 폴더에 pages_text.index.json 이 있으면 PagesReader (lazy)
+    - 없으면 pages_text.json 을 통째로 로드한 pages 리스트 (기존 동작)
+
+    둘 다 len() / [i] / iter 를 지원하므로 호출부는 구분 없이 쓰면 된다.
+    """
+    pages_text_path = Path(pages_text_path)
+    index_path = pages_text_path.parent / PAGES_INDEX_FILENAME
+    if index_path.exists():
+        return PagesReader(index_path)
+
+    if not pages_text_path.exists():
+        raise FileNotFoundError(f"Missing: {pages_text_path}")
+    with open(pages_text_path, "r", encoding="utf-8") as f:
+        obj = json.load(f)
+    if isinstance(obj, dict) and isinstance(obj.get("pages"), list):
+        return obj["pages"]
+    if isinstance(obj, list):
+        return obj
+    raise ValueError("pages_text.json must be a list or an object with a 'pages' list")
+
+
+def pages_text_exists(pages_text_path: Path) -> bool:
+    pages_text_path = Path(pages_text_path)
+    return pages_text_path.exists() or (pages_text_path.parent / PAGES_INDEX_FILENAME).exists()
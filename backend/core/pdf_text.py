@@ -3,15 +3,29 @@
 from __future__ import annotations
 
 import fitz  # PyMuPDF
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
 import json
 import re
 
+from core.pages_reader import PAGES_INDEX_FILENAME, PAGES_JSONL_FILENAME, PagesJsonlWriter
+from core.span_store import SPAN_STORE_DIRNAME, SpanStoreWriter
+
+# 샤드 하나가 최소 이 정도 페이지는 맡아야 프로세스 기동 비용이 상쇄된다
+MIN_PAGES_PER_SHARD = 8
+
+# 추출 결과(스키마/규칙)가 바뀌면 올린다 → prepare 캐시(core.prepare_cache) 무효화 키
+EXTRACTOR_VERSION = "pdf_text/2"
+
 
 def extract_pdf_text(
     pdf_path: Path,
     pdf_id: str,
-    out_dir: Path
+    out_dir: Path,
+    workers: int = 1,
+    layout_format: str = "json",
+    pages_format: str = "json",
 ) -> Path:
     """
     Extract page-wise text from PDF using PyMuPDF.
@@ -49,80 +63,186 @@ def extract_pdf_text(
         ]
       }
 
+    workers > 1 이면 페이지 구간을 프로세스 풀에 나눠서 추출한 뒤 페이지 순서대로
+    병합한다. 출력은 serial 경로(workers=1)와 byte 단위로 동일하다.
+
+    layout_format="npy" 이면 spans 는 {out_dir}/pages_layout/ 컬럼 저장소
+    (core.span_store)에 쓰고, pages_text.json 의 layout 에는 spans 대신
+    "spans_store": "pages_layout" 만 남긴다.
+
+    pages_format="jsonl" 이면 pages_text.json 대신 페이지 한 줄씩
+    pages_text.jsonl + pages_text.index.json(byte offset index)을 쓴다.
+    하류 단계는 core.pages_reader.open_pages 로 두 형식을 구분 없이 읽는다.
+
     Returns:
-        Path to pages_text.json
+        Path to pages_text.json (pages_format="jsonl" 이면 pages_text.jsonl)
     """
+    if layout_format not in ("json", "npy"):
+        raise ValueError(f"Unsupported layout_format: {layout_format}")
+    if pages_format not in ("json", "jsonl"):
+        raise ValueError(f"Unsupported pages_format: {pages_format}")
+
     pdf_path = Path(pdf_path)
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
+    span_writer = SpanStoreWriter(out_dir) if layout_format == "npy" else None
+
+    def _finish(page: Dict[str, Any]) -> Dict[str, Any]:
+        if span_writer is not None:
+            span_writer.add_page(page)
+            layout = page["layout"]
+            page["layout"] = {
+                "page_w": layout["page_w"],
+                "page_h": layout["page_h"],
+                "spans_store": SPAN_STORE_DIRNAME,
+            }
+        return page
+
+    if pages_format == "jsonl":
+        # 페이지가 나오는 대로 흘려 쓴다 (pages 전체를 메모리에 모으지 않음)
+        with PagesJsonlWriter(out_dir, pdf_id) as writer:
+            for page in _iter_pages(pdf_path, workers):
+                writer.write(_finish(page))
+        out_path = writer.path
+        # 이전 형식 산출물이 남아있으면 하류 단계가 오래된 파일을 읽을 수 있으므로 제거
+        (out_dir / "pages_text.json").unlink(missing_ok=True)
+    else:
+        pages = [_finish(page) for page in _iter_pages(pdf_path, workers)]
+
+        result = {
+            "pdf_id": pdf_id,
+            "page_count": len(pages),
+            "pages": pages,
+        }
+
+        # ✅ 0 bytes 방지: tmp에 먼저 쓰고 replace (원자적 저장)
+        out_path = out_dir / "pages_text.json"
+        tmp_path = out_dir / "pages_text.json.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+            f.flush()
+
+        tmp_path.replace(out_path)
+        (out_dir / PAGES_INDEX_FILENAME).unlink(missing_ok=True)
+        (out_dir / PAGES_JSONL_FILENAME).unlink(missing_ok=True)
+
+    if span_writer is not None:
+        span_writer.close()
+    return out_path
+
+
+def _iter_pages(pdf_path: Path, workers: int) -> Iterator[Dict[str, Any]]:
+    """
+    page dict 를 페이지 순서대로 yield.
+    workers > 1 이면 샤드 단위로 프로세스 풀에서 추출하고, 샤드 순서대로 흘려보낸다.
+    """
     doc = fitz.open(str(pdf_path))
+    page_count = len(doc)
 
-    pages = []
-    for page_index, page in enumerate(doc):
-        raw_text = page.get_text("text") or ""
-        lines = [l.strip() for l in raw_text.splitlines() if l.strip()]
-        maybe_title = _guess_section_title(lines)
-
-        # --- NEW: layout spans (폰트 크기/좌표) ---
-        page_w = float(page.rect.width)
-        page_h = float(page.rect.height)
-
-        spans = []
-        d = page.get_text("dict")
-        for b_i, block in enumerate(d.get("blocks", [])):
-            if "lines" not in block:
-                continue
-            for l_i, line in enumerate(block.get("lines", [])):
-                for s_i, sp in enumerate(line.get("spans", [])):
-                    txt = _clean_text(sp.get("text", ""))
-                    if not txt:
-                        continue
-                    bbox = sp.get("bbox")
-                    if not bbox or len(bbox) != 4:
-                        continue
-                    spans.append({
-                        "text": txt,
-                        "size": float(sp.get("size", 0.0)),
-                        "flags": int(sp.get("flags", 0)),
-                        "bbox": [float(bbox[0]), float(bbox[1]), float(bbox[2]), float(bbox[3])],
-                        "block_no": int(b_i),
-                        "line_no": int(l_i),
-                        "span_no": int(s_i),
-                    })
-
-        pages.append({
-            "page_index": page_index,
-            "page_number": page_index + 1,
-            "raw_text": raw_text,
-            "raw_len": len(raw_text),
-            "lines": lines,
-            "maybe_section_title": maybe_title,
+    shards = _shard_ranges(page_count, workers) if workers > 1 else []
+    if len(shards) > 1:
+        # 워커마다 자기 fitz 문서를 연다 (fitz.Document는 프로세스 간 공유 불가)
+        doc.close()
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as ex:
+            # map()은 제출 순서대로 결과를 돌려주므로 병합 결과는 serial 경로와 동일
+            for shard_pages in ex.map(_extract_page_range, [(str(pdf_path), a, b) for a, b in shards]):
+                yield from shard_pages
+    else:
+        try:
+            for page_index, page in enumerate(doc):
+                yield _extract_page(page, page_index)
+        finally:
+            doc.close()
 
-            # NEW (additive)
-            "layout": {
-                "page_w": page_w,
-                "page_h": page_h,
-                "spans": spans,
-            },
-        })
-
-    result = {
-        "pdf_id": pdf_id,
-        "page_count": len(doc),
-        "pages": pages,
+
+def _extract_page(page: "fitz.Page", page_index: int) -> Dict[str, Any]:
+    """
+    한 페이지를 get_text("dict") 한 번으로 파싱한다.
+    raw_text 는 get_text("text") 와 같은 규칙으로 dict 에서 재구성한다:
+    라인마다 span 텍스트를 이어 붙이고, 비어있지 않고 '\n' 으로 끝나지 않으면 '\n' 추가.
+    """
+    # --- NEW: layout spans (폰트 크기/좌표) ---
+    page_w = float(page.rect.width)
+    page_h = float(page.rect.height)
+
+    text_parts: List[str] = []
+    spans = []
+    d = page.get_text("dict")
+    for b_i, block in enumerate(d.get("blocks", [])):
+        if "lines" not in block:
+            continue
+        for l_i, line in enumerate(block.get("lines", [])):
+            line_text = "".join(sp.get("text", "") for sp in line.get("spans", []))
+            if line_text and not line_text.endswith("\n"):
+                line_text += "\n"
+            text_parts.append(line_text)
+
+            for s_i, sp in enumerate(line.get("spans", [])):
+                txt = _clean_text(sp.get("text", ""))
+                if not txt:
+                    continue
+                bbox = sp.get("bbox")
+                if not bbox or len(bbox) != 4:
+                    continue
+                spans.append({
+                    "text": txt,
+                    "size": float(sp.get("size", 0.0)),
+                    "flags": int(sp.get("flags", 0)),
+                    "bbox": [float(bbox[0]), float(bbox[1]), float(bbox[2]), float(bbox[3])],
+                    "block_no": int(b_i),
+                    "line_no": int(l_i),
+                    "span_no": int(s_i),
+                })
+
+    raw_text = "".join(text_parts)
+    lines = [l.strip() for l in raw_text.splitlines() if l.strip()]
+    maybe_title = _guess_section_title(lines)
+
+    return {
+        "page_index": page_index,
+        "page_number": page_index + 1,
+        "raw_text": raw_text,
+        "raw_len": len(raw_text),
+        "lines": lines,
+        "maybe_section_title": maybe_title,
+
+        # NEW (additive)
+        "layout": {
+            "page_w": page_w,
+            "page_h": page_h,
+            "spans": spans,
+        },
     }
 
-    # ✅ 0 bytes 방지: tmp에 먼저 쓰고 replace (원자적 저장)
-    out_path = out_dir / "pages_text.json"
-    tmp_path = out_dir / "pages_text.json.tmp"
 
-    with open(tmp_path, "w", encoding="utf-8") as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
-        f.flush()
+def _extract_page_range(args: Tuple[str, int, int]) -> List[Dict[str, Any]]:
+    """ProcessPool 워커: [start, end) 구간 페이지를 추출 (top-level 이어야 pickle 가능)"""
+    pdf_path, start, end = args
+    doc = fitz.open(pdf_path)
+    try:
+        return [_extract_page(doc.load_page(i), i) for i in range(start, end)]
+    finally:
+        doc.close()
 
-    tmp_path.replace(out_path)
-    return out_path
+
+def _shard_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """
+    페이지를 연속 구간으로 나눈다.
+    워커당 2개 정도로 쪼개서 무거운 페이지가 한쪽에 몰려도 덜 기다리게 한다.
+    """
+    if page_count <= 0:
+        return []
+    n_shards = min(max(1, workers) * 2, max(1, page_count // MIN_PAGES_PER_SHARD))
+    size, rem = divmod(page_count, n_shards)
+    ranges: List[Tuple[int, int]] = []
+    start = 0
+    for i in range(n_shards):
+        end = start + size + (1 if i < rem else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
 
 
 def _clean_text(s: str) -> str:
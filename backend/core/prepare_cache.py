@@ -0,0 +1,194 @@
+# core/prepare_cache.py
+"""
+Prepare 산출물 content-addressed 캐시 (PDF SHA-256 기준)
+
+같은 강의안이 다른 pdf_id 로 여러 번 업로드되는 경우가 많아서,
+pages_text / pages_layout / pages_png 를 PDF 내용 해시로 한 번만 만들고 재사용한다.
+
+Layout ({cache_root}/):
+  {sha[:2]}/{sha}/{params_key}/manifest.json   {"sha256", "params", "artifacts", "files", "page_count", "created_at"}
+  {sha[:2]}/{sha}/{params_key}/...             artifacts (out_dir 기준 상대경로 그대로)
+  stats.json                                   {"hits", "misses", "updated_at"} (best-effort 카운터)
+
+params_key 는 params(extractor version / dpi / format) 의 해시라서,
+같은 PDF 를 다른 옵션으로 prepare 해도 서로의 엔트리를 덮어쓰지 않는다.
+
+cache hit 이면 파일은 hardlink(안 되면 copy)로 out_dir 에 연결하고,
+pdf_id 가 박혀있는 JSON(pages_text.json / pages_text.index.json)만 새 pdf_id 로 다시 쓴다.
+
+hardlink 는 캐시 원본과 inode 를 공유하므로, out_dir 의 산출물을 제자리에서 고쳐 쓰면 캐시 엔트리가 같이 바뀐다.
+prepare 산출물을 쓰는 곳은 모두 새 파일에 쓴 뒤 교체해서 링크를 끊는다:
+  pages_png/*            core.page_render (_render_page / PageRenderer.get) tmp → replace
+  pages_text*.json(l)    core.pdf_text tmp → replace
+  pages_layout spans     core.span_store tmp 디렉토리 → replace
+새 산출물을 추가할 때도 같은 규칙을 지켜야 한다 (core/test_prepare_cache.py 가 pages_png 재-prepare 를 확인).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+PREPARE_CACHE_DIRNAME = "_prepare_cache"
+
+# pdf_id 필드를 가진 top-level JSON 산출물 (restore 시 pdf_id 재작성 대상)
+_PDF_ID_FILES = ("pages_text.json", "pages_text.index.json")
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).astimezone().isoformat()
+
+
+def _atomic_write_json(path: Path, obj: Any, indent: Optional[int] = 2) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(obj, ensure_ascii=False, indent=indent), encoding="utf-8")
+    tmp.replace(path)
+
+
+def sha256_file(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def default_cache_root(out_dir: Path) -> Path:
+    """artifacts/{pdf_id} 옆의 artifacts/_prepare_cache"""
+    return Path(out_dir).parent / PREPARE_CACHE_DIRNAME
+
+
+def params_key(params: Dict[str, Any]) -> str:
+    blob = json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+def entry_dir(cache_root: Path, sha256: str, params: Dict[str, Any]) -> Path:
+    return Path(cache_root) / sha256[:2] / sha256 / params_key(params)
+
+
+def _iter_files(root: Path, rel: str) -> List[str]:
+    p = root / rel
+    if p.is_dir():
+        return sorted(str(f.relative_to(root)) for f in p.rglob("*") if f.is_file())
+    return [rel] if p.is_file() else []
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists() or dst.is_symlink():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        # 다른 파일시스템 / hardlink 미지원(일부 Windows 볼륨) → copy
+        shutil.copy2(src, dst)
+
+
+def lookup(cache_root: Path, sha256: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """manifest 가 있고 params 가 같고 파일이 다 남아있으면 manifest, 아니면 None"""
+    edir = entry_dir(cache_root, sha256, params)
+    manifest_path = edir / "manifest.json"
+    if not manifest_path.exists():
+        return None
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (json.JSONDecodeError, OSError):
+        return None
+    if manifest.get("sha256") != sha256 or manifest.get("params") != params:
+        return None
+    files = manifest.get("files") or []
+    if not files or not all((edir / f).is_file() for f in files):
+        return None
+    return manifest
+
+
+def store(
+    cache_root: Path,
+    sha256: str,
+    params: Dict[str, Any],
+    out_dir: Path,
+    artifacts: List[str],
+    page_count: int,
+) -> Path:
+    """
+    out_dir 의 artifacts(상대경로: 파일 또는 디렉토리)를 캐시 엔트리로 등록.
+    tmp 엔트리에 다 연결한 뒤 rename — 동시에 다른 프로세스가 먼저 등록했으면 그쪽을 쓴다.
+    """
+    out_dir = Path(out_dir)
+    edir = entry_dir(cache_root, sha256, params)
+    tmp_dir = edir.with_name(f"{edir.name}.tmp-{os.getpid()}")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+
+    files: List[str] = []
+    for rel in artifacts:
+        files.extend(_iter_files(out_dir, rel))
+    for f in files:
+        _link_or_copy(out_dir / f, tmp_dir / f)
+
+    manifest = {
+        "sha256": sha256,
+        "params": params,
+        "artifacts": artifacts,
+        "files": files,
+        "page_count": page_count,
+        "created_at": _now_iso(),
+    }
+    _atomic_write_json(tmp_dir / "manifest.json", manifest)
+
+    if edir.exists():
+        # 파일이 빠진(깨진) 엔트리 교체
+        shutil.rmtree(edir, ignore_errors=True)
+    try:
+        tmp_dir.replace(edir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return edir
+
+
+def restore(cache_root: Path, manifest: Dict[str, Any], out_dir: Path, pdf_id: str) -> None:
+    """캐시 엔트리를 out_dir 로 연결 (pdf_id 가 박힌 JSON 은 새 pdf_id 로 재작성)"""
+    out_dir = Path(out_dir)
+    edir = entry_dir(cache_root, manifest["sha256"], manifest["params"])
+    for f in manifest["files"]:
+        src = edir / f
+        dst = out_dir / f
+        if f in _PDF_ID_FILES:
+            obj = json.loads(src.read_text(encoding="utf-8"))
+            obj["pdf_id"] = pdf_id
+            # pages_text.json 은 pretty-print, index 는 compact (pdf_text 와 같은 형식 유지)
+            _atomic_write_json(dst, obj, indent=2 if f == "pages_text.json" else None)
+        else:
+            _link_or_copy(src, dst)
+
+
+def record(cache_root: Path, hit: bool) -> Dict[str, Any]:
+    """
+    hit/miss 카운터 갱신. 잠금 없이 read-modify-write 라서 동시 실행 시 약간 빠질 수 있다
+    (통계 용도라 허용).
+    """
+    stats = cache_stats(cache_root)
+    stats.pop("hit_rate", None)
+    stats["hits" if hit else "misses"] += 1
+    stats["updated_at"] = _now_iso()
+    _atomic_write_json(Path(cache_root) / "stats.json", stats)
+    return cache_stats(cache_root)
+
+
+def cache_stats(cache_root: Path) -> Dict[str, Any]:
+    path = Path(cache_root) / "stats.json"
+    stats: Dict[str, Any] = {"hits": 0, "misses": 0, "updated_at": None}
+    if path.exists():
+        try:
+            stats.update(json.loads(path.read_text(encoding="utf-8")))
+        except (json.JSONDecodeError, OSError):
+            pass
+    total = int(stats["hits"]) + int(stats["misses"])
+    stats["hit_rate"] = round(int(stats["hits"]) / total, 4) if total else 0.0
+    return stats
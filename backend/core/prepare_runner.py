@@ -7,8 +7,11 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, Any, Optional
 
-from core.pdf_text import extract_pdf_text
-from core.page_render import render_page_pngs
+from core import prepare_cache
+from core.pages_reader import PAGES_INDEX_FILENAME, PAGES_JSONL_FILENAME
+from core.pdf_text import EXTRACTOR_VERSION, extract_pdf_text
+from core.page_render import DEFAULT_IMAGE_QUALITY, IMAGE_FORMATS, pdf_page_count, render_page_images
+from core.span_store import SPAN_STORE_DIRNAME
 
 
 def run_prepare(
@@ -16,43 +19,126 @@ def run_prepare(
     pdf_id: str,
     out_dir: Path,
     dpi: int = 150,
+    workers: int = 1,
+    layout_format: str = "json",
+    pages_format: str = "json",
+    image_format: str = "png",
+    image_quality: int = DEFAULT_IMAGE_QUALITY,
+    render: str = "eager",
+    cache_dir: Optional[Path] = None,
+    use_cache: bool = True,
 ) -> Dict[str, Any]:
     """
     Prepare pipeline (local-only, stable):
-    1) pages_text.json 생성 (PyMuPDF 텍스트)
+    1) pages_text.json 생성 (PyMuPDF 텍스트, workers > 1 이면 페이지 샤딩 병렬 추출)
     2) pages PNG 렌더링 (MM 입력용 / 디버깅용)
+       image_format="jpeg"/"webp" 로 주면 그 포맷으로 렌더 (base64 payload 가 훨씬 작다).
+       workers 는 렌더에도 같이 쓴다.
+       render="lazy" 이면 여기서는 렌더하지 않고 바로 반환한다.
+       MM 단계가 core.page_render.PageRenderer 로 필요한 페이지만 그때 렌더한다
+       (prepare_status.json 에 pdf_path / dpi / image_format 을 남긴다).
+
+    use_cache=True 이면 PDF SHA-256 으로 core.prepare_cache 를 먼저 조회한다.
+    같은 내용 + 같은 옵션(extractor version/dpi/format)으로 만든 산출물이 있으면
+    1), 2)를 건너뛰고 hardlink 로 가져온다. (cache_dir 기본값: {out_dir}/../_prepare_cache)
 
     NOTE:
     - 멀티모달 호출(표 탐지/표 추출)은 여기서 절대 하지 않는다.
     - MM 단계는 run_table_presence.py / run_table_extract_mm.py 같은 별도 runner에서 수행한다.
     """
+    if render not in ("eager", "lazy"):
+        raise ValueError(f"Unsupported render: {render}")
+
     pdf_path = Path(pdf_path)
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
-
-    # 1) text extract
-    pages_text_path = extract_pdf_text(
-        pdf_path=pdf_path,
-        pdf_id=pdf_id,
-        out_dir=out_dir,
-    )
-
-    # 2) render images
     img_dir = out_dir / "pages_png"
-    png_paths = render_page_pngs(
-        pdf_path=pdf_path,
-        out_dir=img_dir,
-        dpi=dpi,
-    )
+
+    pages_text_name = PAGES_JSONL_FILENAME if pages_format == "jsonl" else "pages_text.json"
+    artifacts = [pages_text_name]
+    if render == "eager":
+        artifacts.append(img_dir.name)
+    if pages_format == "jsonl":
+        artifacts.append(PAGES_INDEX_FILENAME)
+    if layout_format == "npy":
+        artifacts.append(SPAN_STORE_DIRNAME)
+
+    cache_root = Path(cache_dir) if cache_dir else prepare_cache.default_cache_root(out_dir)
+    cache_info: Dict[str, Any] = {"enabled": use_cache, "hit": False}
+    manifest = None
+    if use_cache:
+        sha256 = prepare_cache.sha256_file(pdf_path)
+        params = {
+            "extractor_version": EXTRACTOR_VERSION,
+            "dpi": dpi,
+            "layout_format": layout_format,
+            "pages_format": pages_format,
+            "image_format": image_format,
+            "image_quality": image_quality if image_format != "png" else None,
+            "render": render,
+        }
+        cache_info["sha256"] = sha256
+        manifest = prepare_cache.lookup(cache_root, sha256, params)
+
+    if manifest is not None:
+        prepare_cache.restore(cache_root, manifest, out_dir, pdf_id)
+        # extract_pdf_text 와 같이 다른 형식의 pages_text 잔재는 지운다
+        if pages_format == "jsonl":
+            (out_dir / "pages_text.json").unlink(missing_ok=True)
+        else:
+            (out_dir / PAGES_INDEX_FILENAME).unlink(missing_ok=True)
+            (out_dir / PAGES_JSONL_FILENAME).unlink(missing_ok=True)
+        # render_page_images 와 같이 다른 포맷 페이지 이미지 잔재도 지운다
+        for ext in set(IMAGE_FORMATS.values()) - {IMAGE_FORMATS[image_format]}:
+            for p in img_dir.glob(f"page_*.{ext}"):
+                p.unlink()
+        pages_text_path = out_dir / pages_text_name
+        page_count = int(manifest["page_count"])
+        cache_info["hit"] = True
+    else:
+        # 1) text extract
+        pages_text_path = extract_pdf_text(
+            pdf_path=pdf_path,
+            pdf_id=pdf_id,
+            out_dir=out_dir,
+            workers=workers,
+            layout_format=layout_format,
+            pages_format=pages_format,
+        )
+
+        # 2) render images (lazy 면 MM 단계에서 필요한 페이지만)
+        if render == "eager":
+            png_paths = render_page_images(
+                pdf_path=pdf_path,
+                out_dir=img_dir,
+                dpi=dpi,
+                image_format=image_format,
+                quality=image_quality,
+                workers=workers,
+            )
+            page_count = len(png_paths)
+        else:
+            page_count = pdf_page_count(pdf_path)
+
+        if use_cache:
+            prepare_cache.store(cache_root, cache_info["sha256"], params, out_dir, artifacts, page_count)
+
+    if use_cache:
+        cache_info["stats"] = prepare_cache.record(cache_root, hit=cache_info["hit"])
 
     # Optional: local-only status file (NOT MM result)
     local_status = {
         "pdf_id": pdf_id,
-        "page_count": len(png_paths),
+        "page_count": page_count,
         "dpi": dpi,
+        "image_format": image_format,
+        "image_quality": image_quality,
+        "render": render,
+        "pdf_path": str(pdf_path.resolve()),
         "updated_at": datetime.now(timezone.utc).astimezone().isoformat(),
         "pages_png_dir": str(img_dir.relative_to(out_dir)),
         "pages_text": str(Path(pages_text_path).relative_to(out_dir)),
+        "cache": {k: v for k, v in cache_info.items() if k != "stats"},
     }
     local_status_path = out_dir / "prepare_status.json"
     tmp_path = out_dir / "prepare_status.json.tmp"
@@ -65,8 +151,10 @@ def run_prepare(
         "pages_text": str(Path(pages_text_path).resolve()),
         "pages_png_dir": str(img_dir.resolve()),
         "prepare_status": str(local_status_path.resolve()),
-        "page_count": len(png_paths),
+        "page_count": page_count,
         "dpi": dpi,
+        "render": render,
+        "cache": cache_info,
     }
 
 
@@ -78,6 +166,19 @@ def main(argv: Optional[list[str]] = None) -> None:
     ap.add_argument("--pdf_id", default="lecture", help="PDF ID")
     ap.add_argument("--out_dir", default="artifacts/lecture", help="산출물 디렉토리")
     ap.add_argument("--dpi", type=int, default=150, help="렌더 DPI")
+    ap.add_argument("--workers", type=int, default=1, help="텍스트 추출/렌더 프로세스 수 (1이면 serial)")
+    ap.add_argument("--layout_format", default="json", choices=["json", "npy"],
+                    help="layout spans 저장 형식 (npy: pages_layout/ 컬럼 저장소, mmap 로드)")
+    ap.add_argument("--pages_format", default="json", choices=["json", "jsonl"],
+                    help="pages_text 저장 형식 (jsonl: 페이지별 한 줄 + offset index, lazy 로드)")
+    ap.add_argument("--image_format", default="png", choices=["png", "jpeg", "webp"],
+                    help="페이지 이미지 포맷 (webp 는 Pillow 필요)")
+    ap.add_argument("--image_quality", type=int, default=DEFAULT_IMAGE_QUALITY, help="jpeg/webp 품질 (1~100)")
+    ap.add_argument("--render", default="eager", choices=["eager", "lazy"],
+                    help="페이지 이미지 렌더 시점 (lazy: MM 단계에서 필요한 페이지만 렌더)")
+    ap.add_argument("--cache_dir", default=None,
+                    help="prepare 캐시 루트 (기본: {out_dir}/../_prepare_cache)")
+    ap.add_argument("--no_cache", action="store_true", help="PDF 해시 기반 prepare 캐시 사용 안 함")
     ap.add_argument("--print_json", action="store_true", help="결과 dict를 JSON으로 stdout 출력")
 
     args = ap.parse_args(argv)
@@ -87,6 +188,14 @@ def main(argv: Optional[list[str]] = None) -> None:
         pdf_id=args.pdf_id,
         out_dir=Path(args.out_dir),
         dpi=args.dpi,
+        workers=args.workers,
+        layout_format=args.layout_format,
+        pages_format=args.pages_format,
+        image_format=args.image_format,
+        image_quality=args.image_quality,
+        render=args.render,
+        cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+        use_cache=not args.no_cache,
     )
 
     # n8n/app.py에서 subprocess로 실행했을 때 stdout으로 결과를 받고 싶으면 유용
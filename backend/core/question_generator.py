@@ -4,9 +4,11 @@ from __future__ import annotations
 import json
 import re
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from core.llm_text import call_llm_text
+from core.json_stream import JsonArrayItems
+from core.llm_schemas import parse_json
+from core.llm_text import call_llm_text, stream_llm_text
 
 # =========================
 # Config
@@ -202,6 +204,136 @@ def _compute_difficulty_distribution(
         return {"easy": n_easy, "medium": n_medium, "hard": n_hard}
 
 
+# 프롬프트 배치: provider 의 prompt prefix 캐시(앞부분이 바이트 단위로 같은 요청끼리 공유)를 타도록
+# job 과 무관한 긴 지시문 / 출력 스키마를 맨 앞에 상수로 두고, 섹션 / 개수 / 원문 / 청크는 맨 뒤에 붙인다.
+# 아래 상수에 job 값을 끼워 넣지 말 것 (한 글자라도 달라지면 그 뒤는 캐시가 안 된다).
+_RULE = "=" * 70
+
+_GEN_INSTRUCTIONS = f"""
+당신은 소프트웨어학부 대학 교수로서, 맨 아래 "출제 대상"에 주어진 섹션에 대한 **고품질 시험 문제**를 출제합니다.
+
+{_RULE}
+🎯 출제 구성(필수)
+{_RULE}
+- 문제 수 / 문제 유형 / 난이도 분포는 "출제 대상"에 적힌 대로 정확히 맞출 것
+- 모든 문제는 "근거 청크 목록"에 기반해야 함
+- evidence는 각 문항당 1~2개만 사용
+- chunk_id는 제공된 목록에 있는 것만 사용
+- 모든 텍스트는 한국어
+- JSON 형식 출력 (마크다운 블록 금지, 설명 문장 금지)
+
+{_RULE}
+🚫 형식/품질 위반 시 처리
+{_RULE}
+- JSON이 아니면 실패
+- 정답이 애매하거나 복수정답 가능성이 있으면 실패
+- evidence와 무관한 문제면 실패
+- SAQ는 1~5단어 "용어/구"로만 답 (괄호로 장황한 설명 금지)
+
+{_RULE}
+🧑‍🏫 교수 출제 원칙 (타당도/변별도/채점가능성)
+{_RULE}
+
+[1] 근거 정합성 (최우선)
+- 각 문항은 evidence를 **1~2개만** 사용.
+- 정답/해설은 evidence 청크의 내용(정의/관계/절차/결론)에서만 도출.
+- 근거 없이 외부 지식으로만 풀리는 문항 금지.
+
+[2] 단일 정답성 (MCQ)
+- 정답은 **오직 1개**여야 함. 복수 정답 가능성이 조금이라도 있으면 문항을 다시 작성.
+- 질문 문장에 조건/범위를 명확히 포함 (예: 특정 상황, 전제, 기준).
+
+[3] 오답 설계 (변별도)
+- 오답은 "흔한 오개념/유사개념 혼동/경계조건 착각/부분적으로만 맞는 진술" 기반으로 설계.
+- 정답과 오답의 길이/형태 유사하게.
+- 무관한 오답/너무 자명한 오답 금지.
+
+[4] 난이도 정의 (조작적으로 준수)
+- easy: 정의/용어/핵심 문장 확인 (추론 0~1 step)
+- medium: 작은 상황 적용/비교/간단 계산 (추론 1~2 step)
+- hard: 경계조건/반례/복합 추론/트레이드오프/다단계 계산 (추론 3 step 이상)
+
+[5] 해설 규칙
+- explanation은 **2~4문장**.
+- 반드시 "왜 정답인지" + "대표 오답 1개가 왜 틀렸는지" 포함.
+- 계산형은 중간 계산 1줄 포함.
+
+[6] 문항 다양성
+- 동일한 질문 패턴 2회 이상 반복 금지.
+- 가능하면 비교/분석형 ≥1, 적용형 ≥1 포함.
+
+{_RULE}
+출력 형식(JSON ONLY, API 명세 필드명)
+{_RULE}
+{{
+  "questions": [
+    {{
+      "question_id": "Q001",
+      "type": "MCQ",
+      "difficulty": "easy",
+      "question_text": "문제 내용",
+      "options": ["A) ...", "B) ...", "C) ...", "D) ..."],
+      "correct_answer": "B",
+      "explanation": "2~4문장 해설(정답 근거 + 대표 오답 반박 포함).",
+      "source_pages": [5, 6],
+      "evidence": [{{"kind": "text", "page": 5, "chunk_id": "p5_c00"}}],
+
+      "learning_objective": "이 문항이 평가하는 학습 목표(한 줄)",
+      "common_misconception": "학생이 자주 하는 오개념(한 줄)",
+
+      "generated_table": {{
+        "headers": ["열1", "열2"],
+        "rows": [["값1","값2"], ["값3","값4"]]
+      }},
+      "table_refs": ["table_5_1"]
+    }}
+  ]
+}}
+""".strip()
+
+# 표 지시문(교수 스타일로 강화). 최소 표 기반 문항 수는 "출제 대상"에 적는다.
+_GEN_TABLE_RULES = f"""
+{_RULE}
+📊 표 기반 문항 출제 규칙 (표가 있는 섹션이면 필수)
+{_RULE}
+
+- "출제 대상"에 적힌 최소 개수만큼의 문항은 **반드시 표 기반**으로 출제.
+- 표 기반 문항은 JSON에 "generated_table" 필드를 **반드시 포함**.
+- "generated_table"은 원본 표를 그대로 복사하지 말고, **구조는 참고하되 수치/시나리오를 새로 구성**.
+- 표는 반드시 "풀이 가능"해야 하며, 외부 지식 없이 표만으로 풀려야 함.
+
+[generated_table 품질 조건]
+- headers는 의미/단위가 드러나야 함 (예: "지연(ms)", "정확도(%)", "비용(원)")
+- 행 3~8개, 열 2~5개 권장
+- 수치 열 최소 2개 포함 (비교/계산 가능하도록)
+- 계산/비율/효율 문제는 explanation에 **중간 계산 1줄** 포함
+
+[표 기반 문항 유형(다양하게 섞기)]
+1) 비교/우선순위: 최대/최소/차이/개선폭
+2) 계산/비율/증감률/효율: 평균, 비율, 증가율, 성능/시간 등
+3) 조건부 추출: 임계값, 조건 충족 행 개수, 필터링 결과
+4) 패턴/추세: 시간/버전/실험조건 변화에 따른 경향
+5) 해석/결론: 데이터로부터 타당한 결론 선택
+
+[금지]
+- 단순 값 찾기("A의 값은?") 수준의 문항
+- 표 없이도 풀 수 있는 문항
+- 원본 표 그대로 복붙
+""".strip()
+
+# 표가 있어야 하는데 없는 경우: 모델이 헛소리 표를 만들지 않도록 경고를 넣음
+_GEN_TABLES_MISSING = f"""
+{_RULE}
+⚠️ 표 사용 요구됨(중요) / 하지만 현재 입력 tables가 비어있음
+{_RULE}
+- 이 섹션은 표 기반 문항이 요구되지만, 제공된 표 데이터가 없습니다.
+- **임의로 표를 꾸며내지 마세요.**
+- 표가 없으므로 이번 출력에서는 "generated_table"을 포함하지 마세요.
+""".strip()
+
+_GEN_NO_TABLES = '**[표 없음]** 이 섹션에는 표가 없으므로 "generated_table" 필드는 포함하지 마세요.'
+
+
 def _build_prompt(
     job: Dict[str, Any],
     chunks: List[Dict[str, Any]],
@@ -244,7 +376,7 @@ def _build_prompt(
     # 표 데이터를 프롬프트에 포함
     table_section = ""
     if has_tables:
-        table_section = "\n" + "=" * 70 + "\n📊 추출된 표 데이터(원문에서 파싱됨)\n" + "=" * 70 + "\n"
+        table_section = "\n" + _RULE + "\n📊 추출된 표 데이터(원문에서 파싱됨)\n" + _RULE + "\n"
         for i, tbl in enumerate(tables, 1):
             page = tbl.get("page")
             headers = tbl.get("headers") or []
@@ -267,114 +399,13 @@ def _build_prompt(
 
             table_section += f"\n[표 {i}] (페이지 {page})\n{snippet}\n"
 
-    # 표 지시문(교수 스타일로 강화)
+    # 표 규칙도 job 마다 세 가지 중 하나인 고정 문자열 (표가 있는 job 끼리는 여기까지 prefix 공유)
     if has_tables:
-        table_instruction = f"""
-{"=" * 70}
-📊 표 기반 문항 출제 규칙 (표가 있는 섹션이면 필수)
-{"=" * 70}
-
-- 총 {qn}문항 중 **최소 {n_table_questions}문항은 반드시 표 기반**으로 출제.
-- 표 기반 문항은 JSON에 "generated_table" 필드를 **반드시 포함**.
-- "generated_table"은 원본 표를 그대로 복사하지 말고, **구조는 참고하되 수치/시나리오를 새로 구성**.
-- 표는 반드시 "풀이 가능"해야 하며, 외부 지식 없이 표만으로 풀려야 함.
-
-[generated_table 품질 조건]
-- headers는 의미/단위가 드러나야 함 (예: "지연(ms)", "정확도(%)", "비용(원)")
-- 행 3~8개, 열 2~5개 권장
-- 수치 열 최소 2개 포함 (비교/계산 가능하도록)
-- 계산/비율/효율 문제는 explanation에 **중간 계산 1줄** 포함
-
-[표 기반 문항 유형(다양하게 섞기)]
-1) 비교/우선순위: 최대/최소/차이/개선폭
-2) 계산/비율/증감률/효율: 평균, 비율, 증가율, 성능/시간 등
-3) 조건부 추출: 임계값, 조건 충족 행 개수, 필터링 결과
-4) 패턴/추세: 시간/버전/실험조건 변화에 따른 경향
-5) 해석/결론: 데이터로부터 타당한 결론 선택
-
-[금지]
-- 단순 값 찾기("A의 값은?") 수준의 문항
-- 표 없이도 풀 수 있는 문항
-- 원본 표 그대로 복붙
-"""
+        table_instruction = _GEN_TABLE_RULES
+    elif must_use_tables:
+        table_instruction = _GEN_TABLES_MISSING
     else:
-        if must_use_tables:
-            # 표가 있어야 하는데 없는 경우: 모델이 헛소리 표를 만들지 않도록 경고를 넣음
-            table_instruction = f"""
-{"=" * 70}
-⚠️ 표 사용 요구됨(중요) / 하지만 현재 입력 tables가 비어있음
-{"=" * 70}
-- 이 섹션은 표 기반 문항이 요구되지만, 제공된 표 데이터가 없습니다.
-- **임의로 표를 꾸며내지 마세요.**
-- 표가 없으므로 이번 출력에서는 "generated_table"을 포함하지 마세요.
-"""
-        else:
-            table_instruction = """
-**[표 없음]** 이 섹션에는 표가 없으므로 "generated_table" 필드는 포함하지 마세요.
-"""
-
-    # 핵심: 교수급 품질 체크리스트(LLM이 스스로 준수하도록 강제)
-    quality_block = f"""
-{"=" * 70}
-🧑‍🏫 교수 출제 원칙 (타당도/변별도/채점가능성)
-{"=" * 70}
-
-[1] 근거 정합성 (최우선)
-- 각 문항은 evidence를 **1~2개만** 사용.
-- 정답/해설은 evidence 청크의 내용(정의/관계/절차/결론)에서만 도출.
-- 근거 없이 외부 지식으로만 풀리는 문항 금지.
-
-[2] 단일 정답성 (MCQ)
-- 정답은 **오직 1개**여야 함. 복수 정답 가능성이 조금이라도 있으면 문항을 다시 작성.
-- 질문 문장에 조건/범위를 명확히 포함 (예: 특정 상황, 전제, 기준).
-
-[3] 오답 설계 (변별도)
-- 오답은 "흔한 오개념/유사개념 혼동/경계조건 착각/부분적으로만 맞는 진술" 기반으로 설계.
-- 정답과 오답의 길이/형태 유사하게.
-- 무관한 오답/너무 자명한 오답 금지.
-
-[4] 난이도 정의 (조작적으로 준수)
-- easy: 정의/용어/핵심 문장 확인 (추론 0~1 step)
-- medium: 작은 상황 적용/비교/간단 계산 (추론 1~2 step)
-- hard: 경계조건/반례/복합 추론/트레이드오프/다단계 계산 (추론 3 step 이상)
-
-[5] 해설 규칙
-- explanation은 **2~4문장**.
-- 반드시 "왜 정답인지" + "대표 오답 1개가 왜 틀렸는지" 포함.
-- 계산형은 중간 계산 1줄 포함.
-
-[6] 문항 다양성
-- 동일한 질문 패턴 2회 이상 반복 금지.
-- 가능하면 비교/분석형 ≥1, 적용형 ≥1 포함.
-"""
-
-    # 출력 스키마 강화: API 명세 필드명 사용
-    output_schema = """
-{
-  "questions": [
-    {
-      "question_id": "Q001",
-      "type": "MCQ",
-      "difficulty": "easy",
-      "question_text": "문제 내용",
-      "options": ["A) ...", "B) ...", "C) ...", "D) ..."],
-      "correct_answer": "B",
-      "explanation": "2~4문장 해설(정답 근거 + 대표 오답 반박 포함).",
-      "source_pages": [5, 6],
-      "evidence": [{"kind": "text", "page": 5, "chunk_id": "p5_c00"}],
-
-      "learning_objective": "이 문항이 평가하는 학습 목표(한 줄)",
-      "common_misconception": "학생이 자주 하는 오개념(한 줄)",
-
-      "generated_table": {
-        "headers": ["열1", "열2"],
-        "rows": [["값1","값2"], ["값3","값4"]]
-      },
-      "table_refs": ["table_5_1"]
-    }
-  ]
-}
-""".strip()
+        table_instruction = _GEN_NO_TABLES
 
     # 유형 구성 텍스트
     type_composition = f"MCQ(객관식) {n_mcq}개"
@@ -391,50 +422,33 @@ def _build_prompt(
         diff_parts.append(f"hard {n_hard}개")
     diff_composition = " / ".join(diff_parts) if diff_parts else "mixed"
 
+    table_count_line = f"\n- 표 기반 문항: 최소 {n_table_questions}개" if has_tables else ""
+
+    # ---- 여기부터 job 별 내용 (prefix 캐시 대상 아님) ----
     return f"""
-당신은 소프트웨어학부 대학 교수로서, 섹션 "{section_id}"에 대한 **고품질 시험 문제**를 출제합니다.
+{_GEN_INSTRUCTIONS}
 
-**정확히 {qn}개의 문제**를 생성하세요.
+{table_instruction}
 
-{"=" * 70}
-🎯 출제 구성(필수)
-{"=" * 70}
+{_RULE}
+출제 대상
+{_RULE}
+- 섹션: "{section_id}"
+- 문제 수: **정확히 {qn}개**
 - 문제 유형: {type_composition}
-- 난이도 분포: {diff_composition}
-- 모든 문제는 아래 "근거 청크 목록"에 기반해야 함
-- evidence는 각 문항당 1~2개만 사용
-- chunk_id는 제공된 목록에 있는 것만 사용
-- 모든 텍스트는 한국어
-- JSON 형식 출력 (마크다운 블록 금지, 설명 문장 금지)
-
-{"=" * 70}
-🚫 형식/품질 위반 시 처리
-{"=" * 70}
-- JSON이 아니면 실패
-- 정답이 애매하거나 복수정답 가능성이 있으면 실패
-- evidence와 무관한 문제면 실패
-- SAQ는 1~5단어 "용어/구"로만 답 (괄호로 장황한 설명 금지)
+- 난이도 분포: {diff_composition}{table_count_line}
 
-{quality_block}
-
-{table_instruction}
-
-{"=" * 70}
+{_RULE}
 섹션 전체 내용(원문)
-{"=" * 70}
+{_RULE}
 {job.get('text', '')}
 {table_section}
 
-{"=" * 70}
+{_RULE}
 근거 청크 목록(여기서만 evidence 선택 가능)
-{"=" * 70}
+{_RULE}
 {chr(10).join(chunk_lines)}
 
-{"=" * 70}
-출력 형식(JSON ONLY)
-{"=" * 70}
-{output_schema}
-
 지금 바로 **{qn}개**의 문제를 JSON으로만 출력하세요.
 """.strip()
 
@@ -548,39 +562,6 @@ def _normalize_question_fields(q: Dict[str, Any]) -> Dict[str, Any]:
     return out
 
 
-def _extract_json(raw: str) -> Optional[Dict[str, Any]]:
-    """JSON 추출 (markdown 블록 제거)"""
-    if not isinstance(raw, str) or not raw.strip():
-        return None
-    raw = raw.strip()
-
-    # ```json ... ``` 제거
-    if raw.startswith("```"):
-        lines = raw.split("\n")
-        if lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].strip() == "```":
-            lines = lines[:-1]
-        raw = "\n".join(lines).strip()
-
-    try:
-        obj = json.loads(raw)
-        return obj if isinstance(obj, dict) else None
-    except Exception:
-        pass
-
-    start = raw.find("{")
-    end = raw.rfind("}")
-    if start != -1 and end != -1 and end > start:
-        cand = raw[start:end + 1]
-        try:
-            obj = json.loads(cand)
-            return obj if isinstance(obj, dict) else None
-        except Exception:
-            return None
-    return None
-
-
 # =========================
 # Public API
 # =========================
@@ -594,37 +575,126 @@ def generate_questions_for_job(
     """
     문제 생성 (검증 없음)
     """
+    prompt, chunks, norm_tables = prepare_generation(job, cfg, tables=tables)
+    if prompt is None:
+        return _no_chunks_result(job, cfg)
+
+    raw = call_llm_text(
+        prompt=prompt,
+        model=cfg.model,
+        temperature=cfg.temperature,
+        stage="generate",
+        schema="questions",
+    )
+    return parse_generation_output(job, cfg, raw, chunks=chunks, norm_tables=norm_tables)
+
+
+def prepare_generation(
+    job: Dict[str, Any],
+    cfg: QuestionGenConfig,
+    *,
+    tables: Optional[List[Dict[str, Any]]] = None,
+) -> Tuple[Optional[str], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    (prompt, evidence chunks, 정규화된 tables). 근거 chunk 가 없으면 prompt 는 None.
+    batch 모드는 이 prompt 로 요청만 모아 제출하고 결과를 parse_generation_output 에 넘긴다.
+    """
     text = job.get("text") or ""
     chunks = _split_text_to_chunks(text, cfg)
-
     if not chunks:
-        return {
-            "questions": [],
-            "answers_only": [],
-            "error": "NO_EVIDENCE_CHUNKS",
-            "raw": "",
-            "evidence_candidates": [],
-            "meta": {
-                "job_id": job.get("job_id"),
-                "section_id": job.get("section_id"),
-                "num_questions": 0,
-                "model": cfg.model,
-            },
-        }
+        return None, [], []
 
     if tables is None:
         tables = job.get("tables", [])
     norm_tables = _normalize_tables_format(tables)
 
-    prompt = _build_prompt(job, chunks, tables=norm_tables)
+    return _build_prompt(job, chunks, tables=norm_tables), chunks, norm_tables
 
-    raw = call_llm_text(
+
+def normalize_question(q: Dict[str, Any], index: int, norm_tables: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """생성된 문제 하나 정규화 (index 는 1부터, question_id 가 없을 때 Q001.. 로 사용)"""
+    # schema(strict) 는 선택 필드도 null 로 채워 보내므로 빠진 것과 같게 취급
+    q = {k: v for k, v in q.items() if v is not None}
+    q["question_id"] = str(q.get("question_id") or f"Q{index:03d}").strip()
+    q["type"] = _normalize_type(q.get("type"))
+    q["difficulty"] = _normalize_difficulty(q.get("difficulty"))
+
+    # 필드명 정규화 (API 명세 준수)
+    q = _normalize_question_fields(q)
+
+    _ensure_saq_answer(q)
+    _ensure_explanation(q)
+
+    # 표 없으면 generated_table, table_refs 제거
+    if not norm_tables:
+        q.pop("generated_table", None)
+        q.pop("table_refs", None)
+
+    return q
+
+
+def generate_questions_streaming(
+    job: Dict[str, Any],
+    cfg: QuestionGenConfig,
+    *,
+    tables: Optional[List[Dict[str, Any]]] = None,
+    on_question: Callable[[Dict[str, Any], List[Dict[str, Any]]], None],
+) -> Dict[str, Any]:
+    """
+    generate_questions_for_job 의 스트리밍 버전.
+    출력에서 문제 object 가 닫히는 대로 정규화해서 on_question(q, evidence_candidates) 를 호출하고
+    (목표 개수까지, evidence_candidates 는 구조 검증의 chunk_id 확인용),
+    끝나면 전체 출력을 파싱한 같은 형태의 결과를 반환한다.
+    """
+    prompt, chunks, norm_tables = prepare_generation(job, cfg, tables=tables)
+    if prompt is None:
+        return _no_chunks_result(job, cfg)
+
+    target = int(job.get("target_questions") or 0) or 2
+    items = JsonArrayItems("questions")
+    n = 0
+    for delta in stream_llm_text(
         prompt=prompt,
         model=cfg.model,
         temperature=cfg.temperature,
-    )
+        stage="generate",
+        schema="questions",
+    ):
+        for q in items.feed(delta):
+            if n >= target:
+                continue
+            n += 1
+            on_question(normalize_question(q, n, norm_tables), chunks)
+
+    return parse_generation_output(job, cfg, items.text, chunks=chunks, norm_tables=norm_tables)
+
+
+def _no_chunks_result(job: Dict[str, Any], cfg: QuestionGenConfig) -> Dict[str, Any]:
+    return {
+        "questions": [],
+        "answers_only": [],
+        "error": "NO_EVIDENCE_CHUNKS",
+        "raw": "",
+        "evidence_candidates": [],
+        "meta": {
+            "job_id": job.get("job_id"),
+            "section_id": job.get("section_id"),
+            "num_questions": 0,
+            "model": cfg.model,
+        },
+    }
+
 
-    data = _extract_json(raw)
+def parse_generation_output(
+    job: Dict[str, Any],
+    cfg: QuestionGenConfig,
+    raw: str,
+    *,
+    chunks: List[Dict[str, Any]],
+    norm_tables: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """LLM 출력 → generate_questions_for_job 결과 형태"""
+    data = parse_json("generate", raw)
     if data is None:
         return {
             "questions": [],
@@ -649,28 +719,11 @@ def generate_questions_for_job(
     if len(questions) > target:
         questions = questions[:target]
 
-    normed: List[Dict[str, Any]] = []
-    for i, q in enumerate(questions, start=1):
-        if not isinstance(q, dict):
-            continue
-
-        q = dict(q)
-        q["question_id"] = str(q.get("question_id") or f"Q{i:03d}").strip()
-        q["type"] = _normalize_type(q.get("type"))
-        q["difficulty"] = _normalize_difficulty(q.get("difficulty"))
-
-        # 필드명 정규화 (API 명세 준수)
-        q = _normalize_question_fields(q)
-
-        _ensure_saq_answer(q)
-        _ensure_explanation(q)
-
-        # 표 없으면 generated_table, table_refs 제거
-        if not norm_tables:
-            q.pop("generated_table", None)
-            q.pop("table_refs", None)
-
-        normed.append(q)
+    normed: List[Dict[str, Any]] = [
+        normalize_question(q, i, norm_tables)
+        for i, q in enumerate(questions, start=1)
+        if isinstance(q, dict)
+    ]
 
     answers_only = [
         {
@@ -18,6 +18,7 @@ from collections import Counter
 from typing import Any, Dict, List, Optional, Set
 from pathlib import Path
 
+from core.llm_schemas import parse_json
 from core.llm_text import call_llm_text
 
 
@@ -270,10 +271,10 @@ def _llm_allocate(summaries: List[Dict[str, Any]], total_questions: int) -> Opti
 출력 형식 (JSON ONLY)
 {"="*60}
 {{
-  "allocation": {{
-    "섹션ID": 문제개수,
+  "allocation": [
+    {{"section_id": "섹션ID", "count": 문제개수}},
     ...
-  }},
+  ],
   "reasoning": "배분 근거를 1-2문장으로"
 }}
 
@@ -284,22 +285,24 @@ def _llm_allocate(summaries: List[Dict[str, Any]], total_questions: int) -> Opti
             prompt=prompt,
             model="gpt-4o-mini",
             temperature=0.3,
+            stage="allocate",
+            schema="question_allocation",
         )
 
-        # JSON 추출
-        response = response.strip()
-        if response.startswith("```json"):
-            response = response[7:]
-        if response.startswith("```"):
-            response = response[3:]
-        if response.endswith("```"):
-            response = response[:-3]
-        response = response.strip()
-
-        data = json.loads(response)
+        data = parse_json("allocate", response)
+        if data is None:
+            return None
         allocation = data.get("allocation", {})
         reasoning = data.get("reasoning", "")
 
+        # schema 는 [{"section_id", "count"}] 배열 (schema 미지원 서버면 예전 dict 형태일 수 있음)
+        if isinstance(allocation, list):
+            allocation = {
+                a.get("section_id"): a.get("count")
+                for a in allocation
+                if isinstance(a, dict)
+            }
+
         # 검증
         if not isinstance(allocation, dict):
             return None
@@ -67,266 +67,296 @@ def _is_nonempty_str(x: Any) -> bool:
 # =========================
 # Core Verifier
 # =========================
-def verify_questions_for_job(
+def verify_question_structure(
+    q: Dict[str, Any],
     *,
-    job: Dict[str, Any],
-    generator_result: Dict[str, Any],
-    evidence_chunks: Optional[List[Dict[str, Any]]] = None,
+    valid_chunk_ids: Set[str],
+    seen_question_ids: Set[str],
+    seen_question_texts: Set[str],
 ) -> Dict[str, Any]:
     """
-    Generator 결과에 대해 구조/명세/참조 무결성 검증만 수행 (LLM 호출 없음)
-
-    원칙:
-    - Generator verdict는 존중하되(기본값), 규칙 위반 시 더 심각한 쪽으로만 업그레이드
-    - 정책적/주관적 품질평가 최소화 (길이 체크는 과도한 REJECT 유발 방지 위해 대부분 FIXABLE)
-    - chunker 단일 진실 소스: generator_result["evidence_candidates"]를 기본으로 사용
+    문제 하나의 구조/명세/참조 무결성 검증 (verify_questions_for_job 의 문제 단위).
+    중복 검사용 seen_* 는 호출하는 쪽이 job 단위로 들고 있고 여기서 갱신된다.
     """
-
-    questions = generator_result.get("questions", [])
-    if not isinstance(questions, list):
-        questions = []
-
-    # ✅ chunker 단일 진실 소스: generator_result가 들고온 evidence_candidates를 기본 사용
-    if evidence_chunks is None:
-        evidence_chunks = generator_result.get("evidence_candidates", [])
-    if not isinstance(evidence_chunks, list):
-        evidence_chunks = []
-
-    valid_chunk_ids = _collect_valid_chunk_ids(evidence_chunks)
-
-    verified: List[Dict[str, Any]] = []
-    summary = {"OK": 0, "FIXABLE": 0, "REJECT": 0}
-
-    seen_question_ids: Set[str] = set()
-    seen_question_texts: Set[str] = set()
-
     # 길이 기준 (너무 공격적이면 FIXABLE 폭증/오판 가능 → 완화)
     MIN_Q_LEN = 8
     MAX_Q_LEN = 700
     MIN_EXPL_LEN = 8
 
-    for q in questions:
-        if not isinstance(q, dict):
-            continue
+    # Generator verdict/issue 존중 (단, invalid면 OK로 시작)
+    gen_verdict = q.get("verdict", "OK")
+    current_verdict = gen_verdict if gen_verdict in VERDICTS else "OK"
 
-        # Generator verdict/issue 존중 (단, invalid면 OK로 시작)
-        gen_verdict = q.get("verdict", "OK")
-        current_verdict = gen_verdict if gen_verdict in VERDICTS else "OK"
+    gen_issues = q.get("issues", [])
+    if not isinstance(gen_issues, list):
+        gen_issues = []
 
-        gen_issues = q.get("issues", [])
-        if not isinstance(gen_issues, list):
-            gen_issues = []
+    additional_issues: List[str] = []
 
-        additional_issues: List[str] = []
+    # =================
+    # 1) question_id 중복/누락
+    # =================
+    qid = q.get("question_id")
+    if _is_nonempty_str(qid):
+        if qid in seen_question_ids:
+            additional_issues.append(f"duplicate question_id: {qid}")
+            current_verdict = _upgrade_verdict(current_verdict, "REJECT")
+        seen_question_ids.add(qid)
+    else:
+        additional_issues.append("missing question_id")
+        current_verdict = _upgrade_verdict(current_verdict, "REJECT")
+
+    # =================
+    # 2) question text 중복 & 길이 (question_text/question 호환)
+    # =================
+    qtext_raw = q.get("question_text") or q.get("question")
+    qtext_norm = (qtext_raw or "").strip().lower()
+
+    if qtext_norm:
+        if qtext_norm in seen_question_texts:
+            additional_issues.append("duplicate question text")
+            current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
+        seen_question_texts.add(qtext_norm)
 
-        # =================
-        # 1) question_id 중복/누락
-        # =================
-        qid = q.get("question_id")
-        if _is_nonempty_str(qid):
-            if qid in seen_question_ids:
-                additional_issues.append(f"duplicate question_id: {qid}")
+        # 길이 체크는 FIXABLE (주관적)
+        qlen = len(qtext_norm)
+        if qlen < MIN_Q_LEN:
+            additional_issues.append(f"question too short (<{MIN_Q_LEN} chars)")
+            current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
+        elif qlen > MAX_Q_LEN:
+            additional_issues.append(f"question too long (>{MAX_Q_LEN} chars)")
+            current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
+    else:
+        additional_issues.append("missing question text")
+        current_verdict = _upgrade_verdict(current_verdict, "REJECT")
+
+    # =================
+    # 3) ENUM 검증
+    # =================
+    qtype = q.get("type")
+    if qtype not in QUESTION_TYPES:
+        additional_issues.append(f"invalid question type: {qtype}")
+        current_verdict = _upgrade_verdict(current_verdict, "REJECT")
+
+    diff = q.get("difficulty")
+    if diff not in DIFFICULTIES:
+        additional_issues.append(f"invalid difficulty: {diff}")
+        current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
+
+    # =================
+    # 4) evidence 존재 & chunk_id/page 무결성
+    # =================
+    evs = q.get("evidence")
+    if not isinstance(evs, list) or not evs:
+        additional_issues.append("missing evidence")
+        current_verdict = _upgrade_verdict(current_verdict, "REJECT")
+    else:
+        for ev in evs:
+            if not isinstance(ev, dict):
+                additional_issues.append("evidence item must be object")
                 current_verdict = _upgrade_verdict(current_verdict, "REJECT")
-            seen_question_ids.add(qid)
-        else:
-            additional_issues.append("missing question_id")
-            current_verdict = _upgrade_verdict(current_verdict, "REJECT")
+                continue
 
-        # =================
-        # 2) question text 중복 & 길이 (question_text/question 호환)
-        # =================
-        qtext_raw = q.get("question_text") or q.get("question")
-        qtext_norm = (qtext_raw or "").strip().lower()
+            cid = ev.get("chunk_id")
+            if not _is_nonempty_str(cid):
+                additional_issues.append("evidence missing chunk_id")
+                current_verdict = _upgrade_verdict(current_verdict, "REJECT")
+                continue
 
-        if qtext_norm:
-            if qtext_norm in seen_question_texts:
-                additional_issues.append("duplicate question text")
-                current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
-            seen_question_texts.add(qtext_norm)
+            if cid not in valid_chunk_ids:
+                additional_issues.append(f"evidence references unknown chunk_id: {cid}")
+                current_verdict = _upgrade_verdict(current_verdict, "REJECT")
 
-            # 길이 체크는 FIXABLE (주관적)
-            qlen = len(qtext_norm)
-            if qlen < MIN_Q_LEN:
-                additional_issues.append(f"question too short (<{MIN_Q_LEN} chars)")
+            # page는 명세상 number이지만, 실전에서는 누락/오류가 잦음 → FIXABLE로만 처리
+            pg = ev.get("page")
+            if pg is None or not isinstance(pg, int):
+                additional_issues.append("evidence missing/invalid page")
                 current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
-            elif qlen > MAX_Q_LEN:
-                additional_issues.append(f"question too long (>{MAX_Q_LEN} chars)")
+
+            # kind도 있으면 체크(강제는 아님)
+            kind = ev.get("kind")
+            if kind is not None and kind not in {"text", "table"}:
+                additional_issues.append(f"evidence invalid kind: {kind}")
                 current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
-        else:
-            additional_issues.append("missing question text")
-            current_verdict = _upgrade_verdict(current_verdict, "REJECT")
 
-        # =================
-        # 3) ENUM 검증
-        # =================
-        qtype = q.get("type")
-        if qtype not in QUESTION_TYPES:
-            additional_issues.append(f"invalid question type: {qtype}")
+    # =================
+    # 5) MCQ 구조 검증 (options/choices, correct_answer/answer 호환)
+    # =================
+    if qtype == "MCQ":
+        ans = q.get("correct_answer") or q.get("answer")
+        if ans not in {"A", "B", "C", "D"}:
+            additional_issues.append("MCQ answer must be A/B/C/D")
             current_verdict = _upgrade_verdict(current_verdict, "REJECT")
 
-        diff = q.get("difficulty")
-        if diff not in DIFFICULTIES:
-            additional_issues.append(f"invalid difficulty: {diff}")
-            current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
-
-        # =================
-        # 4) evidence 존재 & chunk_id/page 무결성
-        # =================
-        evs = q.get("evidence")
-        if not isinstance(evs, list) or not evs:
-            additional_issues.append("missing evidence")
+        choices = q.get("options") or q.get("choices")
+        if not isinstance(choices, list):
+            additional_issues.append("MCQ missing choices")
+            current_verdict = _upgrade_verdict(current_verdict, "REJECT")
+        elif len(choices) != 4:
+            additional_issues.append("MCQ must have exactly 4 choices")
             current_verdict = _upgrade_verdict(current_verdict, "REJECT")
         else:
-            for ev in evs:
-                if not isinstance(ev, dict):
-                    additional_issues.append("evidence item must be object")
-                    current_verdict = _upgrade_verdict(current_verdict, "REJECT")
-                    continue
-
-                cid = ev.get("chunk_id")
-                if not _is_nonempty_str(cid):
-                    additional_issues.append("evidence missing chunk_id")
-                    current_verdict = _upgrade_verdict(current_verdict, "REJECT")
-                    continue
-
-                if cid not in valid_chunk_ids:
-                    additional_issues.append(f"evidence references unknown chunk_id: {cid}")
-                    current_verdict = _upgrade_verdict(current_verdict, "REJECT")
-
-                # page는 명세상 number이지만, 실전에서는 누락/오류가 잦음 → FIXABLE로만 처리
-                pg = ev.get("page")
-                if pg is None or not isinstance(pg, int):
-                    additional_issues.append("evidence missing/invalid page")
+            # choices는 non-empty string이어야 함
+            if any((not isinstance(x, str)) or (not x.strip()) for x in choices):
+                additional_issues.append("MCQ choices must be non-empty strings")
+                current_verdict = _upgrade_verdict(current_verdict, "REJECT")
+            else:
+                # choices 중복 체크 (완화: 공백/대소문자 무시)
+                norm = [x.strip().lower() for x in choices]
+                if len(set(norm)) != 4:
+                    additional_issues.append("duplicate MCQ choices")
                     current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
 
-                # kind도 있으면 체크(강제는 아님)
-                kind = ev.get("kind")
-                if kind is not None and kind not in {"text", "table"}:
-                    additional_issues.append(f"evidence invalid kind: {kind}")
-                    current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
+    # =================
+    # 6) SAQ 구조 검증 (correct_answer/answer 호환)
+    # =================
+    if qtype == "SAQ":
+        ans = q.get("correct_answer") or q.get("answer")
+        if not _is_nonempty_str(ans):
+            additional_issues.append("SAQ missing answer")
+            current_verdict = _upgrade_verdict(current_verdict, "REJECT")
 
-        # =================
-        # 5) MCQ 구조 검증 (options/choices, correct_answer/answer 호환)
-        # =================
-        if qtype == "MCQ":
-            ans = q.get("correct_answer") or q.get("answer")
-            if ans not in {"A", "B", "C", "D"}:
-                additional_issues.append("MCQ answer must be A/B/C/D")
-                current_verdict = _upgrade_verdict(current_verdict, "REJECT")
+        # SAQ는 choices 없어야 하나, LLM이 choices: []/null을 넣는 경우가 흔함 → 완화
+        ch = q.get("options") or q.get("choices", None)
+        if ch not in (None, [], ""):
+            additional_issues.append("SAQ should not include choices")
+            current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
 
-            choices = q.get("options") or q.get("choices")
-            if not isinstance(choices, list):
-                additional_issues.append("MCQ missing choices")
-                current_verdict = _upgrade_verdict(current_verdict, "REJECT")
-            elif len(choices) != 4:
-                additional_issues.append("MCQ must have exactly 4 choices")
-                current_verdict = _upgrade_verdict(current_verdict, "REJECT")
-            else:
-                # choices는 non-empty string이어야 함
-                if any((not isinstance(x, str)) or (not x.strip()) for x in choices):
-                    additional_issues.append("MCQ choices must be non-empty strings")
-                    current_verdict = _upgrade_verdict(current_verdict, "REJECT")
-                else:
-                    # choices 중복 체크 (완화: 공백/대소문자 무시)
-                    norm = [x.strip().lower() for x in choices]
-                    if len(set(norm)) != 4:
-                        additional_issues.append("duplicate MCQ choices")
+    # =================
+    # 7) explanation 검증
+    # =================
+    explanation = q.get("explanation", "")
+    expl = str(explanation).strip() if explanation is not None else ""
+    if not expl:
+        additional_issues.append("missing explanation")
+        current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
+    elif len(expl) < MIN_EXPL_LEN:
+        additional_issues.append(f"explanation too short (<{MIN_EXPL_LEN} chars)")
+        current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
+
+    # =================
+    # ✅ 8) generated_table 검증 (표 기반 문제인 경우)
+    # =================
+    gen_table = q.get("generated_table")
+    if gen_table is not None:
+        if not isinstance(gen_table, dict):
+            additional_issues.append("generated_table must be object")
+            current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
+        else:
+            headers = gen_table.get("headers")
+            rows = gen_table.get("rows")
+            
+            if not isinstance(headers, list) or not headers:
+                additional_issues.append("generated_table missing/invalid headers")
+                current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
+            
+            if not isinstance(rows, list) or not rows:
+                additional_issues.append("generated_table missing/invalid rows")
+                current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
+            elif headers and isinstance(headers, list):
+                # 각 row의 길이가 headers와 맞는지 체크
+                for i, row in enumerate(rows):
+                    if not isinstance(row, list):
+                        additional_issues.append(f"generated_table row {i} must be array")
+                        current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
+                        break
+                    if len(row) != len(headers):
+                        additional_issues.append(
+                            f"generated_table row {i} length mismatch (expected {len(headers)}, got {len(row)})"
+                        )
                         current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
 
-        # =================
-        # 6) SAQ 구조 검증 (correct_answer/answer 호환)
-        # =================
-        if qtype == "SAQ":
-            ans = q.get("correct_answer") or q.get("answer")
-            if not _is_nonempty_str(ans):
-                additional_issues.append("SAQ missing answer")
-                current_verdict = _upgrade_verdict(current_verdict, "REJECT")
+    # =================
+    # 최종 결과 저장
+    # =================
+    all_issues = list(gen_issues) + additional_issues
 
-            # SAQ는 choices 없어야 하나, LLM이 choices: []/null을 넣는 경우가 흔함 → 완화
-            ch = q.get("options") or q.get("choices", None)
-            if ch not in (None, [], ""):
-                additional_issues.append("SAQ should not include choices")
-                current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
+    # confidence 계산: 구조 검증은 확정적이므로 기본 1.0, 이슈마다 감소
+    if current_verdict == "OK":
+        confidence = 1.0
+    elif current_verdict == "FIXABLE":
+        confidence = max(0.5, 1.0 - len(all_issues) * 0.1)
+    else:  # REJECT
+        confidence = max(0.3, 0.8 - len(all_issues) * 0.1)
 
-        # =================
-        # 7) explanation 검증
-        # =================
-        explanation = q.get("explanation", "")
-        expl = str(explanation).strip() if explanation is not None else ""
-        if not expl:
-            additional_issues.append("missing explanation")
-            current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
-        elif len(expl) < MIN_EXPL_LEN:
-            additional_issues.append(f"explanation too short (<{MIN_EXPL_LEN} chars)")
-            current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
+    q_out = dict(q)
+    q_out["verdict"] = current_verdict
+    q_out["issues"] = all_issues
+    q_out["confidence"] = round(confidence, 2)
+    q_out["verified_at"] = _now_iso()
 
-        # =================
-        # ✅ 8) generated_table 검증 (표 기반 문제인 경우)
-        # =================
-        gen_table = q.get("generated_table")
-        if gen_table is not None:
-            if not isinstance(gen_table, dict):
-                additional_issues.append("generated_table must be object")
-                current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
-            else:
-                headers = gen_table.get("headers")
-                rows = gen_table.get("rows")
-                
-                if not isinstance(headers, list) or not headers:
-                    additional_issues.append("generated_table missing/invalid headers")
-                    current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
-                
-                if not isinstance(rows, list) or not rows:
-                    additional_issues.append("generated_table missing/invalid rows")
-                    current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
-                elif headers and isinstance(headers, list):
-                    # 각 row의 길이가 headers와 맞는지 체크
-                    for i, row in enumerate(rows):
-                        if not isinstance(row, list):
-                            additional_issues.append(f"generated_table row {i} must be array")
-                            current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
-                            break
-                        if len(row) != len(headers):
-                            additional_issues.append(
-                                f"generated_table row {i} length mismatch (expected {len(headers)}, got {len(row)})"
-                            )
-                            current_verdict = _upgrade_verdict(current_verdict, "FIXABLE")
-
-        # =================
-        # 최종 결과 저장
-        # =================
-        all_issues = list(gen_issues) + additional_issues
-
-        # confidence 계산: 구조 검증은 확정적이므로 기본 1.0, 이슈마다 감소
-        if current_verdict == "OK":
-            confidence = 1.0
-        elif current_verdict == "FIXABLE":
-            confidence = max(0.5, 1.0 - len(all_issues) * 0.1)
-        else:  # REJECT
-            confidence = max(0.3, 0.8 - len(all_issues) * 0.1)
-
-        q_out = dict(q)
-        q_out["verdict"] = current_verdict
-        q_out["issues"] = all_issues
-        q_out["confidence"] = round(confidence, 2)
-        q_out["verified_at"] = _now_iso()
-
-        verified.append(q_out)
-        summary[current_verdict] += 1
+    return q_out
 
-    return {
-        "job_id": job.get("job_id"),
-        "section_id": job.get("section_id"),
-        "verified_at": _now_iso(),
-        "summary": summary,
-        "questions": verified,
-        "stats": {
-            "total": len(verified),
-            "unique_question_ids": len(seen_question_ids),
-            "unique_question_texts": len(seen_question_texts),
-            "valid_chunk_ids": len(valid_chunk_ids),
-        },
-    }
+
+class JobStructureVerifier:
+    """
+    job 하나의 구조 검증 상태 (스트리밍 생성에서 문제가 닫히는 대로 하나씩 검증).
+    verify(q) 를 순서대로 부르고 result() 를 받으면 verify_questions_for_job 과 같은 결과.
+    """
+
+    def __init__(self, job: Dict[str, Any], evidence_chunks: Optional[List[Dict[str, Any]]]):
+        self.job = job
+        self.valid_chunk_ids = _collect_valid_chunk_ids(evidence_chunks if isinstance(evidence_chunks, list) else [])
+        self.seen_question_ids: Set[str] = set()
+        self.seen_question_texts: Set[str] = set()
+        self.verified: List[Dict[str, Any]] = []
+        self.summary = {"OK": 0, "FIXABLE": 0, "REJECT": 0}
+
+    def verify(self, q: Dict[str, Any]) -> Dict[str, Any]:
+        q_out = verify_question_structure(
+            q,
+            valid_chunk_ids=self.valid_chunk_ids,
+            seen_question_ids=self.seen_question_ids,
+            seen_question_texts=self.seen_question_texts,
+        )
+        self.verified.append(q_out)
+        self.summary[q_out["verdict"]] += 1
+        return q_out
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job.get("job_id"),
+            "section_id": self.job.get("section_id"),
+            "verified_at": _now_iso(),
+            "summary": self.summary,
+            "questions": self.verified,
+            "stats": {
+                "total": len(self.verified),
+                "unique_question_ids": len(self.seen_question_ids),
+                "unique_question_texts": len(self.seen_question_texts),
+                "valid_chunk_ids": len(self.valid_chunk_ids),
+            },
+        }
+
+
+def verify_questions_for_job(
+    *,
+    job: Dict[str, Any],
+    generator_result: Dict[str, Any],
+    evidence_chunks: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    Generator 결과에 대해 구조/명세/참조 무결성 검증만 수행 (LLM 호출 없음)
+
+    원칙:
+    - Generator verdict는 존중하되(기본값), 규칙 위반 시 더 심각한 쪽으로만 업그레이드
+    - 정책적/주관적 품질평가 최소화 (길이 체크는 과도한 REJECT 유발 방지 위해 대부분 FIXABLE)
+    - chunker 단일 진실 소스: generator_result["evidence_candidates"]를 기본으로 사용
+    """
+
+    questions = generator_result.get("questions", [])
+    if not isinstance(questions, list):
+        questions = []
+
+    # ✅ chunker 단일 진실 소스: generator_result가 들고온 evidence_candidates를 기본 사용
+    if evidence_chunks is None:
+        evidence_chunks = generator_result.get("evidence_candidates", [])
+
+    checker = JobStructureVerifier(job, evidence_chunks)
+    for q in questions:
+        if isinstance(q, dict):
+            checker.verify(q)
+    return checker.result()
 
 
 # =========================
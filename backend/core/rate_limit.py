@@ -0,0 +1,273 @@
+# core/rate_limit.py
+"""
+프로세스 간 공유 RPM / TPM token bucket
+
+run_job 은 stage 마다 subprocess 를 띄우고, API 는 요청마다 run_job 을 띄운다.
+프로세스끼리 서로를 모르니 job 이 여러 개 겹치면 한꺼번에 요청을 쏟아 429 가 연달아 난다.
+모든 LLM 요청은 보내기 전에 여기서 model 별 요청 1개 + 예상 토큰 수를 받아간다
+(core.llm_client.create_response / create_response_async 에서 호출, 캐시 hit 은 제외).
+
+bucket 상태는 SQLite 파일 하나에 있고 BEGIN IMMEDIATE 로 잠가서 갱신하므로
+같은 머신의 모든 프로세스가 같은 예산을 나눠 쓴다.
+  capacity = 분당 한도, 초당 한도/60 씩 채워짐 (OpenAI 한도와 같은 방식)
+
+설정 (환경변수):
+  LLM_RATE_LIMIT=0                끄기
+  LLM_RATE_LIMIT_DB               기본 {tmp}/llm_rate_limit.sqlite
+  LLM_RPM_<MODEL> / LLM_TPM_<MODEL>   model 별 한도 (예: LLM_TPM_GPT_4O_MINI=200000)
+  LLM_RPM_DEFAULT / LLM_TPM_DEFAULT   표에 없는 model
+한도를 0 으로 주면 그 bucket 은 제한하지 않는다.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# model 별 기본 한도 (분당). 계정 tier 에 맞게 환경변수로 덮어쓴다.
+DEFAULT_LIMITS: Dict[str, Tuple[int, int]] = {
+    "gpt-4o": (500, 30_000),
+    "gpt-4o-mini": (500, 200_000),
+}
+FALLBACK_LIMITS = (500, 30_000)
+
+# 토큰 추정: 글자 4개 ≈ 1 토큰, 이미지 1장은 high detail 1024px 기준
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = 765
+DEFAULT_OUTPUT_TOKENS = 1000
+
+# 한 번 기다리는 최대 시간 (그 사이 다른 프로세스가 환불했을 수 있으니 다시 확인)
+MAX_WAIT_STEP = 5.0
+
+
+def _env_limit(kind: str, model: str) -> Optional[int]:
+    key = re.sub(r"[^A-Z0-9]+", "_", model.upper())
+    for name in (f"LLM_{kind}_{key}", f"LLM_{kind}_DEFAULT"):
+        v = os.environ.get(name)
+        if v:
+            return int(v)
+    return None
+
+
+def limits_for(model: str) -> Tuple[int, int]:
+    """(rpm, tpm)"""
+    rpm, tpm = DEFAULT_LIMITS.get(model, FALLBACK_LIMITS)
+    env_rpm = _env_limit("RPM", model)
+    env_tpm = _env_limit("TPM", model)
+    return (rpm if env_rpm is None else env_rpm, tpm if env_tpm is None else env_tpm)
+
+
+def estimate_tokens(request: Dict[str, Any]) -> int:
+    """요청 하나의 예상 토큰 (입력 텍스트 + 이미지 + 최대 출력)"""
+    text_chars = 0
+    images = 0
+
+    def _walk(x: Any) -> None:
+        nonlocal text_chars, images
+        if isinstance(x, str):
+            text_chars += len(x)
+        elif isinstance(x, dict):
+            if x.get("type") == "input_image":
+                images += 1
+                return
+            for v in x.values():
+                _walk(v)
+        elif isinstance(x, list):
+            for v in x:
+                _walk(v)
+
+    _walk(request.get("input"))
+    if isinstance(request.get("instructions"), str):
+        text_chars += len(request["instructions"])
+    out_tokens = int(request.get("max_output_tokens") or DEFAULT_OUTPUT_TOKENS)
+    return text_chars // CHARS_PER_TOKEN + images * IMAGE_TOKENS + out_tokens
+
+
+class RateLimiter:
+    """SQLite 한 파일의 bucket 테이블. 스레드마다 커넥션을 따로 쓴다."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " model TEXT, kind TEXT, level REAL, updated_at REAL,"
+            " PRIMARY KEY (model, kind))"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit 모드: 트랜잭션은 BEGIN IMMEDIATE 로 직접 연다
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def try_acquire(self, model: str, tokens: int) -> float:
+        """
+        요청 1개 + tokens 를 가져가 본다.
+        가져갔으면 0.0, 모자라면 가져가지 않고 기다려야 할 초를 반환.
+        """
+        rpm, tpm = limits_for(model)
+        wants = [("rpm", rpm, 1.0), ("tpm", tpm, float(min(tokens, tpm)))]
+        wants = [(kind, cap, n) for kind, cap, n in wants if cap > 0]
+        if not wants:
+            return 0.0
+
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = {}
+            wait = 0.0
+            for kind, cap, n in wants:
+                level = self._refilled(conn, model, kind, cap, now)
+                levels[kind] = level
+                if level < n:
+                    wait = max(wait, (n - level) / (cap / 60.0))
+            if wait > 0:
+                conn.execute("ROLLBACK")
+                return wait
+            for kind, cap, n in wants:
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (model, kind, level, updated_at) VALUES (?, ?, ?, ?)",
+                    (model, kind, levels[kind] - n, now),
+                )
+            conn.execute("COMMIT")
+            return 0.0
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def refund(self, model: str, tokens: int) -> None:
+        """추정보다 덜 쓴 토큰을 돌려준다 (음수면 더 쓴 만큼 차감)."""
+        _, tpm = limits_for(model)
+        if tpm <= 0 or tokens == 0:
+            return
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            level = self._refilled(conn, model, "tpm", tpm, now)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (model, kind, level, updated_at) VALUES (?, ?, ?, ?)",
+                (model, "tpm", min(float(tpm), level + tokens), now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def drain(self, model: str) -> None:
+        """429 를 받았으면 모든 프로세스가 같이 쉬도록 bucket 을 비운다."""
+        rpm, tpm = limits_for(model)
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for kind, cap in (("rpm", rpm), ("tpm", tpm)):
+                if cap > 0:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO buckets (model, kind, level, updated_at) VALUES (?, ?, ?, ?)",
+                        (model, kind, 0.0, now),
+                    )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _refilled(conn: sqlite3.Connection, model: str, kind: str, cap: int, now: float) -> float:
+        row = conn.execute(
+            "SELECT level, updated_at FROM buckets WHERE model = ? AND kind = ?", (model, kind)
+        ).fetchone()
+        if row is None:
+            return float(cap)
+        level, updated_at = row
+        return min(float(cap), level + max(0.0, now - updated_at) * cap / 60.0)
+
+
+_limiter_lock = threading.Lock()
+_limiter: Optional[RateLimiter] = None
+_limiter_pid: Optional[int] = None
+
+
+def get_limiter() -> Optional[RateLimiter]:
+    """LLM_RATE_LIMIT=0 이면 None"""
+    global _limiter, _limiter_pid
+    if os.environ.get("LLM_RATE_LIMIT", "1") in ("0", "false", "no"):
+        return None
+    pid = os.getpid()
+    if _limiter is not None and _limiter_pid == pid:
+        return _limiter
+    with _limiter_lock:
+        if _limiter is None or _limiter_pid != pid:
+            path = os.environ.get("LLM_RATE_LIMIT_DB") or Path(tempfile.gettempdir()) / "llm_rate_limit.sqlite"
+            _limiter = RateLimiter(Path(path))
+            _limiter_pid = pid
+    return _limiter
+
+
+def reset_limiter() -> None:
+    global _limiter, _limiter_pid
+    with _limiter_lock:
+        _limiter = None
+        _limiter_pid = None
+
+
+def acquire(model: str, tokens: int) -> float:
+    """한도 안에 들어올 때까지 기다렸다가 가져간다. 기다린 초를 반환."""
+    limiter = get_limiter()
+    if limiter is None:
+        return 0.0
+    waited = 0.0
+    while True:
+        wait = limiter.try_acquire(model, tokens)
+        if wait <= 0:
+            return waited
+        step = min(wait, MAX_WAIT_STEP)
+        time.sleep(step)
+        waited += step
+
+
+async def acquire_async(model: str, tokens: int) -> float:
+    """
+    acquire 의 asyncio 버전 (기다리는 동안 loop 를 막지 않는다).
+    try_acquire 는 BEGIN IMMEDIATE 로 다른 프로세스의 잠금을 최대 30초까지 기다리므로 스레드에서 돌린다.
+    """
+    limiter = await asyncio.to_thread(get_limiter)
+    if limiter is None:
+        return 0.0
+    waited = 0.0
+    while True:
+        wait = await asyncio.to_thread(limiter.try_acquire, model, tokens)
+        if wait <= 0:
+            return waited
+        step = min(wait, MAX_WAIT_STEP)
+        await asyncio.sleep(step)
+        waited += step
+
+
+def settle(model: str, estimated: int, resp: Any) -> None:
+    """응답의 실제 usage 로 추정치를 보정 (usage 가 없으면 그대로 둔다)."""
+    limiter = get_limiter()
+    usage = getattr(resp, "usage", None)
+    actual = getattr(usage, "total_tokens", None)
+    if limiter is None or not isinstance(actual, int):
+        return
+    limiter.refund(model, estimated - actual)
+
+
+def on_rate_limited(model: str) -> None:
+    limiter = get_limiter()
+    if limiter is not None:
+        limiter.drain(model)
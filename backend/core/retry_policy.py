@@ -0,0 +1,412 @@
+# core/retry_policy.py
+"""
+LLM 호출 재시도 정책 (오류 분류 + retry-after + model 별 circuit breaker)
+
+예전 _retry / retry_async 는 모든 예외를 최대 5번, 지수 백오프로 다시 시도했다.
+FileNotFoundError 처럼 다시 해도 똑같이 실패하는 오류까지 기다려서 페이지 하나에 ~30초씩 버렸다.
+
+오류 분류 (classify):
+  permanent     바로 포기: 입력 파일 없음, 요청을 만들다 난 ValueError/KeyError/TypeError, cassette 에 없는 요청,
+                400/401/403/404/422 같은 요청 자체의 문제
+  rate_limited  429: 서버가 준 retry-after(-ms) / x-ratelimit-reset-* 만큼은 반드시 기다린다
+  transient     연결 끊김 / 타임아웃 / 5xx / 408 / 409 / 그 밖의 예외: 지수 백오프 + jitter
+
+retry / retry_async 안에서는 하나 더:
+  bad_output    그 시도에서 LLM 응답을 받은 뒤에 난 ValueError(JSONDecodeError 포함)/KeyError/TypeError
+                = 출력 파싱 / 검증 실패. 모델 출력은 다시 받으면 달라질 수 있으므로 바로 다시 시도하되,
+                다음 시도는 core.llm_cache.refresh() 안에서 돌려 캐시에 남은 같은 응답 대신 새로 받는다.
+                (응답을 받았는지는 core.llm_client 가 note_response() 로 알려준다)
+두 번째 시도부터 처음 나가는 요청은 core.llm_client 가 take_retry() 로 확인해 llm_usage 의 retries 로 센다.
+
+circuit breaker (model 별, 프로세스 안의 모든 워커가 공유):
+  최근 WINDOW_SECONDS 동안 요청이 BREAKER_MIN_CALLS 이상이고 그 중 transient / rate_limited 비율이
+  BREAKER_ERROR_RATE 를 넘으면 open → cooldown 동안 그 model 로는 요청을 내보내지 않는다
+  (core.llm_client 가 요청 직전에 wait / wait_async 로 기다림).
+  429 에 retry-after 가 붙어 오면 비율과 상관없이 그 시간만큼 바로 open.
+  cooldown 이 끝나면 half-open: 요청 하나만 probe 로 내보내고 나머지는 그 결과를 기다린다.
+  probe 가 성공하면 close, 실패하면 다시 open (retry-after 가 있으면 그만큼, 없으면 cooldown 을 두 배로).
+  워커마다 따로 자는 대신 한 곳에서 멈췄다가 같이 재개한다.
+  (다른 프로세스와는 core.rate_limit 의 bucket drain 으로 공유)
+
+    result = retry(lambda attempt: call(...), max_retries=5)
+    result = await retry_async(fn, max_retries=5)
+
+설정 (환경변수):
+  LLM_BREAKER=0                 circuit breaker 끄기
+  LLM_BREAKER_ERROR_RATE        기본 0.5
+  LLM_BREAKER_MIN_CALLS         기본 6
+  LLM_BREAKER_COOLDOWN          첫 cooldown 초 (기본 5, 최대 MAX_COOLDOWN)
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, Tuple, TypeVar
+
+import openai
+
+from core import llm_cache, llm_cassette
+
+R = TypeVar("R")
+
+TRANSIENT = "transient"
+RATE_LIMITED = "rate_limited"
+PERMANENT = "permanent"
+BAD_OUTPUT = "bad_output"
+
+MAX_DELAY = 20.0
+MAX_RETRY_AFTER = 60.0
+
+WINDOW_SECONDS = 30.0
+DEFAULT_ERROR_RATE = 0.5
+DEFAULT_MIN_CALLS = 6
+DEFAULT_COOLDOWN = 5.0
+MAX_COOLDOWN = 60.0
+PROBE_TIMEOUT = 60.0  # probe 결과가 이 안에 안 오면 다른 요청을 probe 로
+PROBE_POLL = 0.2
+
+_PERMANENT_STATUS = {400, 401, 403, 404, 413, 422}
+_PERMANENT_TYPES: Tuple[type, ...] = (
+    FileNotFoundError,
+    IsADirectoryError,
+    PermissionError,
+    ValueError,  # 응답을 받은 뒤면 bad_output (retry 안에서)
+    LookupError,  # KeyError / core.llm_cassette.CassetteMiss
+    TypeError,
+    NotImplementedError,
+)
+_OUTPUT_TYPES: Tuple[type, ...] = (ValueError, KeyError, IndexError, TypeError)
+
+
+
+class _AttemptState:
+    """retry 의 시도 하나 (to_thread / gather 로 컨텍스트가 복사돼도 같은 객체를 본다)"""
+
+    __slots__ = ("number", "responses", "resend")
+
+    def __init__(self, number: int):
+        self.number = number
+        self.responses = 0         # 이 시도에서 받은 LLM 응답 수
+        self.resend = number > 1   # 두 번째 시도부터: 처음 나가는 요청을 재시도로 센다
+
+
+_current_attempt: ContextVar[Optional[_AttemptState]] = ContextVar("retry_attempt", default=None)
+
+
+# =============================================================================
+# 분류
+# =============================================================================
+
+def _status_code(e: BaseException) -> Optional[int]:
+    code = getattr(e, "status_code", None)
+    if isinstance(code, int):
+        return code
+    resp = getattr(e, "response", None)
+    code = getattr(resp, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def classify(e: BaseException) -> str:
+    if isinstance(e, openai.RateLimitError):
+        return RATE_LIMITED
+    if isinstance(e, (openai.APIConnectionError, openai.APITimeoutError)):
+        return TRANSIENT
+    status = _status_code(e)
+    if status == 429:
+        return RATE_LIMITED
+    if status is not None:
+        return PERMANENT if status in _PERMANENT_STATUS else TRANSIENT
+    if isinstance(e, (ConnectionError, TimeoutError)):
+        return TRANSIENT
+    if isinstance(e, _PERMANENT_TYPES):
+        return PERMANENT
+    return TRANSIENT
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def _parse_duration(v: str) -> Optional[float]:
+    """'1.5', '20ms', '1m3.2s' → 초"""
+    v = v.strip()
+    try:
+        return float(v)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(v)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(n) * scale[u] for n, u in parts)
+
+
+def retry_after(e: BaseException) -> Optional[float]:
+    """응답 헤더의 retry-after 힌트 (초). 없으면 None."""
+    resp = getattr(e, "response", None)
+    headers = getattr(resp, "headers", None)
+    if not headers:
+        return None
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return min(float(ms) / 1000.0, MAX_RETRY_AFTER)
+        except ValueError:
+            pass
+    for name in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        v = headers.get(name)
+        if v:
+            sec = _parse_duration(v)
+            if sec is not None:
+                return min(sec, MAX_RETRY_AFTER)
+    return None
+
+
+def backoff_delay(kind: str, attempt: int, e: BaseException, base_delay: float = 1.0) -> float:
+    """attempt(1..) 번째 실패 뒤 기다릴 초"""
+    delay = base_delay * (2 ** (attempt - 1)) + random.uniform(0, 0.3)
+    if kind == RATE_LIMITED:
+        hint = retry_after(e)
+        if hint is not None:
+            return max(hint, 0.0) + random.uniform(0, 0.3)
+    return min(delay, MAX_DELAY)
+
+
+# =============================================================================
+# 재시도
+# =============================================================================
+
+def note_response() -> None:
+    """core.llm_client: 응답 하나를 받았음 (캐시 hit / 재생 포함)"""
+    state = _current_attempt.get()
+    if state is not None:
+        state.responses += 1
+
+
+def take_retry() -> int:
+    """
+    core.llm_client: 지금 내보낸 요청이 retry 가 다시 보낸 것이면 1 (시도마다 첫 요청 하나만), 아니면 0.
+    llm_usage 의 retries 로 기록한다.
+    """
+    state = _current_attempt.get()
+    if state is None or not state.resend:
+        return 0
+    state.resend = False
+    return 1
+
+
+def _classify_attempt(e: BaseException, state: _AttemptState) -> str:
+    kind = classify(e)
+    if (
+        kind == PERMANENT
+        and state.responses
+        and isinstance(e, _OUTPUT_TYPES)
+        and not isinstance(e, llm_cassette.CassetteMiss)
+    ):
+        return BAD_OUTPUT
+    return kind
+
+
+@contextmanager
+def _attempt(number: int, refresh: bool) -> Iterator[_AttemptState]:
+    state = _AttemptState(number)
+    token = _current_attempt.set(state)
+    try:
+        if refresh:
+            with llm_cache.refresh():
+                yield state
+        else:
+            yield state
+    finally:
+        _current_attempt.reset(token)
+
+
+def retry(fn: Callable[[int], R], max_retries: int = 5, base_delay: float = 1.0) -> R:
+    """fn(attempt) 를 정책에 따라 다시 시도 (permanent 는 바로 raise, bad_output 은 캐시를 건너뛰고 바로 다시)"""
+    refresh = False
+    for attempt in range(1, max_retries + 1):
+        with _attempt(attempt, refresh) as state:
+            try:
+                return fn(attempt)
+            except Exception as e:
+                kind = _classify_attempt(e, state)
+                if kind == PERMANENT or attempt >= max_retries:
+                    raise
+                delay = 0.0 if kind == BAD_OUTPUT else backoff_delay(kind, attempt, e, base_delay)
+        refresh = kind == BAD_OUTPUT
+        if delay > 0:
+            time.sleep(delay)
+    raise RuntimeError("retry failed")  # max_retries < 1
+
+
+async def retry_async(
+    fn: Callable[[int], Awaitable[R]],
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+) -> R:
+    """retry 의 asyncio 버전"""
+    refresh = False
+    for attempt in range(1, max_retries + 1):
+        with _attempt(attempt, refresh) as state:
+            try:
+                return await fn(attempt)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                kind = _classify_attempt(e, state)
+                if kind == PERMANENT or attempt >= max_retries:
+                    raise
+                delay = 0.0 if kind == BAD_OUTPUT else backoff_delay(kind, attempt, e, base_delay)
+        refresh = kind == BAD_OUTPUT
+        if delay > 0:
+            await asyncio.sleep(delay)
+    raise RuntimeError("retry failed")
+
+
+# =============================================================================
+# Circuit breaker
+# =============================================================================
+
+def breaker_enabled() -> bool:
+    return os.environ.get("LLM_BREAKER", "1") not in ("0", "false", "no")
+
+
+class CircuitBreaker:
+    """model 하나의 상태. 시각은 time.monotonic 기준."""
+
+    def __init__(self, error_rate: float, min_calls: int, cooldown: float):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self.half_open = False
+        self.opened = 0  # open 된 횟수 (리포트용)
+        self._probe_at: Optional[float] = None  # half-open 에서 시험 요청을 내보낸 시각
+        self._events: Deque[Tuple[float, bool]] = deque()  # (시각, 실패 여부)
+        self._lock = threading.Lock()
+
+    def admit(self) -> float:
+        """지금 보내도 되면 0, 아니면 기다릴 초. half-open 에서는 한 요청만 시험으로 내보낸다."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self.open_until:
+                return self.open_until - now
+            if self.half_open:
+                if self._probe_at is not None and now - self._probe_at < PROBE_TIMEOUT:
+                    return PROBE_POLL
+                self._probe_at = now
+            return 0.0
+
+    def record(self, failed: bool, pause: Optional[float] = None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self.half_open:
+                if self._probe_at is None:
+                    return  # open 되기 전에 나간 요청의 결과 (판단은 probe 로)
+                self._probe_at = None
+                if failed:
+                    self.cooldown = min(self.cooldown * 2, MAX_COOLDOWN)
+                    self._open(now, min(pause, MAX_RETRY_AFTER) if pause else self.cooldown)
+                    return
+                self.half_open = False
+                self.cooldown = self.base_cooldown
+                return
+
+            self._events.append((now, failed))
+            while self._events and self._events[0][0] < now - WINDOW_SECONDS:
+                self._events.popleft()
+
+            if pause is not None and pause > 0:
+                self._open(now, min(pause, MAX_RETRY_AFTER))
+                return
+            n = len(self._events)
+            if failed and n >= self.min_calls:
+                errors = sum(1 for _, f in self._events if f)
+                if errors / n >= self.error_rate:
+                    self._open(now, self.cooldown)
+
+    def release(self) -> None:
+        """probe 가 판단 없이 끝났을 때 (permanent 오류 등) 다른 요청이 시험하도록 비운다."""
+        with self._lock:
+            self._probe_at = None
+
+    def _open(self, now: float, seconds: float) -> None:
+        self.open_until = max(self.open_until, now + seconds)
+        self.half_open = True
+        self.opened += 1
+        self._events.clear()
+
+
+_breakers_lock = threading.Lock()
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    b = _breakers.get(model)
+    if b is None:
+        with _breakers_lock:
+            b = _breakers.get(model)
+            if b is None:
+                b = _breakers[model] = CircuitBreaker(
+                    error_rate=float(os.environ.get("LLM_BREAKER_ERROR_RATE") or DEFAULT_ERROR_RATE),
+                    min_calls=int(os.environ.get("LLM_BREAKER_MIN_CALLS") or DEFAULT_MIN_CALLS),
+                    cooldown=float(os.environ.get("LLM_BREAKER_COOLDOWN") or DEFAULT_COOLDOWN),
+                )
+    return b
+
+
+def wait(model: str) -> float:
+    """breaker 가 열려 있으면 보내도 될 때까지 기다린다 (half-open 이면 probe 결과까지). 기다린 초를 반환."""
+    if not breaker_enabled():
+        return 0.0
+    b = get_breaker(model)
+    waited = 0.0
+    while True:
+        left = b.admit()
+        if left <= 0:
+            return waited
+        time.sleep(left)
+        waited += left
+
+
+async def wait_async(model: str) -> float:
+    """wait 의 asyncio 버전"""
+    if not breaker_enabled():
+        return 0.0
+    b = get_breaker(model)
+    waited = 0.0
+    while True:
+        left = b.admit()
+        if left <= 0:
+            return waited
+        await asyncio.sleep(left)
+        waited += left
+
+
+def record_success(model: str) -> None:
+    if breaker_enabled():
+        get_breaker(model).record(False)
+
+
+def record_failure(model: str, e: BaseException) -> str:
+    """실패 한 건 반영. permanent 는 서버 상태와 무관하니 breaker 에 넣지 않는다. 분류를 반환."""
+    kind = classify(e)
+    if kind == PERMANENT and breaker_enabled():
+        get_breaker(model).release()
+    elif breaker_enabled():
+        pause = retry_after(e) if kind == RATE_LIMITED else None
+        get_breaker(model).record(True, pause=pause)
+    return kind
+
+
+def breaker_stats() -> Dict[str, Any]:
+    with _breakers_lock:
+        return {m: {"opened": b.opened, "cooldown": b.cooldown} for m, b in _breakers.items()}
+
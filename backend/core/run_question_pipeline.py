@@ -7,18 +7,37 @@ load_dotenv(override=True)
 import argparse
 import json
 import logging
-import random
-import time
 import traceback
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
 from threading import Lock
-from typing import Any, Dict, List, Optional, Set, Callable, Tuple
-
-from core.question_generator import QuestionGenConfig, generate_questions_for_job
-from core.question_verifier import verify_questions_for_job, verify_questions_batch
-from core.llm_verifier import verify_questions_llm, merge_verification_results, LLMVerifyConfig
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from core import llm_cache, llm_schemas, llm_usage
+from core.llm_async import run_tasks
+from core.llm_batch import BatchItem, BatchItemError, run_batch
+from core.llm_text import text_request
+from core.retry_policy import retry
+from core.question_generator import (
+    QuestionGenConfig,
+    generate_questions_for_job,
+    generate_questions_streaming,
+    parse_generation_output,
+    prepare_generation,
+)
+from core.question_verifier import JobStructureVerifier, verify_questions_for_job, verify_questions_batch
+from core.llm_verifier import (
+    verify_questions_llm,
+    merge_verification_results,
+    LLMVerifyConfig,
+    StreamingLLMVerifier,
+    assemble_verification,
+    fallback_results,
+    parse_verify_output,
+    verify_batches,
+    verify_prompt,
+)
 from core.aggregate_verifier import (
     verify_aggregate,
     identify_regeneration_targets,
@@ -124,25 +143,6 @@ def _resolve_jobs_path(out_dir: Path, jobs_jsonl: str) -> Path:
     return out_dir / jp
 
 
-# =============================================================================
-# Retry
-# =============================================================================
-
-def _retry(fn: Callable[[int], Any], max_retries: int = 5, base_delay: float = 1.0):
-    last: Optional[Exception] = None
-    for attempt in range(1, max_retries + 1):
-        try:
-            return fn(attempt)
-        except KeyboardInterrupt:
-            raise
-        except Exception as e:
-            last = e
-            if attempt < max_retries:
-                delay = base_delay * (2 ** (attempt - 1)) + random.uniform(0, 0.3)
-                time.sleep(min(delay, 20))
-    raise last if last else RuntimeError("retry failed")
-
-
 # =============================================================================
 # Preview
 # =============================================================================
@@ -420,6 +420,14 @@ def _write_job_state(
             "message": error_message or error_code,
         }
 
+    # 이 job 에서 나간 LLM 호출의 캐시 hit/miss (run() 에서 job 마다 track, --batch 면 custom_id 로 나눠 셈)
+    cache_stats = llm_cache.tracked_stats()
+    if cache_stats is not None:
+        payload["llm_cache"] = cache_stats
+    usage_stats = llm_usage.tracked_stats()
+    if usage_stats is not None:
+        payload["llm_usage"] = usage_stats
+
     if extra and isinstance(extra, dict):
         payload.update(extra)
 
@@ -528,6 +536,11 @@ def run(
     enable_llm_verify: bool = True,
     target_total: int = 0,  # 0이면 job_targets 합계 사용
     max_regeneration_rounds: int = 2,
+    # Batch API 모드 (야간 대량 처리)
+    batch: bool = False,
+    poll_seconds: Optional[float] = None,
+    # 생성 출력을 스트리밍으로 받아 문제가 닫히는 대로 검증
+    stream: bool = False,
 ) -> Dict[str, Any]:
 
     jobs_path = _resolve_jobs_path(out_dir, jobs_jsonl)
@@ -668,7 +681,12 @@ def run(
             "updated_at": now,
         })
 
-    def run_job_pipeline(job: Dict[str, Any]) -> Dict[str, Any]:
+    # =============================================================================
+    # Job 단계별 기록 (대화형 run_job_pipeline / batch 모드 공용)
+    # =============================================================================
+
+    def start_job(job: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """QUEUED 기록 + tables 정규화 + model plan. (정규화된 tables, model_plan)"""
         jid = job["job_id"]
         section_id = job.get("section_id")
 
@@ -697,51 +715,245 @@ def run(
             table_model=table_model,
             fallback_model=fallback_model,
         )
+        return norm_tables, model_plan
+
+    def mark_generating(job: Dict[str, Any], model: str, attempts: int, model_try: int, model_plan: List[str]) -> None:
+        jid = job["job_id"]
+        section_id = job.get("section_id")
+        now = _now_iso()
+
+        # runner-local verified_out 기록(기존 유지)
+        _atomic_write_json(verified_out(jid), {
+            "pdf_id": pdf_id,
+            "job_id": jid,
+            "section_id": section_id,
+            "status": JobStatusLocal.GENERATING,
+            "model": model,
+            "attempts": attempts,
+            "model_try": model_try,
+            "model_plan": model_plan,
+            "updated_at": now,
+        })
+
+        # (명세 job state) RUNNING/GENERATING 기록
+        _write_job_state(
+            data_dir=data_dir,
+            pdf_id=pdf_id,
+            job_id=jid,
+            section_id=section_id if isinstance(section_id, str) else None,
+            local_status=JobStatusLocal.GENERATING,
+            model=model,
+            attempts=attempts,
+            model_plan=model_plan,
+            detail_stage=None,
+        )
+
+    def generator_failed(
+        job: Dict[str, Any],
+        last_gen: Dict[str, Any],
+        last_model_used: str,
+        model_plan: List[str],
+    ) -> Dict[str, Any]:
+        jid = job["job_id"]
+        section_id = job.get("section_id")
+        now = _now_iso()
+
+        fail_payload = {
+            "pdf_id": pdf_id,
+            "job_id": jid,
+            "section_id": section_id,
+            "status": JobStatusLocal.FAILED,
+            "error_type": ErrorType.GENERATOR,
+            "error": last_gen.get("error") or "EMPTY_QUESTIONS",
+            "model": last_model_used,
+            "model_plan": model_plan,
+            "attempts": int(last_gen.get("meta", {}).get("attempts", 1) or 1),
+            "questions": [],
+            "summary": {"OK": 0, "FIXABLE": 0, "REJECT": 0},
+            "stats": {
+                "total": 0,
+                "valid_chunk_ids": len(last_gen.get("evidence_candidates", []) or []),
+            },
+            "verified_at": now,
+            "updated_at": now,
+        }
+        _atomic_write_json(verified_out(jid), fail_payload)
+
+        # (명세 job state) FAILED 기록
+        _write_job_state(
+            data_dir=data_dir,
+            pdf_id=pdf_id,
+            job_id=jid,
+            section_id=section_id if isinstance(section_id, str) else None,
+            local_status=JobStatusLocal.FAILED,
+            model=last_model_used,
+            attempts=int(last_gen.get("meta", {}).get("attempts", 1) or 1),
+            model_plan=model_plan,
+            error_code=str(fail_payload.get("error") or "GENERATOR_FAILED"),
+            error_message="문제 생성에 실패했습니다.",
+        )
+
+        return fail_payload
+
+    def mark_verifying(
+        job: Dict[str, Any],
+        last_gen: Dict[str, Any],
+        last_model_used: str,
+        model_plan: List[str],
+    ) -> None:
+        jid = job["job_id"]
+        section_id = job.get("section_id")
+        now = _now_iso()
+        _atomic_write_json(verified_out(jid), {
+            "pdf_id": pdf_id,
+            "job_id": jid,
+            "section_id": section_id,
+            "status": JobStatusLocal.VERIFYING,
+            "model": last_model_used,
+            "updated_at": now,
+        })
+
+        # (명세 job state) RUNNING/VERIFYING
+        _write_job_state(
+            data_dir=data_dir,
+            pdf_id=pdf_id,
+            job_id=jid,
+            section_id=section_id if isinstance(section_id, str) else None,
+            local_status=JobStatusLocal.VERIFYING,
+            model=last_model_used,
+            attempts=int(last_gen.get("meta", {}).get("attempts", 1) or 1),
+            model_plan=model_plan,
+        )
+
+    def apply_llm_verify(verified: Dict[str, Any], llm_result: Dict[str, Any]) -> None:
+        # 결과 병합
+        verified["questions"] = merge_verification_results(
+            verified.get("questions", []),
+            llm_result.get("questions", [])
+        )
+        # summary 재계산
+        new_summary = {"OK": 0, "FIXABLE": 0, "REJECT": 0}
+        for q in verified["questions"]:
+            v = q.get("verdict", "OK")
+            if v in new_summary:
+                new_summary[v] += 1
+        verified["summary"] = new_summary
+        verified["llm_verify_done"] = True
+
+    def finish_job(
+        job: Dict[str, Any],
+        last_gen: Dict[str, Any],
+        verified: Dict[str, Any],
+        last_model_used: str,
+        model_plan: List[str],
+    ) -> Dict[str, Any]:
+        jid = job["job_id"]
+        section_id = job.get("section_id")
+        now = _now_iso()
+        payload = {
+            "pdf_id": pdf_id,
+            "job_id": jid,
+            "section_id": section_id,
+            "status": JobStatusLocal.DONE,
+            "model": last_model_used,
+            "model_plan": model_plan,
+            "attempts": int(last_gen.get("meta", {}).get("attempts", 1) or 1),
+            "questions": verified.get("questions", []),
+            "summary": verified.get("summary", {}),
+            "stats": verified.get("stats", {}),
+            "verified_at": verified.get("verified_at"),
+            "updated_at": now,
+        }
+        _atomic_write_json(verified_out(jid), payload)
+
+        # (명세 job state) DONE (SAVING)
+        _write_job_state(
+            data_dir=data_dir,
+            pdf_id=pdf_id,
+            job_id=jid,
+            section_id=section_id if isinstance(section_id, str) else None,
+            local_status=JobStatusLocal.DONE,
+            model=last_model_used,
+            attempts=int(last_gen.get("meta", {}).get("attempts", 1) or 1),
+            model_plan=model_plan,
+        )
+
+        if save_answers_only and last_gen.get("answers_only"):
+            _atomic_write_json(answers_out(jid), {
+                "pdf_id": pdf_id,
+                "job_id": jid,
+                "section_id": section_id,
+                "status": JobStatusLocal.DONE,
+                "answers": last_gen["answers_only"],
+                "updated_at": now,
+            })
+
+        return payload
+
+    def generate_streaming(
+        job: Dict[str, Any],
+        gen_cfg: QuestionGenConfig,
+        norm_tables: List[Dict[str, Any]],
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        --stream: 생성 출력에서 문제가 닫히는 대로 구조 검증하고, OK 면 바로 LLM 검증 큐에 넣는다.
+        (generator 결과, 구조 검증 결과, LLM 검증 결과). 스트림 중 파싱이 전체 파싱과 다르면
+        검증 결과는 None 으로 돌려서 평소 경로로 다시 검증하게 한다.
+        """
+        checker: Optional[JobStructureVerifier] = None
+        llm_verifier = (
+            StreamingLLMVerifier(LLMVerifyConfig(model=gen_cfg.model, temperature=0.1))
+            if enable_llm_verify else None
+        )
+
+        def on_question(q: Dict[str, Any], chunks: List[Dict[str, Any]]) -> None:
+            nonlocal checker
+            if checker is None:
+                checker = JobStructureVerifier(job, chunks)
+            qv = checker.verify(q)
+            if llm_verifier is not None and qv["verdict"] == "OK":
+                llm_verifier.submit(qv)
+
+        try:
+            gen_result = generate_questions_streaming(job, gen_cfg, tables=norm_tables, on_question=on_question)
+        finally:
+            llm_result = llm_verifier.close() if llm_verifier is not None else None
+
+        final_ids = [q.get("question_id") for q in gen_result.get("questions", [])]
+        streamed_ids = [q.get("question_id") for q in checker.verified] if checker is not None else []
+        if not final_ids or streamed_ids != final_ids:
+            return gen_result, None, None
+        return gen_result, checker.result(), llm_result
+
+    def run_job_pipeline(job: Dict[str, Any]) -> Dict[str, Any]:
+        jid = job["job_id"]
+        section_id = job.get("section_id")
+
+        norm_tables, model_plan = start_job(job)
 
         # ---- 1) GENERATOR ----
         last_gen: Dict[str, Any] = {}
+        streamed: Dict[int, Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]] = {}
         last_model_used: str = model_plan[0] if model_plan else default_model
 
         for mi, model in enumerate(model_plan, start=1):
             gen_cfg = get_gen_cfg(model)
 
             def gen_attempt(n: int):
-                now = _now_iso()
-
-                # runner-local verified_out 기록(기존 유지)
-                _atomic_write_json(verified_out(jid), {
-                    "pdf_id": pdf_id,
-                    "job_id": jid,
-                    "section_id": section_id,
-                    "status": JobStatusLocal.GENERATING,
-                    "model": model,
-                    "attempts": n,
-                    "model_try": mi,
-                    "model_plan": model_plan,
-                    "updated_at": now,
-                })
-
-                # (명세 job state) RUNNING/GENERATING 기록
-                _write_job_state(
-                    data_dir=data_dir,
-                    pdf_id=pdf_id,
-                    job_id=jid,
-                    section_id=section_id if isinstance(section_id, str) else None,
-                    local_status=JobStatusLocal.GENERATING,
-                    model=model,
-                    attempts=n,
-                    model_plan=model_plan,
-                    detail_stage=None,
-                )
+                mark_generating(job, model, n, mi, model_plan)
 
-                res = generate_questions_for_job(job, gen_cfg, tables=norm_tables)
+                if stream:
+                    res, s_verified, s_llm = generate_streaming(job, gen_cfg, norm_tables)
+                    streamed[id(res)] = (s_verified, s_llm)
+                else:
+                    res = generate_questions_for_job(job, gen_cfg, tables=norm_tables)
                 meta = res.get("meta", {})
                 if isinstance(meta, dict):
                     meta["attempts"] = n
                     res["meta"] = meta
                 return res
 
-            gen_result = _retry(gen_attempt, max_retries=max_retries)
+            gen_result = retry(gen_attempt, max_retries=max_retries)
             last_gen = gen_result
             last_model_used = model
 
@@ -782,77 +994,27 @@ def run(
 
         # ---- generator 최종 실패 ----
         if not isinstance(last_gen.get("questions"), list) or len(last_gen.get("questions", [])) == 0:
-            now = _now_iso()
-
-            fail_payload = {
-                "pdf_id": pdf_id,
-                "job_id": jid,
-                "section_id": section_id,
-                "status": JobStatusLocal.FAILED,
-                "error_type": ErrorType.GENERATOR,
-                "error": last_gen.get("error") or "EMPTY_QUESTIONS",
-                "model": last_model_used,
-                "model_plan": model_plan,
-                "attempts": int(last_gen.get("meta", {}).get("attempts", 1) or 1),
-                "questions": [],
-                "summary": {"OK": 0, "FIXABLE": 0, "REJECT": 0},
-                "stats": {
-                    "total": 0,
-                    "valid_chunk_ids": len(last_gen.get("evidence_candidates", []) or []),
-                },
-                "verified_at": now,
-                "updated_at": now,
-            }
-            _atomic_write_json(verified_out(jid), fail_payload)
-
-            # (명세 job state) FAILED 기록
-            _write_job_state(
-                data_dir=data_dir,
-                pdf_id=pdf_id,
-                job_id=jid,
-                section_id=section_id if isinstance(section_id, str) else None,
-                local_status=JobStatusLocal.FAILED,
-                model=last_model_used,
-                attempts=int(last_gen.get("meta", {}).get("attempts", 1) or 1),
-                model_plan=model_plan,
-                error_code=str(fail_payload.get("error") or "GENERATOR_FAILED"),
-                error_message="문제 생성에 실패했습니다.",
-            )
-
-            return fail_payload
+            return generator_failed(job, last_gen, last_model_used, model_plan)
 
         # ---- 2) VERIFY ----
-        now = _now_iso()
-        _atomic_write_json(verified_out(jid), {
-            "pdf_id": pdf_id,
-            "job_id": jid,
-            "section_id": section_id,
-            "status": JobStatusLocal.VERIFYING,
-            "model": last_model_used,
-            "updated_at": now,
-        })
-
-        # (명세 job state) RUNNING/VERIFYING
-        _write_job_state(
-            data_dir=data_dir,
-            pdf_id=pdf_id,
-            job_id=jid,
-            section_id=section_id if isinstance(section_id, str) else None,
-            local_status=JobStatusLocal.VERIFYING,
-            model=last_model_used,
-            attempts=int(last_gen.get("meta", {}).get("attempts", 1) or 1),
-            model_plan=model_plan,
-        )
-
-        # Phase 1: 구조 검증
-        verified = verify_questions_for_job(
-            job=job,
-            generator_result=last_gen,
-            evidence_chunks=None,
-        )
+        mark_verifying(job, last_gen, last_model_used, model_plan)
+
+        s_verified, s_llm = streamed.get(id(last_gen), (None, None))
+        if s_verified is not None:
+            # --stream: 생성 중에 이미 구조 검증 / LLM 검증을 마침
+            verified = s_verified
+            if s_llm is not None and s_llm.get("questions"):
+                apply_llm_verify(verified, s_llm)
+        else:
+            # Phase 1: 구조 검증
+            verified = verify_questions_for_job(
+                job=job,
+                generator_result=last_gen,
+                evidence_chunks=None,
+            )
 
         # Phase 2: LLM 품질 검증 (OK인 문제만)
-        if enable_llm_verify:
+        if enable_llm_verify and s_verified is None:
             ok_questions = [
                 q for q in verified.get("questions", [])
                 if q.get("verdict") == "OK"
@@ -863,19 +1025,7 @@ def run(
                         ok_questions,
                         LLMVerifyConfig(model=last_model_used, temperature=0.1)
                     )
-                    # 결과 병합
-                    verified["questions"] = merge_verification_results(
-                        verified.get("questions", []),
-                        llm_result.get("questions", [])
-                    )
-                    # summary 재계산
-                    new_summary = {"OK": 0, "FIXABLE": 0, "REJECT": 0}
-                    for q in verified["questions"]:
-                        v = q.get("verdict", "OK")
-                        if v in new_summary:
-                            new_summary[v] += 1
-                    verified["summary"] = new_summary
-                    verified["llm_verify_done"] = True
+                    apply_llm_verify(verified, llm_result)
                 except Exception as e:
                     logger.warning(f"LLM 검증 실패: {e}")
                     verified["llm_verify_done"] = False
@@ -967,125 +1117,265 @@ def run(
                 break
 
         # ---- 3) DONE (runner-local) ----
-        now = _now_iso()
-        payload = {
+        return finish_job(job, last_gen, verified, last_model_used, model_plan)
+
+    # =============================================================================
+    # 병렬 실행
+    # =============================================================================
+
+    def run_job_tracked(job: Dict[str, Any]) -> Dict[str, Any]:
+        # job 단위 LLM 캐시 hit/miss / 토큰 사용량을 job state 에 남기기 위해 워커 스레드 안에서 track
+        with llm_cache.track(), llm_usage.track():
+            return run_job_pipeline(job)
+
+    def on_job_done(
+        i: int,
+        job: Dict[str, Any],
+        payload: Optional[Dict[str, Any]],
+        error: Optional[BaseException],
+    ) -> None:
+        jid = job["job_id"]
+        completed.add(jid)
+
+        if error is None:
+            status = payload.get("status", "?")
+            qs = payload.get("questions", [])
+            model_used = payload.get("model", "?")
+            summary = payload.get("summary", {})
+
+            ok = summary.get("OK", 0)
+            fixable = summary.get("FIXABLE", 0)
+            reject = summary.get("REJECT", 0)
+
+            if status == JobStatusLocal.DONE:
+                logger.info(
+                    f"[{i}/{len(todo)}] {jid}: DONE "
+                    f"questions={len(qs)} (OK={ok}, FIXABLE={fixable}, REJECT={reject}, model={model_used})"
+                )
+                if preview > 0:
+                    block = _preview_block(jid, str(payload.get("section_id", "")), qs, preview)
+                    output_preview(jid, block)
+            else:
+                err = payload.get("error") or payload.get("error_type") or "FAILED"
+                qn = len(qs) if isinstance(qs, list) else 0
+                logger.info(
+                    f"[{i}/{len(todo)}] {jid}: FAILED "
+                    f"questions={qn} (model={model_used}) reason={err}"
+                )
+                if preview > 0:
+                    err_block = _error_preview_block(jid, str(job.get("section_id", "")), str(err))
+                    output_preview(jid, err_block)
+            return
+
+        now_fail = _now_iso()
+        _atomic_write_json(verified_out(jid), {
             "pdf_id": pdf_id,
             "job_id": jid,
-            "section_id": section_id,
-            "status": JobStatusLocal.DONE,
-            "model": last_model_used,
-            "model_plan": model_plan,
-            "attempts": int(last_gen.get("meta", {}).get("attempts", 1) or 1),
-            "questions": verified.get("questions", []),
-            "summary": verified.get("summary", {}),
-            "stats": verified.get("stats", {}),
-            "verified_at": verified.get("verified_at"),
-            "updated_at": now,
-        }
-        _atomic_write_json(verified_out(jid), payload)
+            "section_id": job.get("section_id"),
+            "status": JobStatusLocal.FAILED,
+            "error_type": ErrorType.UNKNOWN,
+            "error": repr(error),
+            "traceback": "".join(traceback.format_exception(type(error), error, error.__traceback__)),
+            "updated_at": now_fail,
+        })
 
-        # (명세 job state) DONE (SAVING)
+        # (명세 job state) FAILED
         _write_job_state(
             data_dir=data_dir,
             pdf_id=pdf_id,
             job_id=jid,
-            section_id=section_id if isinstance(section_id, str) else None,
-            local_status=JobStatusLocal.DONE,
-            model=last_model_used,
-            attempts=int(last_gen.get("meta", {}).get("attempts", 1) or 1),
-            model_plan=model_plan,
+            section_id=job.get("section_id") if isinstance(job.get("section_id"), str) else None,
+            local_status=JobStatusLocal.FAILED,
+            error_code="UNKNOWN_ERROR",
+            error_message=str(error),
         )
 
-        if save_answers_only and last_gen.get("answers_only"):
-            _atomic_write_json(answers_out(jid), {
-                "pdf_id": pdf_id,
-                "job_id": jid,
-                "section_id": section_id,
-                "status": JobStatusLocal.DONE,
-                "answers": last_gen["answers_only"],
-                "updated_at": now,
-            })
+        logger.error(f"[{i}/{len(todo)}] {jid}: FAILED {repr(error)}")
 
-        return payload
+        if preview > 0:
+            err_block = _error_preview_block(jid, str(job.get("section_id", "")), repr(error))
+            output_preview(jid, err_block)
 
     # =============================================================================
-    # 병렬 실행
+    # Batch 모드: 생성 요청 전체 → batch 1개, LLM 검증 요청 전체 → batch 1개
     # =============================================================================
 
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        futures = {ex.submit(run_job_pipeline, j): j for j in todo}
-
-        for i, fut in enumerate(as_completed(futures), 1):
-            job = futures[fut]
+    def run_jobs_batch(jobs_todo: List[Dict[str, Any]]) -> None:
+        """
+        --batch: job 마다 생성/검증 요청을 모아 Batch API 로 제출하고 결과를 대화형과 같은
+        questions_verified/ · data/jobs 형태로 기록한다 (on_job_done 도 같은 것을 호출).
+        model fallback / FIXABLE 재생성은 하지 않고, 부족분은 뒤의 집계 재생성 라운드가 채운다.
+        job 별 llm_cache / llm_usage 통계는 job 마다 카운터를 따로 두고, 그 job 의 단계와
+        batch 요청(custom_id → job)만 거기에 센다 (data/jobs/{job_id}.json 에 batch 전체가 찍히지 않게).
+        """
+        batch_root = out_dir / "batch"
+        job_counters: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        item_job: Dict[str, str] = {}  # custom_id → job_id
+
+        @contextmanager
+        def job_track(jid: str) -> Iterator[None]:
+            cache_c, usage_c = job_counters.setdefault(jid, ({}, {}))
+            with llm_cache.track(cache_c), llm_usage.track(usage_c):
+                yield
+
+        def item_track(custom_id: str):
+            return job_track(item_job[custom_id])
+
+        prepared: Dict[str, Dict[str, Any]] = {}
+        failed: Dict[str, Tuple[Optional[Dict[str, Any]], Optional[BaseException]]] = {}
+        gen_items: List[BatchItem] = []
+
+        # ---- 1) 생성 요청 모으기 ----
+        for job in jobs_todo:
             jid = job["job_id"]
+            with job_track(jid):
+                try:
+                    norm_tables, model_plan = start_job(job)
+                    model = model_plan[0] if model_plan else default_model
+                    gen_cfg = get_gen_cfg(model)
+                    prompt, chunks, gen_tables = prepare_generation(job, gen_cfg, tables=norm_tables)
+                    if prompt is None:
+                        gen_result = generate_questions_for_job(job, gen_cfg, tables=norm_tables)  # NO_EVIDENCE_CHUNKS
+                        failed[jid] = (generator_failed(job, gen_result, model, model_plan), None)
+                        continue
+                    mark_generating(job, model, 1, 1, model_plan)
+                    prepared[jid] = {
+                        "job": job,
+                        "model": model,
+                        "model_plan": model_plan,
+                        "gen_cfg": gen_cfg,
+                        "chunks": chunks,
+                        "tables": gen_tables,
+                    }
+                    item_job[f"gen:{jid}"] = jid
+                    gen_items.append(BatchItem(
+                        f"gen:{jid}", "generate",
+                        text_request(prompt, model=model, temperature=gen_cfg.temperature, schema="questions"),
+                    ))
+                except Exception as e:
+                    failed[jid] = (None, e)
 
-            try:
-                payload = fut.result()
-                completed.add(jid)
-
-                status = payload.get("status", "?")
-                qs = payload.get("questions", [])
-                model_used = payload.get("model", "?")
-                summary = payload.get("summary", {})
-
-                ok = summary.get("OK", 0)
-                fixable = summary.get("FIXABLE", 0)
-                reject = summary.get("REJECT", 0)
-
-                if status == JobStatusLocal.DONE:
-                    logger.info(
-                        f"[{i}/{len(futures)}] {jid}: DONE "
-                        f"questions={len(qs)} (OK={ok}, FIXABLE={fixable}, REJECT={reject}, model={model_used})"
-                    )
-                    if preview > 0:
-                        block = _preview_block(jid, str(payload.get("section_id", "")), qs, preview)
-                        output_preview(jid, block)
-                else:
-                    err = payload.get("error") or payload.get("error_type") or "FAILED"
-                    qn = len(qs) if isinstance(qs, list) else 0
-                    logger.info(
-                        f"[{i}/{len(futures)}] {jid}: FAILED "
-                        f"questions={qn} (model={model_used}) reason={err}"
+        gen_results = run_batch(
+            gen_items, batch_root / "generate", poll_seconds=poll_seconds, log=logger.info, scope=item_track,
+        ) if gen_items else {}
+
+        # ---- 2) 생성 결과 파싱 + 구조 검증 ----
+        verified_by_job: Dict[str, Dict[str, Any]] = {}
+        verify_items: List[BatchItem] = []
+        verify_units: Dict[str, List[Tuple[str, List[Dict[str, Any]]]]] = {}
+
+        for jid, p in prepared.items():
+            job = p["job"]
+            with job_track(jid):
+                try:
+                    resp = gen_results.get(f"gen:{jid}")
+                    if isinstance(resp, BatchItemError) or resp is None:
+                        gen_result = {
+                            "questions": [],
+                            "answers_only": [],
+                            "error": f"BATCH_ERROR: {resp}",
+                            "evidence_candidates": p["chunks"],
+                            "meta": {"job_id": jid, "section_id": job.get("section_id"), "model": p["model"]},
+                        }
+                    else:
+                        gen_result = parse_generation_output(
+                            job, p["gen_cfg"], resp.output_text or "",
+                            chunks=p["chunks"], norm_tables=p["tables"],
+                        )
+                    gen_result.setdefault("meta", {})["attempts"] = 1
+                    p["gen"] = gen_result
+
+                    qs = gen_result.get("questions", [])
+                    _save_generated_debug(
+                        jid=jid,
+                        model_used=p["model"],
+                        gen_result=gen_result,
+                        job=job,
+                        status="DONE" if qs else "FAILED",
+                        extra_error=None if qs else str(gen_result.get("error") or "EMPTY_QUESTIONS"),
+                        normalized_tables=p["tables"],
                     )
-                    if preview > 0:
-                        err_block = _error_preview_block(jid, str(job.get("section_id", "")), str(err))
-                        output_preview(jid, err_block)
+                    if not isinstance(qs, list) or not qs:
+                        failed[jid] = (generator_failed(job, gen_result, p["model"], p["model_plan"]), None)
+                        continue
+
+                    mark_verifying(job, gen_result, p["model"], p["model_plan"])
+                    verified = verify_questions_for_job(job=job, generator_result=gen_result, evidence_chunks=None)
+                    verified_by_job[jid] = verified
+
+                    if enable_llm_verify:
+                        ok_questions = [q for q in verified.get("questions", []) if q.get("verdict") == "OK"]
+                        units = verify_batches(ok_questions, LLMVerifyConfig(model=p["model"], temperature=0.1))
+                        verify_units[jid] = []
+                        for k, unit in enumerate(units):
+                            cid = f"verify:{jid}:{k}"
+                            item_job[cid] = jid
+                            verify_units[jid].append((cid, unit))
+                            verify_items.append(BatchItem(
+                                cid, "verify",
+                                text_request(
+                                    verify_prompt(unit), model=p["model"], temperature=0.1, schema="question_verify",
+                                ),
+                            ))
+                except Exception as e:
+                    failed[jid] = (None, e)
 
-            except KeyboardInterrupt:
-                logger.warning("KeyboardInterrupt received. Stopping...")
-                raise
+        # ---- 3) LLM 품질 검증 ----
+        verify_results = run_batch(
+            verify_items, batch_root / "verify", poll_seconds=poll_seconds, log=logger.info, scope=item_track,
+        ) if verify_items else {}
+        verify_requests = {it.custom_id: it.request for it in verify_items}
 
-            except Exception as e:
-                completed.add(jid)
-
-                now_fail = _now_iso()
-                _atomic_write_json(verified_out(jid), {
-                    "pdf_id": pdf_id,
-                    "job_id": jid,
-                    "section_id": job.get("section_id"),
-                    "status": JobStatusLocal.FAILED,
-                    "error_type": ErrorType.UNKNOWN,
-                    "error": repr(e),
-                    "traceback": traceback.format_exc(),
-                    "updated_at": now_fail,
-                })
-
-                # (명세 job state) FAILED
-                _write_job_state(
-                    data_dir=data_dir,
-                    pdf_id=pdf_id,
-                    job_id=jid,
-                    section_id=job.get("section_id") if isinstance(job.get("section_id"), str) else None,
-                    local_status=JobStatusLocal.FAILED,
-                    error_code="UNKNOWN_ERROR",
-                    error_message=str(e),
-                )
+        for jid, units in verify_units.items():
+            if jid in failed:
+                continue
+            verified = verified_by_job[jid]
+            with job_track(jid):
+                try:
+                    all_results: List[Dict[str, Any]] = []
+                    ok_questions: List[Dict[str, Any]] = []
+                    for cid, unit in units:
+                        ok_questions.extend(unit)
+                        resp = verify_results.get(cid)
+                        parsed = None
+                        if resp is not None and not isinstance(resp, BatchItemError):
+                            parsed = parse_verify_output(resp.output_text or "", unit)
+                            if parsed is None:
+                                llm_cache.evict("verify", verify_requests[cid])
+                        all_results.extend(parsed if parsed is not None else fallback_results(unit))
+                    if ok_questions:
+                        cfg = LLMVerifyConfig(model=prepared[jid]["model"], temperature=0.1)
+                        apply_llm_verify(verified, assemble_verification(ok_questions, all_results, cfg))
+                except Exception as e:
+                    logger.warning(f"LLM 검증 실패: {e}")
+                    verified["llm_verify_done"] = False
 
-                logger.error(f"[{i}/{len(futures)}] {jid}: FAILED {repr(e)}")
+        # ---- 4) DONE 기록 + 결과 처리 (job 순서대로) ----
+        for i, job in enumerate(jobs_todo, 1):
+            jid = job["job_id"]
+            with job_track(jid):
+                if jid in failed:
+                    payload, error = failed[jid]
+                    on_job_done(i, job, payload, error)
+                    continue
+                p = prepared[jid]
+                try:
+                    payload = finish_job(job, p["gen"], verified_by_job[jid], p["model"], p["model_plan"])
+                except Exception as e:
+                    on_job_done(i, job, None, e)
+                    continue
+                on_job_done(i, job, payload, None)
 
-                if preview > 0:
-                    err_block = _error_preview_block(jid, str(job.get("section_id", "")), repr(e))
-                    output_preview(jid, err_block)
+    # job 하나가 생성 → 검증 → 재생성까지 여러 동기 단계라 core.llm_async 엔진의 스레드 워커로 돌린다
+    # (결과 처리/미리보기는 엔진이 완료 순서대로 한 스레드에서 호출)
+    try:
+        if batch:
+            run_jobs_batch(todo)
+        else:
+            run_tasks(todo, run_job_tracked, concurrency=max_workers, on_done=on_job_done)
+    except KeyboardInterrupt:
+        logger.warning("KeyboardInterrupt received. Stopping...")
+        raise
 
     # Tail flush
     if ordered_preview and preview > 0:
@@ -1257,6 +1547,9 @@ def run(
             "target_total": effective_target,
             "is_satisfied": aggregate_result.is_satisfied,
             "regeneration_rounds": regeneration_rounds,
+            "llm_cache": llm_cache.cache_stats(),
+            "llm_parse": llm_schemas.parse_stats(),
+            "llm_usage": llm_usage.usage_stats(),
         },
         "paths": {
             "verified_dir": str(verified_dir),
@@ -1325,6 +1618,11 @@ def main():
     ap.add_argument("--no_llm_verify", action="store_true", help="LLM 품질 검증 비활성화")
     ap.add_argument("--target_total", type=int, default=0, help="목표 문제 총 개수 (0이면 job별 합계)")
     ap.add_argument("--max_regen_rounds", type=int, default=2, help="최대 재생성 라운드 (0이면 재생성 안함)")
+    ap.add_argument("--batch", action="store_true",
+                    help="생성/LLM 검증 요청을 Batch API 로 모아 제출 (야간 대량 처리용, LLM_BATCH_BASE_URL)")
+    ap.add_argument("--poll_seconds", type=float, default=None, help="--batch 상태 확인 간격(초)")
+    ap.add_argument("--stream", action="store_true",
+                    help="생성 출력을 스트리밍으로 받아 문제가 나오는 대로 구조/LLM 검증 시작")
 
     args = ap.parse_args()
 
@@ -1350,7 +1648,11 @@ def main():
         enable_llm_verify=not args.no_llm_verify,
         target_total=args.target_total,
         max_regeneration_rounds=args.max_regen_rounds,
+        batch=args.batch,
+        poll_seconds=args.poll_seconds,
+        stream=args.stream,
     )
+    llm_usage.write_report(Path(args.out_dir), "questions", pdf_id=args.pdf_id)
 
 
 if __name__ == "__main__":
@@ -2,17 +2,24 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import contextvars
 import json
 import logging
-import random
-import time
+import threading
 import traceback
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from core.table_mm import extract_tables_mm
+from core import image_payload, llm_cache, llm_schemas, llm_usage
+from core.llm_async import run_tasks
+from core.llm_client import close_async_client
+from core.llm_batch import BatchItem, BatchItemError, run_batch
+from core.page_render import PageRenderer, page_image_path
+from core.retry_policy import retry_async
+from core.table_local import DEFAULT_MIN_CONFIDENCE, LOCAL_EXTRACT_VERSION, extract_tables_local_pages
+from core.table_mm import extract_request, extract_tables_mm_async, result_from_response
 
 PROMPT_VERSION = "extract_v1"
 
@@ -43,21 +50,6 @@ def _load_json_safe(path: Path) -> Optional[Dict[str, Any]]:
         return None
 
 
-def _retry(fn, max_retries: int = 5, base_delay: float = 1.0):
-    last = None
-    for attempt in range(1, max_retries + 1):
-        try:
-            return fn(attempt)
-        except KeyboardInterrupt:
-            raise
-        except Exception as e:
-            last = e
-            if attempt < max_retries:
-                delay = base_delay * (2 ** (attempt - 1)) + random.uniform(0, 0.3)
-                time.sleep(min(delay, 20))
-    raise last
-
-
 def _load_existing_results(per_page_dir: Path) -> Dict[int, Dict[str, Any]]:
     """페이지별 결과 로드 (page_*.json)"""
     existing: Dict[int, Dict[str, Any]] = {}
@@ -120,11 +112,91 @@ def _write_aggregate(out_dir: Path, pdf_id: str, existing_by_page: Dict[int, Dic
             "num_pages_with_tables": len(by_page),
             "num_tables_total": sum(len(v) for v in by_page.values()),
             "num_errors": sum(1 for it in items if it.get("status") == "error"),
+            # gpt-4o 없이 텍스트 레이어로 확정된 페이지 수
+            "num_local": sum(1 for it in items if it.get("source") == "local"),
+            "llm_cache": llm_cache.cache_stats(),
+            "llm_parse": llm_schemas.parse_stats(),
+            "llm_usage": llm_usage.usage_stats(),
+            "image_cache": image_payload.cache_stats(),
         },
     }
     _atomic_write_json(out_dir / "tables_by_page.json", agg)
 
 
+def _now() -> str:
+    return datetime.now(timezone.utc).astimezone().isoformat()
+
+
+def _local_payload(pi: int, r: Any, renderer: PageRenderer, out_dir: Path) -> Dict[str, Any]:
+    return {
+        "page_index": pi,
+        "page_png": str(renderer.path(pi).relative_to(out_dir)),
+        "status": "ok",
+        "attempts": 0,
+        "tables": _normalize_tables(r.tables, page_index=pi),
+        "prompt_version": LOCAL_EXTRACT_VERSION,
+        "source": "local",
+        "local_confidence": r.confidence,
+        "updated_at": _now(),
+    }
+
+
+def _mm_payload(
+    pi: int,
+    out_dir: Path,
+    result: Optional[Tuple[List[Dict[str, Any]], int]],
+    error: Optional[BaseException],
+    max_retries: int,
+) -> Dict[str, Any]:
+    page_png = str(page_image_path(out_dir / "pages_png", pi).relative_to(out_dir))
+    if error is None:
+        tables, attempts = result
+        return {
+            "page_index": pi,
+            "page_png": page_png,
+            "status": "ok",
+            "attempts": attempts,
+            "tables": tables,
+            "prompt_version": PROMPT_VERSION,
+            "source": "mm",
+            "updated_at": _now(),
+        }
+    return {
+        "page_index": pi,
+        "page_png": page_png,
+        "status": "error",
+        "error": repr(error),
+        "traceback": "".join(traceback.format_exception(type(error), error, error.__traceback__)),
+        "attempts": max_retries,
+        "tables": [],
+        "prompt_version": PROMPT_VERSION,
+        "updated_at": _now(),
+    }
+
+
+async def _extract_page(
+    pi: int,
+    *,
+    out_dir: Path,
+    renderer: Optional[PageRenderer],
+    max_retries: int,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """gpt-4o 로 한 페이지 추출 (lazy render 면 여기서 렌더)"""
+    if renderer is not None:
+        img = await asyncio.to_thread(renderer.get, pi)
+    else:
+        img = page_image_path(out_dir / "pages_png", pi)
+    if not img.exists():
+        raise FileNotFoundError(f"Missing image: {img}")
+
+    async def _do(attempt: int):
+        r = await extract_tables_mm_async(img, pi)
+        return r.tables, attempt
+
+    tables, attempts = await retry_async(_do, max_retries=max_retries)
+    return _normalize_tables(tables, page_index=pi), attempts
+
+
 def run(
     out_dir: Path = Path("artifacts/lecture"),
     pdf_id: str = "lecture",
@@ -133,9 +205,15 @@ def run(
     overwrite: bool = False,
     retry_errors: bool = True,
     flush_every: int = 5,
+    local_first: bool = True,
+    min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+    batch: bool = False,
+    poll_seconds: Optional[float] = None,
 ) -> Dict[str, Any]:
     out_dir = Path(out_dir)
     pages_dir = out_dir / "pages_png"
+    # prepare --render lazy 면 표가 있는 페이지만 여기서 렌더된다
+    renderer = PageRenderer.for_out_dir(out_dir)
     status_path = out_dir / "page_status.json"
 
     if not status_path.exists():
@@ -171,87 +249,260 @@ def run(
 
     logger.info(f"has_table_pages={len(table_pages)}, todo={len(todo)}, workers={max_workers}")
 
+    # 텍스트 레이어 fast path: confidence 가 충분한 페이지는 gpt-4o 없이 확정
+    if local_first and todo:
+        if renderer is None:
+            logger.info("Local fast path skipped: prepare_status.json has no pdf_path.")
+        else:
+            local = extract_tables_local_pages(renderer.pdf_path, todo)
+            for pi in todo:
+                r = local[pi]
+                if r.confidence < min_confidence:
+                    continue
+                payload = _local_payload(pi, r, renderer, out_dir)
+                _atomic_write_json(per_page_dir / f"page_{pi:03d}.json", payload)
+                existing_by_page[pi] = payload
+            n_before = len(todo)
+            todo = [pi for pi in todo if local[pi].confidence < min_confidence]
+            logger.info(f"local fast path: {n_before - len(todo)}/{n_before} pages resolved, MM todo={len(todo)}")
+
     # ✅ 이미 다 했으면 집계만 최신화하고 종료
     if not todo:
         logger.info("Nothing to do. Writing aggregate and exiting.")
         _write_aggregate(out_dir, pdf_id, existing_by_page)
         return _load_json_safe(out_dir / "tables_by_page.json") or {}
 
-    def _extract(pi: int) -> Tuple[int, List[Dict[str, Any]], int]:
-        img = pages_dir / f"page_{pi:03d}.png"
-        if not img.exists():
-            raise FileNotFoundError(f"Missing image: {img}")
+    async def _extract(pi: int) -> Tuple[List[Dict[str, Any]], int]:
+        return await _extract_page(pi, out_dir=out_dir, renderer=renderer, max_retries=max_retries)
+
+    def _on_done(
+        i: int,
+        pi: int,
+        result: Optional[Tuple[List[Dict[str, Any]], int]],
+        error: Optional[BaseException],
+    ) -> None:
+        payload = _mm_payload(pi, out_dir, result, error, max_retries)
+        _atomic_write_json(per_page_dir / f"page_{pi:03d}.json", payload)
+        existing_by_page[pi] = payload  # ✅ 메모리 갱신
+
+        if error is None:
+            logger.info(f"[{i}/{len(todo)}] page {pi}: {len(payload['tables'])} tables (attempts={payload['attempts']})")
+        else:
+            logger.error(f"[{i}/{len(todo)}] page {pi} ERROR: {repr(error)}")
+
+        # 주기적으로 집계
+        if flush_every > 0 and (i % flush_every == 0 or i == len(todo)):
+            _write_aggregate(out_dir, pdf_id, existing_by_page)
+
+    def _run_batch(pages: List[int], on_done) -> None:
+        """--batch: 남은 페이지를 Batch API 로 한 번에 제출하고 결과를 _on_done 으로 흘려보낸다"""
+        items: List[BatchItem] = []
+        failed: Dict[int, BaseException] = {}
+        for pi in pages:
+            # 페이지 하나의 이미지가 없거나 렌더가 실패해도 나머지는 제출한다 (그 페이지만 error → retry_errors)
+            try:
+                img = renderer.get(pi) if renderer is not None else page_image_path(pages_dir, pi)
+                items.append(BatchItem(f"page_{pi:03d}", "extract", extract_request(img)))
+            except Exception as e:
+                failed[pi] = e
+        requests = {it.custom_id: it.request for it in items}
+        results = run_batch(items, out_dir / "batch" / "extract", poll_seconds=poll_seconds, log=logger.info) if items else {}
+
+        for i, pi in enumerate(pages, 1):
+            if pi in failed:
+                on_done(i, pi, None, failed[pi])
+                continue
+            r = results[f"page_{pi:03d}"]
+            if isinstance(r, BatchItemError):
+                on_done(i, pi, None, r)
+                continue
+            try:
+                tables = result_from_response(r, pi).tables
+            except Exception as e:
+                # 파싱 못 한 응답이 캐시에 남으면 retry_errors 재실행도 같은 응답을 받는다
+                llm_cache.evict("extract", requests[f"page_{pi:03d}"])
+                on_done(i, pi, None, e)
+                continue
+            on_done(i, pi, (_normalize_tables(tables, page_index=pi), 1), None)
+
+    try:
+        if batch:
+            _run_batch(todo, _on_done)
+        else:
+            run_tasks(todo, _extract, concurrency=max_workers, on_done=_on_done)
+    except KeyboardInterrupt:
+        logger.warning("KeyboardInterrupt received. Stopping...")
+        raise
 
-        def _do(attempt: int):
-            r = extract_tables_mm(img, pi)
-            return r.tables, attempt
+    # ✅ 최종 집계 1회 보장
+    _write_aggregate(out_dir, pdf_id, existing_by_page)
+    return _load_json_safe(out_dir / "tables_by_page.json") or {}
 
-        tables, attempts = _retry(_do, max_retries=max_retries)
-        tables = _normalize_tables(tables, page_index=pi)
-        return pi, tables, attempts
 
-    completed = 0
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        fut_map = {ex.submit(_extract, pi): pi for pi in todo}
 
-        for i, fut in enumerate(as_completed(fut_map), 1):
-            completed += 1
-            pi = fut_map[fut]
-            out_path = per_page_dir / f"page_{pi:03d}.json"
+class StreamingTableExtractor:
+    """
+    표 있는 페이지가 확정되는 대로 추출 (core.run_table_pipeline 용, presence 와 stage barrier 없이).
+    백그라운드 스레드 하나가 자기 event loop 에서 max_workers 개의 추출을 돌린다.
+    submit 된 페이지는 local fast path → (confidence 부족이면) gpt-4o 순서로, run() 과 같은 page_*.json 을 쓴다.
 
-            try:
-                pi2, tables, attempts = fut.result()
-                payload = {
-                    "page_index": pi2,
-                    "page_png": str((pages_dir / f"page_{pi2:03d}.png").relative_to(out_dir)),
-                    "status": "ok",
-                    "attempts": attempts,
-                    "tables": tables,
-                    "prompt_version": PROMPT_VERSION,
-                    "updated_at": datetime.now(timezone.utc).astimezone().isoformat(),
-                }
-                _atomic_write_json(out_path, payload)
-                existing_by_page[pi2] = payload  # ✅ 메모리 갱신
-                logger.info(f"[{i}/{len(fut_map)}] page {pi2}: {len(tables)} tables (attempts={attempts})")
-
-            except KeyboardInterrupt:
-                logger.warning("KeyboardInterrupt received. Stopping...")
-                raise
+        ex = StreamingTableExtractor(out_dir, pdf_id)
+        ex.submit(pi)  ...                  # presence 의 on_page 에서
+        agg = ex.close()                    # 남은 추출까지 끝내고 tables_by_page.json 반환
 
-            except Exception as e:
-                payload = {
-                    "page_index": pi,
-                    "page_png": str((pages_dir / f"page_{pi:03d}.png").relative_to(out_dir)),
-                    "status": "error",
-                    "error": repr(e),
-                    "traceback": traceback.format_exc(),
-                    "attempts": max_retries,
-                    "tables": [],
-                    "prompt_version": PROMPT_VERSION,
-                    "updated_at": datetime.now(timezone.utc).astimezone().isoformat(),
-                }
-                _atomic_write_json(out_path, payload)
-                existing_by_page[pi] = payload  # ✅ 메모리 갱신
-                logger.error(f"[{i}/{len(fut_map)}] page {pi} ERROR: {repr(e)}")
-
-            # 주기적으로 집계
-            if flush_every > 0 and (completed % flush_every == 0 or completed == len(fut_map)):
-                _write_aggregate(out_dir, pdf_id, existing_by_page)
+    이어하기 규칙은 run() 과 같다 (이미 ok 인 페이지는 건너뜀, error 는 retry_errors 면 다시).
+    """
 
-    # ✅ 최종 집계 1회 보장
-    _write_aggregate(out_dir, pdf_id, existing_by_page)
-    return _load_json_safe(out_dir / "tables_by_page.json") or {}
+    def __init__(
+        self,
+        out_dir: Path,
+        pdf_id: str,
+        max_workers: int = 2,
+        max_retries: int = 5,
+        overwrite: bool = False,
+        retry_errors: bool = True,
+        flush_every: int = 5,
+        local_first: bool = True,
+        min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+    ):
+        self.out_dir = Path(out_dir)
+        self.pdf_id = pdf_id
+        self.max_workers = max(1, int(max_workers))
+        self.max_retries = max_retries
+        self.overwrite = overwrite
+        self.retry_errors = retry_errors
+        self.flush_every = flush_every
+        self.min_confidence = min_confidence
+
+        self.renderer = PageRenderer.for_out_dir(self.out_dir)
+        self.local_first = local_first and self.renderer is not None
+        if local_first and self.renderer is None:
+            logger.info("Local fast path skipped: prepare_status.json has no pdf_path.")
+
+        self.per_page_dir = self.out_dir / "tables_by_page"
+        self.per_page_dir.mkdir(parents=True, exist_ok=True)
+        self.existing_by_page: Dict[int, Dict[str, Any]] = _load_existing_results(self.per_page_dir)
+
+        self._submitted: Set[int] = set()
+        self._done = 0
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._queue: "asyncio.Queue[Optional[int]]" = asyncio.Queue()
+        self._closed = False
+        # 호출한 스레드의 contextvars(job 단위 llm_cache / llm_usage track)를 그대로 이어받는다
+        ctx = contextvars.copy_context()
+        self._thread = threading.Thread(target=ctx.run, args=(self._run,), name="table-extract-stream", daemon=True)
+        self._thread.start()
+
+    def _should_do(self, pi: int) -> bool:
+        if self.overwrite:
+            return True
+        if pi not in self.existing_by_page:
+            return True
+        return self.retry_errors and self.existing_by_page[pi].get("status") == "error"
+
+    def submit(self, pi: int) -> bool:
+        """추출 대기열에 넣는다. 이미 넣었거나 결과가 있어 건너뛰면 False."""
+        pi = int(pi)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("StreamingTableExtractor is closed")
+            if pi in self._submitted or not self._should_do(pi):
+                return False
+            self._submitted.add(pi)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, pi)
+        return True
+
+    def close(self, cancel: bool = False) -> Dict[str, Any]:
+        """
+        남은 추출까지 끝내고 집계를 써서 반환. cancel=True 면 대기 중 / 진행 중인 추출을 버린다
+        (이미 쓴 page_*.json 은 남으므로 다음 실행이 이어서 한다).
+        """
+        with self._lock:
+            self._closed = True
+        if cancel:
+            self._loop.call_soon_threadsafe(self._cancel_all)
+        else:
+            for _ in range(self.max_workers):
+                self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+        self._thread.join()
+        _write_aggregate(self.out_dir, self.pdf_id, self.existing_by_page)
+        return _load_json_safe(self.out_dir / "tables_by_page.json") or {}
+
+    @property
+    def num_submitted(self) -> int:
+        with self._lock:
+            return len(self._submitted)
+
+    def _cancel_all(self) -> None:
+        for t in asyncio.all_tasks(self._loop):
+            t.cancel()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._main())
+        finally:
+            self._loop.close()
+
+    async def _main(self) -> None:
+        try:
+            await asyncio.gather(*(self._worker() for _ in range(self.max_workers)))
+        except asyncio.CancelledError:
+            logger.warning("table extract stream cancelled")
+        finally:
+            await close_async_client()
+
+    async def _worker(self) -> None:
+        while True:
+            pi = await self._queue.get()
+            if pi is None:
+                return
+            payload = await self._extract(pi)
+            # 결과 기록은 loop 스레드에서만 (run() 의 on_done 과 같은 모양이라 lock 불필요)
+            _atomic_write_json(self.per_page_dir / f"page_{pi:03d}.json", payload)
+            self.existing_by_page[pi] = payload
+            self._done += 1
+            n = self.num_submitted
+            if payload["status"] == "ok":
+                logger.info(f"[extract {self._done}/{n}] page {pi}: {len(payload['tables'])} tables "
+                            f"(source={payload.get('source')}, attempts={payload['attempts']})")
+            else:
+                logger.error(f"[extract {self._done}/{n}] page {pi} ERROR: {payload['error']}")
+            if self.flush_every > 0 and self._done % self.flush_every == 0:
+                _write_aggregate(self.out_dir, self.pdf_id, self.existing_by_page)
+
+    async def _extract(self, pi: int) -> Dict[str, Any]:
+        if self.local_first:
+            try:
+                local = await asyncio.to_thread(extract_tables_local_pages, self.renderer.pdf_path, [pi])
+            except Exception as e:
+                logger.warning(f"local fast path failed on page {pi}: {e!r}")
+            else:
+                if local[pi].confidence >= self.min_confidence:
+                    return _local_payload(pi, local[pi], self.renderer, self.out_dir)
+        try:
+            result = await _extract_page(pi, out_dir=self.out_dir, renderer=self.renderer, max_retries=self.max_retries)
+        except Exception as e:
+            return _mm_payload(pi, self.out_dir, None, e, self.max_retries)
+        return _mm_payload(pi, self.out_dir, result, None, self.max_retries)
 
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--out_dir", type=str, default="artifacts/lecture")
     ap.add_argument("--pdf_id", type=str, default="lecture")
-    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--workers", type=int, default=2, help="동시에 걸어둘 MM 요청 수 (asyncio, 스레드 아님)")
     ap.add_argument("--max_retries", type=int, default=5)
     ap.add_argument("--overwrite", action="store_true")
     ap.add_argument("--no_retry_errors", action="store_true")
     ap.add_argument("--flush_every", type=int, default=5)
+    ap.add_argument("--no_local", action="store_true", help="텍스트 레이어 fast path 없이 모든 페이지를 MM 으로 추출")
+    ap.add_argument("--min_confidence", type=float, default=DEFAULT_MIN_CONFIDENCE,
+                    help="로컬 추출을 그대로 쓰는 최소 confidence (미만이면 MM fallback)")
+    ap.add_argument("--batch", action="store_true",
+                    help="Batch API 로 한 번에 제출하고 완료까지 기다림 (야간 대량 처리용, LLM_BATCH_BASE_URL)")
+    ap.add_argument("--poll_seconds", type=float, default=None, help="--batch 상태 확인 간격(초)")
     args = ap.parse_args()
 
     run(
@@ -262,7 +513,12 @@ def main():
         overwrite=args.overwrite,
         retry_errors=not args.no_retry_errors,
         flush_every=args.flush_every,
+        local_first=not args.no_local,
+        min_confidence=args.min_confidence,
+        batch=args.batch,
+        poll_seconds=args.poll_seconds,
     )
+    llm_usage.write_report(Path(args.out_dir), "table_extract", pdf_id=args.pdf_id)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,151 @@
+# core/run_table_pipeline.py
+"""
+표 존재 탐지 → 표 추출을 stage barrier 없이 한 프로세스에서 (producer / consumer)
+
+run_table_extract_mm 은 문서 전체의 page_status.json 이 나와야 시작해서, 추출이 가장 느린 presence 배치를
+기다린다. 여기서는 run_table_presence.run 이 표 있는 페이지를 확정하는 대로 (on_page)
+run_table_extract_mm.StreamingTableExtractor 에 넘기고, presence 가 나머지 배치를 도는 동안 추출이 같이 돈다.
+presence 는 이 스레드의 event loop, 추출은 백그라운드 스레드의 event loop 에서 돌고
+stage 별 동시 실행 제한(LLM_CONCURRENCY_PRESENCE / _EXTRACT)은 각자 그대로 걸린다.
+
+결과 파일은 따로 돌릴 때와 같다 (page_status.json / tables_by_page/page_*.json / tables_by_page.json).
+이어하기도 각자의 규칙 그대로:
+  - presence 는 page_status.json 에 있는 페이지를 건너뛰고, 이미 표 있음인 페이지는 시작하자마자 추출로 넘긴다
+  - 추출은 page_*.json 이 ok 인 페이지를 건너뛴다
+중간에 끊겨도 다시 실행하면 되고, 이 다음에 run_table_extract_mm 을 따로 돌려도 집계만 새로 쓴다.
+
+--merged (탐지 + 추출 한 번에) 는 추출 단계가 따로 없으므로 여기서 쓰지 않는다.
+
+실행:
+  python -m core.run_table_pipeline --out_dir artifacts/lecture --pdf_id lecture [--contact_sheet]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from core import llm_usage
+from core.run_table_extract_mm import StreamingTableExtractor
+from core.run_table_presence import DEFAULT_BATCH_SIZE
+from core.run_table_presence import run as run_presence
+from core.table_local import DEFAULT_MIN_CONFIDENCE
+
+
+def run(
+    out_dir: Path = Path("artifacts/lecture"),
+    pdf_id: str = "lecture",
+    max_pages: Optional[int] = None,
+    presence_workers: int = 3,
+    extract_workers: int = 2,
+    max_retries: int = 5,
+    retry_errors: bool = True,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    use_batch: bool = True,
+    prefilter: bool = True,
+    contact_sheet: bool = False,
+    sheet_token_budget: Optional[int] = None,
+    sheet_cell_px: Optional[int] = None,
+    local_first: bool = True,
+    min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+) -> Dict[str, Any]:
+    """presence 와 추출을 겹쳐서 실행. {"presence": page_status, "tables": tables_by_page} 반환."""
+    out_dir = Path(out_dir)
+    t0 = time.monotonic()
+    first_submit: Dict[str, float] = {}
+
+    extractor = StreamingTableExtractor(
+        out_dir,
+        pdf_id,
+        max_workers=extract_workers,
+        max_retries=max_retries,
+        retry_errors=retry_errors,
+        local_first=local_first,
+        min_confidence=min_confidence,
+    )
+
+    def _on_page(row: Dict[str, Any]) -> None:
+        if extractor.submit(int(row["page_index"])):
+            first_submit.setdefault("t", time.monotonic() - t0)
+
+    try:
+        presence = run_presence(
+            out_dir=out_dir,
+            pdf_id=pdf_id,
+            max_pages=max_pages,
+            max_workers=presence_workers,
+            max_retries=max_retries,
+            retry_errors=retry_errors,
+            batch_size=batch_size,
+            use_batch=use_batch,
+            prefilter=prefilter,
+            contact_sheet=contact_sheet,
+            sheet_token_budget=sheet_token_budget,
+            sheet_cell_px=sheet_cell_px,
+            on_page=_on_page,
+        )
+    except BaseException:
+        # 이미 쓴 결과는 남기고 (다음 실행이 이어서 함) 진행 중인 추출은 버린다
+        extractor.close(cancel=True)
+        raise
+
+    t_presence = time.monotonic() - t0
+    tables = extractor.close()
+    t_total = time.monotonic() - t0
+
+    if "t" in first_submit:
+        print(f"[pipeline] presence {t_presence:.1f}s, 추출 {extractor.num_submitted}페이지 (첫 추출 시작 {first_submit['t']:.1f}s)")
+    else:
+        print(f"[pipeline] presence {t_presence:.1f}s, 새로 추출할 페이지 없음")
+    print(f"[pipeline] 전체 {t_total:.1f}s (presence 이후 추가 대기 {t_total - t_presence:.1f}s)")
+    return {"presence": presence, "tables": tables}
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="표 존재 탐지 + 표 추출을 겹쳐서 실행 (stage barrier 없음)")
+    ap.add_argument("--out_dir", default="artifacts/lecture")
+    ap.add_argument("--pdf_id", default="lecture")
+    ap.add_argument("--max_pages", type=int, default=None)
+    ap.add_argument("--workers", type=int, default=3, help="presence 동시 MM 요청 수")
+    ap.add_argument("--extract_workers", type=int, default=2, help="추출 동시 MM 요청 수")
+    ap.add_argument("--max_retries", type=int, default=5)
+    ap.add_argument("--no_retry_errors", action="store_true")
+    ap.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE, help=f"presence 배치당 페이지 수 (default: {DEFAULT_BATCH_SIZE})")
+    ap.add_argument("--no_batch", action="store_true", help="presence 배치 모드 비활성화 (개별 처리)")
+    ap.add_argument("--no_prefilter", action="store_true", help="로컬 사전 분류 없이 모든 페이지를 MM 으로 판단")
+    ap.add_argument("--contact_sheet", action="store_true", help="presence 를 썸네일 격자 한 장씩으로 (run_table_presence --contact_sheet)")
+    ap.add_argument("--sheet_token_budget", type=int, default=None)
+    ap.add_argument("--sheet_cell_px", type=int, default=None)
+    ap.add_argument("--no_local", action="store_true", help="텍스트 레이어 fast path 없이 모든 표 페이지를 MM 으로 추출")
+    ap.add_argument("--min_confidence", type=float, default=DEFAULT_MIN_CONFIDENCE,
+                    help="로컬 추출을 그대로 쓰는 최소 confidence (미만이면 MM fallback)")
+    ap.add_argument("--print_json", action="store_true", help="결과 JSON을 stdout으로 출력")
+    args = ap.parse_args(argv)
+
+    result = run(
+        out_dir=Path(args.out_dir),
+        pdf_id=args.pdf_id,
+        max_pages=args.max_pages,
+        presence_workers=args.workers,
+        extract_workers=args.extract_workers,
+        max_retries=args.max_retries,
+        retry_errors=not args.no_retry_errors,
+        batch_size=args.batch_size,
+        use_batch=not args.no_batch,
+        prefilter=not args.no_prefilter,
+        contact_sheet=args.contact_sheet,
+        sheet_token_budget=args.sheet_token_budget,
+        sheet_cell_px=args.sheet_cell_px,
+        local_first=not args.no_local,
+        min_confidence=args.min_confidence,
+    )
+    llm_usage.write_report(Path(args.out_dir), "table_pipeline", pdf_id=args.pdf_id)
+
+    if args.print_json:
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,20 +3,43 @@ from __future__ import annotations
 
 import argparse
 from pathlib import Path
-from typing import Dict, Any, Optional, Tuple, List
+from typing import Callable, Dict, Any, Optional, Set, Tuple, List
+import asyncio
 import json
-import random
-import time
 from datetime import datetime, timezone
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from core.mm_table_presence import detect_table_presence_mm, detect_table_presence_batch
+from core import image_payload, llm_cache, llm_schemas, llm_usage
+from core.contact_sheet import SheetLayout, page_size, plan_layout
+from core.llm_async import run_tasks
+from core.mm_table_presence import (
+    detect_table_presence_batch_async,
+    detect_table_presence_mm_async,
+    detect_table_presence_sheet_async,
+)
+from core.page_render import PageRenderer, list_page_images
+from core.retry_policy import retry_async
+from core.table_detect_extract import (
+    DETECT_EXTRACT_VERSION,
+    ESCALATE_AUTO,
+    ESCALATE_MODES,
+    ESCALATION_MODEL,
+    detect_extract_batch_async,
+    escalation_reason,
+    merged_model,
+)
+from core.table_local import DEFAULT_MIN_CONFIDENCE, LOCAL_EXTRACT_VERSION, extract_tables_local_pages
+from core.table_mm import extract_tables_mm_async
+from core.table_prefilter import PREFILTER_VERSION, layout_spans_loader, prefilter_pages
 
 
 # =============================================================================
 # 상수
 # =============================================================================
 DEFAULT_BATCH_SIZE = 5  # 한 번의 API 호출로 처리할 페이지 수
+DEFAULT_MERGED_BATCH_SIZE = 1  # merged 모드: 표 내용까지 받으므로 묶음은 작게
+
+# 표 있음(has_table=True, status=ok)으로 확정된 페이지 행을 받는 콜백 (core.run_table_pipeline)
+OnTablePage = Callable[[Dict[str, Any]], None]
 
 
 def _atomic_write_json(path: Path, obj: Dict[str, Any]) -> None:
@@ -42,16 +65,39 @@ def _page_index(png: Path) -> int:
     return int(png.stem.split("_")[-1])
 
 
-def _retry(fn, max_retries: int = 5, base_delay: float = 1.0):
-    last = None
-    for attempt in range(1, max_retries + 1):
-        try:
-            return fn(attempt)
-        except Exception as e:
-            last = e
-            delay = base_delay * (2 ** (attempt - 1)) + random.uniform(0, 0.3)
-            time.sleep(min(delay, 15))
-    raise last
+def _write_status(
+    status_path: Path,
+    pdf_id: str,
+    page_count_total: int,
+    pages_status: Dict[int, Dict[str, Any]],
+    prompt_version: str,
+    **extra: Any,
+) -> None:
+    _atomic_write_json(status_path, {
+        "pdf_id": pdf_id,
+        "page_count": page_count_total,
+        "updated_at": datetime.now(timezone.utc).astimezone().isoformat(),
+        "prompt_version": prompt_version,
+        **extra,
+        "pages": sorted(pages_status.values(), key=lambda x: x["page_index"]),
+        "summary": {
+            "num_pages": len(pages_status),
+            "num_ok": sum(1 for v in pages_status.values() if v.get("status") == "ok"),
+            "num_errors": sum(1 for v in pages_status.values() if v.get("status") == "error"),
+            "num_has_table": sum(
+                1 for v in pages_status.values()
+                if v.get("status") == "ok" and v.get("has_table") is True
+            ),
+            # MM 없이 로컬 prefilter 로 확정된 페이지 수
+            "num_prefiltered": sum(1 for v in pages_status.values() if v.get("source") == "prefilter"),
+            # merged 모드에서 gpt-4o 로 다시 추출한 페이지 수
+            "num_escalated": sum(1 for v in pages_status.values() if v.get("escalation")),
+            "llm_cache": llm_cache.cache_stats(),
+            "llm_parse": llm_schemas.parse_stats(),
+            "llm_usage": llm_usage.usage_stats(),
+            "image_cache": image_payload.cache_stats(),
+        }
+    })
 
 
 def _chunk_list(lst: List[Any], chunk_size: int) -> List[List[Any]]:
@@ -69,13 +115,34 @@ def run(
     flush_every: int = 1,
     batch_size: int = DEFAULT_BATCH_SIZE,
     use_batch: bool = True,
+    prefilter: bool = True,
+    merged: bool = False,
+    merged_batch_size: int = DEFAULT_MERGED_BATCH_SIZE,
+    escalate: str = ESCALATE_AUTO,
+    contact_sheet: bool = False,
+    sheet_token_budget: Optional[int] = None,
+    sheet_cell_px: Optional[int] = None,
+    on_page: Optional[OnTablePage] = None,
 ) -> Dict[str, Any]:
+    """
+    on_page 가 있으면 표 있는 페이지가 확정될 때마다 (이전 실행 결과 / prefilter / MM 배치 완료 순서대로)
+    그 페이지 행으로 호출한다 (진행 파일 기록 직후). 콜백 쪽 작업이 먼저 끝나고 여기서 중단돼도
+    다음 실행은 그 페이지를 다시 탐지할 뿐이고 결과 파일은 각자 이어하기 규칙대로 건너뛴다.
+    """
 
     out_dir = Path(out_dir)
     pages_dir = out_dir / "pages_png"
     status_path = out_dir / "page_status.json"
 
-    all_pngs = sorted(pages_dir.glob("page_*.png"))
+    all_pngs = list_page_images(pages_dir)
+
+    # prepare --render lazy: 이미지가 (일부) 없으면 필요한 페이지만 그때 렌더
+    page_renderer = PageRenderer.for_out_dir(out_dir)
+    renderer: Optional[PageRenderer] = None
+    if page_renderer is not None and len(all_pngs) < page_renderer.page_count:
+        all_pngs = [page_renderer.path(i) for i in range(page_renderer.page_count)]
+        renderer = page_renderer
+
     if not all_pngs:
         raise FileNotFoundError("pages_png not found. Run prepare first.")
 
@@ -99,13 +166,104 @@ def run(
             return True
         return False
 
+    def _emit(pis: List[int]) -> None:
+        if on_page is None:
+            return
+        for pi in pis:
+            row = pages_status.get(pi)
+            if row and row.get("status") == "ok" and row.get("has_table") is True:
+                on_page(row)
+
+    # 이어하기: 이미 표 있음으로 확정된 페이지는 바로 넘긴다
+    _emit(sorted(_page_index(p) for p in pngs if not _should_do(_page_index(p))))
+
     todo: List[Tuple[int, Path]] = [(_page_index(p), p) for p in pngs if _should_do(_page_index(p))]
     todo.sort(key=lambda x: x[0])
 
+    # 로컬 사전 분류: 확실한 yes/no 는 MM 없이 확정하고 uncertain 만 MM 으로 보낸다
+    # (merged 모드는 yes 페이지도 표 내용이 필요하므로 추출까지 보낸다)
+    prefilter_yes: Set[int] = set()
+    if prefilter and todo:
+        if page_renderer is None:
+            print("[presence] prefilter 건너뜀: prepare_status.json 에 pdf_path 없음 (prepare 를 다시 실행하면 사용 가능)")
+        else:
+            with layout_spans_loader(out_dir) as page_spans:
+                verdicts = prefilter_pages(
+                    page_renderer.pdf_path,
+                    [pi for pi, _ in todo],
+                    page_spans=page_spans,
+                )
+            for pi, png in todo:
+                r = verdicts[pi]
+                if r.verdict == "uncertain":
+                    continue
+                if merged and r.verdict == "yes":
+                    prefilter_yes.add(pi)
+                    continue
+                pages_status[pi] = {
+                    "page_index": pi,
+                    "page_png": str(png.relative_to(out_dir)),
+                    "has_table": r.verdict == "yes",
+                    "status": "ok",
+                    "attempts": 0,
+                    "source": "prefilter",
+                    "prefilter": r.signals,
+                }
+            n_before = len(todo)
+            todo = [(pi, png) for pi, png in todo if verdicts[pi].verdict == "uncertain" or pi in prefilter_yes]
+            print(f"[presence] prefilter: {n_before}페이지 중 {n_before - len(todo)}페이지 로컬 확정, MM 대상 {len(todo)}페이지")
+            if len(todo) < n_before:
+                _write_status(status_path, pdf_id, page_count_total, pages_status, PREFILTER_VERSION)
+                _emit([pi for pi in verdicts if verdicts[pi].verdict == "yes" and pi not in prefilter_yes])
+
     if not todo:
         print(f"[presence] 처리할 페이지 없음 (이미 완료)")
         return _load_json_safe(status_path) or {}
 
+    # 탐지 + 추출 한 번에
+    if merged:
+        if on_page is not None:
+            raise ValueError("merged mode extracts tables itself; on_page is not supported")
+        return _run_merged_mode(
+            todo=todo,
+            out_dir=out_dir,
+            pdf_id=pdf_id,
+            page_count_total=page_count_total,
+            pages_status=pages_status,
+            status_path=status_path,
+            max_workers=max_workers,
+            max_retries=max_retries,
+            batch_size=merged_batch_size,
+            escalate=escalate,
+            prefilter_yes=prefilter_yes,
+            renderer=renderer,
+            pdf_path=page_renderer.pdf_path if page_renderer is not None else None,
+        )
+
+    # contact sheet 모드: 썸네일 격자 한 장에 토큰 예산만큼 페이지를 넣는다
+    if contact_sheet:
+        pdf_path = page_renderer.pdf_path if page_renderer is not None else None
+        if pdf_path is not None:
+            size = page_size(pdf_path=pdf_path)
+        else:
+            size = page_size(image_path=todo[0][1])
+        layout = plan_layout(*size, token_budget=sheet_token_budget, cell_px=sheet_cell_px)
+        return _run_batch_mode(
+            todo=todo,
+            out_dir=out_dir,
+            pdf_id=pdf_id,
+            page_count_total=page_count_total,
+            pages_status=pages_status,
+            status_path=status_path,
+            max_workers=max_workers,
+            max_retries=max_retries,
+            batch_size=layout.cells,
+            renderer=renderer,
+            sheet=layout,
+            pdf_path=pdf_path,
+            on_pages=_emit,
+        )
+
     # 배치 처리 모드
     if use_batch and batch_size > 1:
         return _run_batch_mode(
@@ -118,55 +276,44 @@ def run(
             max_workers=max_workers,
             max_retries=max_retries,
             batch_size=batch_size,
+            renderer=renderer,
+            on_pages=_emit,
         )
 
     # 기존 개별 처리 모드 (fallback)
-    def _detect(pi: int, png: Path) -> Tuple[int, Path, bool, Optional[str], int]:
-        def _do(attempt: int):
-            r = detect_table_presence_mm(png, pi)
+    async def _detect(item: Tuple[int, Path]) -> Tuple[bool, int]:
+        pi, png = item
+        if renderer is not None:
+            await asyncio.to_thread(renderer.get, pi)
+
+        async def _do(attempt: int):
+            r = await detect_table_presence_mm_async(png, pi)
             return r.has_table, attempt
-        has_table, attempts = _retry(_do, max_retries=max_retries)
-        return pi, png, bool(has_table), None, attempts
+        has_table, attempts = await retry_async(_do, max_retries=max_retries)
+        return bool(has_table), attempts
 
     print(f"[presence] total_pages={len(all_pngs)} selected={len(pngs)} todo={len(todo)} workers={max_workers} (개별모드)")
 
-    completed = 0
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        futures = [ex.submit(_detect, pi, png) for pi, png in todo]
-
-        for i, fut in enumerate(as_completed(futures), 1):
-            completed += 1
-            try:
-                pi, png, has_table, err, attempts = fut.result()
-                pages_status[pi] = {
-                    "page_index": pi,
-                    "page_png": str(png.relative_to(out_dir)),
-                    "has_table": bool(has_table),
-                    "status": "ok",
-                    "attempts": attempts,
-                }
-                print(f"[{i}/{len(futures)}] page {pi} has_table={has_table} (attempts={attempts})")
-
-            except Exception as e:
-                print(f"[{i}/{len(futures)}] ERROR: {repr(e)}")
-
-            if flush_every > 0 and (completed % flush_every == 0 or completed == len(futures)):
-                _atomic_write_json(status_path, {
-                    "pdf_id": pdf_id,
-                    "page_count": page_count_total,
-                    "updated_at": datetime.now(timezone.utc).astimezone().isoformat(),
-                    "prompt_version": "presence_v1",
-                    "pages": sorted(pages_status.values(), key=lambda x: x["page_index"]),
-                    "summary": {
-                        "num_pages": len(pages_status),
-                        "num_ok": sum(1 for v in pages_status.values() if v.get("status") == "ok"),
-                        "num_errors": sum(1 for v in pages_status.values() if v.get("status") == "error"),
-                        "num_has_table": sum(
-                            1 for v in pages_status.values()
-                            if v.get("status") == "ok" and v.get("has_table") is True
-                        ),
-                    }
-                })
+    def _on_done(i: int, item: Tuple[int, Path], result: Optional[Tuple[bool, int]], error: Optional[BaseException]) -> None:
+        pi, png = item
+        if error is None:
+            has_table, attempts = result
+            pages_status[pi] = {
+                "page_index": pi,
+                "page_png": str(png.relative_to(out_dir)),
+                "has_table": bool(has_table),
+                "status": "ok",
+                "attempts": attempts,
+            }
+            print(f"[{i}/{len(todo)}] page {pi} has_table={has_table} (attempts={attempts})")
+        else:
+            print(f"[{i}/{len(todo)}] ERROR: {repr(error)}")
+
+        if flush_every > 0 and (i % flush_every == 0 or i == len(todo)):
+            _write_status(status_path, pdf_id, page_count_total, pages_status, "presence_v1")
+        _emit([pi])
+
+    run_tasks(todo, _detect, concurrency=max_workers, on_done=_on_done)
 
     return _load_json_safe(status_path) or {}
 
@@ -181,82 +328,246 @@ def _run_batch_mode(
     max_workers: int,
     max_retries: int,
     batch_size: int,
+    renderer: Optional[PageRenderer] = None,
+    sheet: Optional[SheetLayout] = None,
+    pdf_path: Optional[Path] = None,
+    on_pages: Optional[Callable[[List[int]], None]] = None,
 ) -> Dict[str, Any]:
     """
     배치 모드: 여러 페이지를 한 번의 API 호출로 처리
 
     기존 N번 호출 → ceil(N/batch_size)번 호출로 감소
     예: 50페이지, batch_size=5 → 50회 → 10회 (80% 감소)
+
+    sheet 가 있으면 배치 하나를 contact sheet 이미지 한 장으로 보낸다 (batch_size = sheet.cells).
+    pdf_path 까지 있으면 시트를 PDF 에서 바로 그리므로 lazy render 페이지 PNG 를 만들지 않는다.
+    시트 답에서 빠진 칸은 표 없음으로 두지 않는다: 그 시트를 다시 물어보고, 끝까지 빠지면 시트 전체가 error
+    (다음 실행에서 retry_errors 로 다시).
     """
     # 배치로 분할
     batches = _chunk_list(todo, batch_size)
     total_batches = len(batches)
     total_pages = len(todo)
 
-    print(f"[presence] 배치 모드: {total_pages}페이지 → {total_batches}배치 (batch_size={batch_size}, workers={max_workers})")
-
-    def _detect_batch(batch: List[Tuple[int, Path]], batch_idx: int):
-        def _do(attempt: int):
-            results = detect_table_presence_batch(batch)
+    if sheet is not None:
+        print(f"[presence] contact sheet 모드: {total_pages}페이지 → {total_batches}장 "
+              f"({sheet.cols}x{sheet.rows}, 셀 {sheet.cell_w}x{sheet.cell_h}px, 장당 ~{sheet.tokens} 이미지 토큰, workers={max_workers})")
+    else:
+        print(f"[presence] 배치 모드: {total_pages}페이지 → {total_batches}배치 (batch_size={batch_size}, workers={max_workers})")
+
+    async def _detect_batch(item: Tuple[int, List[Tuple[int, Path]]]):
+        _, batch = item
+        if renderer is not None and not (sheet is not None and pdf_path is not None):
+            for pi, _ in batch:
+                await asyncio.to_thread(renderer.get, pi)
+
+        async def _do(attempt: int):
+            if sheet is not None:
+                results = await detect_table_presence_sheet_async(batch, sheet, pdf_path=pdf_path)
+            else:
+                results = await detect_table_presence_batch_async(batch)
             return results, attempt
-        results, attempts = _retry(_do, max_retries=max_retries)
-        return batch_idx, batch, results, attempts
+        return await retry_async(_do, max_retries=max_retries)
 
-    completed_batches = 0
+    def _on_done(completed_batches: int, item, result, error: Optional[BaseException]) -> None:
+        batch_idx, batch = item
+        if error is None:
+            results, attempts = result
 
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        futures = {ex.submit(_detect_batch, batch, idx): (idx, batch) for idx, batch in enumerate(batches)}
+            for (pi, png), r in zip(batch, results):
+                pages_status[pi] = {
+                    "page_index": pi,
+                    "page_png": str(png.relative_to(out_dir)),
+                    "has_table": r.has_table,
+                    "status": "ok",
+                    "attempts": attempts,
+                    "batch_idx": batch_idx,
+                }
 
-        for fut in as_completed(futures):
-            completed_batches += 1
-            batch_idx, batch = futures[fut]
-            try:
-                _, _, results, attempts = fut.result()
-
-                for (pi, png), result in zip(batch, results):
-                    pages_status[pi] = {
-                        "page_index": pi,
-                        "page_png": str(png.relative_to(out_dir)),
-                        "has_table": result.has_table,
-                        "status": "ok",
-                        "attempts": attempts,
-                        "batch_idx": batch_idx,
-                    }
-
-                table_pages = sum(1 for r in results if r.has_table)
-                print(f"[batch {completed_batches}/{total_batches}] {len(batch)}페이지 처리완료 (표={table_pages}, attempts={attempts})")
-
-            except Exception as e:
-                print(f"[batch {completed_batches}/{total_batches}] ERROR: {repr(e)}")
-                # 배치 실패 시 에러 상태로 기록
-                for pi, png in batch:
-                    pages_status[pi] = {
-                        "page_index": pi,
-                        "page_png": str(png.relative_to(out_dir)),
-                        "has_table": False,
-                        "status": "error",
-                        "error": str(e),
-                    }
-
-            # 진행상황 저장
-            _atomic_write_json(status_path, {
-                "pdf_id": pdf_id,
-                "page_count": page_count_total,
-                "updated_at": datetime.now(timezone.utc).astimezone().isoformat(),
-                "prompt_version": "presence_v2_batch",
-                "batch_size": batch_size,
-                "pages": sorted(pages_status.values(), key=lambda x: x["page_index"]),
-                "summary": {
-                    "num_pages": len(pages_status),
-                    "num_ok": sum(1 for v in pages_status.values() if v.get("status") == "ok"),
-                    "num_errors": sum(1 for v in pages_status.values() if v.get("status") == "error"),
-                    "num_has_table": sum(
-                        1 for v in pages_status.values()
-                        if v.get("status") == "ok" and v.get("has_table") is True
-                    ),
+            table_pages = sum(1 for r in results if r.has_table)
+            print(f"[batch {completed_batches}/{total_batches}] {len(batch)}페이지 처리완료 (표={table_pages}, attempts={attempts})")
+
+        else:
+            print(f"[batch {completed_batches}/{total_batches}] ERROR: {repr(error)}")
+            # 배치 실패 시 에러 상태로 기록
+            for pi, png in batch:
+                pages_status[pi] = {
+                    "page_index": pi,
+                    "page_png": str(png.relative_to(out_dir)),
+                    "has_table": False,
+                    "status": "error",
+                    "error": str(error),
+                }
+
+        # 진행상황 저장
+        if sheet is not None:
+            _write_status(
+                status_path, pdf_id, page_count_total, pages_status, "presence_v3_sheet",
+                batch_size=batch_size, sheet=sheet.to_dict(),
+            )
+        else:
+            _write_status(
+                status_path, pdf_id, page_count_total, pages_status, "presence_v2_batch",
+                batch_size=batch_size,
+            )
+        if on_pages is not None:
+            on_pages([pi for pi, _ in batch])
+
+    run_tasks(list(enumerate(batches)), _detect_batch, concurrency=max_workers, on_done=_on_done)
+
+    return _load_json_safe(status_path) or {}
+
+
+def _run_merged_mode(
+    todo: List[Tuple[int, Path]],
+    out_dir: Path,
+    pdf_id: str,
+    page_count_total: int,
+    pages_status: Dict[int, Dict[str, Any]],
+    status_path: Path,
+    max_workers: int,
+    max_retries: int,
+    batch_size: int,
+    escalate: str,
+    prefilter_yes: Set[int],
+    renderer: Optional[PageRenderer] = None,
+    pdf_path: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """
+    merged 모드: 표 탐지 + 추출을 페이지(묶음)당 MM 한 번으로 (core.table_detect_extract)
+
+    page_status.json 과 tables_by_page/page_NNN.json 을 기존 형식 그대로 같이 쓰므로
+    뒤이은 run_table_extract_mm 은 할 일 없이 집계(tables_by_page.json)만 다시 쓴다.
+    표 파일을 먼저 쓰고 상태를 나중에 쓴다 (중간에 죽으면 그 페이지는 다시 처리).
+    """
+    from core.run_table_extract_mm import (
+        PROMPT_VERSION as EXTRACT_PROMPT_VERSION,
+        _load_existing_results,
+        _normalize_tables,
+        _write_aggregate,
+    )
+
+    per_page_dir = out_dir / "tables_by_page"
+    tables_by_page = _load_existing_results(per_page_dir)
+
+    def _save_tables(pi: int, png: Path, tables: List[Dict[str, Any]], attempts: int, **fields: Any) -> None:
+        payload = {
+            "page_index": pi,
+            "page_png": str(png.relative_to(out_dir)),
+            "status": "ok",
+            "attempts": attempts,
+            "tables": _normalize_tables(tables, page_index=pi),
+            **fields,
+            "updated_at": datetime.now(timezone.utc).astimezone().isoformat(),
+        }
+        _atomic_write_json(per_page_dir / f"page_{pi:03d}.json", payload)
+        tables_by_page[pi] = payload
+
+    def _flush() -> None:
+        _write_status(
+            status_path, pdf_id, page_count_total, pages_status, DETECT_EXTRACT_VERSION,
+            batch_size=batch_size, escalate=escalate,
+        )
+
+    # 텍스트 레이어 fast path (run_table_extract_mm 과 같은 기준): 표가 충분한 confidence 로 나오면 MM 없이 확정
+    if pdf_path is not None and todo:
+        local = extract_tables_local_pages(pdf_path, [pi for pi, _ in todo])
+        resolved = {pi for pi, _ in todo if local[pi].tables and local[pi].confidence >= DEFAULT_MIN_CONFIDENCE}
+        for pi, png in todo:
+            if pi not in resolved:
+                continue
+            r = local[pi]
+            _save_tables(pi, png, r.tables, 0, prompt_version=LOCAL_EXTRACT_VERSION, source="local",
+                         local_confidence=r.confidence)
+            pages_status[pi] = {
+                "page_index": pi,
+                "page_png": str(png.relative_to(out_dir)),
+                "has_table": True,
+                "status": "ok",
+                "attempts": 0,
+                "source": "local",
+            }
+        todo = [(pi, png) for pi, png in todo if pi not in resolved]
+        print(f"[presence] merged: 로컬 추출로 {len(resolved)}페이지 확정, MM 대상 {len(todo)}페이지")
+        if resolved:
+            _flush()
+
+    batches = _chunk_list(todo, max(1, batch_size))
+    total_batches = len(batches)
+    print(f"[presence] merged 모드: {len(todo)}페이지 → {total_batches}회 호출 "
+          f"(model={merged_model()}, batch_size={batch_size}, escalate={escalate}, workers={max_workers})")
+
+    async def _escalate(r: Any, png: Path) -> Dict[str, Any]:
+        reason = escalation_reason(r.tables, mode=escalate, prefilter_yes=r.page_index in prefilter_yes)
+        if reason is None:
+            return {"tables": r.tables, "model": merged_model(), "escalation": None}
+
+        async def _do(attempt: int):
+            return (await extract_tables_mm_async(png, r.page_index)).tables
+        try:
+            tables = await retry_async(_do, max_retries=max_retries)
+            return {"tables": tables, "model": ESCALATION_MODEL, "escalation": reason}
+        except Exception as e:
+            # gpt-4o 가 실패하면 싼 모델 결과라도 남긴다
+            return {"tables": r.tables, "model": merged_model(), "escalation": reason, "escalation_error": repr(e)}
+
+    async def _detect_extract(item: Tuple[int, List[Tuple[int, Path]]]):
+        _, batch = item
+        if renderer is not None:
+            for pi, _ in batch:
+                await asyncio.to_thread(renderer.get, pi)
+
+        async def _do(attempt: int):
+            return await detect_extract_batch_async(batch), attempt
+        results, attempts = await retry_async(_do, max_retries=max_retries)
+        finals = await asyncio.gather(*(_escalate(r, png) for r, (_, png) in zip(results, batch)))
+        return finals, attempts
+
+    def _on_done(completed_batches: int, item, result, error: Optional[BaseException]) -> None:
+        batch_idx, batch = item
+        if error is None:
+            finals, attempts = result
+            for (pi, png), f in zip(batch, finals):
+                extra = {"escalation_error": f["escalation_error"]} if "escalation_error" in f else {}
+                if f["tables"]:
+                    escalated = f["escalation"] is not None and "escalation_error" not in f
+                    _save_tables(
+                        pi, png, f["tables"], attempts,
+                        prompt_version=EXTRACT_PROMPT_VERSION if escalated else DETECT_EXTRACT_VERSION,
+                        source="merged", model=f["model"], escalation=f["escalation"], **extra,
+                    )
+                pages_status[pi] = {
+                    "page_index": pi,
+                    "page_png": str(png.relative_to(out_dir)),
+                    "has_table": bool(f["tables"]),
+                    "status": "ok",
+                    "attempts": attempts,
+                    "batch_idx": batch_idx,
+                    "source": "merged",
+                    "model": f["model"],
+                    "escalation": f["escalation"],
+                    **extra,
+                }
+            n_tables = sum(1 for f in finals if f["tables"])
+            n_escalated = sum(1 for f in finals if f["escalation"])
+            print(f"[merged {completed_batches}/{total_batches}] {len(batch)}페이지 처리완료 "
+                  f"(표={n_tables}, gpt-4o 재추출={n_escalated}, attempts={attempts})")
+        else:
+            print(f"[merged {completed_batches}/{total_batches}] ERROR: {repr(error)}")
+            for pi, png in batch:
+                pages_status[pi] = {
+                    "page_index": pi,
+                    "page_png": str(png.relative_to(out_dir)),
+                    "has_table": False,
+                    "status": "error",
+                    "error": str(error),
                 }
-            })
+        _flush()
+
+    if batches:
+        run_tasks(list(enumerate(batches)), _detect_extract, concurrency=max_workers, on_done=_on_done)
 
+    _write_aggregate(out_dir, pdf_id, tables_by_page)
     return _load_json_safe(status_path) or {}
 
 
@@ -269,12 +580,25 @@ def main(argv: Optional[list[str]] = None) -> None:
     ap.add_argument("--out_dir", default="artifacts/lecture")
     ap.add_argument("--pdf_id", default="lecture")
     ap.add_argument("--max_pages", type=int, default=None)
-    ap.add_argument("--workers", type=int, default=3)
+    ap.add_argument("--workers", type=int, default=3, help="동시에 걸어둘 MM 요청 수 (asyncio, 스레드 아님)")
     ap.add_argument("--max_retries", type=int, default=5)
     ap.add_argument("--no_retry_errors", action="store_true")
     ap.add_argument("--flush_every", type=int, default=1)
     ap.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE, help=f"배치당 페이지 수 (default: {DEFAULT_BATCH_SIZE})")
     ap.add_argument("--no_batch", action="store_true", help="배치 모드 비활성화 (개별 처리)")
+    ap.add_argument("--no_prefilter", action="store_true", help="로컬 사전 분류 없이 모든 페이지를 MM 으로 판단")
+    ap.add_argument("--merged", action="store_true",
+                    help="표 탐지 + 추출을 페이지당 MM 한 번으로 (page_status.json 과 tables_by_page/ 를 같이 씀)")
+    ap.add_argument("--merged_batch_size", type=int, default=DEFAULT_MERGED_BATCH_SIZE,
+                    help=f"--merged 한 번의 호출에 넣을 페이지 수 (default: {DEFAULT_MERGED_BATCH_SIZE})")
+    ap.add_argument("--escalate", choices=ESCALATE_MODES, default=ESCALATE_AUTO,
+                    help="--merged 에서 gpt-4o 로 다시 추출할 기준 (auto: 격자 깨짐/큰 표/빈 셀/prefilter 불일치)")
+    ap.add_argument("--contact_sheet", action="store_true",
+                    help="페이지 썸네일 격자 한 장으로 묶어 탐지 (묶음 크기는 이미지 토큰 예산으로 결정)")
+    ap.add_argument("--sheet_token_budget", type=int, default=None,
+                    help="--contact_sheet 시트 한 장의 이미지 토큰 예산 (default: PRESENCE_SHEET_TOKEN_BUDGET 또는 1105)")
+    ap.add_argument("--sheet_cell_px", type=int, default=None,
+                    help="--contact_sheet 썸네일 긴 변 px (default: PRESENCE_SHEET_CELL_PX 또는 320)")
     ap.add_argument("--print_json", action="store_true", help="결과 JSON을 stdout으로 출력")
 
     args = ap.parse_args(argv)
@@ -289,7 +613,15 @@ def main(argv: Optional[list[str]] = None) -> None:
         flush_every=args.flush_every,
         batch_size=args.batch_size,
         use_batch=not args.no_batch,
+        prefilter=not args.no_prefilter,
+        merged=args.merged,
+        merged_batch_size=args.merged_batch_size,
+        escalate=args.escalate,
+        contact_sheet=args.contact_sheet,
+        sheet_token_budget=args.sheet_token_budget,
+        sheet_cell_px=args.sheet_cell_px,
     )
+    llm_usage.write_report(Path(args.out_dir), "table_presence", pdf_id=args.pdf_id)
 
     if args.print_json:
         print(json.dumps(result, ensure_ascii=False))
@@ -7,6 +7,9 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+from core.pages_reader import open_pages, pages_text_exists
+from core.span_store import SpanStore, page_spans_of
+
 
 # =========================
 # Config
@@ -65,19 +68,6 @@ def _atomic_write_json(path: Path, obj: Any) -> None:
 # Parsing helpers
 # =========================
 
-def _ensure_pages_list(pages_text: Any) -> List[Dict[str, Any]]:
-    """
-    pages_text.json format variations:
-    - {"pages":[{...}, ...]}
-    - [{...}, ...]
-    """
-    if isinstance(pages_text, dict) and isinstance(pages_text.get("pages"), list):
-        return pages_text["pages"]
-    if isinstance(pages_text, list):
-        return pages_text
-    raise ValueError("pages_text.json must be a list or an object with a 'pages' list")
-
-
 def _ensure_sections_list(sections_obj: Any) -> List[Dict[str, Any]]:
     """
     sections.json format variations (프로젝트 진행 중 스키마 흔들림 대응):
@@ -184,13 +174,19 @@ def _normalize_tables_by_page(tables_obj: Any) -> Dict[int, List[Dict[str, Any]]
     return out
 
 
-def _safe_get_page_text(page_obj: Dict[str, Any], prefer_spans: bool) -> str:
+def _safe_get_page_text(
+    page_obj: Dict[str, Any],
+    prefer_spans: bool,
+    page_index: int,
+    span_store: Optional[SpanStore] = None,
+) -> str:
     """
     Try multiple fields; if prefer_spans=True, rebuild from spans deterministically.
+    layout_format=npy 로 prepare 했으면 spans 는 span_store (pages_layout/) 에서 읽는다.
     """
     if prefer_spans:
-        spans = page_obj.get("spans") or page_obj.get("layout", {}).get("spans") or []
-        if isinstance(spans, list) and spans:
+        spans = page_spans_of(page_obj, page_index, span_store)
+        if spans:
             def key_fn(s: Dict[str, Any]) -> Tuple[float, float]:
                 bbox = s.get("bbox") or s.get("bbox_xyxy") or s.get("rect") or [0, 0, 0, 0]
                 try:
@@ -213,8 +209,8 @@ def _safe_get_page_text(page_obj: Dict[str, Any], prefer_spans: bool) -> str:
             return v.strip()
 
     # fallback spans
-    spans = page_obj.get("spans") or page_obj.get("layout", {}).get("spans") or []
-    if isinstance(spans, list) and spans:
+    spans = page_spans_of(page_obj, page_index, span_store)
+    if spans:
         parts = []
         for s in spans:
             if not isinstance(s, dict):
@@ -307,14 +303,15 @@ def build_section_contexts(cfg: PackagerConfig) -> Dict[str, Any]:
 
     if not sections_path.exists():
         raise FileNotFoundError(f"Missing: {sections_path}")
-    if not pages_text_path.exists():
+    if not pages_text_exists(pages_text_path):
         raise FileNotFoundError(f"Missing: {pages_text_path}")
 
     sections_obj = _read_json(sections_path)
     sections = _ensure_sections_list(sections_obj)
 
-    pages_text_obj = _read_json(pages_text_path)
-    pages_list = _ensure_pages_list(pages_text_obj)
+    # pages_text.jsonl(index)가 있으면 필요한 페이지만 lazy 로드
+    pages_list = open_pages(pages_text_path)
+    span_store = SpanStore.open_if_exists(pages_text_path.parent)
 
     tables_obj = _read_json(tables_path) if tables_path.exists() else None
     tables_by_page = _normalize_tables_by_page(tables_obj)
@@ -362,7 +359,7 @@ def build_section_contexts(cfg: PackagerConfig) -> Dict[str, Any]:
 
         for p in pages:
             page_obj = pages_list[p]
-            txt = _safe_get_page_text(page_obj, prefer_spans=cfg.prefer_spans)
+            txt = _safe_get_page_text(page_obj, cfg.prefer_spans, p, span_store)
 
             if cfg.drop_empty_lines:
                 txt = _squeeze_blank_lines(txt, cfg.max_consecutive_blank_lines)
@@ -8,6 +8,9 @@ import json
 import re
 from collections import Counter
 
+from core.pages_reader import open_pages
+from core.span_store import SpanStore
+
 
 def _atomic_write_json(path: Path, obj: Dict[str, Any]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
@@ -189,20 +192,31 @@ def run_section_indexer(
     if out_page_titles is None:
         out_page_titles = out_dir / "page_titles.json"
 
-    data = json.loads(Path(in_path).read_text(encoding="utf-8"))
-    pages = data["pages"]
+    # pages_text.jsonl(index)가 있으면 PagesReader 로 페이지를 순차 스트리밍
+    pages = open_pages(Path(in_path))
     n_pages = len(pages)
 
+    # layout_format=npy 로 prepare 했으면 spans 는 pages_layout/ 컬럼 저장소에 있다
+    span_store: Optional[SpanStore] = None
+    top_mask = None
+    store_name = (pages[0].get("layout") or {}).get("spans_store") if pages else None
+    if store_name:
+        span_store = SpanStore(Path(in_path).parent / store_name)
+        top_mask = span_store.top_region_mask(top_region_ratio)
+
     # 1) gather top-region candidate lines per page and count repetitions (header removal)
     header_counter = Counter()
     per_page_lines: List[List[Dict[str, Any]]] = []
 
-    for p in pages:
-        layout = p.get("layout") or {}
-        page_h = float(layout.get("page_h", 0.0))
-        spans = layout.get("spans") or []
+    for i, p in enumerate(pages):
+        if span_store is not None:
+            top_spans = span_store.page_spans(i, mask=top_mask)
+        else:
+            layout = p.get("layout") or {}
+            page_h = float(layout.get("page_h", 0.0))
+            spans = layout.get("spans") or []
+            top_spans = [sp for sp in spans if page_h and float(sp["bbox"][1]) <= page_h * top_region_ratio]
 
-        top_spans = [sp for sp in spans if page_h and float(sp["bbox"][1]) <= page_h * top_region_ratio]
         lines = _group_spans_to_lines(top_spans)
 
         lines_sorted = sorted(lines, key=lambda x: x["size_max"], reverse=True)[:6]
@@ -285,7 +299,7 @@ def run_section_indexer(
 
     out_sections_obj = {
         "pdf_id": pdf_id,
-        "page_count": data.get("page_count"),
+        "page_count": n_pages,
         "config": {
             "top_region_ratio": top_region_ratio,
             "repeat_threshold_ratio": repeat_threshold_ratio,
@@ -0,0 +1,258 @@
+# core/span_store.py
+"""
+페이지 layout span 컬럼 저장소 (pages_layout/)
+
+pages_text.json 의 layout.spans 를 span 마다 dict 로 저장하면 큰 PDF 에서 수십 MB 가 되고,
+section_indexer 등이 매번 json.load 로 전부 올려야 한다.
+여기서는 같은 정보를 NumPy 컬럼으로 저장하고 np.load(mmap_mode="r") 로 연다.
+
+Layout ({out_dir}/pages_layout/):
+  manifest.json         {"version", "page_count", "span_count", "arrays": [...]}
+  page_w.npy            float64 [P]
+  page_h.npy            float64 [P]
+  page_offsets.npy      int64   [P+1]   page i 의 span = [page_offsets[i], page_offsets[i+1])
+  bbox.npy              float64 [N, 4]  x0, y0, x1, y1
+  size.npy              float64 [N]
+  flags.npy             int32   [N]
+  ids.npy               int32   [N, 3]  block_no, line_no, span_no
+  text_offsets.npy      int64   [N+1]   text_blob 내 UTF-8 바이트 구간
+  text_blob.npy         uint8   [B]     span 텍스트 UTF-8 연결 (string table)
+
+float 컬럼은 float64 라서 JSON 경로와 값이 완전히 같다.
+"""
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+SPAN_STORE_DIRNAME = "pages_layout"
+SPAN_STORE_VERSION = 1
+
+_ARRAYS = (
+    "page_w", "page_h", "page_offsets",
+    "bbox", "size", "flags", "ids",
+    "text_offsets", "text_blob",
+)
+
+# span 단위 컬럼: name -> (dtype, 행당 값 수)
+_SPAN_COLUMNS = {
+    "bbox": (np.float64, 4),
+    "size": (np.float64, 1),
+    "flags": (np.int32, 1),
+    "ids": (np.int32, 3),
+    "text_offsets": (np.int64, 1),
+    "text_blob": (np.uint8, 1),
+}
+
+
+class SpanStoreWriter:
+    """
+    페이지를 하나씩 받아 컬럼 저장소를 만든다 (pages 전체를 메모리에 들고 있을 필요 없음).
+    span 컬럼은 add_page 마다 그 페이지 조각을 tmp 디렉토리의 raw 파일(.bin)에 이어 쓰고,
+    메모리에는 페이지당 값(page_w / page_h / page_offsets)만 남긴다.
+    close() 에서 raw 파일을 memmap 으로 열어 .npy 로 옮긴 뒤 디렉토리를 교체한다
+    (중간에 죽어도 반쯤 쓴 저장소가 남지 않게).
+    """
+
+    def __init__(self, out_dir: Path):
+        self.out_dir = Path(out_dir)
+        self.store_dir = self.out_dir / SPAN_STORE_DIRNAME
+        self.tmp_dir = self.out_dir / (SPAN_STORE_DIRNAME + ".tmp")
+
+        if self.tmp_dir.exists():
+            shutil.rmtree(self.tmp_dir)
+        self.tmp_dir.mkdir(parents=True)
+        self._files = {name: open(self.tmp_dir / f"{name}.bin", "wb") for name in _SPAN_COLUMNS}
+
+        self._page_w: List[float] = []
+        self._page_h: List[float] = []
+        self._page_offsets: List[int] = [0]
+        self._span_count = 0
+        self._blob_len = 0
+        np.zeros(1, dtype=np.int64).tofile(self._files["text_offsets"])
+
+    def add_page(self, page: Dict[str, Any]) -> None:
+        layout = page.get("layout") or {}
+        spans = layout.get("spans") or []
+        self._page_w.append(float(layout.get("page_w", 0.0)))
+        self._page_h.append(float(layout.get("page_h", 0.0)))
+
+        texts = [sp["text"].encode("utf-8") for sp in spans]
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+        chunk = {
+            "bbox": np.asarray([sp["bbox"] for sp in spans], dtype=np.float64).reshape(-1, 4),
+            "size": np.asarray([sp["size"] for sp in spans], dtype=np.float64),
+            "flags": np.asarray([sp["flags"] for sp in spans], dtype=np.int32),
+            "ids": np.asarray(
+                [[sp["block_no"], sp["line_no"], sp["span_no"]] for sp in spans], dtype=np.int32
+            ).reshape(-1, 3),
+            "text_offsets": self._blob_len + np.cumsum(lengths),
+            "text_blob": np.frombuffer(b"".join(texts), dtype=np.uint8),
+        }
+        for name, arr in chunk.items():
+            arr.tofile(self._files[name])
+
+        self._span_count += len(spans)
+        self._blob_len += int(lengths.sum())
+        self._page_offsets.append(self._span_count)
+
+    def close(self) -> Path:
+        """
+        Returns:
+            저장소 디렉토리 경로 ({out_dir}/pages_layout)
+        """
+        for f in self._files.values():
+            f.close()
+
+        rows = {
+            "bbox": self._span_count,
+            "size": self._span_count,
+            "flags": self._span_count,
+            "ids": self._span_count,
+            "text_offsets": self._span_count + 1,
+            "text_blob": self._blob_len,
+        }
+        for name, (dtype, width) in _SPAN_COLUMNS.items():
+            raw = self.tmp_dir / f"{name}.bin"
+            shape = (rows[name], width) if width > 1 else (rows[name],)
+            if rows[name]:
+                arr = np.memmap(raw, dtype=dtype, mode="r", shape=shape)
+            else:
+                arr = np.empty(shape, dtype=dtype)
+            np.save(self.tmp_dir / f"{name}.npy", arr, allow_pickle=False)
+            del arr
+            raw.unlink()
+
+        per_page = {
+            "page_w": np.asarray(self._page_w, dtype=np.float64),
+            "page_h": np.asarray(self._page_h, dtype=np.float64),
+            "page_offsets": np.asarray(self._page_offsets, dtype=np.int64),
+        }
+        for name, arr in per_page.items():
+            np.save(self.tmp_dir / f"{name}.npy", arr, allow_pickle=False)
+
+        manifest = {
+            "version": SPAN_STORE_VERSION,
+            "page_count": len(self._page_w),
+            "span_count": self._span_count,
+            "arrays": list(_ARRAYS),
+        }
+        (self.tmp_dir / "manifest.json").write_text(
+            json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+
+        if self.store_dir.exists():
+            shutil.rmtree(self.store_dir)
+        self.tmp_dir.replace(self.store_dir)
+        return self.store_dir
+
+
+def write_span_store(pages: List[Dict[str, Any]], out_dir: Path) -> Path:
+    """extract_pdf_text 의 pages 리스트(layout.spans 포함)를 컬럼 저장소로 기록."""
+    writer = SpanStoreWriter(out_dir)
+    for p in pages:
+        writer.add_page(p)
+    return writer.close()
+
+
+class SpanStore:
+    """
+    pages_layout/ 을 memory-map 으로 여는 read-only 뷰.
+
+    컬럼(bbox, size, ...)은 np.memmap 이라 실제로 접근한 페이지만 디스크에서 읽힌다.
+    """
+
+    def __init__(self, store_dir: Path):
+        self.store_dir = Path(store_dir)
+        manifest_path = self.store_dir / "manifest.json"
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"Missing: {manifest_path}")
+        self.manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if self.manifest.get("version") != SPAN_STORE_VERSION:
+            raise ValueError(f"Unsupported span store version: {self.manifest.get('version')}")
+
+        def _load(name: str) -> np.ndarray:
+            return np.load(self.store_dir / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+
+        self.page_w = _load("page_w")
+        self.page_h = _load("page_h")
+        self.page_offsets = _load("page_offsets")
+        self.bbox = _load("bbox")
+        self.size = _load("size")
+        self.flags = _load("flags")
+        self.ids = _load("ids")
+        self.text_offsets = _load("text_offsets")
+        self.text_blob = _load("text_blob")
+
+    @classmethod
+    def open_if_exists(cls, out_dir: Path) -> Optional["SpanStore"]:
+        store_dir = Path(out_dir) / SPAN_STORE_DIRNAME
+        if not (store_dir / "manifest.json").exists():
+            return None
+        return cls(store_dir)
+
+    @property
+    def page_count(self) -> int:
+        return int(self.manifest["page_count"])
+
+    @property
+    def span_count(self) -> int:
+        return int(self.manifest["span_count"])
+
+    def page_range(self, page_index: int) -> slice:
+        return slice(int(self.page_offsets[page_index]), int(self.page_offsets[page_index + 1]))
+
+    def span_page_index(self) -> np.ndarray:
+        """span 별 page_index (int64 [N])"""
+        counts = np.diff(self.page_offsets)
+        return np.repeat(np.arange(self.page_count, dtype=np.int64), counts)
+
+    def text(self, i: int) -> str:
+        a, b = int(self.text_offsets[i]), int(self.text_offsets[i + 1])
+        return bytes(self.text_blob[a:b]).decode("utf-8")
+
+    def top_region_mask(self, top_region_ratio: float) -> np.ndarray:
+        """
+        y0 <= page_h * ratio 인 span 마스크 (bool [N]).
+        page_h 가 0 인 페이지의 span 은 제외 (JSON 경로의 `page_h and ...` 와 동일).
+        """
+        limit = np.repeat(np.asarray(self.page_h) * top_region_ratio, np.diff(self.page_offsets))
+        page_ok = np.repeat(np.asarray(self.page_h) != 0, np.diff(self.page_offsets))
+        return page_ok & (np.asarray(self.bbox[:, 1]) <= limit)
+
+    def span_dict(self, i: int) -> Dict[str, Any]:
+        """pages_text.json 의 span dict 와 같은 모양으로 복원"""
+        block_no, line_no, span_no = (int(x) for x in self.ids[i])
+        return {
+            "text": self.text(i),
+            "size": float(self.size[i]),
+            "flags": int(self.flags[i]),
+            "bbox": [float(x) for x in self.bbox[i]],
+            "block_no": block_no,
+            "line_no": line_no,
+            "span_no": span_no,
+        }
+
+    def page_spans(self, page_index: int, mask: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """page 의 span dict 리스트. mask(전역 bool [N])가 있으면 해당 span 만."""
+        rng = self.page_range(page_index)
+        idx = np.arange(rng.start, rng.stop)
+        if mask is not None:
+            idx = idx[mask[rng]]
+        return [self.span_dict(int(i)) for i in idx]
+
+
+def page_spans_of(page: Dict[str, Any], page_index: int, store: Optional[SpanStore]) -> List[Dict[str, Any]]:
+    """
+    pages_text 의 page dict 하나의 spans.
+    layout_format=npy 로 prepare 했으면 (layout.spans_store) store 에서, 아니면 spans / layout.spans 에서.
+    """
+    layout = page.get("layout") or {}
+    if layout.get("spans_store") and store is not None:
+        return store.page_spans(page_index)
+    spans = page.get("spans") or layout.get("spans") or []
+    return spans if isinstance(spans, list) else []
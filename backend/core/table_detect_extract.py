@@ -0,0 +1,211 @@
+# core/table_detect_extract.py
+"""
+표 탐지 + 추출 한 번에 (merged mode, run_table_presence --merged)
+
+기존 흐름은 presence(gpt-4o-mini) 가 표 있음으로 표시한 페이지를 run_table_extract_mm(gpt-4o) 이
+다시 보내서, 표가 있는 페이지마다 MM 왕복 두 번 + 이미지 업로드 두 번이 든다.
+여기서는 싼 모델에 페이지(또는 작은 묶음)마다 한 번 {"pages": [{"page": 0, "tables": [...]}]} 을
+바로 요청한다. tables 가 빈 리스트면 표 없음.
+
+escalation (싼 모델 결과를 gpt-4o 로 다시 추출할지):
+  auto (기본)  아래 중 하나면 그 페이지만 table_mm.extract_tables_mm_async (gpt-4o, 기존 프롬프트) 로 다시 추출
+                 malformed   markdown 격자가 아님 (구분선 없음 / 행마다 열 수가 다름 / 1행·1열)
+                 dense       셀 수가 max_cells 초과 (큰 표는 싼 모델이 행/열을 잘 빠뜨림)
+                 sparse      빈 셀 비율이 MAX_EMPTY_CELL_RATIO 초과 (셀 내용을 못 읽은 경우)
+                 disagree    로컬 prefilter 는 확실히 표라고 했는데 싼 모델이 빈 리스트
+  always       표가 나온 페이지는 전부 gpt-4o 로 추출 (탐지만 싼 모델, 품질은 기존과 같음)
+  never        싼 모델 결과 그대로
+
+설정 (환경변수):
+  TABLE_MERGED_MODEL            싼 모델 (기본 gpt-4o-mini)
+  TABLE_ESCALATE_MAX_CELLS      dense 기준 (기본 60)
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.llm_client import create_response_async
+from core.llm_mm import _image_to_data_url
+from core.llm_schemas import parse_json, with_schema
+from core.table_mm import EXTRACT_MODEL, _to_result
+
+DETECT_EXTRACT_VERSION = "detect_extract_v1"
+
+DEFAULT_MERGED_MODEL = "gpt-4o-mini"
+ESCALATION_MODEL = EXTRACT_MODEL  # table_mm.extract_tables_mm 이 쓰는 모델
+DEFAULT_MAX_CELLS = 60
+MAX_EMPTY_CELL_RATIO = 0.3
+
+ESCALATE_AUTO = "auto"
+ESCALATE_ALWAYS = "always"
+ESCALATE_NEVER = "never"
+ESCALATE_MODES = (ESCALATE_AUTO, ESCALATE_ALWAYS, ESCALATE_NEVER)
+
+
+@dataclass(frozen=True)
+class DetectExtractResult:
+    page_index: int
+    tables: List[Dict[str, Any]]
+
+    @property
+    def has_table(self) -> bool:
+        return bool(self.tables)
+
+
+# 페이지 수는 이미지 뒤에 따로 붙인다 (지시문을 묶음 크기와 무관하게 고정 → provider prompt prefix 캐시)
+PROMPT_DETECT_EXTRACT = """You are given one or more page images. For EACH page, extract ALL tables on it.
+
+Definition of "table":
+- A structure with rows AND columns
+- Includes simple 2-column tables
+- Includes tables with headers or without headers
+
+Ignore:
+- Charts, plots, diagrams
+- Equations or formulas
+- Code blocks, bullet lists, plain paragraphs
+- Pseudo-tables made only with spacing
+
+Output schema:
+{
+  "pages": [
+    {
+      "page": 0,
+      "tables": [
+        {
+          "table_id": "t01",
+          "title": null | "short optional title",
+          "format": "markdown",
+          "content": "| A | B |\\n|---|---|\\n| 1 | 2 |"
+        }
+      ]
+    }
+  ]
+}
+
+Rules:
+- "page" is the 0-based index of the image in order shown
+- Return one entry per page; "tables" is an empty list if the page has no table
+- Use GitHub-flavored markdown table format
+- table_id must be unique per page (t01, t02, ...)
+"""
+
+PROMPT_DETECT_EXTRACT_COUNT = "There are {n} page images above (page 0 to {last}). Return entries for ALL {n} pages."
+
+
+def merged_model() -> str:
+    return os.environ.get("TABLE_MERGED_MODEL") or DEFAULT_MERGED_MODEL
+
+
+def detect_extract_request(data_urls: List[str], *, model: str) -> Dict[str, Any]:
+    """고정 지시문 → 이미지들 → 페이지 수 순서의 요청 body"""
+    content: List[Dict[str, Any]] = [{
+        "type": "input_text",
+        "text": f"Return ONLY valid JSON. Do not include code fences.\n{PROMPT_DETECT_EXTRACT}",
+    }]
+    for data_url in data_urls:
+        content.append({"type": "input_image", "image_url": data_url})
+    n = len(data_urls)
+    content.append({"type": "input_text", "text": PROMPT_DETECT_EXTRACT_COUNT.format(n=n, last=n - 1)})
+    return with_schema({
+        "model": model,
+        "input": [{"role": "user", "content": content}],
+        "temperature": 0.0,
+    }, "table_detect_extract")
+
+
+async def detect_extract_batch_async(
+    pages: List[Tuple[int, Path]],
+    model: Optional[str] = None,
+) -> List[DetectExtractResult]:
+    """페이지 묶음 → 페이지별 표 목록 (한 번의 MM 호출). 응답에 빠진 페이지가 있으면 ValueError."""
+    if not pages:
+        return []
+    paths = []
+    for _, image_path in pages:
+        image_path = Path(image_path)
+        if not image_path.exists():
+            raise FileNotFoundError(f"Image not found: {image_path}")
+        paths.append(image_path)
+    data_urls = await asyncio.to_thread(lambda: [_image_to_data_url(p, stage="detect") for p in paths])
+
+    resp = await create_response_async(
+        stage="detect", **detect_extract_request(data_urls, model=model or merged_model())
+    )
+    return _results(resp, pages)
+
+
+def _results(resp: Any, pages: List[Tuple[int, Path]]) -> List[DetectExtractResult]:
+    data = parse_json("detect", getattr(resp, "output_text", None) or str(resp))
+    if data is None or not isinstance(data.get("pages"), list):
+        raise ValueError(f"Invalid detect_extract output: {data}")
+
+    by_idx: Dict[int, Any] = {}
+    for entry in data["pages"]:
+        if isinstance(entry, dict) and "page" in entry:
+            by_idx[int(entry["page"])] = entry.get("tables")
+
+    results: List[DetectExtractResult] = []
+    for batch_idx, (page_index, _) in enumerate(pages):
+        if batch_idx not in by_idx:
+            raise ValueError(f"detect_extract output missing page {batch_idx} (page_index={page_index})")
+        results.append(DetectExtractResult(
+            page_index=page_index,
+            tables=_to_result({"tables": by_idx[batch_idx]}, page_index).tables,
+        ))
+    return results
+
+
+# =============================================================================
+# escalation
+# =============================================================================
+
+_SEPARATOR = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$")
+
+
+def _grid(content: str) -> Optional[List[List[str]]]:
+    """markdown 표 → 셀 격자 (구분선 제외). 격자가 아니면 None."""
+    lines = [ln.strip() for ln in (content or "").splitlines() if ln.strip()]
+    if len(lines) < 3 or not _SEPARATOR.match(lines[1]):
+        return None
+    rows = [[c.strip() for c in ln.strip("|").split("|")] for i, ln in enumerate(lines) if i != 1]
+    ncols = len(rows[0])
+    if ncols < 2 or any(len(r) != ncols for r in rows):
+        return None
+    return rows
+
+
+def escalation_reason(
+    tables: List[Dict[str, Any]],
+    *,
+    mode: str = ESCALATE_AUTO,
+    prefilter_yes: bool = False,
+    max_cells: Optional[int] = None,
+) -> Optional[str]:
+    """gpt-4o 로 다시 추출해야 하면 이유, 아니면 None"""
+    if mode == ESCALATE_NEVER:
+        return None
+    if not tables:
+        return "disagree" if prefilter_yes else None
+    if mode == ESCALATE_ALWAYS:
+        return "always"
+
+    if max_cells is None:
+        max_cells = int(os.environ.get("TABLE_ESCALATE_MAX_CELLS") or DEFAULT_MAX_CELLS)
+    for t in tables:
+        rows = _grid(t.get("content", ""))
+        if rows is None:
+            return "malformed"
+        cells = len(rows) * len(rows[0])
+        if cells > max_cells:
+            return "dense"
+        empty = sum(1 for r in rows for c in r if not c)
+        if empty / cells > MAX_EMPTY_CELL_RATIO:
+            return "sparse"
+    return None
+
@@ -0,0 +1,168 @@
+# core/table_local.py
+"""
+텍스트 레이어 기반 표 추출 (gpt-4o MM 추출의 fast path)
+
+born-digital PDF 는 표의 셀 텍스트가 이미 텍스트 레이어에 있으므로,
+PyMuPDF find_tables() 결과를 table_mm 과 같은 레코드로 바꾼다:
+
+  {"table_id": "t01", "title": str | None, "format": "markdown", "content": "| A | B |\\n|---|---|\\n..."}
+
+페이지마다 confidence(0~1)를 같이 돌려주고, run_table_extract_mm 은
+confidence 가 낮은 페이지만 MM 으로 보낸다.
+
+confidence 구성 (표마다 계산해서 페이지는 최솟값):
+  - 채워진 셀 비율            (빈 칸이 많으면 차트/레이아웃 격자일 가능성)
+  - 병합 셀(None) 비율         (병합이 많으면 markdown 격자로 표현이 어긋남)
+  - 텍스트 커버리지            (표 bbox 안 span 글자 수 vs 셀에 들어간 글자 수)
+표 밖에 괘선 없는 정렬 격자나 큰 이미지가 있으면 MM 이 다른 표를 찾을 수 있으므로 상한을 낮춘다.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import fitz  # PyMuPDF
+
+from core.table_prefilter import MAX_IMAGE_AREA_RATIO_FOR_NO, MIN_GRID_ROWS, _span_grid
+
+LOCAL_EXTRACT_VERSION = "local_v1"
+DEFAULT_MIN_CONFIDENCE = 0.8
+
+# 표 밖에 다른 표 후보가 있을 때의 confidence 상한
+OUTSIDE_SIGNAL_CAP = 0.5
+
+# 표 위 이 거리(pt) 안의 짧은 줄을 제목으로 본다
+TITLE_MAX_GAP = 24.0
+TITLE_MAX_LEN = 80
+
+
+@dataclass(frozen=True)
+class LocalTableResult:
+    page_index: int
+    tables: List[Dict[str, Any]]
+    confidence: float
+    signals: Dict[str, Any]
+
+
+def extract_tables_local(page: "fitz.Page", page_index: int) -> LocalTableResult:
+    """한 페이지의 표를 텍스트 레이어에서 추출."""
+    spans = _line_spans(page)
+    tables: List[Dict[str, Any]] = []
+    confs: List[float] = []
+    bboxes: List[fitz.Rect] = []
+
+    for tab in page.find_tables().tables:
+        rows = tab.extract()
+        if tab.row_count < 2 or tab.col_count < 2 or not rows:
+            continue
+        bbox = fitz.Rect(tab.bbox)
+        bboxes.append(bbox)
+        confs.append(_table_confidence(rows, bbox, spans))
+        tables.append({
+            "table_id": f"t{len(tables) + 1:02d}",
+            "title": _guess_title(bbox, spans),
+            "format": "markdown",
+            "content": _to_markdown(rows),
+        })
+
+    # 표 bbox 밖의 표 후보 신호
+    outside = [sp for sp in spans if not any(_center_in(sp["bbox"], b) for b in bboxes)]
+    grid_rows, _ = _span_grid(outside)
+    page_area = max(1.0, float(page.rect.width * page.rect.height))
+    image_area = 0.0
+    for info in page.get_image_info():
+        r = fitz.Rect(info.get("bbox")) & page.rect
+        if not r.is_empty:
+            image_area += r.width * r.height
+    image_ratio = min(1.0, image_area / page_area)
+
+    confidence = min(confs) if confs else 0.0
+    if grid_rows >= MIN_GRID_ROWS or image_ratio >= MAX_IMAGE_AREA_RATIO_FOR_NO:
+        confidence = min(confidence, OUTSIDE_SIGNAL_CAP)
+
+    return LocalTableResult(
+        page_index=page_index,
+        tables=tables,
+        confidence=round(confidence, 4),
+        signals={
+            "tables": len(tables),
+            "table_confidences": [round(c, 4) for c in confs],
+            "outside_grid_rows": grid_rows,
+            "image_ratio": round(image_ratio, 4),
+        },
+    )
+
+
+def extract_tables_local_pages(pdf_path: Path, page_indices: List[int]) -> Dict[int, LocalTableResult]:
+    results: Dict[int, LocalTableResult] = {}
+    doc = fitz.open(str(pdf_path))
+    try:
+        for pi in page_indices:
+            results[pi] = extract_tables_local(doc.load_page(pi), pi)
+    finally:
+        doc.close()
+    return results
+
+
+def _line_spans(page: "fitz.Page") -> List[Dict[str, Any]]:
+    """line 단위 텍스트 + bbox (제목 추정/커버리지 계산용)"""
+    out: List[Dict[str, Any]] = []
+    for block in page.get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            for sp in line.get("spans", []):
+                txt = (sp.get("text") or "").strip()
+                if txt:
+                    out.append({"text": txt, "bbox": list(sp["bbox"])})
+    return out
+
+
+def _center_in(bbox: List[float], rect: "fitz.Rect") -> bool:
+    cx = (bbox[0] + bbox[2]) / 2
+    cy = (bbox[1] + bbox[3]) / 2
+    return rect.x0 <= cx <= rect.x1 and rect.y0 <= cy <= rect.y1
+
+
+def _cell_text(c: Optional[str]) -> str:
+    return " ".join((c or "").split()).replace("|", "\\|")
+
+
+def _to_markdown(rows: List[List[Optional[str]]]) -> str:
+    """첫 행을 헤더로 하는 GitHub-flavored markdown 표"""
+    n_cols = max(len(r) for r in rows)
+    norm = [[_cell_text(r[i] if i < len(r) else None) for i in range(n_cols)] for r in rows]
+    lines = ["| " + " | ".join(norm[0]) + " |", "|" + "---|" * n_cols]
+    lines.extend("| " + " | ".join(r) + " |" for r in norm[1:])
+    return "\n".join(lines)
+
+
+def _table_confidence(rows: List[List[Optional[str]]], bbox: "fitz.Rect", spans: List[Dict[str, Any]]) -> float:
+    cells = [c for r in rows for c in r]
+    if not cells:
+        return 0.0
+    filled = sum(1 for c in cells if c and c.strip()) / len(cells)
+    merged = sum(1 for c in cells if c is None) / len(cells)
+
+    cell_chars = sum(len("".join((c or "").split())) for c in cells)
+    span_chars = sum(len("".join(sp["text"].split())) for sp in spans if _center_in(sp["bbox"], bbox))
+    if max(cell_chars, span_chars) == 0:
+        coverage = 0.0
+    else:
+        coverage = min(cell_chars, span_chars) / max(cell_chars, span_chars)
+
+    return 0.4 * filled + 0.3 * (1.0 - merged) + 0.3 * coverage
+
+
+def _guess_title(bbox: "fitz.Rect", spans: List[Dict[str, Any]]) -> Optional[str]:
+    """표 바로 위(가로로 겹치는) 짧은 줄 하나를 제목으로"""
+    best: Optional[Dict[str, Any]] = None
+    for sp in spans:
+        x0, y0, x1, y1 = sp["bbox"]
+        gap = bbox.y0 - y1
+        if gap < 0 or gap > TITLE_MAX_GAP or x1 < bbox.x0 or x0 > bbox.x1:
+            continue
+        if len(sp["text"]) > TITLE_MAX_LEN:
+            continue
+        if best is None or y1 > best["bbox"][3]:
+            best = sp
+    return best["text"] if best else None
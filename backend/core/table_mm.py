@@ -5,7 +5,7 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from core.llm_mm import call_mm_json
+from core.llm_mm import _image_to_data_url, call_mm_json, call_mm_json_async, mm_request, response_json
 
 
 # =========================
@@ -22,6 +22,8 @@ class TableExtractResult:
 # Prompt
 # =========================
 
+EXTRACT_MODEL = "gpt-4o"
+
 PROMPT_EXTRACT_TABLES = """Return ONLY valid JSON. No explanation, no markdown outside JSON.
 
 Task:
@@ -81,10 +83,48 @@ def extract_tables_mm(image_path: Path, page_index: int) -> TableExtractResult:
     out = call_mm_json(
         prompt=PROMPT_EXTRACT_TABLES,
         image_path=image_path,
-        model="gpt-4o",          # 표 추출은 고성능 모델 고정
+        model=EXTRACT_MODEL,     # 표 추출은 고성능 모델 고정
+        temperature=0.0,
+        stage="extract",
+        schema="table_extract",
+    )
+    return _to_result(out, page_index)
+
+
+async def extract_tables_mm_async(image_path: Path, page_index: int) -> TableExtractResult:
+    """extract_tables_mm 의 asyncio 버전 (같은 프롬프트/검증)"""
+    image_path = Path(image_path)
+    if not image_path.exists():
+        raise FileNotFoundError(f"Image not found: {image_path}")
+
+    out = await call_mm_json_async(
+        prompt=PROMPT_EXTRACT_TABLES,
+        image_path=image_path,
+        model=EXTRACT_MODEL,
         temperature=0.0,
+        stage="extract",
+        schema="table_extract",
+    )
+    return _to_result(out, page_index)
+
+
+def extract_request(image_path: Path) -> Dict[str, Any]:
+    """extract_tables_mm 이 보내는 것과 같은 요청 body (batch 제출용)"""
+    image_path = Path(image_path)
+    if not image_path.exists():
+        raise FileNotFoundError(f"Image not found: {image_path}")
+    return mm_request(
+        PROMPT_EXTRACT_TABLES, _image_to_data_url(image_path, stage="extract"),
+        model=EXTRACT_MODEL, temperature=0.0, schema="table_extract",
     )
 
+
+def result_from_response(resp: Any, page_index: int) -> TableExtractResult:
+    """batch 로 받은 응답 → TableExtractResult (extract_tables_mm 과 같은 검증/정규화)"""
+    return _to_result(response_json(resp, stage="extract"), page_index)
+
+
+def _to_result(out: Any, page_index: int) -> TableExtractResult:
     # -------------------------
     # Basic validation
     # -------------------------
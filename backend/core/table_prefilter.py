@@ -0,0 +1,230 @@
+# core/table_prefilter.py
+"""
+로컬 표 존재 사전 분류 (MM presence 호출 전 단계)
+
+born-digital 강의안은 대부분 페이지가 평문이라, 이미지 전부를 gpt-4o-mini 에 보낼 필요가 없다.
+PyMuPDF 가 이미 알고 있는 정보로 페이지를 세 가지로 나눈다:
+
+  "yes"        page.find_tables() 가 텍스트가 채워진 표(2x2 이상)를 찾음
+  "no"         표 후보 신호가 전혀 없음 (find_tables 없음, 괘선 없음, span 격자 정렬 없음,
+               텍스트 레이어 있음, 큰 이미지 없음)
+  "uncertain"  그 외 → MM presence 로 보낸다
+
+신호:
+  - find_tables()            : 괘선 기반 표 (rows x cols, 채워진 셀 비율)
+  - get_drawings()           : 수평/수직 선분 수 (얇은 rect 포함)
+  - layout spans (pages_text): 여러 줄에 걸쳐 같은 x 위치에서 시작하는 span 열 (괘선 없는 표)
+  - get_image_info()         : 이미지가 덮는 면적 비율 (표가 그림으로 들어간 경우)
+
+표를 "no" 로 잘못 거르면 복구가 안 되므로 "no" 조건을 보수적으로 잡는다.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import fitz  # PyMuPDF
+
+from core.pages_reader import PagesReader, open_pages
+from core.span_store import SpanStore
+
+PREFILTER_VERSION = "prefilter_v1"
+
+# find_tables 결과를 표로 인정하는 최소 조건
+MIN_TABLE_ROWS = 2
+MIN_TABLE_COLS = 2
+MIN_FILLED_CELL_RATIO = 0.5   # 차트 격자처럼 빈 칸뿐인 "표" 는 제외
+
+# 괘선 / span 격자 신호
+MIN_RULE_LEN = 20.0           # pt, 이보다 짧은 선분은 밑줄/장식으로 보고 무시
+RULE_TOL = 1.0                # pt, 수평/수직 판정 허용 오차
+ROW_Y_TOL = 3.0               # pt, 같은 줄로 묶을 y-center 차이
+COL_X_BIN = 5.0               # pt, 열 시작 x 를 묶는 단위
+MIN_GRID_ROWS = 3             # 같은 열 구조가 반복되는 최소 줄 수
+MIN_GRID_COLS = 2
+
+# 이미지가 이 비율 이상 덮으면 표가 그림일 수 있으므로 "no" 로 확정하지 않는다
+MAX_IMAGE_AREA_RATIO_FOR_NO = 0.10
+
+
+@dataclass(frozen=True)
+class PrefilterResult:
+    page_index: int
+    verdict: str                                  # "yes" | "no" | "uncertain"
+    signals: Dict[str, Any] = field(default_factory=dict)
+
+
+def classify_page(
+    page: "fitz.Page",
+    page_index: int,
+    spans: Optional[List[Dict[str, Any]]] = None,
+) -> PrefilterResult:
+    """
+    한 페이지 분류.
+    spans 는 pages_text 의 layout.spans (bbox 포함) — 없으면 page 에서 직접 뽑는다.
+    """
+    if spans is None:
+        spans = _spans_from_page(page)
+
+    page_area = max(1.0, float(page.rect.width * page.rect.height))
+
+    n_tables = 0
+    for tab in page.find_tables().tables:
+        if tab.row_count < MIN_TABLE_ROWS or tab.col_count < MIN_TABLE_COLS:
+            continue
+        cells = [c for row in tab.extract() for c in row]
+        filled = sum(1 for c in cells if c and str(c).strip())
+        if cells and filled / len(cells) >= MIN_FILLED_CELL_RATIO:
+            n_tables += 1
+
+    h_rules, v_rules = _count_rules(page)
+    grid_rows, grid_cols = _span_grid(spans)
+
+    image_area = 0.0
+    for info in page.get_image_info():
+        r = fitz.Rect(info.get("bbox")) & page.rect
+        if not r.is_empty:
+            image_area += r.width * r.height
+    image_ratio = min(1.0, image_area / page_area)
+
+    signals = {
+        "tables": n_tables,
+        "h_rules": h_rules,
+        "v_rules": v_rules,
+        "grid_rows": grid_rows,
+        "grid_cols": grid_cols,
+        "spans": len(spans),
+        "image_ratio": round(image_ratio, 4),
+    }
+
+    if n_tables > 0:
+        verdict = "yes"
+    elif (
+        spans
+        and h_rules + v_rules < 3
+        and grid_rows < MIN_GRID_ROWS
+        and image_ratio < MAX_IMAGE_AREA_RATIO_FOR_NO
+    ):
+        verdict = "no"
+    else:
+        verdict = "uncertain"
+
+    return PrefilterResult(page_index=page_index, verdict=verdict, signals=signals)
+
+
+def prefilter_pages(
+    pdf_path: Path,
+    page_indices: List[int],
+    page_spans: Optional[Callable[[int], Optional[List[Dict[str, Any]]]]] = None,
+) -> Dict[int, PrefilterResult]:
+    """page_indices 를 분류. page_spans(pi) 가 있으면 저장된 layout spans 를 쓴다."""
+    results: Dict[int, PrefilterResult] = {}
+    doc = fitz.open(str(pdf_path))
+    try:
+        for pi in page_indices:
+            spans = page_spans(pi) if page_spans is not None else None
+            results[pi] = classify_page(doc.load_page(pi), pi, spans=spans)
+    finally:
+        doc.close()
+    return results
+
+
+@contextmanager
+def layout_spans_loader(out_dir: Path) -> Iterator[Optional[Callable[[int], Optional[List[Dict[str, Any]]]]]]:
+    """
+    prepare 산출물(pages_text.json / jsonl + pages_layout/)에서 page 별 layout spans 를 꺼내는 함수를 yield.
+    pages_text 가 없으면 None (classify_page 가 page 에서 직접 뽑는다).
+    jsonl 이면 PagesReader 가 파일을 열고 있으므로 with 블록이 끝날 때 닫는다.
+
+        with layout_spans_loader(out_dir) as page_spans:
+            prefilter_pages(pdf_path, page_indices, page_spans=page_spans)
+    """
+    out_dir = Path(out_dir)
+    try:
+        pages = open_pages(out_dir / "pages_text.json")
+    except FileNotFoundError:
+        yield None
+        return
+    store = SpanStore.open_if_exists(out_dir)
+
+    def _load(pi: int) -> Optional[List[Dict[str, Any]]]:
+        if not 0 <= pi < len(pages):
+            return None
+        layout = pages[pi].get("layout") or {}
+        if layout.get("spans_store") and store is not None:
+            return store.page_spans(pi)
+        spans = layout.get("spans")
+        return spans if isinstance(spans, list) else None
+
+    try:
+        yield _load
+    finally:
+        if isinstance(pages, PagesReader):
+            pages.close()
+
+
+def _spans_from_page(page: "fitz.Page") -> List[Dict[str, Any]]:
+    spans: List[Dict[str, Any]] = []
+    for block in page.get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            for sp in line.get("spans", []):
+                if (sp.get("text") or "").strip():
+                    spans.append({"text": sp["text"], "bbox": list(sp["bbox"])})
+    return spans
+
+
+def _count_rules(page: "fitz.Page") -> tuple[int, int]:
+    """수평/수직 선분 수 (선 + 얇은 rect). 채워진 큰 rect 는 테두리 4변으로 센다."""
+    h = v = 0
+    for d in page.get_drawings():
+        for item in d.get("items", []):
+            kind = item[0]
+            if kind == "l":
+                p1, p2 = item[1], item[2]
+                if abs(p1.y - p2.y) <= RULE_TOL and abs(p1.x - p2.x) >= MIN_RULE_LEN:
+                    h += 1
+                elif abs(p1.x - p2.x) <= RULE_TOL and abs(p1.y - p2.y) >= MIN_RULE_LEN:
+                    v += 1
+            elif kind == "re":
+                r = item[1]
+                if r.height <= 2 * RULE_TOL and r.width >= MIN_RULE_LEN:
+                    h += 1
+                elif r.width <= 2 * RULE_TOL and r.height >= MIN_RULE_LEN:
+                    v += 1
+                elif r.width >= MIN_RULE_LEN and r.height >= MIN_RULE_LEN:
+                    h += 2
+                    v += 2
+    return h, v
+
+
+def _span_grid(spans: List[Dict[str, Any]]) -> tuple[int, int]:
+    """
+    괘선 없는 표 신호: 여러 줄이 같은 열 시작 x 들을 공유하는지.
+    Returns: (격자에 맞는 줄 수, 반복되는 열 수)
+    """
+    rows: List[List[float]] = []  # 줄별 span x0 목록
+    row_y: List[float] = []
+    for sp in sorted(spans, key=lambda s: (s["bbox"][1] + s["bbox"][3]) / 2):
+        x0, y0, _, y1 = sp["bbox"]
+        yc = (y0 + y1) / 2
+        if row_y and abs(yc - row_y[-1]) <= ROW_Y_TOL:
+            rows[-1].append(x0)
+        else:
+            rows.append([x0])
+            row_y.append(yc)
+
+    multi = [sorted({round(x / COL_X_BIN) for x in xs}) for xs in rows]
+    multi = [cols for cols in multi if len(cols) >= MIN_GRID_COLS]
+    if len(multi) < MIN_GRID_ROWS:
+        return 0, 0
+
+    col_freq = Counter(c for cols in multi for c in cols)
+    common = {c for c, n in col_freq.items() if n >= MIN_GRID_ROWS}
+    if len(common) < MIN_GRID_COLS:
+        return 0, 0
+
+    grid_rows = sum(1 for cols in multi if len(common.intersection(cols)) >= MIN_GRID_COLS)
+    return grid_rows, len(common)
@@ -0,0 +1,78 @@
+# core/test_llm_cache.py
+"""
+llm_cache 가 completed 응답만 저장하고, refresh() / evict() 로 못 쓰는 응답을 다시 받을 수 있는지 확인한다.
+
+  1) status="incomplete" 응답은 저장되지 않는다 (다음 호출은 다시 보냄)
+  2) status="completed" 응답은 저장되고 다음 호출은 hit
+  3) refresh() 안에서는 hit 이어도 다시 보내고 새 응답으로 덮어쓴다
+  4) evict() 로 지운 항목은 다음 호출에서 다시 보낸다
+
+usage: python -m core.test_llm_cache
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from core import llm_cache
+
+
+def main():
+    print("=== TEST llm_cache ===")
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["LLM_CACHE"] = "1"
+        os.environ["LLM_CACHE_DIR"] = str(Path(tmp))
+        llm_cache.reset_cache()
+
+        request = {"model": "m", "input": "hello", "temperature": 0.0}
+        sent = []
+
+        def _call_with(status: str, text: str):
+            def _call():
+                sent.append(text)
+                return {"status": status, "output_text": text}
+            return _call
+
+        def _get(status: str, text: str):
+            return llm_cache.cached_call(
+                stage="verify", request=request, call=_call_with(status, text),
+                dump=lambda r: r, load=lambda d: d,
+            )
+
+        _get("incomplete", "trunc")
+        r = _get("completed", "v1")
+        if sent != ["trunc", "v1"] or r["output_text"] != "v1":
+            failures.append(f"incomplete response was cached: sent={sent}")
+
+        r = _get("completed", "v2")
+        if len(sent) != 2 or r["output_text"] != "v1":
+            failures.append(f"completed response was not served from cache: sent={sent}, got={r}")
+
+        with llm_cache.refresh():
+            r = _get("completed", "v3")
+        if len(sent) != 3 or r["output_text"] != "v3":
+            failures.append(f"refresh() did not bypass the cache: sent={sent}, got={r}")
+        r = _get("completed", "v4")
+        if r["output_text"] != "v3":
+            failures.append(f"refresh() did not overwrite the entry: got={r}")
+
+        if not llm_cache.evict("verify", request):
+            failures.append("evict() found no entry")
+        r = _get("completed", "v5")
+        if r["output_text"] != "v5":
+            failures.append(f"evicted entry was still served: got={r}")
+
+        print("sent:", sent)
+        print("stats:", llm_cache.cache_stats()["by_stage"])
+        llm_cache.reset_cache()
+
+    if failures:
+        for f in failures:
+            print("❌", f)
+        sys.exit(1)
+    print("✅ only completed responses cached; refresh/evict re-fetch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# core/test_pdf_text_single_pass.py
+"""
+single-pass 추출(get_text("dict") 1회)이 예전 two-pass 추출
+(get_text("text") + get_text("dict"))과 같은 페이지 dict를 만드는지 비교한다.
+
+usage: python -m core.test_pdf_text_single_pass [pdf_path]
+"""
+import sys
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from core.pdf_text import _clean_text, _extract_page, _guess_section_title
+
+
+def _extract_page_two_pass(page, page_index: int) -> dict:
+    """기준 구현: single-pass 도입 전 extract_pdf_text의 페이지 처리 그대로"""
+    raw_text = page.get_text("text") or ""
+    lines = [l.strip() for l in raw_text.splitlines() if l.strip()]
+
+    spans = []
+    d = page.get_text("dict")
+    for b_i, block in enumerate(d.get("blocks", [])):
+        if "lines" not in block:
+            continue
+        for l_i, line in enumerate(block.get("lines", [])):
+            for s_i, sp in enumerate(line.get("spans", [])):
+                txt = _clean_text(sp.get("text", ""))
+                if not txt:
+                    continue
+                bbox = sp.get("bbox")
+                if not bbox or len(bbox) != 4:
+                    continue
+                spans.append({
+                    "text": txt,
+                    "size": float(sp.get("size", 0.0)),
+                    "flags": int(sp.get("flags", 0)),
+                    "bbox": [float(bbox[0]), float(bbox[1]), float(bbox[2]), float(bbox[3])],
+                    "block_no": int(b_i),
+                    "line_no": int(l_i),
+                    "span_no": int(s_i),
+                })
+
+    return {
+        "page_index": page_index,
+        "page_number": page_index + 1,
+        "raw_text": raw_text,
+        "raw_len": len(raw_text),
+        "lines": lines,
+        "maybe_section_title": _guess_section_title(lines),
+        "layout": {
+            "page_w": float(page.rect.width),
+            "page_h": float(page.rect.height),
+            "spans": spans,
+        },
+    }
+
+
+def main():
+    pdf_path = Path(sys.argv[1] if len(sys.argv) > 1 else "data/Ch6.pdf")
+    print("=== TEST pdf_text single-pass ===")
+    print("pdf_path:", pdf_path.resolve())
+
+    doc = fitz.open(str(pdf_path))
+    mismatched = []
+    for page_index, page in enumerate(doc):
+        expected = _extract_page_two_pass(page, page_index)
+        actual = _extract_page(page, page_index)
+        if actual != expected:
+            diff_keys = [k for k in expected if expected[k] != actual.get(k)]
+            mismatched.append((page_index, diff_keys))
+
+    print("pages:", len(doc))
+    if mismatched:
+        for pi, keys in mismatched[:10]:
+            print(f"❌ page {pi}: {keys}")
+        sys.exit(1)
+    print("✅ identical to two-pass output")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# core/test_prepare_cache.py
+"""
+prepare_cache 엔트리가 out_dir 재-prepare 로 바뀌지 않는지 확인한다.
+
+cache hit 은 파일을 hardlink 로 연결하므로, 같은 out_dir 을 다른 dpi 로 다시 prepare 할 때
+페이지 이미지를 제자리에서 고쳐 쓰면 캐시 원본(같은 inode)까지 바뀐다.
+  1) A 를 dpi=72 로 prepare (miss → 캐시 등록)
+  2) A 를 dpi=150 으로 다시 prepare (같은 out_dir, 다른 params)
+  3) B 를 dpi=72 로 prepare (hit) → B 의 page_000.png 는 여전히 72dpi 크기여야 한다
+
+usage: python -m core.test_prepare_cache
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from core.prepare_runner import run_prepare
+
+
+def _make_pdf(path: Path, pages: int = 2) -> None:
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((72, 72), f"Section {i}\nprepare cache check page {i}", fontsize=14)
+    doc.save(str(path))
+    doc.close()
+
+
+def _png_size(path: Path) -> tuple:
+    pix = fitz.Pixmap(str(path))
+    return pix.width, pix.height
+
+
+def main():
+    print("=== TEST prepare_cache immutability ===")
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        pdf = root / "deck.pdf"
+        _make_pdf(pdf)
+        artifacts = root / "artifacts"
+        a, b = artifacts / "a", artifacts / "b"
+
+        run_prepare(pdf_path=pdf, pdf_id="a", out_dir=a, dpi=72)
+        size_72 = _png_size(a / "pages_png" / "page_000.png")
+        out = run_prepare(pdf_path=pdf, pdf_id="a", out_dir=a, dpi=150)
+        size_150 = _png_size(a / "pages_png" / "page_000.png")
+        if out["cache"]["hit"]:
+            failures.append("dpi=150 re-prepare should be a cache miss")
+        if size_150 == size_72:
+            failures.append(f"dpi=150 re-prepare did not re-render: {size_150}")
+
+        out = run_prepare(pdf_path=pdf, pdf_id="b", out_dir=b, dpi=72)
+        size_hit = _png_size(b / "pages_png" / "page_000.png")
+        if not out["cache"]["hit"]:
+            failures.append("dpi=72 prepare of another pdf_id should be a cache hit")
+        if size_hit != size_72:
+            failures.append(f"cache entry was modified by re-prepare: expected {size_72}, got {size_hit}")
+
+        print("dpi=72:", size_72, "dpi=150:", size_150, "hit:", size_hit)
+
+    if failures:
+        for f in failures:
+            print("❌", f)
+        sys.exit(1)
+    print("✅ cache entry unchanged by re-prepare")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# core/test_rate_limit.py
+"""
+rate_limit token bucket 의 소진 / refill / refund 와 acquire_async 가 event loop 를 막지 않는지 확인한다.
+
+  1) 가득 찬 bucket 에서 한도만큼 가져가면 다음 요청은 기다려야 한다 (기다릴 초 = 모자란 양 / 초당 refill)
+  2) 시간이 지나면 분당 한도/60 씩 다시 찬다
+  3) refund 로 덜 쓴 토큰을 돌려받으면 바로 다시 가져갈 수 있고, 음수 refund 는 더 차감한다
+  4) 다른 커넥션이 bucket 을 잠그고 있는 동안에도 acquire_async 를 기다리는 loop 의 다른 작업은 돈다
+
+usage: python -m core.test_rate_limit
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from core import rate_limit
+from core.rate_limit import RateLimiter
+
+MODEL = "test-model"
+
+
+def _check_bucket(limiter: RateLimiter, failures: list) -> None:
+    os.environ["LLM_RPM_TEST_MODEL"] = "0"
+    os.environ["LLM_TPM_TEST_MODEL"] = "600"  # 초당 10 토큰씩 refill
+
+    if limiter.try_acquire(MODEL, 600) != 0.0:
+        failures.append("full bucket did not grant its capacity")
+    wait = limiter.try_acquire(MODEL, 100)
+    if not 9.0 < wait <= 10.0:
+        failures.append(f"empty bucket wait should be ~10s for 100 tokens at 10/s: {wait:.2f}")
+
+    time.sleep(0.5)  # ~5 토큰 refill
+    wait_after = limiter.try_acquire(MODEL, 100)
+    if not 0.3 < wait - wait_after < 0.7:
+        failures.append(f"bucket did not refill over time: wait {wait:.2f} → {wait_after:.2f}")
+
+    limiter.refund(MODEL, 200)
+    if limiter.try_acquire(MODEL, 150) != 0.0:
+        failures.append("refunded tokens were not available")
+    limiter.refund(MODEL, -300)  # 추정보다 300 더 씀
+    wait = limiter.try_acquire(MODEL, 50)
+    if wait < 25.0:
+        failures.append(f"negative refund did not deduct: wait {wait:.2f}")
+
+
+def _check_async_not_blocking(db: Path, failures: list) -> None:
+    os.environ["LLM_RATE_LIMIT_DB"] = str(db)
+    rate_limit.reset_limiter()
+    os.environ["LLM_TPM_TEST_MODEL"] = "600"  # 새 DB 라 bucket 은 가득 참 → 잠금만 기다리면 된다
+    rate_limit.get_limiter()
+
+    # 다른 프로세스가 잠금을 쥐고 있는 상황: 0.5초 동안 BEGIN IMMEDIATE 를 유지
+    locked = threading.Event()
+
+    def _hold_lock():
+        conn = sqlite3.connect(str(db), timeout=30, isolation_level=None)
+        conn.execute("BEGIN IMMEDIATE")
+        locked.set()
+        time.sleep(0.5)
+        conn.execute("ROLLBACK")
+        conn.close()
+
+    holder = threading.Thread(target=_hold_lock)
+    holder.start()
+    locked.wait()
+
+    async def _main():
+        ticks = 0
+
+        async def _ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.05)
+                ticks += 1
+
+        t = asyncio.create_task(_ticker())
+        t0 = time.monotonic()
+        await rate_limit.acquire_async(MODEL, 10)
+        elapsed = time.monotonic() - t0
+        t.cancel()
+        return ticks, elapsed
+
+    ticks, elapsed = asyncio.run(_main())
+    holder.join()
+    if elapsed < 0.3:
+        failures.append(f"acquire_async did not wait for the lock: {elapsed:.2f}s")
+    if ticks < 4:
+        failures.append(f"event loop was blocked while acquire_async waited for the lock: ticks={ticks}")
+    rate_limit.reset_limiter()
+
+
+def main():
+    print("=== TEST rate_limit ===")
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        _check_bucket(RateLimiter(Path(tmp) / "bucket.sqlite"), failures)
+        _check_async_not_blocking(Path(tmp) / "async.sqlite", failures)
+
+    if failures:
+        for f in failures:
+            print("❌", f)
+        sys.exit(1)
+    print("✅ bucket refill / refund; acquire_async keeps the loop running")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# core/test_retry_policy.py
+"""
+retry_policy 의 circuit breaker 상태 전이와 출력 파싱 실패 재시도를 확인한다.
+
+  1) breaker: 오류율이 넘으면 open → cooldown 뒤 half-open 에서 probe 하나만 통과
+     → probe 실패면 cooldown 두 배로 다시 open, probe 성공이면 close (cooldown 원래대로)
+  2) retry: 응답을 받은 뒤 난 ValueError 는 bad_output → 기다리지 않고 다시 시도하고,
+     다시 시도할 때는 llm_cache 를 건너뛰어 새 응답을 받는다 (캐시는 새 응답으로 바뀜).
+     다시 보낸 요청은 take_retry() 가 1 번 센다 (llm_usage 의 retries)
+  3) retry: 응답을 받기 전에 난 ValueError 는 그대로 permanent (한 번만 시도)
+
+usage: python -m core.test_retry_policy
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from core import llm_cache, retry_policy
+from core.retry_policy import CircuitBreaker
+
+
+def _check_breaker(failures: list) -> None:
+    br = CircuitBreaker(error_rate=0.5, min_calls=4, cooldown=0.2)
+    for failed in (False, False, True):
+        br.record(failed)
+    if br.admit() != 0.0:
+        failures.append("breaker opened below min_calls")
+    br.record(True)  # 4번 중 2번 실패 → open
+    if br.opened != 1 or br.admit() <= 0:
+        failures.append(f"breaker did not open at error_rate: opened={br.opened}")
+
+    time.sleep(0.25)
+    if br.admit() != 0.0:
+        failures.append("half-open breaker did not admit a probe after cooldown")
+    if br.admit() != retry_policy.PROBE_POLL:
+        failures.append("half-open breaker admitted a second request while the probe is out")
+
+    br.record(True)  # probe 실패 → 다시 open, cooldown 두 배
+    if br.opened != 2 or abs(br.cooldown - 0.4) > 1e-9 or br.admit() <= 0:
+        failures.append(f"failed probe did not re-open with doubled cooldown: cooldown={br.cooldown}")
+
+    time.sleep(0.45)
+    if br.admit() != 0.0:
+        failures.append("breaker did not admit a probe after the doubled cooldown")
+    br.record(False)  # probe 성공 → close
+    if br.half_open or br.cooldown != 0.2:
+        failures.append(f"successful probe did not close the breaker: half_open={br.half_open}")
+    if br.admit() != 0.0 or br.admit() != 0.0:
+        failures.append("closed breaker did not admit requests")
+
+
+def _check_bad_output_retry(failures: list) -> None:
+    request = {"model": "m", "input": "parse me", "temperature": 0.0}
+    outputs = iter(["not json", '{"ok": true}'])
+    sent = []
+    retries = []
+
+    def _call():
+        text = next(outputs)
+        sent.append(text)
+        retries.append(retry_policy.take_retry())  # core.llm_client 가 요청마다 하는 일
+        return {"status": "completed", "output_text": text}
+
+    def _get():
+        resp = llm_cache.cached_call(stage="verify", request=request, call=_call, dump=lambda r: r, load=lambda d: d)
+        retry_policy.note_response()  # core.llm_client 가 하는 일
+        return resp
+
+    def _attempt(attempt: int):
+        resp = _get()
+        if not resp["output_text"].startswith("{"):
+            raise ValueError("output could not be parsed")
+        return resp["output_text"]
+
+    _get()  # 못 쓰는 응답이 캐시에 들어가 있는 상태에서 시작
+    t0 = time.monotonic()
+    out = retry_policy.retry(_attempt, max_retries=3, base_delay=5.0)
+    elapsed = time.monotonic() - t0
+    if out != '{"ok": true}' or sent != ["not json", '{"ok": true}']:
+        failures.append(f"bad output was not re-fetched past the cache: out={out}, sent={sent}")
+    if elapsed > 1.0:
+        failures.append(f"bad output retry waited for backoff: {elapsed:.1f}s")
+    if retries != [0, 1]:
+        failures.append(f"re-fetch after bad output should count as one retry: {retries}")
+    found, cached = llm_cache.lookup("verify", request, load=lambda d: d)
+    if not found or cached["output_text"] != '{"ok": true}':
+        failures.append(f"cache still holds the bad output: {cached}")
+
+    tries = []
+
+    def _no_response(attempt: int):
+        tries.append(attempt)
+        raise ValueError("bad argument")
+
+    try:
+        retry_policy.retry(_no_response, max_retries=3, base_delay=5.0)
+    except ValueError:
+        pass
+    if tries != [1]:
+        failures.append(f"ValueError before any response should be permanent: tries={tries}")
+
+
+def main():
+    print("=== TEST retry_policy ===")
+    failures = []
+    _check_breaker(failures)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["LLM_CACHE"] = "1"
+        os.environ["LLM_CACHE_DIR"] = str(Path(tmp))
+        llm_cache.reset_cache()
+        _check_bad_output_retry(failures)
+        llm_cache.reset_cache()
+
+    if failures:
+        for f in failures:
+            print("❌", f)
+        sys.exit(1)
+    print("✅ breaker open/half-open/close; bad output retried past the cache")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,11 @@
 # core/question_generator.py
 from __future__ import annotations
 
-import json
 import re
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Set
 
+from core.llm_schemas import parse_json
 from core.llm_text import call_llm_text
 from core.text_chunker import TextChunkConfig, split_text_to_chunks
 
@@ -56,11 +56,7 @@ def _extract_json(raw: str) -> str:
 
 
 def _safe_json_loads(raw: str) -> Optional[Dict[str, Any]]:
-    try:
-        obj = json.loads(_extract_json(raw))
-        return obj if isinstance(obj, dict) else None
-    except Exception:
-        return None
+    return parse_json("chunk", _extract_json(raw))
 
 
 # =========================
@@ -269,6 +265,8 @@ def generate_questions_for_job(
         prompt=prompt,
         model=cfg.model,
         temperature=cfg.temperature,
+        stage="chunk",
+        schema="questions",
     )
 
     # 3) JSON 파싱
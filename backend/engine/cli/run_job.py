@@ -40,7 +40,8 @@ def run_orchestrator(out_dir: Path, total_questions: int, use_llm: bool = True)
     """
     Orchestrator 실행 → allocation 반환
     """
-    from backend.engine.core.question_orchestrator import orchestrate_question_allocation
+    from core import llm_usage
+    from core.question_orchestrator import orchestrate_question_allocation
 
     # section_contexts에서 섹션 정보 읽기
     contexts_dir = out_dir / "section_contexts"
@@ -79,6 +80,7 @@ def run_orchestrator(out_dir: Path, total_questions: int, use_llm: bool = True)
 
     allocation = result["allocation"]
     method = result["method"]
+    llm_usage.write_report(out_dir, "orchestrate")
 
     print(f"✅ Orchestration 완료 ({method} 방식)")
     print(f"   배분: {allocation}")
@@ -179,7 +181,21 @@ if __name__ == "__main__":
     parser.add_argument("--mcq_ratio", type=float, default=1.0, help="MCQ(객관식) 비율 (0.0~1.0)")
     parser.add_argument("--saq_ratio", type=float, default=0.0, help="SAQ(단답형) 비율 (0.0~1.0)")
     parser.add_argument("--no_llm_orchestrate", action="store_true", help="LLM 사용 안함 (통계적 방법)")
+    parser.add_argument("--batch", action="store_true", help="표 추출/문제 생성을 Batch API 로 제출 (야간 대량 처리)")
+    parser.add_argument("--mock_llm", action="store_true",
+                        help="provider 대신 로컬 mock LLM 서버(core.mock_llm_server)로 실행 (오프라인 성능 측정)")
+    parser.add_argument("--mock_latency", default="recorded",
+                        help="mock 지연 분포: recorded / none / fixed:S / uniform:A,B / lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--mock_cassette", default=None, help="mock 서버가 먼저 재생할 core.llm_cassette 녹화 디렉토리")
+    parser.add_argument("--contact_sheet", action="store_true",
+                        help="표 존재 탐지를 페이지 썸네일 격자 한 장씩으로 (run_table_presence --contact_sheet)")
+    parser.add_argument("--pipeline_tables", action="store_true",
+                        help="표 존재 확인과 표 추출을 겹쳐서 실행 (core.run_table_pipeline, 표 추출 단계는 집계만)")
+    parser.add_argument("--merged_tables", action="store_true",
+                        help="표 탐지 + 추출을 페이지당 MM 한 번으로 (run_table_presence --merged, 표 추출 단계는 집계만)")
     args = parser.parse_args()
+    batch_flag = " --batch" if args.batch else ""
+    presence_flags = (" --merged" if args.merged_tables else "") + (" --contact_sheet" if args.contact_sheet else "")
 
     base = Path(__file__).parent.parent.parent  # backend/ 디렉토리
     pdf_path = str(base / "data" / "pdfs" / f"{args.pdf_id}.pdf")
@@ -192,6 +208,19 @@ if __name__ == "__main__":
     sys.path.insert(0, str(base))
     from app.storage.job_store import JobStore
 
+    if args.mock_llm:
+        # stage subprocess 들은 환경변수를 물려받으므로 base URL 만 바꾸면 그대로 mock 으로 간다
+        import os
+        from core.mock_llm_server import start_background
+        _mock_server, mock_url = start_background(
+            latency=args.mock_latency,
+            cassette=Path(args.mock_cassette) if args.mock_cassette else None,
+        )
+        os.environ["OPENAI_BASE_URL"] = mock_url
+        os.environ["LLM_BATCH_BASE_URL"] = mock_url
+        os.environ.setdefault("OPENAI_API_KEY", "local")
+        print(f"🧪 mock LLM: {mock_url} (latency={args.mock_latency}, cassette={args.mock_cassette or '-'})")
+
     try:
         total_steps = 9  # 전체 단계 수 (orchestrator 포함)
 
@@ -201,13 +230,14 @@ if __name__ == "__main__":
             job_store=JobStore, job_id=job_id, stage="PARSING", step_num=1, total_steps=total_steps)
 
         # 2. Table Presence (PARSING)
+        presence_module = "core.run_table_pipeline" if args.pipeline_tables and not args.merged_tables else "core.run_table_presence"
         run_step("2. 표 존재 확인",
-            f'python -m core.run_table_presence --out_dir "{out_dir}" --pdf_id {pdf_id}',
+            f'python -m {presence_module} --out_dir "{out_dir}" --pdf_id {pdf_id}{presence_flags}',
             job_store=JobStore, job_id=job_id, stage="PARSING", step_num=2, total_steps=total_steps)
 
         # 3. Table Extract (PARSING)
         run_step("3. 표 추출",
-            f'python -m core.run_table_extract_mm --out_dir "{out_dir}" --pdf_id {pdf_id}',
+            f'python -m core.run_table_extract_mm --out_dir "{out_dir}" --pdf_id {pdf_id}{batch_flag}',
             job_store=JobStore, job_id=job_id, stage="PARSING", step_num=3, total_steps=total_steps)
 
         # 4. Section Indexer (PARSING)
@@ -244,7 +274,7 @@ if __name__ == "__main__":
         # 7. Question Pipeline (GENERATING/VERIFYING)
         JobStore.update_job_progress(job_id, "GENERATING", 8, total_steps)
         run_step("7. 문제 생성",
-            f'python -m core.run_question_pipeline --out_dir "{out_dir}" --pdf_id {pdf_id}',
+            f'python -m core.run_question_pipeline --out_dir "{out_dir}" --pdf_id {pdf_id}{batch_flag}',
             job_store=None, job_id=None, stage=None, step_num=0, total_steps=0)  # run_question_pipeline 내부에서 상태 업데이트
 
         # 8. API 명세 형식 변환 (SAVING)
@@ -264,6 +294,12 @@ if __name__ == "__main__":
         print(f"📁 원본: {out_dir}/questions_verified_aggregate.json")
         print(f"📁 명세: {output_path}")
         print(f"📊 요청: {args.num_questions}개 / 생성: {q_count}개")
+        usage_path = out_dir / "llm_usage.json"
+        if usage_path.exists():
+            total = json.loads(usage_path.read_text(encoding="utf-8")).get("total", {})
+            print(f"💰 LLM: {total.get('calls', 0)}회 호출, "
+                  f"토큰 {total.get('input_tokens', 0)}/{total.get('output_tokens', 0)} (입력/출력), "
+                  f"약 ${total.get('cost_usd', 0.0):.4f}  ({usage_path})")
         print("="*60)
     except Exception as e:
         # Job 실패 상태 업데이트